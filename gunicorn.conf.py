@@ -35,3 +35,10 @@ tmp_upload_dir = None
 # SSL (se necessário)
 # keyfile = None
 # certfile = None
+
+
+# Métricas Prometheus em modo multiprocesso (PROMETHEUS_MULTIPROC_DIR)
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -4,9 +4,9 @@ import logging
 from datetime import datetime
 from flask import Blueprint, request, jsonify, session
 from flask_cors import cross_origin
-import openai
 
 from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.interfaces.dataprovider.LlmGateway import get_llm_gateway
 from domain.dto.EtpDto import ChatSession, EtpSession
 from domain.dto.UserDto import User
 from domain.dto.KbDto import KbChunk
@@ -18,9 +18,9 @@ from domain.services.requirements_interpreter import (
 logger = logging.getLogger(__name__)
 chat_bp = Blueprint('chat', __name__)
 
-# Configurar cliente OpenAI
+# Configurar cliente OpenAI (gateway compartilhado)
 openai_api_key = os.getenv('OPENAI_API_KEY')
-openai_client = openai.OpenAI(api_key=openai_api_key) if openai_api_key else None
+llm = get_llm_gateway(openai_api_key) if openai_api_key else None
 
 def search_relevant_chunks(query_text, limit=3):
     """Busca chunks relevantes na knowledge base baseado na consulta do usuário"""
@@ -86,7 +86,7 @@ def send_message_direct():
                 'limit_reached': True
             }), 429
         
-        if not openai_client:
+        if not llm:
             return jsonify({
                 'success': False,
                 'error': 'OpenAI não configurado. Verifique a variável OPENAI_API_KEY.'
@@ -130,7 +130,8 @@ def send_message_direct():
             kb_context += "\nUse essas informações para enriquecer sua resposta quando relevante."
 
         # Gerar resposta da IA
-        response = openai_client.chat.completions.create(
+        response = llm.chat(
+            'chat_direct',
             model="gpt-4",
             messages=[
                 {
@@ -255,7 +256,7 @@ def start_chat_session(session_id):
 def send_message(session_id):
     """Envia uma mensagem no chat"""
     try:
-        if not openai_client:
+        if not llm:
             return jsonify({'error': 'OpenAI não configurado'}), 500
 
         data = request.get_json()
@@ -313,7 +314,8 @@ def send_message(session_id):
             })
 
         # Gerar resposta da IA
-        response = openai_client.chat.completions.create(
+        response = llm.chat(
+            'chat_session',
             model="gpt-4",
             messages=openai_messages,
             max_tokens=1000,
@@ -449,7 +451,7 @@ def list_conversations():
 def general_chat():
     """Chat geral sobre ETP e Lei 14.133/21 (sem sessão específica)"""
     try:
-        if not openai_client:
+        if not llm:
             return jsonify({
                 'success': False,
                 'error': 'OpenAI não configurado. Verifique a variável OPENAI_API_KEY.'
@@ -465,7 +467,8 @@ def general_chat():
             }), 400
         
         # Gerar resposta direta
-        response = openai_client.chat.completions.create(
+        response = llm.chat(
+            'chat_general',
             model="gpt-4",
             messages=[
                 {
@@ -13,6 +13,7 @@ from domain.usecase.etp.utils_parser import parse_requirements_response_safely
 from domain.interfaces.dataprovider.DatabaseConfig import db
 from domain.dto.EtpDto import EtpSession
 from rag.retrieval import search_requirements
+from domain.usecase.etp.prompt_budget import budget_context
 from domain.usecase.etp.etp_generator_dynamic import DynamicEtpGenerator
 
 # Blueprint para fluxo conversacional
@@ -121,13 +122,14 @@ def handle_suggest_alternative(session, current_requirements, current_index):
         Necessidade: {necessity}
         
         Baseado nos exemplos similares:
-        {json.dumps(rag_results[:2], indent=2)}
+        {budget_context('alternative_requirement', "gpt-4o-mini", rag_results[:2], max_tokens=400)}
         
         Sugira UMA alternativa diferente e melhor para este requisito.
         Responda apenas com o texto do novo requisito, sem numeração.
         """
         
-        response = etp_generator.client.chat.completions.create(
+        response = etp_generator.llm.chat(
+            'alternative_requirement',
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "Você é um consultor especialista em licitações que sugere requisitos alternativos."},
@@ -207,7 +209,8 @@ def handle_apply_modification(intent_result, session, current_requirements, curr
         Aplique a modificação solicitada e retorne apenas o texto do requisito modificado.
         """
         
-        response = etp_generator.client.chat.completions.create(
+        response = etp_generator.llm.chat(
+            'modify_requirement',
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "Você modifica requisitos conforme solicitado pelo usuário."},
@@ -284,6 +284,28 @@ def generate_etp_legacy(session_id):
             'error': str(e)
         }), 500
 
+@etp_bp.route('/session/<session_id>/generate/stream', methods=['GET', 'POST'])
+@cross_origin()
+def generate_etp_legacy_stream(session_id):
+    """Gera ETP via Server-Sent Events (redirecionamento interno para API dinâmica)"""
+    try:
+        from adapter.entrypoint.etp.EtpDynamicController import _get_etp_components, stream_etp_generation
+        
+        etp_generator = _get_etp_components()[0]
+        if not etp_generator:
+            return jsonify({
+                'success': False,
+                'error': 'Gerador ETP não configurado. Verifique a chave da OpenAI.'
+            }), 500
+        
+        return stream_etp_generation(etp_generator, session_id, 'dynamic_prompts_legacy_compat_stream', ETP_QUESTIONS)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # Adicionar endpoints ausentes que o frontend está chamando
 @etp_bp.route('/generate-preview', methods=['POST'])
 @cross_origin()
@@ -585,6 +607,7 @@ def approve_preview():
         
         # Marcar preview como aprovado
         session.status = 'preview_approved'
+        session.preview_approved = True
         session.updated_at = datetime.utcnow()
         
         db.session.commit()
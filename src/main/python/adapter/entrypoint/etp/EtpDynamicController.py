@@ -4,145 +4,95 @@ import uuid
 import tempfile
 import logging
 from datetime import datetime
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context, url_for
 from flask_cors import cross_origin
 
 from domain.interfaces.dataprovider.DatabaseConfig import db
-from domain.dto.EtpDto import EtpSession, DocumentAnalysis, KnowledgeBase, ChatSession, EtpTemplate
+from domain.dto.EtpDto import EtpSession, EtpSection, DocumentAnalysis, KnowledgeBase, ChatSession, EtpTemplate
 from domain.usecase.etp.verify_federal import resolve_lexml, summarize_for_user, parse_legal_norm_string
 from application.config.LimiterConfig import limiter
 from rag.retrieval import search_requirements
 from domain.services.etp_dynamic import init_etp_dynamic
+from domain.services.etp_sections import (
+    question_sections, load_reusable_sections, save_sections, section_summary, generate_etp_incremental,
+    draft_fingerprint, regenerate_section, VARIANT_FINAL, VARIANT_PREVIEW
+)
+from domain.services.etp_jobs import async_generation_enabled, enqueue_generation_job, get_job, request_cancel
+from domain.services.etp_pregeneration import maybe_pregenerate, pregenerated_draft, adopt_speculative_job
+from domain.services.requirements_cache import get_requirements_cache
+from domain.services.session_prefetch import (
+    get_session_prefetch, prefetch_necessity, KIND_REQUIREMENTS, KIND_OPTIONS, KIND_LEGAL_NORMS,
+    PREFETCH_REQUIREMENTS_K, PREFETCH_WAIT_SECONDS
+)
+from domain.services.single_flight import (
+    get_single_flight, input_fingerprint, OPERATION_GENERATE, OPERATION_PREVIEW, OPERATION_SUGGEST_REQUIREMENTS,
+    OPERATION_REGENERATE_SECTION
+)
+from domain.usecase.etp.prompt_budget import budget_context
 
 etp_dynamic_bp = Blueprint('etp_dynamic', __name__)
 
+# Schemas das respostas estruturadas (uma chamada devolve classificação e resposta ao usuário)
+OPTION_CONVERSATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "made_choice": {"type": "boolean"},
+        "chosen_option": {"type": ["string", "null"]},
+        "needs_clarification": {"type": "boolean"},
+        "response_type": {"type": "string", "enum": ["choice", "question", "clarification"]},
+        "reply": {"type": "string"}
+    },
+    "required": ["made_choice", "chosen_option", "needs_clarification", "response_type", "reply"],
+    "additionalProperties": False
+}
+
+ANALYZE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answered_questions": {"type": "array", "items": {"type": "integer"}},
+        "extracted_answers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"question": {"type": "integer"}, "answer": {"type": "string"}},
+                "required": ["question", "answer"],
+                "additionalProperties": False
+            }
+        },
+        "needs_suggestion": {"type": "boolean"}
+    },
+    "required": ["answered_questions", "extracted_answers", "needs_suggestion"],
+    "additionalProperties": False
+}
+
+MODIFY_REQUIREMENTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "updated_requirements": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "text": {"type": "string"},
+                    "justification": {"type": "string"}
+                },
+                "required": ["id", "text", "justification"],
+                "additionalProperties": False
+            }
+        },
+        "explanation": {"type": "string"}
+    },
+    "required": ["updated_requirements", "explanation"],
+    "additionalProperties": False
+}
+
 # Module-level variables for lazy initialization
 _etp_generator = None
 _prompt_generator = None  
 _rag_system = None
 _initialized = False
 
-def parse_update_command(user_message, current_requirements):
-    """
-    Parse user commands for requirement updates
-    Returns dict with:
-    - action: 'remove', 'edit', 'keep_only', 'add', 'unclear'
-    - items: list of requirement IDs or content
-    - message: explanation of what was done
-    """
-    import re
-    
-    message_lower = user_message.lower()
-    
-    # Check for explicit necessity restart keywords
-    restart_keywords = [
-        "nova necessidade", "trocar a necessidade", "na verdade a necessidade é",
-        "mudou a necessidade", "preciso trocar a necessidade"
-    ]
-    
-    for keyword in restart_keywords:
-        if keyword in message_lower:
-            return {
-                'action': 'restart_necessity',
-                'items': [],
-                'message': 'Detectada solicitação para reiniciar necessidade'
-            }
-    
-    # Extract requirement numbers (R1, R2, etc. or just numbers)
-    req_numbers = []
-    
-    # Look for patterns like "R1", "R2", "requisito 1", "primeiro", "último", etc.
-    r_patterns = re.findall(r'[rR](\d+)', user_message)
-    req_numbers.extend([f"R{n}" for n in r_patterns])
-    
-    # Look for standalone numbers that might refer to requirements
-    number_patterns = re.findall(r'\b(\d+)\b', user_message)
-    for n in number_patterns:
-        if int(n) <= len(current_requirements):
-            req_id = f"R{n}"
-            if req_id not in req_numbers:
-                req_numbers.append(req_id)
-    
-    # Handle positional references
-    if 'último' in message_lower or 'ultima' in message_lower:
-        if current_requirements:
-            req_numbers.append(current_requirements[-1].get('id', f"R{len(current_requirements)}"))
-    
-    if 'primeiro' in message_lower or 'primeira' in message_lower:
-        if current_requirements:
-            req_numbers.append(current_requirements[0].get('id', 'R1'))
-    
-    if 'penúltimo' in message_lower or 'penultima' in message_lower:
-        if len(current_requirements) > 1:
-            req_numbers.append(current_requirements[-2].get('id', f"R{len(current_requirements)-1}"))
-    
-    # Determine action type
-    if any(word in message_lower for word in ['remover', 'tirar', 'excluir', 'deletar', 'retirar']):
-        if req_numbers:
-            return {
-                'action': 'remove',
-                'items': req_numbers,
-                'message': f'Removidos requisitos: {", ".join(req_numbers)}'
-            }
-        else:
-            return {'action': 'unclear', 'items': [], 'message': 'Não foi possível identificar quais requisitos remover'}
-    
-    if any(word in message_lower for word in ['manter apenas', 'só manter', 'manter só', 'manter somente']):
-        if req_numbers:
-            return {
-                'action': 'keep_only',
-                'items': req_numbers,
-                'message': f'Mantidos apenas requisitos: {", ".join(req_numbers)}'
-            }
-        else:
-            return {'action': 'unclear', 'items': [], 'message': 'Não foi possível identificar quais requisitos manter'}
-    
-    if any(word in message_lower for word in ['alterar', 'modificar', 'trocar', 'mudar', 'editar']):
-        if req_numbers:
-            return {
-                'action': 'edit',
-                'items': req_numbers,
-                'message': f'Requisitos para edição: {", ".join(req_numbers)}'
-            }
-        else:
-            return {'action': 'unclear', 'items': [], 'message': 'Não foi possível identificar quais requisitos alterar'}
-    
-    if any(word in message_lower for word in ['adicionar', 'incluir', 'acrescentar', 'novo requisito']):
-        # Extract the content after the add command
-        add_content = user_message
-        for word in ['adicionar', 'incluir', 'acrescentar']:
-            if word in message_lower:
-                parts = user_message.lower().split(word, 1)
-                if len(parts) > 1:
-                    add_content = parts[1].strip()
-                break
-        
-        return {
-            'action': 'add',
-            'items': [add_content],
-            'message': f'Novo requisito adicionado: {add_content}'
-        }
-    
-    # Check for confirmation words
-    confirm_words = [
-        'confirmar', 'confirmo', 'manter', 'ok', 'está bom', 'perfeito',
-        'concordo', 'aceito', 'pode ser', 'sim'
-    ]
-    
-    if any(word in message_lower for word in confirm_words):
-        return {
-            'action': 'confirm',
-            'items': [],
-            'message': 'Requisitos confirmados'
-        }
-    
-    # If nothing clear was detected
-    return {
-        'action': 'unclear',
-        'items': [],
-        'message': 'Comando não reconhecido'
-    }
-
 def _get_etp_components():
     """Lazy initialization of ETP components to avoid circular imports"""
     global _etp_generator, _prompt_generator, _rag_system, _initialized
@@ -384,17 +334,62 @@ def generate_etp(session_id):
             return jsonify({'error': 'Respostas insuficientes. Mínimo 3 respostas necessárias.'}), 400
 
         # Preparar dados da sessão
-        session_data = {
-            'session_id': session_id,
-            'answers': answers,
-            'user_id': session.user_id
-        }
+        session_data = _generation_session_data(session)
 
-        # Gerar ETP usando sistema dinâmico
-        etp_content = etp_generator.generate_complete_etp(
-            session_data=session_data,
-            context_data=None,
-            is_preview=False
+        # Duplo clique/retentativa com o mesmo estado recebe o resultado da geração em andamento
+        return _single_flight_response(
+            session_id, OPERATION_GENERATE, draft_fingerprint(etp_generator, session_data),
+            lambda: _generate_etp_result(session, session_data)
+        )
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'generation_method': 'dynamic_prompts'
+        }), 500
+
+def _generate_etp_result(session, session_data):
+    """Geração do ETP de /generate: (corpo, status)"""
+    try:
+        # Rascunho especulativo para o mesmo estado da sessão: documento sem chamadas ao modelo
+        draft = pregenerated_draft(etp_generator, session, session_data)
+        if draft:
+            etp_content, sections = draft
+            session.generated_etp = etp_content
+            session.status = 'completed'
+            session.updated_at = datetime.utcnow()
+            db.session.commit()
+            return {
+                'success': True,
+                'etp_content': etp_content,
+                'message': 'ETP gerado com sucesso usando sistema dinâmico',
+                'generation_method': 'dynamic_prompts_pregenerated',
+                'knowledge_base_used': True,
+                'sections': sections
+            }, 200
+
+        # Geração assíncrona: enfileirar e devolver o job (processado pelo applicationWorker)
+        if async_generation_enabled():
+            # Rascunho especulativo em andamento com o mesmo estado vira a geração pedida
+            job, created = adopt_speculative_job(etp_generator, session, session_data), False
+            if job is None:
+                job, created = enqueue_generation_job(
+                    session, variant='final', params={'question_sections': session_data['question_sections']}
+                )
+            db.session.commit()
+            return {
+                'success': True,
+                'job_id': job.job_id,
+                'status': job.status,
+                'status_url': url_for('etp_dynamic.get_generation_job', job_id=job.job_id),
+                'message': 'Geração do ETP enfileirada' if created else 'Geração do ETP já em andamento',
+                'generation_method': 'dynamic_prompts_async'
+            }, 202
+
+        # Gerar ETP usando sistema dinâmico (apenas seções com entradas alteradas)
+        etp_content, sections = generate_etp_incremental(
+            etp_generator, session, session_data, is_preview=False
         )
 
         # Salvar ETP gerado
@@ -404,19 +399,154 @@ def generate_etp(session_id):
 
         db.session.commit()
 
-        return jsonify({
+        return {
             'success': True,
             'etp_content': etp_content,
             'message': 'ETP gerado com sucesso usando sistema dinâmico',
             'generation_method': 'dynamic_prompts',
-            'knowledge_base_used': True
-        })
+            'knowledge_base_used': True,
+            'sections': sections
+        }, 200
 
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': str(e),
             'generation_method': 'dynamic_prompts'
+        }, 500
+
+def _sse_event(event: str, data: dict) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_etp_generation(generator, session_id, generation_method='dynamic_prompts_stream', questions=None):
+    """
+    Resposta SSE da geração do ETP: repassa os eventos de
+    DynamicEtpGenerator.stream_complete_etp e, ao final, grava o documento
+    em generated_etp (e as seções em etp_section) antes de emitir o evento 'done'.
+    Seções com entradas inalteradas são reaproveitadas sem chamar o modelo.
+    Retorna (resposta_de_erro, status) se a sessão não puder ser gerada.
+    """
+    session = EtpSession.query.filter_by(session_id=session_id).first()
+    if not session:
+        return jsonify({'error': 'Sessão não encontrada'}), 404
+
+    answers = session.get_answers()
+    if not answers or len(answers) < 3:
+        return jsonify({'error': 'Respostas insuficientes. Mínimo 3 respostas necessárias.'}), 400
+
+    session_data = {
+        'session_id': session_id,
+        'answers': answers,
+        'user_id': session.user_id,
+        'question_sections': question_sections(questions or ETP_QUESTIONS)
+    }
+    reusable_sections = load_reusable_sections(session, is_preview=False)
+
+    def events():
+        yield _sse_event('generation_start', {'session_id': session_id, 'generation_method': generation_method})
+        try:
+            for event in generator.stream_complete_etp(session_data=session_data, context_data=None, is_preview=False,
+                                                       reusable_sections=reusable_sections):
+                name = event.pop('event')
+                if name == 'heartbeat':
+                    yield ": keep-alive\n\n"
+                    continue
+                if name == 'done':
+                    sections = event.pop('sections')
+                    current = EtpSession.query.filter_by(session_id=session_id).first()
+                    current.generated_etp = event['etp_content']
+                    current.status = 'completed'
+                    current.updated_at = datetime.utcnow()
+                    save_sections(current, sections, is_preview=False)
+                    db.session.commit()
+                    event.update(success=True, session_id=session_id, generation_method=generation_method,
+                                 sections=section_summary(sections))
+                yield _sse_event(name, event)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erro no streaming do ETP {session_id}: {str(e)}")
+            yield _sse_event('error', {'success': False, 'error': str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@etp_dynamic_bp.route('/session/<session_id>/generate/stream', methods=['GET', 'POST'])
+@limiter.limit("10 per minute")
+@cross_origin()
+def generate_etp_stream(session_id):
+    """Gera ETP completo transmitindo as seções via Server-Sent Events"""
+    try:
+        _ensure_initialized()
+        if not etp_generator:
+            return jsonify({'error': 'Gerador ETP não configurado'}), 500
+
+        return stream_etp_generation(etp_generator, session_id)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'generation_method': 'dynamic_prompts_stream'
+        }), 500
+
+@etp_dynamic_bp.route('/jobs/<job_id>', methods=['GET'])
+@cross_origin()
+def get_generation_job(job_id):
+    """Retorna o status e o progresso por seção de um job de geração"""
+    try:
+        job = get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job não encontrado'}), 404
+
+        response = {'success': True, 'job': job.to_dict()}
+        if job.status == 'completed':
+            _ensure_initialized()
+            session = db.session.get(EtpSession, job.etp_session_id)
+            response['etp_content'] = session.preview_content if job.variant == 'preview' else session.generated_etp
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@etp_dynamic_bp.route('/jobs/<job_id>', methods=['DELETE'])
+@cross_origin()
+def cancel_generation_job(job_id):
+    """Cancela um job de geração (na fila ou em andamento)"""
+    try:
+        job = get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job não encontrado'}), 404
+
+        if job.status not in ('queued', 'running'):
+            return jsonify({
+                'success': False,
+                'error': f'Job já finalizado ({job.status})',
+                'job': job.to_dict()
+            }), 409
+
+        request_cancel(job)
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'message': 'Cancelamento solicitado' if job.status == 'running' else 'Job cancelado',
+            'job': job.to_dict()
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
         }), 500
 
 @etp_dynamic_bp.route('/session/<session_id>/preview', methods=['POST'])
@@ -434,34 +564,122 @@ def generate_preview(session_id):
             return jsonify({'error': 'Sessão não encontrada'}), 404
 
         # Preparar dados da sessão
-        session_data = {
-            'session_id': session_id,
-            'answers': session.get_answers(),
-            'user_id': session.user_id
-        }
+        session_data = _generation_session_data(session)
 
-        # Gerar preview usando sistema dinâmico
-        preview_content = etp_generator.generate_complete_etp(
-            session_data=session_data,
-            context_data=None,
-            is_preview=True
+        return _single_flight_response(
+            session_id, OPERATION_PREVIEW, draft_fingerprint(etp_generator, session_data),
+            lambda: _generate_preview_result(session, session_data)
         )
 
+    except Exception as e:
         return jsonify({
+            'success': False,
+            'error': str(e),
+            'generation_method': 'dynamic_prompts'
+        }), 500
+
+def _generate_preview_result(session, session_data):
+    """Geração do preview de /preview: (corpo, status)"""
+    try:
+        # Gerar preview usando sistema dinâmico (apenas seções com entradas alteradas)
+        preview_content, sections = generate_etp_incremental(
+            etp_generator, session, session_data, is_preview=True
+        )
+
+        # Preview alterado precisa de nova aprovação antes de ser promovido a final
+        if preview_content != session.preview_content:
+            session.preview_approved = False
+        session.preview_content = preview_content
+        session.updated_at = datetime.utcnow()
+
+        db.session.commit()
+
+        return {
             'success': True,
             'preview_content': preview_content,
             'message': 'Preview gerado com sucesso usando sistema dinâmico',
             'generation_method': 'dynamic_prompts',
-            'is_preview': True
-        })
+            'is_preview': True,
+            'sections': sections
+        }, 200
 
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': str(e),
             'generation_method': 'dynamic_prompts'
+        }, 500
+
+@etp_dynamic_bp.route('/session/<session_id>/sections/<int:section_number>/regenerate', methods=['POST'])
+@limiter.limit("10 per minute")
+@cross_origin()
+def regenerate_etp_section(session_id, section_number):
+    """Regenera uma única seção do ETP (com feedback opcional) sem refazer o documento"""
+    try:
+        _ensure_initialized()
+        if not etp_generator:
+            return jsonify({'error': 'Gerador ETP não configurado'}), 500
+
+        session = EtpSession.query.filter_by(session_id=session_id).first()
+        if not session:
+            return jsonify({'error': 'Sessão não encontrada'}), 404
+
+        data = request.get_json(silent=True) or {}
+        variant = data.get('variant') or VARIANT_FINAL
+        if variant not in (VARIANT_FINAL, VARIANT_PREVIEW):
+            return jsonify({'error': 'variant deve ser final ou preview'}), 400
+        if section_number not in dict(etp_generator.section_titles()):
+            return jsonify({'error': f'Seção {section_number} não existe'}), 400
+        feedback = (data.get('feedback') or '').strip() or None
+
+        # Retentativa com a mesma seção atual e o mesmo feedback recebe o resultado em andamento
+        row = EtpSection.query.filter_by(
+            etp_session_id=session.id, variant=variant, section_number=section_number
+        ).first()
+        fingerprint = input_fingerprint(
+            section_number, variant, feedback, row.fingerprint if row else None, row.content if row else None
+        )
+        return _single_flight_response(
+            session_id, OPERATION_REGENERATE_SECTION, fingerprint,
+            lambda: _regenerate_section_result(session, section_number, feedback, variant == VARIANT_PREVIEW)
+        )
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
         }), 500
 
+def _regenerate_section_result(session, section_number, feedback, is_preview):
+    """Regeneração de /sections/<n>/regenerate: (corpo, status)"""
+    method = 'section_adjustment' if feedback else 'section_regeneration'
+    try:
+        result = regenerate_section(
+            etp_generator, session, section_number, _generation_session_data(session),
+            feedback=feedback, is_preview=is_preview
+        )
+        if result is None:
+            return {
+                'success': False,
+                'error': 'Seção ainda não gerada. Gere o documento antes de regenerar uma seção.'
+            }, 404
+        db.session.commit()
+
+        return {
+            'success': True,
+            'section': result,
+            'etp_content': session.preview_content if is_preview else session.generated_etp,
+            'generation_method': method
+        }, 200
+
+    except Exception as e:
+        db.session.rollback()
+        return {
+            'success': False,
+            'error': str(e),
+            'generation_method': method
+        }, 500
+
 @etp_dynamic_bp.route('/session/<session_id>', methods=['GET'])
 @cross_origin()
 def get_session(session_id):
@@ -537,7 +755,8 @@ def generate_consultative_options():
         }}
         """
 
-        response = etp_generator.client.chat.completions.create(
+        response = etp_generator.llm.chat(
+            'consultative_options',
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": open('/home/ubuntu/autodoc-ia-projeto/prompts/system_consultor.txt').read()},
@@ -589,59 +808,49 @@ def handle_option_conversation():
         if not user_message:
             return jsonify({'error': 'Mensagem do usuário é obrigatória'}), 400
 
-        # Analisar se o usuário fez uma escolha final
-        choice_analysis_prompt = f"""
-        Analise se o usuário fez uma escolha definitiva entre as opções apresentadas.
-
-        Opções disponíveis: {[opt['name'] for opt in options]}
-        Mensagem do usuário: "{user_message}"
-
-        Retorne JSON:
-        {{
-            "made_choice": true/false,
-            "chosen_option": "nome da opção escolhida" ou null,
-            "needs_clarification": true/false,
-            "response_type": "choice|question|clarification"
-        }}
-        """
-
-        choice_response = etp_generator.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": choice_analysis_prompt}],
-            max_tokens=200,
-            temperature=0.3
-        )
-
-        choice_result = json.loads(choice_response.choices[0].message.content.strip())
-
-        # Gerar resposta contextual
-        context_prompt = f"""
+        # Uma única chamada: análise da escolha e resposta consultiva no mesmo JSON
+        conversation_prompt = f"""
         Você é um consultor especialista em contratações públicas conversando sobre opções de atendimento.
 
-        Opções apresentadas: {json.dumps(options, indent=2)}
+        Opções apresentadas: {json.dumps(options, indent=2, ensure_ascii=False)}
         Mensagem do usuário: "{user_message}"
-        Análise da escolha: {json.dumps(choice_result)}
 
-        Responda de forma natural e consultiva, ajudando o usuário a:
-        - Esclarecer dúvidas sobre as opções
-        - Tomar uma decisão informada
-        - Entender implicações de cada escolha
-
-        Se o usuário fez uma escolha, confirme e oriente próximos passos.
-        Se ainda está decidindo, ajude com mais informações.
+        1. Analise se o usuário fez uma escolha definitiva entre as opções
+           ({[opt['name'] for opt in options]}): made_choice, chosen_option (nome da opção ou null),
+           needs_clarification e response_type (choice|question|clarification).
+        2. Em "reply", responda de forma natural e consultiva, ajudando o usuário a:
+           - Esclarecer dúvidas sobre as opções
+           - Tomar uma decisão informada
+           - Entender implicações de cada escolha
+           Se o usuário fez uma escolha, confirme e oriente próximos passos.
+           Se ainda está decidindo, ajude com mais informações.
         """
 
-        ai_response = etp_generator.client.chat.completions.create(
+        from domain.usecase.etp.utils_parser import chat_json
+        result = chat_json(
+            etp_generator.llm,
+            'option_conversation',
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "Você é um consultor especialista em contratações públicas."},
-                {"role": "user", "content": context_prompt}
+                {"role": "user", "content": conversation_prompt}
             ],
-            max_tokens=800,
-            temperature=0.7
-        )
+            schema_name='option_conversation',
+            schema=OPTION_CONVERSATION_SCHEMA,
+            max_tokens=1000,
+            temperature=0.5
+        ) or {}
 
-        ai_response_text = ai_response.choices[0].message.content.strip()
+        ai_response_text = (result.get('reply') or '').strip() or (
+            'Não consegui analisar sua mensagem. Pode reformular ou dizer qual opção prefere?'
+        )
+        # Contrato anterior de choice_analysis; sem JSON válido, pede esclarecimento
+        choice_result = {
+            'made_choice': bool(result.get('made_choice', False)),
+            'chosen_option': result.get('chosen_option'),
+            'needs_clarification': bool(result.get('needs_clarification', True)),
+            'response_type': result.get('response_type', 'clarification')
+        }
         
         return jsonify({
             **resp_base,
@@ -713,6 +922,7 @@ def etp_conversation():
             
             if command_result['intent'] == 'restart_necessity':
                 # Reset session to collect new necessity
+                get_session_prefetch().discard(session.session_id)
                 session.necessity = None
                 session.conversation_stage = 'collect_need'
                 session.set_requirements([])
@@ -731,6 +941,8 @@ def etp_conversation():
                 # PASSO 3: Apply the command to requirements with stable renumbering
                 aplicar_comando(command_result, session, session.necessity)
                 session.conversation_stage = 'review_requirements'
+                if command_result['intent'] == 'confirm':
+                    get_requirements_cache().remember(session, session.necessity, session.get_requirements())
                 session.updated_at = datetime.utcnow()
                 db.session.commit()
                 
@@ -757,7 +969,7 @@ def etp_conversation():
             from domain.usecase.etp.utils_parser import analyze_need_safely
             
             # PASSO 5: Use safe analyzer - NO fallback suicida
-            contains_need, need_description = analyze_need_safely(user_message, etp_generator.client)
+            contains_need, need_description = analyze_need_safely(user_message, etp_generator.llm)
             print(f"🔹 [ANALYZER] contains_need={contains_need}, description='{need_description or 'None'}'")
 
             if contains_need and need_description:
@@ -771,47 +983,64 @@ def etp_conversation():
                 
                 print(f"🔹 [DEPOIS] Sessão: {session.session_id}, estágio: {session.conversation_stage}")
 
+                # Etapas seguintes (RAG, caminho de contratação, normas legais) pré-buscadas em segundo plano
+                prefetch_necessity(session.session_id, need_description,
+                                   _necessity_objective_slug(need_description), etp_generator.llm)
+
                 # Generate requirements using existing logic
                 try:
-                    # Use RAG to find similar requirements
-                    rag_results = search_requirements("generic", need_description, k=15)
+                    # Necessidade equivalente com requisitos já aceitos: sem RAG nem LLM
+                    cached = get_requirements_cache().lookup(need_description, 'conversation_requirements')
+                    requirements_source = cached['provenance'] if cached else None
+                    if cached:
+                        structured_requirements = cached['requirements']
+                    else:
+                        # Use RAG to find similar requirements (pré-busca agendada na trava)
+                        rag_results = get_session_prefetch().result(
+                            session.session_id, KIND_REQUIREMENTS, need_description, timeout=PREFETCH_WAIT_SECONDS
+                        )
+                        if rag_results is None:
+                            rag_results = search_requirements("generic", need_description, k=PREFETCH_REQUIREMENTS_K)
+                        # Exemplos compactados, por relevância, no orçamento de tokens
+                        rag_context = budget_context('conversation_requirements', "gpt-4o-mini", rag_results)
                     
-                    # Generate structured requirements
-                    requirements_prompt = f"""
-                    Baseado na necessidade: "{need_description}"
+                        # Generate structured requirements
+                        requirements_prompt = f"""
+                        Baseado na necessidade: "{need_description}"
                     
-                    E nos seguintes exemplos de requisitos similares:
-                    {json.dumps(rag_results, indent=2)}
+                        E nos seguintes exemplos de requisitos similares:
+                        {rag_context}
                     
-                    Gere uma lista de 3-5 requisitos específicos e objetivos para esta contratação.
+                        Gere uma lista de 3-5 requisitos específicos e objetivos para esta contratação.
                     
-                    Retorne APENAS um JSON no formato:
-                    {{
-                        "requirements": [
-                            {{"id": "R1", "text": "Descrição do requisito", "justification": "Justificativa"}},
-                            {{"id": "R2", "text": "Descrição do requisito", "justification": "Justificativa"}}
-                        ]
-                    }}
-                    """
+                        Retorne APENAS um JSON no formato:
+                        {{
+                            "requirements": [
+                                {{"id": "R1", "text": "Descrição do requisito", "justification": "Justificativa"}},
+                                {{"id": "R2", "text": "Descrição do requisito", "justification": "Justificativa"}}
+                            ]
+                        }}
+                        """
                     
-                    response = etp_generator.client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {"role": "system", "content": "Você é um especialista em licitações que gera requisitos técnicos precisos."},
-                            {"role": "user", "content": requirements_prompt}
-                        ],
-                        max_tokens=1000,
-                        temperature=0.7
-                    )
+                        response = etp_generator.llm.chat(
+                            'conversation_requirements',
+                            model="gpt-4o-mini",
+                            messages=[
+                                {"role": "system", "content": "Você é um especialista em licitações que gera requisitos técnicos precisos."},
+                                {"role": "user", "content": requirements_prompt}
+                            ],
+                            max_tokens=1000,
+                            temperature=0.7
+                        )
                     
-                    # PASSO 5: Parse response safely
-                    from domain.usecase.etp.utils_parser import parse_requirements_response_safely
-                    parsed_response = parse_requirements_response_safely(
-                        response.choices[0].message.content.strip()
-                    )
+                        # PASSO 5: Parse response safely
+                        from domain.usecase.etp.utils_parser import parse_requirements_response_safely
+                        parsed_response = parse_requirements_response_safely(
+                            response.choices[0].message.content.strip()
+                        )
                     
-                    # Extract requirements list from parsed response
-                    structured_requirements = parsed_response.get('suggested_requirements', [])
+                        # Extract requirements list from parsed response
+                        structured_requirements = parsed_response.get('suggested_requirements', [])
                     
                     # Store requirements in session
                     session.set_requirements(structured_requirements)
@@ -846,7 +1075,8 @@ def etp_conversation():
                         "current_index": 0,
                         "ai_response": ai_response,
                         "message": ai_response,
-                        "conversation_stage": "review_requirement_progressive"
+                        "conversation_stage": "review_requirement_progressive",
+                        "requirements_source": requirements_source
                     })
                         
                 except Exception as suggest_error:
@@ -909,7 +1139,8 @@ Não repita informações já coletadas."""
         messages.append({"role": "user", "content": user_message})
 
         # Generate response
-        response = etp_generator.client.chat.completions.create(
+        response = etp_generator.llm.chat(
+            'conversation_reply',
             model="gpt-4o-mini",
             messages=messages,
             max_tokens=800,
@@ -1007,28 +1238,28 @@ def analyze_response():
         Resposta do usuário: "{user_response}"
 
         Retorne um JSON com:
-        {{
-            "answered_questions": [números das perguntas respondidas],
-            "extracted_answers": {{"número": "resposta extraída"}},
-            "needs_suggestion": true/false
-        }}
+        - "answered_questions": números das perguntas respondidas
+        - "extracted_answers": lista de {{"question": número, "answer": "resposta extraída"}}
+        - "needs_suggestion": true/false
 
         Seja rigoroso: só marque como respondida se a resposta for clara e específica.
         """
 
-        response = etp_generator.client.chat.completions.create(
+        # PASSO 5: Resposta estruturada, com parse relaxado como fallback
+        from domain.usecase.etp.utils_parser import chat_json
+        analysis_result = chat_json(
+            etp_generator.llm,
+            'analyze_response',
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "Você é um analisador semântico especializado em extrair informações de respostas sobre licitações."},
                 {"role": "user", "content": analysis_prompt}
             ],
+            schema_name='analyze_response',
+            schema=ANALYZE_RESPONSE_SCHEMA,
             max_tokens=500,
             temperature=0.3
         )
-
-        # PASSO 5: Parse response safely
-        from domain.usecase.etp.utils_parser import parse_json_relaxed
-        analysis_result = parse_json_relaxed(response.choices[0].message.content.strip())
         
         if not analysis_result:
             analysis_result = {
@@ -1036,6 +1267,12 @@ def analyze_response():
                 "extracted_answers": {},
                 "needs_suggestion": False
             }
+        extracted = analysis_result.get('extracted_answers') or {}
+        if isinstance(extracted, list):
+            # Schema usa lista (chaves dinâmicas não cabem no modo estrito); contrato da API segue {"número": resposta}
+            extracted = {str(item.get('question')): item.get('answer') for item in extracted if isinstance(item, dict)}
+        analysis_result['extracted_answers'] = extracted
+        analysis_result.setdefault('answered_questions', [])
 
         # Atualizar lista de perguntas respondidas
         newly_answered = analysis_result.get('answered_questions', [])
@@ -1133,23 +1370,25 @@ def confirm_requirements():
             Solicitação do usuário: "{user_message}"
 
             Retorne APENAS um JSON com:
-            - "updated_requirements": array com requisitos atualizados
+            - "updated_requirements": array com requisitos atualizados ({{"id", "text", "justification"}})
             - "explanation": breve explicação das mudanças feitas
             """
 
-            response = etp_generator.client.chat.completions.create(
+            # PASSO 5: Resposta estruturada, com parse relaxado como fallback
+            from domain.usecase.etp.utils_parser import chat_json
+            modification_result = chat_json(
+                etp_generator.llm,
+                'confirm_requirements',
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "Você é um especialista em requisitos técnicos para licitações."},
                     {"role": "user", "content": modify_prompt}
                 ],
+                schema_name='modify_requirements',
+                schema=MODIFY_REQUIREMENTS_SCHEMA,
                 max_tokens=800,
                 temperature=0.7
             )
-
-            # PASSO 5: Parse response safely
-            from domain.usecase.etp.utils_parser import parse_json_relaxed
-            modification_result = parse_json_relaxed(response.choices[0].message.content.strip())
             
             if modification_result and 'updated_requirements' in modification_result:
                 confirmed_requirements = modification_result['updated_requirements']
@@ -1170,6 +1409,9 @@ def confirm_requirements():
         answers['confirmed_requirements'] = confirmed_requirements
         session.set_answers(answers)
         session.updated_at = datetime.utcnow()
+        if user_action == 'accept':
+            # Conjunto aceito alimenta o cache semântico de sugestões
+            get_requirements_cache().remember(session, session.necessity, confirmed_requirements)
 
         db.session.commit()
 
@@ -1182,14 +1424,22 @@ def confirm_requirements():
         session.updated_at = datetime.utcnow()
         db.session.commit()
 
-        return jsonify({
+        response = {
             **resp_base,
             'kind': 'requirements_confirmed',
             'confirmed_requirements': confirmed_requirements,
             'ai_response': ai_response,
             'message': ai_response,
             'conversation_stage': session.conversation_stage
-        })
+        }
+        if session.conversation_stage == 'legal_norms':
+            # Normas já verificadas pela pré-busca; sem espera se ainda em andamento
+            legal_norms = get_session_prefetch().result(
+                session.session_id, KIND_LEGAL_NORMS, _necessity_objective_slug(session.necessity)
+            )
+            if legal_norms:
+                response['legal_norms'] = legal_norms
+        return jsonify(response)
 
     except Exception as e:
         return jsonify({
@@ -1212,15 +1462,45 @@ def suggest_requirements():
         if not necessity:
             return jsonify({'error': 'Necessidade é obrigatória'}), 400
 
+        # Mesma necessidade pedida de novo enquanto a sugestão está em andamento: mesmo resultado
+        return _single_flight_response(
+            data.get('session_id'), OPERATION_SUGGEST_REQUIREMENTS, input_fingerprint(necessity),
+            lambda: _suggest_requirements_result(necessity)
+        )
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Erro ao sugerir requisitos: {str(e)}'
+        }), 500
+
+def _suggest_requirements_result(necessity):
+    """Sugestão de requisitos de /suggest-requirements: (corpo, status)"""
+    try:
+        # Necessidade equivalente com requisitos já aceitos: sem RAG nem LLM
+        cached = get_requirements_cache().lookup(necessity, 'suggest_requirements')
+        if cached:
+            db.session.commit()
+            return {
+                'success': True,
+                'requirements': cached['requirements'],
+                'message': 'Requisitos sugeridos com base em contratação equivalente já aprovada',
+                'necessity': necessity,
+                'rag_sources': 0,
+                'cache': cached['provenance'],
+                'timestamp': datetime.now().isoformat()
+            }, 200
+
         # Usar RAG para encontrar requisitos similares
         rag_results = search_requirements("generic", necessity, k=5)
+        rag_context = budget_context('suggest_requirements', "gpt-4o-mini", rag_results)
         
         # Gerar requisitos estruturados
         requirements_prompt = f"""
         Baseado na necessidade: "{necessity}"
         
         E nos seguintes exemplos de requisitos similares:
-        {json.dumps(rag_results, indent=2)}
+        {rag_context}
         
         Gere uma lista de 3-5 requisitos específicos e objetivos para esta contratação.
         
@@ -1234,7 +1514,8 @@ def suggest_requirements():
         }}
         """
         
-        response = etp_generator.client.chat.completions.create(
+        response = etp_generator.llm.chat(
+            'suggest_requirements',
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "Você é um especialista em licitações que gera requisitos técnicos precisos."},
@@ -1250,20 +1531,20 @@ def suggest_requirements():
             response.choices[0].message.content.strip()
         )
 
-        return jsonify({
+        return {
             'success': True,
             'requirements': structured_requirements.get('suggested_requirements', []),
             'message': structured_requirements.get('consultative_message', ''),
             'necessity': necessity,
             'rag_sources': len(rag_results),
             'timestamp': datetime.now().isoformat()
-        })
+        }, 200
 
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': f'Erro ao sugerir requisitos: {str(e)}'
-        }), 500
+        }, 500
 
 
 # ============================================================================
@@ -1338,12 +1619,11 @@ def review_requirements():
         
         elif cmd['intent'] == 'edit':
             # Trocar/editar requisitos
+            necessity = session.necessity or ""
+            rag_results = get_session_prefetch().result(session.session_id, KIND_REQUIREMENTS, necessity)
+            rag_results = rag_results[:3] if rag_results is not None else search_requirements("generic", necessity, k=3)
             for req_id in cmd['items']:
-                # Gerar novo requisito via RAG
-                necessity = session.necessity or ""
-                rag_results = search_requirements("generic", necessity, k=3)
-                
-                # Usar IA para gerar novo requisito
+                # Gerar novo requisito via RAG + IA
                 new_req_text = _generate_single_requirement(necessity, rag_results, req_id)
                 session.update_requirement(req_id, new_text=new_req_text)
             
@@ -1353,6 +1633,7 @@ def review_requirements():
         elif cmd['intent'] == 'confirm':
             # Confirmar requisitos
             session.conversation_stage = 'requirements_confirmed'
+            get_requirements_cache().remember(session, session.necessity, session.get_requirements())
             db.session.commit()
             
             return jsonify({
@@ -1438,9 +1719,11 @@ def options_if_ambiguous():
                 'next_action': 'continue_pca'
             })
         
-        # É ambíguo, sugerir opções
-        options = advisor.suggest_options(necessity, requirements)
-        response = advisor.format_options_for_response(options)
+        # É ambíguo, sugerir opções (pré-calculadas na trava da necessidade, se houver)
+        response = get_session_prefetch().result(session_id, KIND_OPTIONS, necessity)
+        if response is None:
+            options = advisor.suggest_options(necessity, requirements)
+            response = advisor.format_options_for_response(options)
         
         # Atualizar estágio da conversa
         session.conversation_stage = 'options'
@@ -1507,6 +1790,9 @@ def pick_option():
         session.procurement_path = procurement_path
         session.conversation_stage = 'path_selected'
         db.session.commit()
+
+        # Conversa concluída: rascunho especulativo do ETP enquanto o usuário revisa (opt-in)
+        _pregenerate_draft(session)
         
         # Mensagem de confirmação
         path_labels = {
@@ -1533,6 +1819,42 @@ def pick_option():
         }), 500
 
 
+def _single_flight_response(session_id, operation, fingerprint, compute):
+    """Executa compute() -> (corpo, status) uma única vez entre requisições duplicadas concorrentes"""
+    (body, status), _ = get_single_flight().do(
+        session_id, operation, fingerprint, compute, keep=lambda result: result[1] < 500
+    )
+    return jsonify(body), status
+
+
+def _generation_session_data(session) -> dict:
+    """Dados da sessão consumidos pela geração do ETP"""
+    return {
+        'session_id': session.session_id,
+        'answers': session.get_answers(),
+        'user_id': session.user_id,
+        'question_sections': question_sections(ETP_QUESTIONS)
+    }
+
+
+def _pregenerate_draft(session):
+    """Enfileira o rascunho especulativo quando a política permite; falhas não afetam a conversa"""
+    try:
+        _ensure_initialized()
+        if not etp_generator or len(session.get_answers()) < 3:
+            return
+        if maybe_pregenerate(etp_generator, session, _generation_session_data(session)):
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Falha ao agendar pré-geração do ETP {session.session_id}: {e}")
+
+
+def _necessity_objective_slug(necessity: str) -> str:
+    """objective_slug das normas legais a partir da necessidade travada"""
+    return etp_generator._extract_objective_slug({'answers': {'necessity': necessity or ''}})
+
+
 def _generate_single_requirement(necessity: str, rag_results: list, req_id: str) -> str:
     """
     Gera um único requisito usando IA e RAG.
@@ -1544,14 +1866,15 @@ def _generate_single_requirement(necessity: str, rag_results: list, req_id: str)
         Baseado na necessidade: "{necessity}"
         
         E nos seguintes exemplos similares:
-        {json.dumps(rag_results[:2], indent=2, ensure_ascii=False)}
+        {budget_context('single_requirement', "gpt-4o-mini", rag_results[:2], max_tokens=400)}
         
         Gere UM requisito técnico específico e objetivo para esta contratação.
         
         Retorne APENAS o texto do requisito, sem numeração ou formatação adicional.
         """
         
-        response = etp_generator.client.chat.completions.create(
+        response = etp_generator.llm.chat(
+            'single_requirement',
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "Você é um especialista em licitações que gera requisitos técnicos precisos."},
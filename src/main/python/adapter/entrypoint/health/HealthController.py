@@ -1,9 +1,17 @@
 import os
 from datetime import datetime
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, request
 from flask_cors import cross_origin
 
+try:
+    from prometheus_client import CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
 health_bp = Blueprint('health', __name__)
+# Registrado sem prefixo: /metrics
+metrics_bp = Blueprint('metrics', __name__)
 
 @health_bp.route('/health', methods=['GET'])
 @cross_origin()
@@ -60,3 +68,26 @@ def get_version():
         ]
     })
 
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas Prometheus (protegido por METRICS_TOKEN, se definido)"""
+    auth_header = request.headers.get('Authorization', '')
+    token = auth_header.replace('Bearer ', '') if auth_header.startswith('Bearer ') else auth_header
+    metrics_token = os.getenv('METRICS_TOKEN', '')
+    if metrics_token and token != metrics_token:
+        return jsonify({"error": "unauthorized"}), 401
+
+    if not PROMETHEUS_AVAILABLE:
+        return jsonify({
+            "error": "prometheus_client não instalado",
+            "message": "Instale com: pip install prometheus-client"
+        }), 503
+
+    # Com vários workers gunicorn (e o applicationWorker), as métricas de todos
+    # os processos são agregadas a partir de PROMETHEUS_MULTIPROC_DIR
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
@@ -7,6 +7,9 @@ import pdfplumber
 import logging
 from domain.interfaces.dataprovider.DatabaseConfig import db
 from domain.dto.KbDto import KbDocument, KbChunk
+from domain.usecase.utils.pdf_pages import iter_pdf_pages
+from rag.dedup import get_chunk_deduplicator
+from domain.usecase.utils.text_cache import get_text_cache, sha256_file
 from datetime import datetime
 import json
 
@@ -22,36 +25,59 @@ def allowed_file(filename):
     """Verifica se o arquivo é permitido"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Chunks persistidos entre flushes ao processar PDFs em streaming
+CHUNK_FLUSH_EVERY = 200
+
+def iter_pdf_text_pages(file_path):
+    """Gera o texto de cada página do PDF em streaming (com cache por sha256 do arquivo)"""
+    return get_text_cache().iter_pages(
+        sha256_file(file_path), 'pdfplumber', lambda: (text for _, text in iter_pdf_pages(file_path))
+    )
+
 def extract_text_from_pdf(file_path):
-    """Extrai texto de um arquivo PDF usando pdfplumber"""
+    """Extrai texto de um arquivo PDF usando pdfplumber (com cache por sha256 do arquivo)"""
     text = []
     try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:  # Skip pages with no text
-                    text.append(page_text)
+        for page_text in iter_pdf_text_pages(file_path):
+            if page_text:  # Skip pages with no text
+                text.append(page_text)
     except Exception as e:
         print(f"Erro ao extrair texto do PDF: {e}")
         return None
     return "\n".join(text) if text else None
 
-def chunk_text(text, chunk_size=1000, overlap=200):
-    """Divide o texto em chunks com sobreposição"""
-    chunks = []
-    text_length = len(text)
+def iter_chunks(pages, chunk_size=1000, overlap=200):
+    """
+    Divide em chunks com sobreposição um fluxo de textos de página, mantendo em
+    memória apenas a janela corrente. Produz os mesmos chunks que chunk_text
+    aplicado às páginas não vazias unidas por '\n'.
+    """
+    step = chunk_size - overlap
+    buffer = ""
+    has_text = False
     
-    for i in range(0, text_length, chunk_size - overlap):
-        chunk = text[i:i + chunk_size]
-        if chunk.strip():
-            chunks.append(chunk.strip())
+    for page_text in pages:
+        if not page_text:
+            continue
+        buffer += ("\n" if has_text else "") + page_text
+        has_text = True
         
-        if i + chunk_size >= text_length:
-            break
+        while len(buffer) > chunk_size:
+            chunk = buffer[:chunk_size].strip()
+            if chunk:
+                yield chunk
+            buffer = buffer[step:]
     
-    return chunks
+    if buffer:
+        chunk = buffer[:chunk_size].strip()
+        if chunk:
+            yield chunk
+
+def chunk_text(text, chunk_size=1000, overlap=200):
+    """Divide o texto em chunks com sobreposição"""
+    return list(iter_chunks([text], chunk_size, overlap))
 
-def process_single_pdf(file, objective_slug):
+def process_single_pdf(file, objective_slug, deduplicator=None):
     """Process a single PDF file and return result data"""
     if not allowed_file(file.filename):
         raise ValueError(f"Tipo de arquivo não permitido: {file.filename}. Apenas PDFs são aceitos.")
@@ -62,11 +88,6 @@ def process_single_pdf(file, objective_slug):
     file.save(temp_path)
     
     try:
-        # Extrair texto do PDF
-        extracted_text = extract_text_from_pdf(temp_path)
-        if not extracted_text:
-            raise ValueError(f"Não foi possível extrair texto do PDF: {filename}")
-        
         # Criar documento na base de conhecimento
         kb_doc = KbDocument(
             filename=filename,
@@ -77,11 +98,11 @@ def process_single_pdf(file, objective_slug):
         db.session.add(kb_doc)
         db.session.flush()  # Para obter o ID
         
-        # Dividir texto em chunks e salvar
-        chunks = chunk_text(extracted_text)
+        # Extrair páginas e gravar chunks incrementalmente (memória constante por página)
         chunk_count = 0
+        collapsed_count = 0
         
-        for text_chunk in chunks:
+        for text_chunk in iter_chunks(iter_pdf_text_pages(temp_path)):
             kb_chunk = KbChunk(
                 kb_document_id=kb_doc.id,
                 section_type='content',
@@ -89,15 +110,27 @@ def process_single_pdf(file, objective_slug):
                 objective_slug=objective_slug,
                 created_at=datetime.utcnow()
             )
-            db.session.add(kb_chunk)
+            if deduplicator is not None and not deduplicator.add_chunk(kb_chunk, source=filename):
+                collapsed_count += 1
+                continue
+            if deduplicator is None:
+                db.session.add(kb_chunk)
             chunk_count += 1
+            
+            if chunk_count % CHUNK_FLUSH_EVERY == 0:
+                db.session.flush()
+        
+        if not chunk_count and not collapsed_count:
+            raise ValueError(f"Não foi possível extrair texto do PDF: {filename}")
         
-        logger.info(f"Processed PDF: {filename} - Document ID: {kb_doc.id} - Chunks: {chunk_count}")
+        logger.info(f"Processed PDF: {filename} - Document ID: {kb_doc.id} - Chunks: {chunk_count} "
+                    f"- Duplicates collapsed: {collapsed_count}")
         
         return {
             'filename': filename,
             'document_id': kb_doc.id,
-            'chunks_created': chunk_count
+            'chunks_created': chunk_count,
+            'duplicates_collapsed': collapsed_count
         }
         
     finally:
@@ -133,23 +166,35 @@ def upload_pdf():
             if not allowed_file(file.filename):
                 return jsonify({"error": f"Arquivo {file.filename} não é um PDF válido. Apenas arquivos .pdf são aceitos."}), 400
         
-        # Processar todos os arquivos
+        # Processar todos os arquivos (chunks quase duplicados são colapsados no canônico)
+        deduplicator = get_chunk_deduplicator(db.session)
         docs_info = []
-        for f in files_to_process:
-            try:
-                result = process_single_pdf(f, objective_slug)
-                docs_info.append(result)
-            except ValueError as ve:
-                db.session.rollback()
-                return jsonify({"error": str(ve)}), 400
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f"Erro ao processar arquivo {f.filename}: {e}")
-                return jsonify({"error": f"Erro ao processar arquivo {f.filename}"}), 500
-        
-        db.session.commit()
-        
-        return jsonify({"message": "PDF processado com sucesso", "documents": docs_info}), 200
+        try:
+            for f in files_to_process:
+                try:
+                    result = process_single_pdf(f, objective_slug, deduplicator)
+                    docs_info.append(result)
+                except ValueError as ve:
+                    db.session.rollback()
+                    return jsonify({"error": str(ve)}), 400
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Erro ao processar arquivo {f.filename}: {e}")
+                    return jsonify({"error": f"Erro ao processar arquivo {f.filename}"}), 500
+            
+            db.session.commit()
+        finally:
+            deduplicator.sync_pending()
+        
+        created = sum(d['chunks_created'] for d in docs_info)
+        collapsed = sum(d['duplicates_collapsed'] for d in docs_info)
+        dedup = {
+            'chunks_seen': created + collapsed,
+            'duplicates_collapsed': collapsed,
+            'dedup_ratio': round(collapsed / (created + collapsed), 4) if created + collapsed else 0.0
+        }
+        
+        return jsonify({"message": "PDF processado com sucesso", "documents": docs_info, "dedup": dedup}), 200
         
     except Exception as e:
         db.session.rollback()
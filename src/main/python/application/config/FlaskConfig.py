@@ -6,7 +6,7 @@ import logging
 import json
 from pathlib import Path
 from dotenv import load_dotenv
-from flask import Flask, send_from_directory, request, g, Response, jsonify
+from flask import Flask, send_from_directory, request, g
 from flask_cors import CORS
 from werkzeug.middleware.proxy_fix import ProxyFix
 import uuid
@@ -14,7 +14,7 @@ import time
 
 # Prometheus metrics
 try:
-    from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client import Counter, Histogram
     PROMETHEUS_AVAILABLE = True
 except ImportError:
     PROMETHEUS_AVAILABLE = False
@@ -323,7 +323,7 @@ def create_api():
     from adapter.entrypoint.etp.EtpDynamicController import etp_dynamic_bp
     from adapter.entrypoint.user.UserController import user_bp
     from adapter.entrypoint.chat.ChatController import chat_bp
-    from adapter.entrypoint.health.HealthController import health_bp
+    from adapter.entrypoint.health.HealthController import health_bp, metrics_bp
     from adapter.entrypoint.admin.AdminController import admin_bp
     from adapter.entrypoint.kb.KbController import kb_blueprint
     
@@ -335,30 +335,7 @@ def create_api():
     app.register_blueprint(chat_bp, url_prefix='/api/chat')
     app.register_blueprint(kb_blueprint)  # KB blueprint already has url_prefix='/api/kb' defined
     app.register_blueprint(admin_bp)  # Admin blueprint already has url_prefix='/administracao' defined
-    
-    # Endpoint de métricas (Prometheus)
-    @app.route('/metrics')
-    def metrics():
-        """Endpoint de métricas Prometheus (protegido por token)."""
-        # Autenticação via token
-        auth_header = request.headers.get('Authorization', '')
-        metrics_token = os.getenv('METRICS_TOKEN', '')
-        
-        # Extrair token do header (formato: "Bearer <token>")
-        token = auth_header.replace('Bearer ', '') if auth_header.startswith('Bearer ') else auth_header
-        
-        # Validar token
-        if metrics_token and token != metrics_token:
-            return jsonify({"error": "unauthorized"}), 401
-        
-        # Retornar métricas Prometheus
-        if PROMETHEUS_AVAILABLE:
-            return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
-        else:
-            return jsonify({
-                "error": "prometheus_client não instalado",
-                "message": "Instale com: pip install prometheus-client"
-            }), 503
+    app.register_blueprint(metrics_bp)  # /metrics (Prometheus, protegido por METRICS_TOKEN)
     
     # Servir arquivos estáticos
     @app.route('/', defaults={'path': ''})
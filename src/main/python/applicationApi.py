@@ -62,7 +62,7 @@ from adapter.entrypoint.etp.ConversationalFlowController import conversational_f
 from adapter.entrypoint.admin.AdminController import admin_bp
 from adapter.entrypoint.chat.ChatController import chat_bp
 from adapter.entrypoint.user.UserController import user_bp
-from adapter.entrypoint.health.HealthController import health_bp
+from adapter.entrypoint.health.HealthController import health_bp, metrics_bp
 
 # Registrar blueprints com prefixo /api
 app.register_blueprint(etp_bp, url_prefix='/api/etp')
@@ -72,6 +72,7 @@ app.register_blueprint(admin_bp)  # já tem url_prefix='/administracao'
 app.register_blueprint(chat_bp, url_prefix='/api/chat')
 app.register_blueprint(user_bp, url_prefix='/api/user')
 app.register_blueprint(health_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp)  # /metrics
 
 # Tabelas são criadas automaticamente pelo init_database
 
@@ -90,7 +91,7 @@ if __name__ == "__main__":
     with app.app_context():
         try:
             from pathlib import Path
-            import openai
+            from domain.interfaces.dataprovider.LlmGateway import get_llm_gateway
             from rag.retrieval import get_retrieval_instance
             
             # Verificar se existem índices FAISS
@@ -101,10 +102,10 @@ if __name__ == "__main__":
             if index_dir.exists() and (index_dir / "etp_index.faiss").exists():
                 logger.info("Carregando índices RAG...")
                 
-                # Configurar cliente OpenAI se disponível
+                # Configurar cliente OpenAI se disponível (pool compartilhado do gateway)
                 openai_client = None
                 try:
-                    openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
+                    openai_client = get_llm_gateway(OPENAI_API_KEY).client
                 except Exception as e:
                     logger.warning("Não foi possível configurar cliente OpenAI: %s", e)
                 
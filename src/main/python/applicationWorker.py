@@ -0,0 +1,105 @@
+"""
+Worker de geração de ETP.
+
+Processa a fila etp_generation_job fora do gunicorn: cada job gera as seções
+do ETP (em paralelo, ETP_SECTION_CONCURRENCY) e grava o progresso no banco.
+
+Uso:
+    python src/main/python/applicationWorker.py --concurrency 2
+"""
+
+import os
+import sys
+import signal
+import socket
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.services.etp_dynamic import init_etp_dynamic
+from domain.services.etp_jobs import EtpJobRunner, claim_next_job, JOB_POLL_SECONDS
+
+
+class GenerationWorker:
+    """Laço de reserva e execução de jobs com até `concurrency` jobs simultâneos"""
+
+    def __init__(self, generator, concurrency: int = 2, poll_interval: float = JOB_POLL_SECONDS):
+        self.runner = EtpJobRunner(generator)
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = threading.Event()
+        self._slots = threading.Semaphore(self.concurrency)
+
+    def stop(self, *_):
+        logger.info("Encerrando worker após os jobs em andamento...")
+        self._stopping.set()
+
+    def _run_job(self, job_id: str):
+        try:
+            status = self.runner.run(job_id)
+            logger.info(f"Job {job_id}: {status}")
+        finally:
+            self._slots.release()
+
+    def run(self):
+        logger.info(f"Worker {self.worker_id} iniciado (concorrência {self.concurrency})")
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='etp-job') as executor:
+            while not self._stopping.is_set():
+                if not self._slots.acquire(timeout=self.poll_interval):
+                    continue
+                try:
+                    job = claim_next_job(self.worker_id)
+                except Exception as e:
+                    logger.error(f"Erro ao consultar a fila: {e}")
+                    db.session.rollback()
+                    job = None
+                finally:
+                    db.session.remove()
+
+                if job is None:
+                    self._slots.release()
+                    self._stopping.wait(self.poll_interval)
+                    continue
+
+                logger.info(f"Job {job.job_id} reservado (sessão {job.etp_session_id}, {job.variant})")
+                executor.submit(self._run_job, job.job_id)
+
+
+def main():
+    """Função principal do CLI"""
+    parser = argparse.ArgumentParser(description="Worker da fila de geração de ETP")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv('ETP_WORKER_CONCURRENCY', '2')),
+                        help="Jobs processados simultaneamente")
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_SECONDS,
+                        help="Intervalo (s) entre consultas à fila vazia")
+    args = parser.parse_args()
+
+    db.create_all()
+    etp_generator = init_etp_dynamic()[0]
+    if etp_generator is None:
+        logger.error("OPENAI_API_KEY não configurada; worker não pode gerar ETPs")
+        sys.exit(1)
+
+    worker = GenerationWorker(etp_generator, concurrency=args.concurrency, poll_interval=args.poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
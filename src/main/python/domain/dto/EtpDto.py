@@ -1,6 +1,7 @@
 from domain.interfaces.dataprovider.DatabaseConfig import db
 from datetime import datetime
 import json
+from sqlalchemy import UniqueConstraint
 
 class EtpSession(db.Model):
     """Modelo para sessões de geração de ETP"""
@@ -358,3 +359,249 @@ class EtpTemplate(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+
+class EtpSection(db.Model):
+    """Seção gerada de um ETP (preview ou final) com o fingerprint das suas entradas"""
+    __tablename__ = 'etp_section'
+    __table_args__ = (
+        UniqueConstraint('etp_session_id', 'variant', 'section_number', name='uk_etp_section_session_variant_number'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    etp_session_id = db.Column(db.Integer, db.ForeignKey('etp_sessions.id', ondelete='CASCADE'), nullable=False, index=True)
+    variant = db.Column(db.String(20), nullable=False, default='final')  # preview, final
+    section_number = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(255))
+    content = db.Column(db.Text)
+    
+    # sha256 de prompt (respostas consumidas + contexto recuperado), modelo e parâmetros
+    fingerprint = db.Column(db.String(64), nullable=False)
+    model = db.Column(db.String(255))
+    
+    # Custo da chamada ao modelo que gerou o conteúdo
+    tokens = db.Column(db.Integer, default=0, nullable=False)
+    latency_ms = db.Column(db.Integer)
+    
+    # Metadados
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Converte o modelo para dicionário"""
+        return {
+            'id': self.id,
+            'etp_session_id': self.etp_session_id,
+            'variant': self.variant,
+            'section_number': self.section_number,
+            'title': self.title,
+            'content': self.content,
+            'fingerprint': self.fingerprint,
+            'model': self.model,
+            'tokens': self.tokens,
+            'latency_ms': self.latency_ms,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class EtpGenerationJob(db.Model):
+    """Job de geração de ETP na fila (processado pelo applicationWorker)"""
+    __tablename__ = 'etp_generation_job'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(36), unique=True, nullable=False)
+    etp_session_id = db.Column(db.Integer, db.ForeignKey('etp_sessions.id', ondelete='CASCADE'), nullable=False, index=True)
+    variant = db.Column(db.String(20), nullable=False, default='final')  # preview, final
+    
+    # Estado do job
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, completed, failed, cancelled
+    cancel_requested = db.Column(db.Boolean, default=False, nullable=False)
+    # Rascunho especulativo (pré-geração); a promoção a geração real é um UPDATE condicional nesta coluna
+    speculative = db.Column(db.Boolean, default=False, nullable=False)
+    params_json = db.Column(db.Text)  # JSON com parâmetros da geração (ex.: question_sections)
+    sections_json = db.Column(db.Text)  # JSON {número: {"title": ..., "status": ...}}
+    error = db.Column(db.Text)
+    worker_id = db.Column(db.String(100))
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    
+    # Metadados
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def get_params(self):
+        """Retorna os parâmetros da geração como dicionário"""
+        if self.params_json:
+            try:
+                return json.loads(self.params_json)
+            except json.JSONDecodeError:
+                return {}
+        return {}
+    
+    def set_params(self, params_dict):
+        """Define os parâmetros da geração a partir de um dicionário"""
+        self.params_json = json.dumps(params_dict, ensure_ascii=False)
+    
+    def get_sections(self):
+        """Retorna o progresso por seção como dicionário"""
+        if self.sections_json:
+            try:
+                return json.loads(self.sections_json)
+            except json.JSONDecodeError:
+                return {}
+        return {}
+    
+    def set_sections(self, sections_dict):
+        """Define o progresso por seção a partir de um dicionário"""
+        self.sections_json = json.dumps(sections_dict, ensure_ascii=False)
+    
+    def to_dict(self):
+        """Converte o modelo para dicionário"""
+        sections = self.get_sections()
+        done = sum(1 for s in sections.values() if s.get('status') in ('completed', 'reused', 'failed'))
+        return {
+            'job_id': self.job_id,
+            'etp_session_id': self.etp_session_id,
+            'variant': self.variant,
+            'status': self.status,
+            'cancel_requested': self.cancel_requested,
+            'progress': {'sections_done': done, 'sections_total': len(sections)},
+            'sections': [dict(section=int(number), **sections[number]) for number in sorted(sections, key=int)],
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class AcceptedRequirementSet(db.Model):
+    """Conjunto de requisitos aceito pelo usuário para uma necessidade (cache semântico de sugestões)"""
+    __tablename__ = 'accepted_requirement_set'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    etp_session_id = db.Column(db.Integer, db.ForeignKey('etp_sessions.id', ondelete='SET NULL'), index=True)
+    necessity = db.Column(db.Text, nullable=False)
+    normalized_necessity = db.Column(db.String(500), nullable=False, index=True)
+    
+    # Embedding da necessidade normalizada (JSON) e modelo que o gerou
+    embedding = db.Column(db.Text, nullable=False)
+    embedding_model = db.Column(db.String(100), nullable=False)
+    requirements_json = db.Column(db.Text, nullable=False)  # JSON [{"id", "text", "justification"}]
+    hits = db.Column(db.Integer, default=0, nullable=False)
+    
+    # Metadados
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_hit_at = db.Column(db.DateTime)
+    
+    def get_embedding(self):
+        """Retorna o embedding como lista de floats"""
+        try:
+            return json.loads(self.embedding) if self.embedding else []
+        except json.JSONDecodeError:
+            return []
+    
+    def set_embedding(self, embedding):
+        """Define o embedding a partir de uma lista de floats"""
+        self.embedding = json.dumps([float(v) for v in embedding])
+    
+    def get_requirements(self):
+        """Retorna os requisitos aceitos como lista"""
+        try:
+            return json.loads(self.requirements_json) if self.requirements_json else []
+        except json.JSONDecodeError:
+            return []
+    
+    def set_requirements(self, requirements):
+        """Define os requisitos aceitos a partir de uma lista"""
+        self.requirements_json = json.dumps(requirements, ensure_ascii=False)
+    
+    def to_dict(self):
+        """Converte o modelo para dicionário (sem o embedding)"""
+        return {
+            'id': self.id,
+            'etp_session_id': self.etp_session_id,
+            'necessity': self.necessity,
+            'normalized_necessity': self.normalized_necessity,
+            'embedding_model': self.embedding_model,
+            'requirements': self.get_requirements(),
+            'hits': self.hits,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'last_hit_at': self.last_hit_at.isoformat() if self.last_hit_at else None
+        }
+
+class RequestLease(db.Model):
+    """Lease de operação em andamento (single-flight entre workers) e resultado para duplicatas"""
+    __tablename__ = 'request_lease'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    lease_key = db.Column(db.String(64), unique=True, nullable=False)  # sha256 de (sessão, operação, entrada)
+    operation = db.Column(db.String(40), nullable=False)
+    session_id = db.Column(db.String(100))
+    
+    # Estado da operação
+    owner = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, done, failed
+    result_json = db.Column(db.Text)  # JSON com o resultado compartilhado com as duplicatas
+    
+    # Metadados
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    finished_at = db.Column(db.DateTime)
+    
+    def get_result(self):
+        """Retorna o resultado compartilhado"""
+        if self.result_json:
+            try:
+                return json.loads(self.result_json)
+            except json.JSONDecodeError:
+                return None
+        return None
+    
+    def set_result(self, result):
+        """Define o resultado compartilhado"""
+        self.result_json = json.dumps(result, ensure_ascii=False)
+
+
+class EtpRegenerationCheckpoint(db.Model):
+    """Progresso de uma sessão numa execução de regeneração em lote (tools.regenerate_etps)"""
+    __tablename__ = 'etp_regeneration_checkpoint'
+    __table_args__ = (
+        UniqueConstraint('run_id', 'etp_session_id', name='uk_etp_regeneration_checkpoint_run_session'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.String(64), nullable=False, index=True)
+    etp_session_id = db.Column(db.Integer, db.ForeignKey('etp_sessions.id', ondelete='CASCADE'), nullable=False)
+    
+    # Estado da sessão na execução
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, unchanged, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    worker_id = db.Column(db.String(100))
+    error = db.Column(db.Text)
+    
+    # Custo da regeneração
+    tokens = db.Column(db.Integer, default=0, nullable=False)
+    sections_generated = db.Column(db.Integer, default=0, nullable=False)
+    duration_ms = db.Column(db.Integer)
+    
+    # Metadados
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """Converte o modelo para dicionário"""
+        return {
+            'run_id': self.run_id,
+            'etp_session_id': self.etp_session_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'tokens': self.tokens,
+            'sections_generated': self.sections_generated,
+            'duration_ms': self.duration_ms,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -1,7 +1,7 @@
 """
 Modelos de dados para a base de conhecimento (Knowledge Base).
 Tipos portáveis para suporte multi-SGBD (PostgreSQL, MySQL, SQL Server, SQLite).
-Embeddings armazenados apenas no FAISS (filesystem), não no banco.
+Embeddings persistidos como JSON em kb_chunk.embedding e indexados no FAISS (filesystem).
 """
 from domain.interfaces.dataprovider.DatabaseConfig import db
 from datetime import datetime
@@ -45,7 +45,7 @@ class KbDocument(db.Model):
 class KbChunk(db.Model):
     """
     Modelo para chunks (fragmentos) da base de conhecimento.
-    Armazena texto e metadados. Embeddings ficam no FAISS (filesystem).
+    Armazena texto, metadados e o embedding serializado (JSON) usado pelo FAISS.
     """
     __tablename__ = 'kb_chunk'
     
@@ -61,10 +61,11 @@ class KbChunk(db.Model):
     # Metadados adicionais (portável)
     metadata_json = db.Column(db.Text, nullable=True)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Embedding serializado como JSON (changeset 012). NULL = ainda não vetorizado,
+    # usado pelo backfill (rag.backfill_embeddings) para retomar o processamento.
+    embedding = db.Column(db.Text, nullable=True)
     
-    # NOTA: Embeddings NÃO são armazenados no banco.
-    # Eles ficam no FAISS (filesystem) e são referenciados pelo ID do chunk.
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     def __repr__(self):
         return f'<KbChunk {self.id} - {self.section_type}>'
@@ -217,13 +217,16 @@ class _FlaskSQLAlchemyCompat:
     """Camada de compatibilidade para código que usa Flask-SQLAlchemy."""
     
     def __init__(self):
-        from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey
+        from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, func
         from sqlalchemy.orm import relationship
         
         self.Model = Base
         self.session = scoped_session(SessionLocal)
         self.metadata = metadata
         
+        # Model.query, como no Flask-SQLAlchemy
+        Base.query = self.session.query_property()
+        
         # Expor tipos SQLAlchemy para compatibilidade
         self.Column = Column
         self.Integer = Integer
@@ -234,6 +237,7 @@ class _FlaskSQLAlchemyCompat:
         self.Boolean = Boolean
         self.ForeignKey = ForeignKey
         self.relationship = relationship
+        self.func = func
     
     def init_app(self, app):
         """Inicializa com app Flask."""
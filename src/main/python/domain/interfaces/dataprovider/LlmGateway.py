@@ -0,0 +1,491 @@
+"""
+Gateway único para as chamadas de chat ao modelo (OpenAI).
+
+Todas as chamadas de chat da aplicação passam por aqui:
+- um único cliente HTTP com pool de conexões por processo (keep-alive reaproveitado);
+- timeout por modelo (fine-tuned de seções é mais lento que os modelos de conversa);
+- retry com backoff exponencial e jitter em 429, 5xx e falhas de conexão,
+  respeitando o Retry-After devolvido pela API;
+- semáforo que limita as chamadas simultâneas do processo inteiro, para que
+  picos (geração em paralelo de várias sessões) esperem na fila local em vez
+  de estourar o rate limit da conta;
+- métricas e log estruturado por chamada (LlmMetrics);
+- cache exato opcional de respostas (LlmResponseCache, LLM_CACHE_ENABLED);
+- requisições duplicadas opcionais contra latência de cauda (LlmHedging,
+  LLM_HEDGE_ENABLED).
+
+Uso:
+    llm = get_llm_gateway()
+    response = llm.chat('section_generation', model=..., messages=[...], max_tokens=...)
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional
+
+import openai
+
+from domain.interfaces.dataprovider.LlmMetrics import (
+    OUTCOME_OK, OUTCOME_CANCELLED, OUTCOME_UNAVAILABLE, call_outcome, record_llm_call, usage_tokens
+)
+from domain.interfaces.dataprovider.LlmResponseCache import LlmResponseCache, cache_key, get_response_cache
+from domain.interfaces.dataprovider.LlmHedging import (
+    HedgePolicy, HEDGE_LOST, HEDGE_NO_SLOT, HEDGE_WON
+)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# Chamadas simultâneas ao modelo no processo (todas as threads do gunicorn/worker)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '16'))
+# Tempo máximo (s) esperando uma vaga no semáforo antes de desistir
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', '120'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', '0.5'))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', '20'))
+LLM_POOL_CONNECTIONS = int(os.getenv('LLM_POOL_CONNECTIONS', '32'))
+LLM_TIMEOUT_DEFAULT = float(os.getenv('LLM_TIMEOUT_DEFAULT', '60'))
+
+# Timeout (s) por prefixo do nome do modelo; vale o prefixo mais longo
+DEFAULT_MODEL_TIMEOUTS = {
+    'ft:': 180.0,
+    'gpt-4-turbo': 120.0,
+    'gpt-4o-mini': 45.0,
+    'gpt-3.5-turbo': 30.0,
+}
+
+
+def parse_model_timeouts(raw: Optional[str]) -> Dict[str, float]:
+    """Lê LLM_MODEL_TIMEOUTS no formato 'prefixo=segundos,prefixo=segundos'"""
+    timeouts = {}
+    for item in (raw or '').split(','):
+        if '=' not in item:
+            continue
+        prefix, _, seconds = item.rpartition('=')
+        try:
+            timeouts[prefix.strip()] = float(seconds)
+        except ValueError:
+            logger.warning(f"LLM_MODEL_TIMEOUTS: valor inválido ignorado '{item}'")
+    return timeouts
+
+
+class LlmUnavailableError(RuntimeError):
+    """Nenhuma vaga no semáforo de chamadas dentro de LLM_QUEUE_TIMEOUT"""
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Segundos pedidos pela API no cabeçalho Retry-After, se houver"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """429, 5xx e falhas de conexão/timeout são transitórios"""
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class _GatewayStream:
+    """
+    Resposta em streaming que mantém a vaga do semáforo até ser consumida ou
+    fechada. Fechar interrompe a conexão HTTP (cancelamento da chamada).
+    Ao terminar, registra o tempo até o primeiro token e o uso de tokens.
+    """
+
+    def __init__(self, stream, on_finish):
+        self._stream = stream
+        self._on_finish = on_finish
+        self._finished = False
+        self._closing = False
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._finish_callbacks: List = []
+        self.ttft: Optional[float] = None
+        self.usage = None
+
+    def __iter__(self) -> Iterator:
+        outcome = OUTCOME_CANCELLED
+        try:
+            for chunk in self._stream:
+                self._observe(chunk)
+                yield chunk
+            outcome = OUTCOME_OK
+        except Exception as e:
+            # Fechada por outra thread (cancelamento): o erro de leitura é esperado
+            outcome = OUTCOME_CANCELLED if self._closing else call_outcome(e)
+            raise
+        finally:
+            self._finish(outcome)
+
+    def _observe(self, chunk):
+        if self.ttft is None:
+            choices = getattr(chunk, 'choices', None)
+            if choices and getattr(getattr(choices[0], 'delta', None), 'content', None):
+                self.ttft = time.perf_counter() - self._started
+        usage = getattr(chunk, 'usage', None)
+        if usage is not None:
+            self.usage = usage
+
+    def close(self):
+        self._closing = True
+        try:
+            close = getattr(self._stream, 'close', None)
+            if close:
+                close()
+        finally:
+            self._finish(OUTCOME_CANCELLED)
+
+    def _finish(self, outcome: str):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            callbacks = list(self._finish_callbacks)
+        self._on_finish(outcome, self.ttft, self.usage)
+        for callback in callbacks:
+            callback(self.usage)
+
+    def add_finish_callback(self, callback):
+        """callback(usage) quando o stream terminar (na hora, se já terminou)"""
+        with self._lock:
+            if not self._finished:
+                self._finish_callbacks.append(callback)
+                return
+        callback(self.usage)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _PrefetchedStream:
+    """Stream cujo início (até o primeiro token) já foi lido; repete esses chunks e segue"""
+
+    def __init__(self, stream: _GatewayStream):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._buffer: List = []
+
+    def prefetch(self) -> "_PrefetchedStream":
+        for chunk in self._iterator:
+            self._buffer.append(chunk)
+            if self._stream.ttft is not None:
+                break
+        return self
+
+    def __iter__(self) -> Iterator:
+        while self._buffer:
+            yield self._buffer.pop(0)
+        yield from self._iterator
+
+    def close(self):
+        self._stream.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _HedgeAttempt:
+    """Uma das chamadas de um par duplicado; cancel() fecha o stream assim que existir"""
+
+    def __init__(self):
+        self.stream: Optional[_GatewayStream] = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def attach(self, stream: _GatewayStream):
+        with self._lock:
+            self.stream = stream
+            cancelled = self.cancelled
+        if cancelled:
+            stream.close()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            stream = self.stream
+        if stream is not None:
+            stream.close()
+
+
+class LlmGateway:
+    """Cliente de chat compartilhado com pool HTTP, timeouts por modelo, retry e limite de concorrência"""
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, client=None,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT, model_timeouts: Optional[Dict[str, float]] = None,
+                 default_timeout: float = LLM_TIMEOUT_DEFAULT, cache: Optional[LlmResponseCache] = None,
+                 hedging: Optional[HedgePolicy] = None):
+        self.client = client if client is not None else self._build_client(api_key, base_url)
+        self.cache = cache if cache is not None else get_response_cache()
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.queue_timeout = queue_timeout
+        self.default_timeout = default_timeout
+        self.model_timeouts = dict(DEFAULT_MODEL_TIMEOUTS)
+        self.model_timeouts.update(parse_model_timeouts(os.getenv('LLM_MODEL_TIMEOUTS')))
+        self.model_timeouts.update(model_timeouts or {})
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.hedging = hedging if hedging is not None else HedgePolicy()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_pool_lock = threading.Lock()
+
+    @staticmethod
+    def _build_client(api_key: Optional[str], base_url: Optional[str]):
+        """Cliente OpenAI sobre um pool HTTP próprio; o retry é do gateway (max_retries=0 no SDK)"""
+        kwargs = {
+            'api_key': api_key or os.getenv('OPENAI_API_KEY'),
+            'base_url': base_url or os.getenv('OPENAI_API_BASE') or None,
+            'max_retries': 0,
+        }
+        if httpx is not None:
+            kwargs['http_client'] = httpx.Client(
+                limits=httpx.Limits(max_connections=LLM_POOL_CONNECTIONS,
+                                    max_keepalive_connections=LLM_POOL_CONNECTIONS),
+                timeout=httpx.Timeout(LLM_TIMEOUT_DEFAULT, connect=10.0)
+            )
+        return openai.OpenAI(**kwargs)
+
+    def timeout_for(self, model: str) -> float:
+        """Timeout configurado para o modelo (prefixo mais longo) ou o padrão"""
+        matches = [prefix for prefix in self.model_timeouts if model.startswith(prefix)]
+        if not matches:
+            return self.default_timeout
+        return self.model_timeouts[max(matches, key=len)]
+
+    def backoff_delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Backoff exponencial com jitter total; o Retry-After da API é o piso"""
+        delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+        retry_after = _retry_after(error) if error is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, LLM_BACKOFF_MAX))
+        return delay
+
+    def _acquire(self, call_site: str):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise LlmUnavailableError(
+                f"LLM {call_site}: sem vaga para chamada ao modelo após {self.queue_timeout:.0f}s"
+            )
+
+    def chat(self, call_site: str, model: str, messages: List[Dict], stream: bool = False,
+             timeout: Optional[float] = None, cache: bool = True, **params):
+        """
+        chat.completions.create pelo gateway. `call_site` identifica a origem da
+        chamada nos logs e métricas. Com stream=True devolve a resposta em
+        streaming, que ocupa a vaga no semáforo até ser consumida ou fechada; o
+        retry só vale até a resposta começar. cache=False ignora o cache de
+        respostas nesta chamada.
+        """
+        key = None
+        if cache and self.cache.cacheable(stream, params):
+            key = cache_key(model, messages, params)
+            cached = self.cache.get(call_site, key)
+            if cached is not None:
+                return cached
+        elif cache:
+            self.cache.skip(call_site)
+
+        timeout = timeout if timeout is not None else self.timeout_for(model)
+        if stream:
+            # Uso de tokens no último chunk do stream
+            params.setdefault('stream_options', {'include_usage': True})
+
+        hedge_delay = self.hedging.delay(call_site)
+        if hedge_delay is None:
+            response = self._call(call_site, model, messages, stream, timeout, **params)
+        else:
+            response = self._hedged_call(call_site, hedge_delay, model, messages, stream, timeout, **params)
+
+        if key is not None:
+            self.cache.put(call_site, model, key, response)
+        return response
+
+    def _call(self, call_site: str, model: str, messages: List[Dict], stream: bool, timeout: float,
+              acquired: bool = False, hedge: bool = False, observe: bool = True, **params):
+        """Uma chamada (com retry) ocupando uma vaga do semáforo; acquired=True se a vaga já foi obtida"""
+        started = time.perf_counter()
+        if not acquired:
+            try:
+                self._acquire(call_site)
+            except LlmUnavailableError:
+                record_llm_call(call_site, model, OUTCOME_UNAVAILABLE, time.perf_counter() - started,
+                                stream=stream, hedge=hedge)
+                raise
+
+        attempts = [0]
+        try:
+            response = self._create_with_retry(call_site, attempts, model=model, messages=messages,
+                                               stream=stream, timeout=timeout, **params)
+        except BaseException as e:
+            self._slots.release()
+            record_llm_call(call_site, model, call_outcome(e), time.perf_counter() - started,
+                            attempts=attempts[0], stream=stream, hedge=hedge)
+            raise
+
+        if stream:
+            def on_finish(outcome, ttft, usage):
+                self._slots.release()
+                if observe and ttft is not None:
+                    self.hedging.observe(call_site, ttft)
+                record_llm_call(call_site, model, outcome, time.perf_counter() - started,
+                                ttft=ttft, usage=usage, attempts=attempts[0], stream=True, hedge=hedge)
+            return _GatewayStream(response, on_finish)
+
+        self._slots.release()
+        latency = time.perf_counter() - started
+        if observe:
+            self.hedging.observe(call_site, latency)
+        record_llm_call(call_site, model, OUTCOME_OK, latency,
+                        usage=getattr(response, 'usage', None), attempts=attempts[0], hedge=hedge)
+        return response
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._hedge_pool is None:
+            with self._hedge_pool_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=self.max_concurrency * 2,
+                                                          thread_name_prefix='llm-hedge')
+        return self._hedge_pool
+
+    def _hedged_call(self, call_site: str, delay: float, model: str, messages: List[Dict],
+                     stream: bool, timeout: float, **params):
+        """
+        Chamada original numa thread; sem primeiro token (ou resposta) após
+        `delay`, dispara uma cópia se houver crédito e vaga. Vale a primeira
+        que responder. Em streaming a outra é fechada; sem streaming não há
+        como cancelá-la: roda até o fim, ocupa a vaga e a resposta é
+        descartada. Os tokens da perdedora entram em llm_hedge_wasted_tokens_total.
+        """
+        started = time.perf_counter()
+
+        def run(attempt: _HedgeAttempt, acquired: bool, hedge: bool):
+            response = self._call(call_site, model, messages, stream, timeout,
+                                  acquired=acquired, hedge=hedge, observe=False, **params)
+            if not stream:
+                return response
+            attempt.attach(response)
+            return _PrefetchedStream(response).prefetch()
+
+        pool = self._pool()
+        primary = _HedgeAttempt()
+        attempts = {pool.submit(run, primary, False, False): primary}
+        done, _ = wait(attempts, timeout=delay)
+        if not done:
+            # A cópia não espera vaga: com o semáforo cheio, duplicar só pioraria a fila
+            if not self._slots.acquire(blocking=False):
+                self.hedging.record(call_site, HEDGE_NO_SLOT)
+            elif not self.hedging.try_fire(call_site):
+                self._slots.release()
+            else:
+                logger.info(f"LLM {call_site}: sem resposta em {delay:.1f}s, disparando cópia da chamada")
+                hedge = _HedgeAttempt()
+                attempts[pool.submit(run, hedge, True, True)] = hedge
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    if attempts[future] is primary or error is None:
+                        error = future.exception()
+                    continue
+                winner = attempts[future]
+                if len(attempts) > 1:
+                    self.hedging.record(call_site, HEDGE_LOST if winner is primary else HEDGE_WON)
+                    if stream and winner.stream is not None:
+                        # A perdedora é fechada antes do primeiro token: paga o mesmo prompt da vencedora
+                        winner.stream.add_finish_callback(
+                            lambda usage: self.hedging.record_waste(call_site, prompt_tokens=usage_tokens(usage)[0])
+                        )
+                for other in set(attempts) - {future}:
+                    attempts[other].cancel()
+                    other.add_done_callback(lambda loser: self._discard_result(call_site, loser))
+                self.hedging.observe(call_site, time.perf_counter() - started)
+                return future.result()
+        raise error
+
+    def _discard_result(self, call_site: str, future):
+        """
+        Descarta a chamada perdedora: fecha o stream que terminou de abrir depois
+        do cancelamento ou, sem streaming, contabiliza a resposta paga e ignorada.
+        """
+        if future.cancelled() or future.exception() is not None:
+            return
+        response = future.result()
+        close = getattr(response, 'close', None)
+        if close:
+            close()
+            return
+        self.hedging.record_waste(call_site, *usage_tokens(getattr(response, 'usage', None)))
+
+    def embed(self, call_site: str, model: str, input, timeout: Optional[float] = None):
+        """embeddings.create pelo gateway (mesmo semáforo, retry e métricas do chat)"""
+        started = time.perf_counter()
+        try:
+            self._acquire(call_site)
+        except LlmUnavailableError:
+            record_llm_call(call_site, model, OUTCOME_UNAVAILABLE, time.perf_counter() - started)
+            raise
+        attempts = [0]
+        try:
+            response = self._with_retry(call_site, attempts, self.client.embeddings.create, model=model,
+                                        input=input, timeout=timeout or self.timeout_for(model))
+        except BaseException as e:
+            record_llm_call(call_site, model, call_outcome(e), time.perf_counter() - started, attempts=attempts[0])
+            raise
+        finally:
+            self._slots.release()
+        record_llm_call(call_site, model, OUTCOME_OK, time.perf_counter() - started,
+                        usage=getattr(response, 'usage', None), attempts=attempts[0])
+        return response
+
+    def _create_with_retry(self, call_site: str, attempts: List[int], **kwargs):
+        if not kwargs.get('stream'):
+            kwargs.pop('stream')
+        return self._with_retry(call_site, attempts, self.client.chat.completions.create, **kwargs)
+
+    def _with_retry(self, call_site: str, attempts: List[int], create, **kwargs):
+        while True:
+            attempts[0] += 1
+            try:
+                return create(**kwargs)
+            except Exception as e:
+                retry = attempts[0] - 1
+                if retry >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff_delay(retry, e)
+                logger.warning(
+                    f"LLM {call_site}: {e.__class__.__name__} em {kwargs['model']}, "
+                    f"nova tentativa {retry + 1}/{self.max_retries} em {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+_gateway: Optional[LlmGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway(api_key: Optional[str] = None) -> LlmGateway:
+    """Gateway do processo (criado na primeira chamada)"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LlmGateway(api_key=api_key)
+    return _gateway
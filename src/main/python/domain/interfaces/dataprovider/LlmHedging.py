@@ -0,0 +1,148 @@
+"""
+Política de requisições duplicadas (hedging) do LlmGateway.
+
+Para os call sites configurados, se a chamada não produziu o primeiro token
+(streaming) ou a resposta (sem streaming) até o percentil LLM_HEDGE_PERCENTILE
+das latências recentes daquele call site, o gateway dispara uma cópia; vale a
+primeira que responder. A perdedora só é interrompida em streaming (o stream é
+fechado e o custo é o prompt); sem streaming a API não permite cancelar, então
+ela roda até o fim, é paga inteira e a resposta é descartada. Por isso a lista
+padrão de call sites só inclui a geração de seções, em que a cópia custa pouco
+perto da latência de cauda.
+
+O gasto extra é limitado por um orçamento de créditos: cada chamada elegível
+acumula LLM_HEDGE_BUDGET créditos (até LLM_HEDGE_BURST) e cada cópia consome
+um; com LLM_HEDGE_BUDGET=0.05, no máximo ~5% das chamadas são duplicadas.
+
+Métricas: llm_hedges_total{call_site, result}
+- fired: cópia disparada
+- won / lost: a cópia respondeu antes / depois da chamada original
+- budget_exhausted / no_slot: cópia não disparada por falta de crédito / de
+  vaga no semáforo do gateway
+
+Métricas: llm_hedge_wasted_tokens_total{call_site, kind}
+- tokens pagos pela chamada perdedora (kind = prompt | completion): uso real
+  da resposta descartada sem streaming; em streaming, o prompt da vencedora
+  (idêntico ao da perdedora, fechada antes do primeiro token)
+"""
+
+import os
+import math
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional
+
+try:
+    from prometheus_client import Counter
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+HEDGE_FIRED = 'fired'
+HEDGE_WON = 'won'
+HEDGE_LOST = 'lost'
+HEDGE_BUDGET_EXHAUSTED = 'budget_exhausted'
+HEDGE_NO_SLOT = 'no_slot'
+
+if PROMETHEUS_AVAILABLE:
+    LLM_HEDGES = Counter(
+        "llm_hedges_total",
+        "Requisições duplicadas (hedging) por resultado",
+        ["call_site", "result"]
+    )
+    LLM_HEDGE_WASTED_TOKENS = Counter(
+        "llm_hedge_wasted_tokens_total",
+        "Tokens pagos pelas chamadas perdedoras do hedging",
+        ["call_site", "kind"]
+    )
+else:
+    LLM_HEDGES = None
+    LLM_HEDGE_WASTED_TOKENS = None
+
+
+def _env_list(name: str, default: str):
+    return {item.strip() for item in os.getenv(name, default).split(',') if item.strip()}
+
+
+class HedgePolicy:
+    """Janela de latências por call site e orçamento de cópias do processo"""
+
+    def __init__(self, enabled: Optional[bool] = None, call_sites: Optional[Iterable[str]] = None,
+                 percentile: Optional[float] = None, budget_ratio: Optional[float] = None,
+                 burst: Optional[float] = None, min_delay: Optional[float] = None,
+                 min_samples: Optional[int] = None, window: Optional[int] = None):
+        if enabled is None:
+            enabled = os.getenv('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+        self.enabled = enabled
+        if call_sites is None:
+            call_sites = _env_list('LLM_HEDGE_CALL_SITES', 'section_generation,section_generation_stream')
+        self.call_sites = set(call_sites)
+        self.percentile = percentile if percentile is not None else float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+        self.budget_ratio = budget_ratio if budget_ratio is not None else float(os.getenv('LLM_HEDGE_BUDGET', '0.05'))
+        self.burst = burst if burst is not None else float(os.getenv('LLM_HEDGE_BURST', '3'))
+        # Piso do atraso (s): abaixo disso a cópia custa mais do que economiza
+        self.min_delay = min_delay if min_delay is not None else float(os.getenv('LLM_HEDGE_MIN_DELAY', '2'))
+        self.min_samples = min_samples if min_samples is not None else int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+        self.window = window if window is not None else int(os.getenv('LLM_HEDGE_WINDOW', '200'))
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._credits = 0.0
+        self._lock = threading.Lock()
+
+    def applies(self, call_site: str) -> bool:
+        return self.enabled and call_site in self.call_sites
+
+    def observe(self, call_site: str, seconds: float):
+        """Latência até o primeiro token (ou resposta) de uma chamada concluída"""
+        if not self.applies(call_site):
+            return
+        with self._lock:
+            samples = self._latencies.get(call_site)
+            if samples is None:
+                samples = self._latencies[call_site] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def latency_percentile(self, call_site: str) -> Optional[float]:
+        """Percentil configurado da janela, ou None com amostras insuficientes"""
+        with self._lock:
+            samples = sorted(self._latencies.get(call_site, ()))
+        if len(samples) < max(1, self.min_samples):
+            return None
+        rank = max(0, math.ceil(self.percentile / 100.0 * len(samples)) - 1)
+        return samples[min(rank, len(samples) - 1)]
+
+    def delay(self, call_site: str) -> Optional[float]:
+        """
+        Atraso (s) após o qual a chamada deve ser duplicada, ou None para não
+        duplicar. Cada chamada elegível acumula crédito no orçamento.
+        """
+        if not self.applies(call_site):
+            return None
+        with self._lock:
+            self._credits = min(self.burst, self._credits + self.budget_ratio)
+        percentile = self.latency_percentile(call_site)
+        if percentile is None:
+            return None
+        return max(self.min_delay, percentile)
+
+    def try_fire(self, call_site: str) -> bool:
+        """Consome um crédito para disparar a cópia"""
+        with self._lock:
+            allowed = self._credits >= 1.0
+            if allowed:
+                self._credits -= 1.0
+        self.record(call_site, HEDGE_FIRED if allowed else HEDGE_BUDGET_EXHAUSTED)
+        return allowed
+
+    def record(self, call_site: str, result: str):
+        if PROMETHEUS_AVAILABLE:
+            LLM_HEDGES.labels(call_site, result).inc()
+
+    def record_waste(self, call_site: str, prompt_tokens: Optional[int] = None,
+                     completion_tokens: Optional[int] = None):
+        """Tokens gastos pela chamada perdedora de um par duplicado"""
+        if not PROMETHEUS_AVAILABLE:
+            return
+        if prompt_tokens:
+            LLM_HEDGE_WASTED_TOKENS.labels(call_site, 'prompt').inc(prompt_tokens)
+        if completion_tokens:
+            LLM_HEDGE_WASTED_TOKENS.labels(call_site, 'completion').inc(completion_tokens)
@@ -0,0 +1,115 @@
+"""
+Instrumentação das chamadas ao modelo feitas pelo LlmGateway.
+
+Cada chamada gera uma linha de log estruturada (JSON) e alimenta as métricas
+Prometheus expostas em /metrics, por call_site e modelo:
+- llm_calls_total{call_site, model, outcome}
+- llm_call_latency_seconds{call_site, model}       latência total (fila + retries)
+- llm_time_to_first_token_seconds{call_site, model} só em streaming
+- llm_tokens_total{call_site, model, kind}          kind = prompt | completion
+"""
+
+import json
+import logging
+from typing import Optional, Tuple
+
+import openai
+
+try:
+    from prometheus_client import Counter, Histogram
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_OK = 'ok'
+OUTCOME_CANCELLED = 'cancelled'
+OUTCOME_UNAVAILABLE = 'unavailable'
+
+# Chamadas de conversa levam segundos; seções do ETP, até alguns minutos
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 240)
+TTFT_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+
+if PROMETHEUS_AVAILABLE:
+    LLM_CALLS = Counter(
+        "llm_calls_total",
+        "Chamadas ao modelo por origem, modelo e resultado",
+        ["call_site", "model", "outcome"]
+    )
+    LLM_LATENCY = Histogram(
+        "llm_call_latency_seconds",
+        "Latência total das chamadas ao modelo",
+        ["call_site", "model"],
+        buckets=LATENCY_BUCKETS
+    )
+    LLM_TTFT = Histogram(
+        "llm_time_to_first_token_seconds",
+        "Tempo até o primeiro token nas chamadas em streaming",
+        ["call_site", "model"],
+        buckets=TTFT_BUCKETS
+    )
+    LLM_TOKENS = Counter(
+        "llm_tokens_total",
+        "Tokens consumidos nas chamadas ao modelo",
+        ["call_site", "model", "kind"]
+    )
+else:
+    LLM_CALLS = None
+    LLM_LATENCY = None
+    LLM_TTFT = None
+    LLM_TOKENS = None
+
+
+def call_outcome(error: BaseException) -> str:
+    """Resultado da chamada a partir da exceção"""
+    if isinstance(error, openai.APITimeoutError):
+        return 'timeout'
+    if isinstance(error, openai.APIConnectionError):
+        return 'connection_error'
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code == 429:
+            return 'rate_limited'
+        return 'server_error' if error.status_code >= 500 else 'client_error'
+    return 'error'
+
+
+def usage_tokens(usage) -> Tuple[Optional[int], Optional[int]]:
+    """(prompt_tokens, completion_tokens) do objeto usage da resposta, se houver"""
+    if usage is None:
+        return None, None
+    return getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None)
+
+
+def record_llm_call(call_site: str, model: str, outcome: str, latency: float,
+                    ttft: Optional[float] = None, usage=None, attempts: int = 1,
+                    stream: bool = False, hedge: bool = False) -> dict:
+    """Registra a chamada nas métricas e no log estruturado; retorna os campos registrados"""
+    prompt_tokens, completion_tokens = usage_tokens(usage)
+    fields = {
+        'event': 'llm_call',
+        'call_site': call_site,
+        'model': model,
+        'outcome': outcome,
+        'stream': stream,
+        'hedge': hedge,
+        'attempts': attempts,
+        'latency_ms': round(latency * 1000, 1),
+        'ttft_ms': round(ttft * 1000, 1) if ttft is not None else None,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+    }
+
+    if PROMETHEUS_AVAILABLE:
+        LLM_CALLS.labels(call_site, model, outcome).inc()
+        LLM_LATENCY.labels(call_site, model).observe(latency)
+        if ttft is not None:
+            LLM_TTFT.labels(call_site, model).observe(ttft)
+        if prompt_tokens:
+            LLM_TOKENS.labels(call_site, model, 'prompt').inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(call_site, model, 'completion').inc(completion_tokens)
+
+    log = logger.info if outcome in (OUTCOME_OK, OUTCOME_CANCELLED) else logger.warning
+    log(json.dumps(fields, ensure_ascii=False))
+    return fields
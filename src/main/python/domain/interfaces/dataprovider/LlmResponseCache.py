@@ -0,0 +1,233 @@
+"""
+Cache exato de respostas do modelo (opt-in, LLM_CACHE_ENABLED).
+
+A chave é o sha256 de (modelo, mensagens, temperature, max_tokens,
+response_format e demais parâmetros da chamada): prompts idênticos byte a byte
+devolvem a resposta gravada sem chamar a API. Só entram chamadas sem streaming
+e com temperatura até LLM_CACHE_MAX_TEMPERATURE (respostas criativas não são
+repetidas).
+
+O armazenamento é um SQLite local (WAL), compartilhado entre os workers
+gunicorn e o applicationWorker da mesma máquina, com TTL por entrada e
+despejo das entradas menos usadas recentemente quando o total passa de
+LLM_CACHE_MAX_MB.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from openai.types.chat import ChatCompletion
+except ImportError:
+    ChatCompletion = None
+
+try:
+    from prometheus_client import Counter
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Versão da chave/formato; alterar invalida entradas antigas
+CACHE_VERSION = 1
+
+# Parâmetros que não mudam a resposta e ficam fora da chave
+_NON_KEY_PARAMS = ('timeout', 'stream_options')
+
+RESULT_HIT = 'hit'
+RESULT_MISS = 'miss'
+RESULT_SKIP = 'skip'
+
+if PROMETHEUS_AVAILABLE:
+    LLM_CACHE_REQUESTS = Counter(
+        "llm_cache_requests_total",
+        "Consultas ao cache de respostas do modelo (hit, miss ou skip)",
+        ["call_site", "result"]
+    )
+    LLM_CACHE_EVICTIONS = Counter(
+        "llm_cache_evictions_total",
+        "Entradas removidas do cache de respostas por TTL ou tamanho",
+        ["reason"]
+    )
+else:
+    LLM_CACHE_REQUESTS = None
+    LLM_CACHE_EVICTIONS = None
+
+
+def cache_key(model: str, messages: List[Dict], params: Dict) -> str:
+    """sha256 determinístico da chamada"""
+    payload = {
+        'version': CACHE_VERSION,
+        'model': model,
+        'messages': messages,
+        'temperature': params.get('temperature'),
+        'max_tokens': params.get('max_tokens'),
+        'response_format': params.get('response_format'),
+        'params': {k: v for k, v in params.items()
+                   if k not in _NON_KEY_PARAMS and k not in ('temperature', 'max_tokens', 'response_format')},
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+class LlmResponseCache:
+    """Cache de respostas de chat em SQLite com TTL e limite de tamanho"""
+
+    def __init__(self, path: Optional[str] = None, enabled: Optional[bool] = None,
+                 ttl_seconds: Optional[float] = None, max_bytes: Optional[int] = None,
+                 max_temperature: Optional[float] = None):
+        if enabled is None:
+            enabled = os.getenv('LLM_CACHE_ENABLED', 'false').lower() == 'true'
+        self.enabled = enabled and ChatCompletion is not None
+        self.path = Path(path or os.getenv('LLM_CACHE_PATH', './cache/llm/responses.sqlite3'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('LLM_CACHE_TTL_SECONDS', '86400'))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('LLM_CACHE_MAX_MB', '256')) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        if max_temperature is None:
+            max_temperature = float(os.getenv('LLM_CACHE_MAX_TEMPERATURE', '0.3'))
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def hit_rate(self) -> float:
+        """Taxa de acerto no processo desde o início"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def cacheable(self, stream: bool, params: Dict) -> bool:
+        """Chamadas sem streaming, com uma única escolha e temperatura baixa"""
+        if not self.enabled or stream or params.get('n', 1) != 1:
+            return False
+        # A API usa temperature=1 quando não informada
+        temperature = params.get('temperature', 1.0)
+        return temperature is not None and temperature <= self.max_temperature
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS llm_response_cache ("
+                        " cache_key TEXT PRIMARY KEY, call_site TEXT, model TEXT, response TEXT NOT NULL,"
+                        " size INTEGER NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL,"
+                        " last_access REAL NOT NULL)"
+                    )
+                    conn.execute(
+                        "CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_access"
+                        " ON llm_response_cache (last_access)"
+                    )
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def _count(self, call_site: str, result: str):
+        if result == RESULT_HIT:
+            self.hits += 1
+        elif result == RESULT_MISS:
+            self.misses += 1
+        if PROMETHEUS_AVAILABLE:
+            LLM_CACHE_REQUESTS.labels(call_site, result).inc()
+
+    def skip(self, call_site: str):
+        """Contabiliza uma chamada que não pode usar o cache"""
+        if self.enabled:
+            self._count(call_site, RESULT_SKIP)
+
+    def get(self, call_site: str, key: str):
+        """Resposta gravada para a chave (ChatCompletion) ou None"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response FROM llm_response_cache WHERE cache_key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is None:
+                self._count(call_site, RESULT_MISS)
+                return None
+            conn.execute("UPDATE llm_response_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+            response = ChatCompletion.model_validate_json(row[0])
+        except Exception as e:
+            logger.warning(f"Cache LLM: falha na leitura ({call_site}): {e}")
+            self._count(call_site, RESULT_MISS)
+            return None
+        self._count(call_site, RESULT_HIT)
+        return response
+
+    def put(self, call_site: str, model: str, key: str, response) -> bool:
+        """Grava a resposta; ignora objetos que não são ChatCompletion"""
+        dump = getattr(response, 'model_dump_json', None)
+        if dump is None:
+            return False
+        try:
+            payload = dump()
+            now = time.time()
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache"
+                " (cache_key, call_site, model, response, size, created_at, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, call_site, model, payload, len(payload), now, now + self.ttl_seconds, now)
+            )
+            self._evict(conn, now)
+            return True
+        except Exception as e:
+            logger.warning(f"Cache LLM: falha na gravação ({call_site}): {e}")
+            return False
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Remove expiradas e, acima de max_bytes, as menos usadas recentemente"""
+        expired = conn.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (now,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_response_cache").fetchone()[0]
+        evicted = 0
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            keys = []
+            for key, size in conn.execute(
+                    "SELECT cache_key, size FROM llm_response_cache ORDER BY last_access"):
+                keys.append(key)
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM llm_response_cache WHERE cache_key = ?", [(k,) for k in keys])
+            evicted = len(keys)
+        if PROMETHEUS_AVAILABLE:
+            if expired:
+                LLM_CACHE_EVICTIONS.labels('ttl').inc(expired)
+            if evicted:
+                LLM_CACHE_EVICTIONS.labels('size').inc(evicted)
+
+    def clear(self):
+        """Remove todas as entradas"""
+        self._connection().execute("DELETE FROM llm_response_cache")
+
+
+_response_cache: Optional[LlmResponseCache] = None
+
+
+def get_response_cache() -> LlmResponseCache:
+    """Instância compartilhada do cache de respostas"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = LlmResponseCache()
+    return _response_cache
@@ -0,0 +1,284 @@
+"""
+Fila de jobs de geração de ETP persistida no banco (etp_generation_job).
+
+Com ETP_ASYNC_GENERATION=true, o endpoint /generate apenas enfileira o job e
+devolve 202 com o job_id; a geração roda no processo applicationWorker (que
+precisa estar em execução), liberando as threads do gunicorn para os
+endpoints conversacionais. O progresso por seção é gravado no job e o
+cancelamento (DELETE /jobs/<id>) interrompe as chamadas ao modelo em andamento.
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import or_, and_, update
+
+from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.dto.EtpDto import EtpSession, EtpGenerationJob
+from domain.services.etp_sections import (
+    VARIANT_DRAFT, draft_fingerprint, load_reusable_sections, save_sections, section_summary
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+# Job 'running' sem heartbeat há mais que isso volta para a fila (worker morreu)
+JOB_STALE_SECONDS = int(os.getenv('ETP_JOB_STALE_SECONDS', '120'))
+JOB_MAX_ATTEMPTS = int(os.getenv('ETP_JOB_MAX_ATTEMPTS', '3'))
+# Intervalo de gravação do progresso/heartbeat e de verificação de cancelamento
+JOB_POLL_SECONDS = float(os.getenv('ETP_JOB_POLL_SECONDS', '2'))
+
+
+def async_generation_enabled() -> bool:
+    """Geração via fila/worker (requer o applicationWorker) ou síncrona na própria requisição (padrão)"""
+    return os.getenv('ETP_ASYNC_GENERATION', 'false').lower() == 'true'
+
+
+def enqueue_generation_job(etp_session, variant: str = 'final', params: Optional[Dict] = None,
+                           speculative: bool = False) -> Tuple[EtpGenerationJob, bool]:
+    """
+    Enfileira a geração da sessão. Se já houver job ativo para a mesma sessão e
+    variante, ele é reaproveitado. Não faz commit.
+
+    Returns:
+        (job, criado)
+    """
+    active = EtpGenerationJob.query.filter(
+        EtpGenerationJob.etp_session_id == etp_session.id,
+        EtpGenerationJob.variant == variant,
+        EtpGenerationJob.status.in_(ACTIVE_STATUSES),
+        EtpGenerationJob.cancel_requested.is_(False)
+    ).order_by(EtpGenerationJob.id.desc()).first()
+    if active is not None:
+        return active, False
+
+    job = EtpGenerationJob(
+        job_id=str(uuid.uuid4()),
+        etp_session_id=etp_session.id,
+        variant=variant,
+        status=STATUS_QUEUED,
+        cancel_requested=False,
+        speculative=speculative,
+        attempts=0
+    )
+    job.set_params(params or {})
+    db.session.add(job)
+    return job, True
+
+
+def get_job(job_id: str) -> Optional[EtpGenerationJob]:
+    """Busca o job pelo identificador público"""
+    return EtpGenerationJob.query.filter_by(job_id=job_id).first()
+
+
+def request_cancel(job: EtpGenerationJob) -> EtpGenerationJob:
+    """
+    Cancela o job: na fila é cancelado na hora; em execução, o worker percebe a
+    flag no próximo heartbeat e aborta as chamadas em andamento. Não faz commit.
+    """
+    if job.status == STATUS_QUEUED:
+        job.status = STATUS_CANCELLED
+        job.cancel_requested = True
+        job.finished_at = datetime.utcnow()
+    elif job.status == STATUS_RUNNING:
+        job.cancel_requested = True
+    return job
+
+
+def claim_next_job(worker_id: str) -> Optional[EtpGenerationJob]:
+    """
+    Reserva o próximo job da fila (ou um 'running' abandonado) para o worker.
+    A reserva é um UPDATE condicional no status, seguro entre vários workers.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    claimable = or_(
+        EtpGenerationJob.status == STATUS_QUEUED,
+        and_(EtpGenerationJob.status == STATUS_RUNNING, EtpGenerationJob.heartbeat_at < stale_before)
+    )
+    for _ in range(5):
+        candidate = (
+            db.session.query(EtpGenerationJob.id, EtpGenerationJob.status, EtpGenerationJob.attempts)
+            .filter(claimable, EtpGenerationJob.cancel_requested.is_(False))
+            .order_by(EtpGenerationJob.created_at, EtpGenerationJob.id)
+            .first()
+        )
+        if candidate is None:
+            db.session.rollback()
+            return None
+        job_pk, status, attempts = candidate
+
+        now = datetime.utcnow()
+        if attempts >= JOB_MAX_ATTEMPTS:
+            values = dict(status=STATUS_FAILED, finished_at=now,
+                          error=f'Job abandonado após {attempts} tentativas')
+        else:
+            values = dict(status=STATUS_RUNNING, worker_id=worker_id, attempts=attempts + 1,
+                          started_at=now, heartbeat_at=now)
+        result = db.session.execute(
+            update(EtpGenerationJob)
+            .where(EtpGenerationJob.id == job_pk, EtpGenerationJob.status == status,
+                   EtpGenerationJob.attempts == attempts)
+            .values(**values)
+        )
+        db.session.commit()
+        if result.rowcount == 1 and values['status'] == STATUS_RUNNING:
+            return db.session.get(EtpGenerationJob, job_pk)
+    return None
+
+
+class EtpJobRunner:
+    """Executa um job reservado, gravando progresso por seção e respeitando o cancelamento"""
+
+    def __init__(self, generator, poll_interval: float = JOB_POLL_SECONDS):
+        self.generator = generator
+        self.poll_interval = poll_interval
+
+    def run(self, job_id: str) -> str:
+        """Executa o job e retorna o status final"""
+        job = get_job(job_id)
+        try:
+            return self._run(job)
+        except Exception as e:
+            logger.exception(f"Job {job_id} falhou")
+            db.session.rollback()
+            job = get_job(job_id)
+            job.status = STATUS_FAILED
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            return STATUS_FAILED
+        finally:
+            db.session.remove()
+
+    def _run(self, job: EtpGenerationJob) -> str:
+        etp_session = db.session.get(EtpSession, job.etp_session_id)
+        is_preview = job.variant == 'preview'
+        session_data = {
+            'session_id': etp_session.session_id,
+            'answers': etp_session.get_answers(),
+            'user_id': etp_session.user_id,
+            'question_sections': job.get_params().get('question_sections', {})
+        }
+        progress = {
+            str(number): {'title': title, 'status': 'pending'}
+            for number, title in self.generator.section_titles()
+        }
+        job.set_sections(progress)
+        if job.speculative:
+            # Estado efetivamente usado no rascunho (as respostas podem ter mudado na fila)
+            params = job.get_params()
+            params['state_fingerprint'] = draft_fingerprint(self.generator, session_data)
+            job.set_params(params)
+        db.session.commit()
+
+        results = []
+        events = self.generator.stream_complete_etp(
+            session_data=session_data,
+            is_preview=is_preview,
+            reusable_sections=load_reusable_sections(etp_session, is_preview),
+            heartbeat_interval=self.poll_interval
+        )
+        last_write = 0.0
+        try:
+            for event in events:
+                name = event['event']
+                dirty = False
+                if name == 'section_start':
+                    progress[str(event['section'])]['status'] = 'running'
+                    dirty = True
+                elif name == 'section_complete':
+                    status = 'failed' if event['error'] else ('reused' if event['reused'] else 'completed')
+                    progress[str(event['section'])]['status'] = status
+                    results.append(event)
+                    dirty = True
+                elif name == 'done':
+                    return self._complete(job, etp_session, event, is_preview)
+
+                if dirty or time.monotonic() - last_write >= self.poll_interval:
+                    job.set_sections(progress)
+                    job.heartbeat_at = datetime.utcnow()
+                    db.session.commit()
+                    last_write = time.monotonic()
+                    # Após o commit o job é relido: cancel_requested reflete o DELETE
+                    if job.cancel_requested:
+                        return self._cancel(job, etp_session, progress, results, is_preview)
+        finally:
+            events.close()
+        raise RuntimeError("Geração terminou sem o documento final")
+
+    def _complete(self, job, etp_session, event: Dict, is_preview: bool) -> str:
+        sections = event['sections']
+        # Rascunho especulativo: só as seções, na variante draft; o documento é montado no clique em gerar
+        draft = job.speculative and self._complete_speculative(job, sections)
+        if draft:
+            logger.info(f"Job {job.job_id}: rascunho especulativo gravado")
+        elif is_preview:
+            if event['etp_content'] != etp_session.preview_content:
+                etp_session.preview_approved = False
+            etp_session.preview_content = event['etp_content']
+        else:
+            etp_session.generated_etp = event['etp_content']
+            etp_session.status = 'completed'
+        etp_session.updated_at = datetime.utcnow()
+        save_sections(etp_session, sections, is_preview, variant=VARIANT_DRAFT if draft else None)
+
+        progress = job.get_sections()
+        for result in sections:
+            progress[str(result['section'])]['status'] = (
+                'failed' if result['error'] else ('reused' if result['reused'] else 'completed')
+            )
+        job.set_sections(progress)
+        job.status = STATUS_COMPLETED
+        job.finished_at = datetime.utcnow()
+        job.heartbeat_at = job.finished_at
+        db.session.commit()
+
+        summary = section_summary(sections)
+        logger.info(
+            f"Job {job.job_id} concluído: {summary['sections_generated']} seções geradas, "
+            f"{summary['sections_reused']} reaproveitadas, {summary['sections_failed']} com erro"
+        )
+        return STATUS_COMPLETED
+
+    def _complete_speculative(self, job, sections) -> bool:
+        """
+        Grava as seções do rascunho só se o job ainda é especulativo: UPDATE
+        condicional na mesma transação que conclui o job. Promovido no meio tempo
+        (adopt_speculative_job), grava o documento como uma geração real.
+        """
+        params = job.get_params()
+        params['sections'] = {str(r['section']): r['fingerprint'] for r in sections if not r['error']}
+        result = db.session.execute(
+            update(EtpGenerationJob)
+            .where(EtpGenerationJob.id == job.id, EtpGenerationJob.speculative.is_(True))
+            .values(params_json=json.dumps(params, ensure_ascii=False))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            return True
+        logger.info(f"Job {job.job_id} promovido durante a geração: gravando o documento")
+        return False
+
+    def _cancel(self, job, etp_session, progress: Dict, results, is_preview: bool) -> str:
+        # Seções já concluídas ficam gravadas e serão reaproveitadas numa nova geração
+        save_sections(etp_session, results, is_preview, variant=VARIANT_DRAFT if job.speculative else None)
+        for section in progress.values():
+            if section['status'] in ('pending', 'running'):
+                section['status'] = 'cancelled'
+        job.set_sections(progress)
+        job.status = STATUS_CANCELLED
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"Job {job.job_id} cancelado")
+        return STATUS_CANCELLED
@@ -0,0 +1,212 @@
+"""
+Pré-geração especulativa do rascunho do ETP (opt-in).
+
+Com ETP_PREGENERATION_ENABLED=true, quando a conversa chega a um estágio final
+(ETP_PREGENERATION_STAGES: requisitos confirmados, normas vistas, caminho de
+contratação escolhido) é enfileirado um job de geração marcado como
+especulativo. Ele grava as seções em etp_section na variante draft, sem tocar
+nas linhas final (as do documento já entregue), no documento ou no status da
+sessão.
+
+O job guarda o fingerprint do estado da sessão (draft_fingerprint) e o de cada
+seção gerada. No clique em gerar:
+- mesmo estado e seções intactas: o documento é montado das seções do
+  rascunho, copiadas para a variante final, sem chamadas ao modelo;
+- job especulativo ainda ativo com o mesmo estado: é promovido a geração real
+  e o clique acompanha esse job;
+- estado diferente: o job especulativo é cancelado e a geração normal refaz
+  apenas as seções cujo fingerprint mudou.
+
+O gasto especulativo é limitado por usuário e dia: seções geradas pelo modelo
+em jobs especulativos (um job ainda ativo conta como documento inteiro).
+
+Métricas: etp_pregeneration_total{result} - scheduled, cap_reached, hit,
+promoted, stale.
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+
+try:
+    from prometheus_client import Counter
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.dto.EtpDto import EtpSession, EtpSection, EtpGenerationJob
+from domain.services.etp_jobs import (
+    ACTIVE_STATUSES, STATUS_COMPLETED, async_generation_enabled, enqueue_generation_job, request_cancel
+)
+from domain.services.etp_sections import (
+    VARIANT_DRAFT, VARIANT_FINAL, draft_fingerprint, save_sections, section_summary
+)
+
+logger = logging.getLogger(__name__)
+
+PREGENERATION_STAGES = {
+    stage.strip() for stage in os.getenv('ETP_PREGENERATION_STAGES', 'done,path_selected').split(',') if stage.strip()
+}
+# Seções geradas pelo modelo em rascunhos especulativos, por usuário e dia (UTC)
+PREGENERATION_DAILY_SECTIONS = int(os.getenv('ETP_PREGENERATION_DAILY_SECTIONS', '60'))
+# Rascunho mais antigo que isso não é entregue (a base de conhecimento pode ter mudado)
+PREGENERATION_MAX_AGE_SECONDS = int(os.getenv('ETP_PREGENERATION_MAX_AGE_SECONDS', '3600'))
+
+if PROMETHEUS_AVAILABLE:
+    ETP_PREGENERATION = Counter(
+        "etp_pregeneration_total",
+        "Rascunhos especulativos do ETP por resultado",
+        ["result"]
+    )
+else:
+    ETP_PREGENERATION = None
+
+
+def pregeneration_enabled() -> bool:
+    """Pré-geração especulativa ligada (padrão: desligada)"""
+    return os.getenv('ETP_PREGENERATION_ENABLED', 'false').lower() == 'true'
+
+
+def _record(result: str):
+    if PROMETHEUS_AVAILABLE:
+        ETP_PREGENERATION.labels(result).inc()
+
+
+def _speculative_jobs(etp_session, statuses) -> List[EtpGenerationJob]:
+    return EtpGenerationJob.query.filter(
+        EtpGenerationJob.etp_session_id == etp_session.id,
+        EtpGenerationJob.variant == VARIANT_FINAL,
+        EtpGenerationJob.speculative.is_(True),
+        EtpGenerationJob.status.in_(statuses),
+        EtpGenerationJob.cancel_requested.is_(False)
+    ).order_by(EtpGenerationJob.id.desc()).all()
+
+
+def speculative_spend_today(etp_session, sections_per_draft: int) -> int:
+    """Seções gastas hoje em rascunhos especulativos do usuário (ou da sessão, se anônima)"""
+    start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    query = EtpGenerationJob.query.join(EtpSession, EtpSession.id == EtpGenerationJob.etp_session_id).filter(
+        EtpGenerationJob.created_at >= start,
+        EtpGenerationJob.speculative.is_(True)
+    )
+    if etp_session.user_id is not None:
+        query = query.filter(EtpSession.user_id == etp_session.user_id)
+    else:
+        query = query.filter(EtpGenerationJob.etp_session_id == etp_session.id)
+
+    spent = 0
+    for job in query.all():
+        if job.status in ACTIVE_STATUSES:
+            spent += sections_per_draft
+        else:
+            spent += sum(1 for s in job.get_sections().values() if s.get('status') in ('completed', 'failed'))
+    return spent
+
+
+def maybe_pregenerate(generator, etp_session, session_data: Dict) -> Optional[EtpGenerationJob]:
+    """
+    Enfileira o rascunho especulativo se a política permitir: ligada, estágio
+    final, fila de geração ativa, sem rascunho para o mesmo estado e dentro do
+    limite diário. Não faz commit.
+    """
+    if not pregeneration_enabled() or etp_session.conversation_stage not in PREGENERATION_STAGES:
+        return None
+    if not async_generation_enabled():
+        logger.info("Pré-geração ignorada: requer ETP_ASYNC_GENERATION=true")
+        return None
+
+    fingerprint = draft_fingerprint(generator, session_data)
+    cutoff = datetime.utcnow() - timedelta(seconds=PREGENERATION_MAX_AGE_SECONDS)
+    for job in _speculative_jobs(etp_session, ACTIVE_STATUSES + (STATUS_COMPLETED,)):
+        current = job.status in ACTIVE_STATUSES or (job.finished_at and job.finished_at >= cutoff)
+        if current and job.get_params().get('state_fingerprint') == fingerprint:
+            return None
+
+    if speculative_spend_today(etp_session, len(generator.section_titles())) >= PREGENERATION_DAILY_SECTIONS:
+        logger.info(f"Pré-geração ignorada para a sessão {etp_session.session_id}: limite diário atingido")
+        _record('cap_reached')
+        return None
+
+    job, created = enqueue_generation_job(etp_session, variant=VARIANT_FINAL, params={
+        'question_sections': session_data.get('question_sections', {}),
+        'state_fingerprint': fingerprint
+    }, speculative=True)
+    if created:
+        _record('scheduled')
+    return job
+
+
+def pregenerated_draft(generator, etp_session, session_data: Dict) -> Optional[Tuple[str, Dict[str, int]]]:
+    """
+    Documento e resumo por seção do rascunho especulativo, se o estado da sessão
+    e as seções do rascunho não mudaram desde que ele foi gerado. As seções são
+    copiadas para a variante final junto com o documento. Não faz commit.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=PREGENERATION_MAX_AGE_SECONDS)
+    job = next((job for job in _speculative_jobs(etp_session, (STATUS_COMPLETED,))
+                if job.finished_at and job.finished_at >= cutoff), None)
+    if job is None:
+        return None
+
+    params = job.get_params()
+    expected = params.get('sections') or {}
+    rows = {
+        row.section_number: row
+        for row in EtpSection.query.filter_by(etp_session_id=etp_session.id, variant=VARIANT_DRAFT).all()
+    }
+    numbers = [number for number, _ in generator.section_titles()]
+    if params.get('state_fingerprint') != draft_fingerprint(generator, session_data) or any(
+        number not in rows or rows[number].fingerprint != expected.get(str(number)) for number in numbers
+    ):
+        _record('stale')
+        return None
+
+    results = [
+        {'section': number, 'title': rows[number].title, 'content': rows[number].content,
+         'fingerprint': rows[number].fingerprint, 'model': rows[number].model, 'tokens': rows[number].tokens,
+         'latency_ms': rows[number].latency_ms, 'reused': True, 'error': False}
+        for number in numbers
+    ]
+    save_sections(etp_session, results, is_preview=False)
+    _record('hit')
+    return generator.assemble_etp(results), section_summary(results)
+
+
+def _promote(job: EtpGenerationJob) -> bool:
+    result = db.session.execute(
+        update(EtpGenerationJob)
+        .where(EtpGenerationJob.id == job.id, EtpGenerationJob.speculative.is_(True),
+               EtpGenerationJob.status.in_(ACTIVE_STATUSES))
+        .values(speculative=False)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+    db.session.expire(job, ['speculative'])
+    return True
+
+
+def adopt_speculative_job(generator, etp_session, session_data: Dict) -> Optional[EtpGenerationJob]:
+    """
+    Job especulativo ativo da sessão: com o mesmo estado é promovido a geração
+    real (grava o documento ao concluir); com estado diferente é cancelado, e as
+    seções já concluídas ficam para a nova geração. Não faz commit.
+
+    A promoção é um UPDATE condicional em speculative enquanto o job está ativo;
+    o worker conclui o rascunho com o UPDATE inverso (EtpJobRunner), então só um
+    dos dois vence. Job já concluído como rascunho não é adotado.
+    """
+    fingerprint = draft_fingerprint(generator, session_data)
+    adopted = None
+    for job in _speculative_jobs(etp_session, ACTIVE_STATUSES):
+        if adopted is None and job.get_params().get('state_fingerprint') == fingerprint and _promote(job):
+            adopted = job
+            _record('promoted')
+        else:
+            request_cancel(job)
+            _record('stale')
+    return adopted
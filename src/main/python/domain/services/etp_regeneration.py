@@ -0,0 +1,335 @@
+"""
+Regeneração em lote do ETP de sessões existentes (tools.regenerate_etps).
+
+Após uma mudança de prompt ou de modelo, cada sessão selecionada recebe uma
+linha em etp_regeneration_checkpoint identificada pelo run_id. Threads reservam
+as linhas pendentes com UPDATE condicional (como claim_next_job), regeneram as
+seções cujo fingerprint mudou e gravam documento, seções e checkpoint numa
+única transação: uma falha deixa o generated_etp anterior intacto. Executar de
+novo com o mesmo run_id retoma só o que não terminou.
+
+O custo é controlado por um orçamento de tokens por minuto compartilhado: cada
+sessão reserva a média de tokens observada antes de chamar o modelo e o uso
+real informado pela API acerta o saldo ao final.
+"""
+
+import os
+import time
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, or_, update
+
+from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.dto.EtpDto import EtpSession, EtpRegenerationCheckpoint
+from domain.services.etp_sections import load_reusable_sections, save_sections, section_summary
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PENDING = 'pending'
+CHECKPOINT_RUNNING = 'running'
+CHECKPOINT_DONE = 'done'
+CHECKPOINT_UNCHANGED = 'unchanged'
+CHECKPOINT_FAILED = 'failed'
+
+# Reserva 'running' sem conclusão após esse tempo é de um processo interrompido
+REGEN_STALE_SECONDS = int(os.getenv('ETP_REGEN_STALE_SECONDS', '900'))
+REGEN_MAX_ATTEMPTS = int(os.getenv('ETP_REGEN_MAX_ATTEMPTS', '3'))
+# Tokens reservados por sessão até haver uso real observado
+REGEN_ESTIMATE_TOKENS = int(os.getenv('ETP_REGEN_ESTIMATE_TOKENS', '30000'))
+
+
+class TokenBudget:
+    """Balde de tokens por minuto compartilhado entre threads (0 = sem limite)"""
+
+    def __init__(self, tokens_per_minute: int = 0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.capacity = max(0, tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = float(self.capacity)
+        self.waited = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: int) -> int:
+        """Aguarda saldo e reserva os tokens; retorna o valor reservado"""
+        if not self.capacity:
+            return 0
+        tokens = min(max(0, tokens), self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return tokens
+                delay = (tokens - self.available) / self.rate
+                self.waited += delay
+            self._sleep(delay)
+
+    def settle(self, reserved: int, spent: int):
+        """Acerta a reserva pelo uso real (saldo negativo atrasa as próximas reservas)"""
+        if not self.capacity:
+            return
+        with self._lock:
+            self._refill()
+            self.available = min(self.capacity, self.available + reserved - spent)
+
+
+def select_sessions(statuses: Iterable[str] = ('completed',), session_ids: Optional[List[str]] = None,
+                    user_id: Optional[int] = None, updated_since: Optional[datetime] = None,
+                    updated_until: Optional[datetime] = None, limit: Optional[int] = None) -> List[int]:
+    """ids (chave primária) das sessões com ETP gerado que atendem ao filtro"""
+    query = db.session.query(EtpSession.id).filter(EtpSession.generated_etp.isnot(None))
+    statuses = [status for status in statuses or [] if status]
+    if statuses:
+        query = query.filter(EtpSession.status.in_(statuses))
+    if session_ids:
+        query = query.filter(EtpSession.session_id.in_(session_ids))
+    if user_id is not None:
+        query = query.filter(EtpSession.user_id == user_id)
+    if updated_since:
+        query = query.filter(EtpSession.updated_at >= updated_since)
+    if updated_until:
+        query = query.filter(EtpSession.updated_at < updated_until)
+    query = query.order_by(EtpSession.id)
+    if limit:
+        query = query.limit(limit)
+    return [row[0] for row in query.all()]
+
+
+def prepare_run(run_id: str, session_pks: List[int], retry_failed: bool = False) -> int:
+    """
+    Cria os checkpoints pendentes das sessões ainda fora da execução; os
+    existentes não mudam (exceto 'failed' com retry_failed). Retorna quantas
+    sessões entraram.
+    """
+    existing = {
+        row[0] for row in
+        db.session.query(EtpRegenerationCheckpoint.etp_session_id)
+        .filter(EtpRegenerationCheckpoint.run_id == run_id).all()
+    }
+    added = [pk for pk in session_pks if pk not in existing]
+    db.session.add_all(EtpRegenerationCheckpoint(run_id=run_id, etp_session_id=pk) for pk in added)
+    if retry_failed:
+        db.session.execute(
+            update(EtpRegenerationCheckpoint)
+            .where(EtpRegenerationCheckpoint.run_id == run_id,
+                   EtpRegenerationCheckpoint.status == CHECKPOINT_FAILED)
+            .values(status=CHECKPOINT_PENDING, attempts=0)
+        )
+    db.session.commit()
+    return len(added)
+
+
+def claim_next(run_id: str, worker_id: str,
+               stale_seconds: int = REGEN_STALE_SECONDS) -> Optional[EtpRegenerationCheckpoint]:
+    """Reserva o próximo checkpoint pendente (ou 'running' abandonado) da execução"""
+    stale_before = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    claimable = and_(
+        EtpRegenerationCheckpoint.run_id == run_id,
+        or_(EtpRegenerationCheckpoint.status == CHECKPOINT_PENDING,
+            and_(EtpRegenerationCheckpoint.status == CHECKPOINT_RUNNING,
+                 EtpRegenerationCheckpoint.started_at < stale_before))
+    )
+    for _ in range(5):
+        candidate = (
+            db.session.query(EtpRegenerationCheckpoint.id, EtpRegenerationCheckpoint.status,
+                             EtpRegenerationCheckpoint.attempts)
+            .filter(claimable)
+            .order_by(EtpRegenerationCheckpoint.id)
+            .first()
+        )
+        if candidate is None:
+            db.session.rollback()
+            return None
+        checkpoint_pk, status, attempts = candidate
+
+        now = datetime.utcnow()
+        if attempts >= REGEN_MAX_ATTEMPTS:
+            values = dict(status=CHECKPOINT_FAILED, finished_at=now,
+                          error=f'Sessão abandonada após {attempts} tentativas')
+        else:
+            values = dict(status=CHECKPOINT_RUNNING, worker_id=worker_id, attempts=attempts + 1, started_at=now)
+        result = db.session.execute(
+            update(EtpRegenerationCheckpoint)
+            .where(EtpRegenerationCheckpoint.id == checkpoint_pk, EtpRegenerationCheckpoint.status == status,
+                   EtpRegenerationCheckpoint.attempts == attempts)
+            .values(**values)
+        )
+        db.session.commit()
+        if result.rowcount == 1 and values['status'] == CHECKPOINT_RUNNING:
+            return db.session.get(EtpRegenerationCheckpoint, checkpoint_pk)
+    return None
+
+
+def run_summary(run_id: str) -> Dict:
+    """Contagem por status e tokens acumulados da execução (todas as retomadas)"""
+    rows = (
+        db.session.query(EtpRegenerationCheckpoint.status, func.count(), func.sum(EtpRegenerationCheckpoint.tokens))
+        .filter(EtpRegenerationCheckpoint.run_id == run_id)
+        .group_by(EtpRegenerationCheckpoint.status)
+        .all()
+    )
+    db.session.rollback()
+    summary = {'sessions': 0, 'tokens': 0}
+    for status, count, tokens in rows:
+        summary[status] = count
+        summary['sessions'] += count
+        summary['tokens'] += int(tokens or 0)
+    return summary
+
+
+class EtpRegenerator:
+    """Regenera os checkpoints de uma execução num pool limitado, sob o orçamento de tokens"""
+
+    def __init__(self, generator, question_sections: Dict[str, str], concurrency: int = 2,
+                 budget: Optional[TokenBudget] = None, estimate_tokens: int = REGEN_ESTIMATE_TOKENS,
+                 force: bool = False):
+        self.generator = generator
+        self.question_sections = question_sections
+        self.concurrency = max(1, concurrency)
+        self.budget = budget or TokenBudget()
+        self.force = force
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._estimate = float(estimate_tokens)
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {'processed': 0, CHECKPOINT_DONE: 0, CHECKPOINT_UNCHANGED: 0, CHECKPOINT_FAILED: 0,
+                       'tokens': 0, 'sections_generated': 0}
+        self._failures: List[Dict] = []
+
+    def stop(self, *_):
+        self._stopping.set()
+
+    def _observe(self, tokens: int):
+        """Média móvel do custo por sessão regenerada (base da próxima reserva)"""
+        if tokens:
+            with self._lock:
+                self._estimate = 0.8 * self._estimate + 0.2 * tokens
+
+    def regenerate(self, checkpoint_pk: int) -> str:
+        """Regenera a sessão do checkpoint e grava tudo numa transação; retorna o status final"""
+        checkpoint = db.session.get(EtpRegenerationCheckpoint, checkpoint_pk)
+        session_id = f"#{checkpoint.etp_session_id}"
+        reserved = 0
+        started = time.perf_counter()
+        tokens = generated = 0
+        try:
+            etp_session = self._session(checkpoint)
+            session_id = etp_session.session_id
+            session_data = {
+                'session_id': session_id,
+                'answers': etp_session.get_answers(),
+                'user_id': etp_session.user_id,
+                'question_sections': self.question_sections
+            }
+            reusable = {} if self.force else load_reusable_sections(etp_session, is_preview=False)
+            db.session.rollback()
+
+            reserved = self.budget.acquire(int(self._estimate))
+            started = time.perf_counter()
+            results = self.generator.generate_sections(session_data, None, False, reusable)
+            tokens = sum(result.get('tokens', 0) for result in results)
+            summary = section_summary(results)
+            generated = summary['sections_generated']
+            if summary['sections_failed']:
+                raise RuntimeError(f"{summary['sections_failed']} seções com erro; documento anterior mantido")
+
+            # Escrita única: documento, seções e checkpoint
+            checkpoint = db.session.get(EtpRegenerationCheckpoint, checkpoint_pk)
+            etp_session = self._session(checkpoint)
+            status = CHECKPOINT_DONE if generated else CHECKPOINT_UNCHANGED
+            if status == CHECKPOINT_DONE:
+                etp_session.generated_etp = self.generator.assemble_etp(results, is_preview=False)
+                etp_session.updated_at = datetime.utcnow()
+                save_sections(etp_session, results, is_preview=False)
+            self._finish(checkpoint, status, tokens, generated, started)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Regeneração da sessão {session_id} falhou: {e}")
+            checkpoint = db.session.get(EtpRegenerationCheckpoint, checkpoint_pk)
+            status = CHECKPOINT_FAILED
+            # Checkpoint removido junto com a sessão (ON DELETE CASCADE): nada a registrar
+            if checkpoint is not None:
+                self._finish(checkpoint, status, tokens, generated, started, error=str(e))
+                db.session.commit()
+            with self._lock:
+                self._failures.append({'session_id': session_id, 'error': str(e)})
+        finally:
+            self.budget.settle(reserved, tokens)
+            self._observe(tokens)
+
+        with self._lock:
+            self._stats['processed'] += 1
+            self._stats[status] += 1
+            self._stats['tokens'] += tokens
+            self._stats['sections_generated'] += generated
+        logger.info(f"Sessão {session_id}: {status} ({generated} seções, {tokens} tokens)")
+        return status
+
+    @staticmethod
+    def _session(checkpoint) -> EtpSession:
+        """Sessão do checkpoint; removida durante a execução vira falha do checkpoint"""
+        etp_session = db.session.get(EtpSession, checkpoint.etp_session_id) if checkpoint is not None else None
+        if etp_session is None:
+            raise LookupError('sessão não encontrada')
+        return etp_session
+
+    def _finish(self, checkpoint, status: str, tokens: int, generated: int, started: float,
+                error: Optional[str] = None):
+        checkpoint.status = status
+        checkpoint.tokens = tokens
+        checkpoint.sections_generated = generated
+        checkpoint.duration_ms = int((time.perf_counter() - started) * 1000)
+        checkpoint.error = error
+        checkpoint.finished_at = datetime.utcnow()
+
+    def _worker(self, run_id: str, remaining: List[Optional[int]]):
+        try:
+            while not self._stopping.is_set():
+                with self._lock:
+                    if remaining[0] is not None:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                checkpoint = claim_next(run_id, self.worker_id)
+                if checkpoint is None:
+                    return
+                self.regenerate(checkpoint.id)
+        finally:
+            db.session.remove()
+
+    def run(self, run_id: str, limit: Optional[int] = None) -> Dict:
+        """Processa os checkpoints pendentes da execução; retorna o relatório desta invocação"""
+        started = time.monotonic()
+        remaining = [limit]
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='etp-regen') as executor:
+            futures = [executor.submit(self._worker, run_id, remaining) for _ in range(self.concurrency)]
+            for future in futures:
+                future.result()
+
+        elapsed = time.monotonic() - started
+        minutes = elapsed / 60.0
+        stats = dict(self._stats)
+        return {
+            'run_id': run_id,
+            **stats,
+            'elapsed_s': round(elapsed, 1),
+            'sessions_per_minute': round(stats['processed'] / minutes, 2) if minutes else None,
+            'tokens_per_minute': round(stats['tokens'] / minutes) if minutes else None,
+            'budget_wait_s': round(self.budget.waited, 1),
+            'failures': list(self._failures),
+            'run': run_summary(run_id),
+        }
@@ -0,0 +1,211 @@
+"""
+Regeneração incremental do ETP por seção.
+
+Cada seção gerada é gravada em etp_section com o fingerprint das suas entradas
+(prompt com as respostas consumidas e o contexto recuperado, modelo e
+parâmetros). Numa nova geração, o DynamicEtpGenerator só chama o modelo para as
+seções cujo fingerprint mudou; as demais são reaproveitadas. Um preview aprovado
+é promovido a documento final sem novas chamadas quando nada mudou.
+
+Uma seção também pode ser regenerada isoladamente (regenerate_section): a
+linha da seção e o trecho dela no documento gravado na sessão são reescritos
+na mesma transação, de forma que o texto da sessão continua sendo o documento
+atual para todos os leitores e gravações posteriores do documento inteiro.
+"""
+
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.dto.EtpDto import EtpSection
+
+logger = logging.getLogger(__name__)
+
+VARIANT_PREVIEW = 'preview'
+VARIANT_FINAL = 'final'
+# Rascunho especulativo (etp_pregeneration): copiado para final só quando o clique em gerar o adota
+VARIANT_DRAFT = 'draft'
+
+
+def question_sections(questions: List[Dict]) -> Dict[str, str]:
+    """Mapa {id da pergunta: seção do ETP a que ela pertence}, usado em session_data['question_sections']"""
+    return {str(q['id']): q['section'] for q in questions if q.get('section')}
+
+
+def draft_fingerprint(generator, session_data: Dict) -> str:
+    """
+    sha256 do estado da sessão que alimenta a geração (respostas e mapa de
+    perguntas por seção) e da versão/modelo do gerador. Usado para entregar um
+    rascunho já gerado sem recalcular o fingerprint de cada seção.
+    """
+    payload = {
+        'version': generator.SECTION_FINGERPRINT_VERSION,
+        'model': generator.SECTION_MODEL,
+        'answers': session_data.get('answers') or {},
+        'question_sections': session_data.get('question_sections') or {}
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def is_preview_approved(etp_session) -> bool:
+    """Preview aprovado pelo usuário (flag ou status legado)"""
+    return bool(etp_session.preview_approved) or etp_session.status == 'preview_approved'
+
+
+def load_reusable_sections(etp_session, is_preview: bool) -> Dict[int, Dict]:
+    """
+    Seções já gravadas que podem ser reaproveitadas: as da própria variante e,
+    na geração final, as do preview aprovado e as do rascunho especulativo. Em
+    caso de conflito vale a da própria variante; o rascunho só preenche seções
+    sem outra linha, para não substituir o conteúdo entregue ao usuário.
+    """
+    if etp_session is None or etp_session.id is None:
+        return {}
+
+    if is_preview:
+        variants = [VARIANT_PREVIEW, VARIANT_FINAL]
+    elif is_preview_approved(etp_session):
+        variants = [VARIANT_FINAL, VARIANT_PREVIEW, VARIANT_DRAFT]
+    else:
+        variants = [VARIANT_FINAL, VARIANT_DRAFT]
+
+    rows = EtpSection.query.filter(
+        EtpSection.etp_session_id == etp_session.id,
+        EtpSection.variant.in_(variants)
+    ).all()
+
+    reusable: Dict[int, Dict] = {}
+    for variant in reversed(variants):
+        for row in rows:
+            if row.variant == variant:
+                reusable[row.section_number] = {'fingerprint': row.fingerprint, 'content': row.content}
+    return reusable
+
+
+def save_sections(etp_session, section_results: List[Dict], is_preview: bool, variant: Optional[str] = None) -> int:
+    """
+    Grava (insere ou atualiza) as seções geradas com sucesso na variante
+    (preview/final conforme is_preview, ou a informada em variant). Seções com
+    erro não são gravadas, para serem refeitas na próxima geração. Não faz commit.
+
+    Returns:
+        int: número de linhas inseridas ou alteradas
+    """
+    variant = variant or (VARIANT_PREVIEW if is_preview else VARIANT_FINAL)
+    existing = {
+        row.section_number: row
+        for row in EtpSection.query.filter_by(etp_session_id=etp_session.id, variant=variant).all()
+    }
+
+    written = 0
+    for result in section_results:
+        if result.get('error') or not result.get('fingerprint'):
+            continue
+        row = existing.get(result['section'])
+        if row is not None and row.fingerprint == result['fingerprint'] and row.content == result['content']:
+            continue
+        if row is None:
+            row = EtpSection(etp_session_id=etp_session.id, variant=variant, section_number=result['section'])
+            db.session.add(row)
+        row.title = result['title']
+        row.content = result['content']
+        row.fingerprint = result['fingerprint']
+        row.model = result['model']
+        row.tokens = result.get('tokens') or 0
+        row.latency_ms = result.get('latency_ms')
+        written += 1
+    return written
+
+
+def load_sections(etp_session, is_preview: bool) -> List[EtpSection]:
+    """Seções gravadas da variante, em ordem"""
+    if etp_session is None or etp_session.id is None:
+        return []
+    variant = VARIANT_PREVIEW if is_preview else VARIANT_FINAL
+    return EtpSection.query.filter_by(
+        etp_session_id=etp_session.id, variant=variant
+    ).order_by(EtpSection.section_number).all()
+
+
+def regenerate_section(generator, etp_session, section_number: int, session_data: Dict,
+                       feedback: Optional[str] = None, is_preview: bool = False) -> Optional[Dict]:
+    """
+    Regenera uma seção com uma chamada ao modelo e reescreve a sua linha e o seu
+    trecho no documento da variante gravado na sessão (sem commit). Com
+    feedback, ajusta o conteúdo atual do documento; sem feedback, refaz a seção
+    a partir das respostas (também serve para uma seção que falhou).
+
+    Returns:
+        Resultado da seção (ver DynamicEtpGenerator._section_result), ou None se
+        o documento ainda não foi gerado ou não contém a seção
+    """
+    document = etp_session.preview_content if is_preview else etp_session.generated_etp
+    current_content = generator.section_content(document, section_number) if document else None
+    if current_content is None:
+        return None
+    variant = VARIANT_PREVIEW if is_preview else VARIANT_FINAL
+    row = EtpSection.query.filter_by(
+        etp_session_id=etp_session.id, variant=variant, section_number=section_number
+    ).first()
+
+    result = generator.regenerate_section(
+        section_number, session_data,
+        current_content=current_content,
+        feedback=feedback,
+        fingerprint=row.fingerprint if row is not None else None
+    )
+    if row is None:
+        row = EtpSection(etp_session_id=etp_session.id, variant=variant, section_number=section_number)
+        db.session.add(row)
+    row.title = result['title']
+    row.content = result['content']
+    row.fingerprint = result['fingerprint']
+    row.model = result['model']
+    row.tokens = result['tokens']
+    row.latency_ms = result['latency_ms']
+
+    document = generator.replace_section(document, section_number, result['content'])
+    if is_preview:
+        etp_session.preview_content = document
+    else:
+        etp_session.generated_etp = document
+    etp_session.updated_at = datetime.utcnow()
+    return result
+
+
+def section_summary(section_results: List[Dict]) -> Dict[str, int]:
+    """Contagem de seções geradas, reaproveitadas e com erro"""
+    reused = sum(1 for r in section_results if r.get('reused'))
+    failed = sum(1 for r in section_results if r.get('error'))
+    return {
+        'sections_total': len(section_results),
+        'sections_reused': reused,
+        'sections_generated': len(section_results) - reused - failed,
+        'sections_failed': failed
+    }
+
+
+def generate_etp_incremental(generator, etp_session, session_data: Dict, is_preview: bool = False,
+                             context_data: Optional[Dict] = None) -> Tuple[str, Dict[str, int]]:
+    """
+    Gera o ETP chamando o modelo apenas para seções com entradas alteradas e
+    grava as seções na sessão (sem commit).
+
+    Returns:
+        (conteúdo do documento, resumo por seção)
+    """
+    reusable = load_reusable_sections(etp_session, is_preview)
+    results = generator.generate_sections(session_data, context_data, is_preview, reusable)
+    content = generator.assemble_etp(results, is_preview)
+    save_sections(etp_session, results, is_preview)
+
+    summary = section_summary(results)
+    logger.info(
+        f"ETP {etp_session.session_id} ({'preview' if is_preview else 'final'}): "
+        f"{summary['sections_generated']} seções geradas, {summary['sections_reused']} reaproveitadas"
+    )
+    return content, summary
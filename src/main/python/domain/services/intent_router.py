@@ -0,0 +1,390 @@
+"""
+Roteador local de intenções da conversa (português do Brasil).
+
+Único interpretador dos comandos de revisão de requisitos (remover, manter
+apenas, ajustar, adicionar, confirmar, trocar a necessidade) e da captura da
+necessidade na primeira mensagem.
+
+O texto é normalizado uma vez (minúsculas, sem acentos, posições preservadas)
+e avaliado contra estruturas montadas na importação do módulo:
+- uma alternação regex pré-compilada por intenção (radicais verbais);
+- uma trie de palavras-chave por tokens (expressões como "está bom", "ok"),
+  percorrida numa única passada sobre a mensagem.
+
+Só contam como alvo os números presos ao verbo ("remover 2 e 4") ou a uma
+referência explícita ("requisito 3", "R3"); os demais fazem parte do texto
+("garantia de 3 anos"). Um verbo negado ("não remover o 2") não vale como
+intenção.
+
+Cada decisão traz uma confiança entre 0 e 1. Comandos que pedem alvo sem
+índice válido, sinais conflitantes ou negação reduzem a confiança; abaixo de
+INTENT_ROUTER_MIN_CONFIDENCE o comando não é aplicado e o usuário recebe um
+pedido de esclarecimento. Na captura da necessidade, route_need decide
+localmente pedidos óbvios ("preciso contratar ...") e saudações; perguntas e o
+restante seguem para o modelo (analyze_need_safely).
+
+Métricas: intent_router_decisions_total{route,decision} - decision local,
+llm (encaminhada ao modelo, só na rota need) ou clarify (comando não aplicado,
+pedido de esclarecimento). Chamadas ao modelo evitadas = local na rota need.
+"""
+
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from prometheus_client import Counter
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+INTENT_CHANGE_NEED = 'change_need'
+INTENT_REMOVE = 'remove'
+INTENT_KEEP_ONLY = 'keep_only'
+INTENT_EDIT = 'edit'
+INTENT_ADD = 'add'
+INTENT_CONFIRM = 'confirm'
+INTENT_UNCLEAR = 'unclear'
+
+ROUTE_COMMAND = 'command'
+ROUTE_NEED = 'need'
+
+DECISION_LOCAL = 'local'
+DECISION_LLM = 'llm'
+DECISION_CLARIFY = 'clarify'
+
+# Decisões abaixo desse valor são tratadas como ambíguas
+MIN_CONFIDENCE = float(os.getenv('INTENT_ROUTER_MIN_CONFIDENCE', '0.8'))
+
+# Ordem de precedência quando mais de uma intenção aparece na mensagem
+_PRIORITY = (INTENT_CHANGE_NEED, INTENT_REMOVE, INTENT_KEEP_ONLY, INTENT_EDIT, INTENT_ADD, INTENT_CONFIRM)
+# Intenções que só fazem sentido com requisitos alvo
+_NEEDS_TARGETS = (INTENT_REMOVE, INTENT_KEEP_ONLY, INTENT_EDIT)
+
+# Radicais por intenção (texto já sem acentos): peso e alternativas
+_STEMS = {
+    INTENT_CHANGE_NEED: (0.95, [
+        r'nova\s*necessidade', r'outra\s*necessidade', r'trocar\s*a\s*necessidade', r'mudar\s*a\s*necessidade',
+        r'mudou\s*a\s*necessidade', r'na\s*verdade\s*a\s*necessidade\s*e'
+    ]),
+    INTENT_REMOVE: (0.9, [
+        r'remov\w*', r'tir(?:ar|a|e|em)\b', r'exclu\w*', r'delet\w*', r'retir\w*', r'apag\w*', r'descart\w*',
+        r'elimin\w*'
+    ]),
+    INTENT_KEEP_ONLY: (0.9, [
+        r'(?:manter|mantenha|mantem|deixar|deixe|ficar|fique|quero)\s+(?:so|somente|apenas)',
+        r'(?:so|somente|apenas)\s+(?:manter|mantenha|deixar|deixe|ficar|fique)',
+        r'(?:manter|mantenha|deixar|deixe)(?=\s+(?:(?:o|os|a|as|com)\s+)?(?:r\s*)?\d+\s*(?:,|e\b))'
+    ]),
+    INTENT_EDIT: (0.85, [
+        r'alter\w*', r'modific\w*', r'troc\w*', r'troqu\w*', r'mud(?:ar|a|e|em)\b', r'edit\w*', r'ajust\w*',
+        r'refa[zc]\w*', r'substitu\w*', r'reescrev\w*', r'corrig\w*'
+    ]),
+    INTENT_ADD: (0.85, [
+        r'adicion\w*', r'inclu\w*', r'acrescent\w*', r'novo\s+requisito', r'mais\s+um'
+    ]),
+    INTENT_CONFIRM: (0.85, [
+        r'confirm\w*', r'aprov\w*', r'concord\w*', r'aceit\w*'
+    ]),
+}
+
+# Expressões exatas (sequências de tokens) por intenção
+_KEYWORDS = {
+    INTENT_CONFIRM: (0.8, [
+        'ok', 'okay', 'sim', 'certo', 'correto', 'perfeito', 'otimo', 'beleza', 'pode ser', 'pode manter',
+        'mantenha', 'manter', 'esta bom', 'ta bom', 'estao bons', 'assim mesmo', 'tudo certo', 'de acordo',
+        'pode seguir', 'pode prosseguir', 'vamos seguir'
+    ]),
+}
+
+# Referências por posição: deslocamento a partir do início (>= 0) ou do fim (< 0)
+_ORDINALS = {
+    'primeiro': 0, 'primeira': 0, 'segundo': 1, 'segunda': 1, 'terceiro': 2, 'terceira': 2,
+    'quarto': 3, 'quarta': 3, 'quinto': 4, 'quinta': 4,
+    'ultimo': -1, 'ultima': -1, 'penultimo': -2, 'penultima': -2
+}
+
+_NEGATION = re.compile(r'\b(?:nao|nem|nunca)\b')
+# Negação logo antes do verbo ("não remover", "não quero mudar")
+_NEGATED_VERB = re.compile(r'\b(?:nao|nem|nunca)\s+(?:\w+\s+){0,2}$')
+_TOKEN = re.compile(r'\w+')
+_NUMBER = re.compile(r'\b(?:r\s*)?(\d+)\b')
+_RANGE = re.compile(r'\b(?:r\s*)?(\d+)\s*(?:-|a|ao|ate)\s*(?:r\s*)?(\d+)\b')
+
+# Lista de alvos presa ao verbo ou à referência: "o 2", "R1 e R4", "do 2 ao 4", "1, 3 e o último"
+_TARGET_ITEM = r'(?:(?:r\s*)?\d+\b|' + '|'.join(sorted(_ORDINALS, key=len, reverse=True)) + r')'
+_TARGET_SPAN = _TARGET_ITEM + r'(?:\s*(?:-|a|ao|ate)\s*' + _TARGET_ITEM + r')?'
+_TARGET_FILLER = r'(?:(?:o|os|a|as|do|dos|da|das|de|requisitos?|itens?|numeros?|apenas|so|somente|tambem)\s+)'
+_TARGETS = re.compile(
+    r'\s*' + _TARGET_FILLER + r'{0,3}' + _TARGET_SPAN
+    + r'(?:\s*(?:,|\be\b)\s*' + _TARGET_FILLER + r'{0,2}' + _TARGET_SPAN + r')*'
+)
+_REFERENCE = re.compile(r'\b(?:r\s*\d|requisitos?\s+\d)')
+# Queixa ou pedido de outra sugestão sobre um requisito citado ("não gostei do último, pode sugerir outro?")
+_COMPLAINT = re.compile(r'\bnao\s+gost\w*|\bsug(?:er|ir|est)\w*\s+(?:\w+\s+)?outr\w*')
+
+# Captura da necessidade
+_NEED_OBJECT = (
+    r'contrat\w*|compr\w*|adquir\w*|aquisic\w*|alug\w*|loca\w*|fornec\w*|servic\w*|manutenc\w*|'
+    r'obras?|reform\w*|instala\w*|implant\w*|licenc\w*|assinatura\w*|consultoria\w*|limpeza|vigilancia'
+)
+_NEED_PATTERN = re.compile(
+    r'^(?:(?:eu|nos|a gente|o orgao|a secretaria)\s+)?'
+    r'(?:preciso|precisa|precisamos|necessito|necessita|necessitamos|quero|queremos|gostaria|gostariamos|pretendo|pretendemos|'
+    r'temos que|tenho que|e necessario|ha necessidade)\b[^?]{0,40}?\b(?:' + _NEED_OBJECT + r')\b'
+    r'|^(?:a\s+|uma\s+|o\s+)?(?:contratacao|aquisicao|compra|locacao|aluguel|fornecimento|prestacao|'
+    r'servicos?|manutencao|reforma|obra|instalacao|implantacao)\s+(?:de|do|da|dos|das|para|em)\b'
+)
+_QUESTION = re.compile(
+    r'\?\s*$|^(?:o que|oque|como|qual|quais|quando|onde|quem|por que|porque|pode me|voce|vc)\b'
+    r'|\b(?:saber|entender|como|duvidas?|explica\w*|expliqu\w*)\b'
+)
+# Sujeito e verbo de vontade que abrem o pedido ("preciso", "o órgão precisa de", "gostaria de")
+_NEED_LEAD = re.compile(
+    r'^(?:(?:eu|nos|a gente|o orgao|a secretaria)\s+)?'
+    r'(?:preciso|precisa|precisamos|necessito|necessita|necessitamos|quero|queremos|gostaria|gostariamos|pretendo|'
+    r'pretendemos|temos que|tenho que|e necessario|ha necessidade)\b(?:\s+de)?\s*'
+)
+_SMALLTALK = frozenset(
+    'oi ola opa bom boa dia tarde noite tudo bem obrigado obrigada valeu e ai tchau ok sim nao teste'.split()
+)
+# Tokens mínimos para tratar a mensagem como descrição de necessidade
+_NEED_MIN_TOKENS = 4
+
+
+if PROMETHEUS_AVAILABLE:
+    INTENT_ROUTER_DECISIONS = Counter(
+        "intent_router_decisions_total",
+        "Decisões do roteador de intenções (local, encaminhada ao modelo ou pedido de esclarecimento)",
+        ["route", "decision"]
+    )
+else:
+    INTENT_ROUTER_DECISIONS = None
+
+
+@dataclass
+class IntentDecision:
+    """Intenção de um comando de revisão de requisitos"""
+    intent: str
+    confidence: float
+    indices: List[int] = field(default_factory=list)
+    new_text: Optional[str] = None
+    evidence: List[str] = field(default_factory=list)
+    # Intenção reconhecida sem requisito alvo válido ("remover 10" em lista de 5)
+    unresolved: Optional[str] = None
+
+
+@dataclass
+class NeedDecision:
+    """Captura da necessidade: contains_need None quando a mensagem é ambígua"""
+    contains_need: Optional[bool]
+    description: Optional[str]
+    confidence: float
+
+
+class KeywordTrie:
+    """Trie de expressões por tokens; find percorre a mensagem uma única vez"""
+
+    _VALUE = object()
+
+    def __init__(self):
+        self.root: Dict = {}
+
+    def add(self, phrase: str, value):
+        node = self.root
+        for token in phrase.split():
+            node = node.setdefault(token, {})
+        node[self._VALUE] = value
+
+    def find(self, tokens: List[str]) -> List[Tuple[str, object]]:
+        """Expressões encontradas (a mais longa em cada posição)"""
+        found = []
+        for start in range(len(tokens)):
+            node, match = self.root, None
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if self._VALUE in node:
+                    match = (' '.join(tokens[start:end + 1]), node[self._VALUE])
+            if match:
+                found.append(match)
+        return found
+
+
+def _fold_char(char: str) -> str:
+    folded = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c)).lower()
+    return folded if len(folded) == 1 else char.lower()
+
+
+def fold(text: str) -> str:
+    """Minúsculas sem acentos, com o mesmo comprimento (posições valem no texto original)"""
+    return ''.join(_fold_char(char) for char in text)
+
+
+def _compile_stems() -> Dict[str, Tuple[float, re.Pattern]]:
+    return {
+        intent: (weight, re.compile(r'\b(?:' + '|'.join(f'(?:{p})' for p in patterns) + r')\b'))
+        for intent, (weight, patterns) in _STEMS.items()
+    }
+
+
+def _build_keywords() -> KeywordTrie:
+    trie = KeywordTrie()
+    for intent, (weight, phrases) in _KEYWORDS.items():
+        for phrase in phrases:
+            trie.add(fold(phrase), (intent, weight))
+    return trie
+
+
+_STEM_PATTERNS = _compile_stems()
+_KEYWORD_TRIE = _build_keywords()
+
+
+def record_decision(route: str, decision: str):
+    if PROMETHEUS_AVAILABLE:
+        INTENT_ROUTER_DECISIONS.labels(route, decision).inc()
+
+
+def target_spans(folded_head: str, anchors: List[int]) -> str:
+    """Trechos com a lista de alvos logo após cada verbo (anchors) e após cada "requisito N"/"R N\""""
+    starts = list(anchors) + [match.start() for match in _REFERENCE.finditer(folded_head)]
+    spans = []
+    for start in starts:
+        match = _TARGETS.match(folded_head, start)
+        if match:
+            spans.append(match.group(0))
+    return ' ; '.join(spans)
+
+
+def extract_indices(folded_head: str, total: int) -> List[int]:
+    """Posições (1-based) citadas: números, R1, intervalos e primeiro/último/penúltimo"""
+    targets = set()
+    for start, end in _RANGE.findall(folded_head):
+        start, end = int(start), int(end)
+        if 1 <= start <= end <= total:
+            targets.update(range(start, end + 1))
+    for number in _NUMBER.findall(folded_head):
+        if 1 <= int(number) <= total:
+            targets.add(int(number))
+    for token in _TOKEN.findall(folded_head):
+        offset = _ORDINALS.get(token)
+        if offset is None:
+            continue
+        position = offset + 1 if offset >= 0 else total + offset + 1
+        if 1 <= position <= total:
+            targets.add(position)
+    return sorted(targets)
+
+
+def route_command(text: str, total_requirements: int) -> IntentDecision:
+    """Interpreta um comando de revisão sobre uma lista de total_requirements requisitos"""
+    if not text or not isinstance(text, str) or not text.strip():
+        return IntentDecision(INTENT_UNCLEAR, 0.0)
+
+    original = text.strip()
+    folded = fold(original)
+    # Índices e verbos valem antes do ':'; depois dele vem o novo texto
+    colon = folded.find(':')
+    head = folded if colon < 0 else folded[:colon]
+    after_colon = original[colon + 1:].strip() if colon >= 0 else ''
+
+    scores: Dict[str, float] = {}
+    evidence: List[str] = []
+    anchors: List[int] = []
+    negated = False
+    add_match = None
+    claimed: List[Tuple[int, int]] = []
+    for intent, (weight, pattern) in _STEM_PATTERNS.items():
+        for match in pattern.finditer(head):
+            # "trocar" dentro de "trocar a necessidade" já pertence à intenção anterior
+            if any(match.start() < end and start < match.end() for start, end in claimed):
+                continue
+            claimed.append(match.span())
+            if _NEGATED_VERB.search(head[:match.start()]):
+                # "não remover o 2": o verbo negado não é comando
+                negated = True
+                continue
+            scores[intent] = weight
+            evidence.append(match.group(0))
+            anchors.append(match.end())
+            if intent == INTENT_ADD and add_match is None:
+                add_match = match
+    for phrase, (intent, weight) in _KEYWORD_TRIE.find(_TOKEN.findall(head)):
+        scores[intent] = max(scores.get(intent, 0.0), weight)
+        evidence.append(phrase)
+
+    if INTENT_CONFIRM in scores and _NEGATION.search(head):
+        # "não concordo", "não está bom": não é confirmação
+        del scores[INTENT_CONFIRM]
+        negated = True
+    if negated:
+        evidence.append('negacao')
+
+    chosen = next((intent for intent in _PRIORITY if intent in scores), None)
+
+    if chosen is None:
+        indices = [] if negated else extract_indices(head, total_requirements)
+        if indices:
+            complaint = _COMPLAINT.search(head)
+            if complaint:
+                # Queixa explícita sobre o requisito citado: ajuste
+                return IntentDecision(INTENT_EDIT, 0.85, indices, after_colon or None, evidence + [complaint.group(0)])
+            # Só a referência ao requisito ("o 2 está confuso"): provável ajuste, mas pede confirmação
+            return IntentDecision(INTENT_EDIT, 0.6, indices, after_colon or None, evidence)
+        return IntentDecision(INTENT_UNCLEAR, 0.0, evidence=evidence)
+
+    indices = extract_indices(target_spans(head, anchors), total_requirements)
+
+    if chosen in _NEEDS_TARGETS and not indices:
+        return IntentDecision(INTENT_UNCLEAR, 0.0, evidence=evidence, unresolved=chosen)
+
+    confidence = scores[chosen]
+    competing = [intent for intent in scores if intent not in (chosen, INTENT_CONFIRM)]
+    if competing:
+        confidence *= 0.8
+    if negated:
+        # Outro verbo negado na mesma mensagem ("não remover o 2, trocar o 3"): pede confirmação
+        confidence *= 0.5
+
+    new_text = None
+    if chosen == INTENT_EDIT:
+        new_text = after_colon or None
+    elif chosen == INTENT_ADD:
+        new_text = after_colon or (original[add_match.end():].strip(' .,;') if add_match else '') or None
+
+    return IntentDecision(
+        chosen, round(confidence, 3), indices if chosen != INTENT_ADD else [], new_text, evidence
+    )
+
+
+def route_need(text: str) -> NeedDecision:
+    """Primeira mensagem: pedido óbvio de contratação, conversa sem conteúdo ou ambígua"""
+    if not text or not isinstance(text, str) or not text.strip():
+        return NeedDecision(False, None, 1.0)
+
+    original = text.strip()
+    folded = fold(original)
+    tokens = _TOKEN.findall(folded)
+
+    if not tokens or all(token in _SMALLTALK for token in tokens):
+        return NeedDecision(False, None, 0.95)
+    if _QUESTION.search(folded):
+        return NeedDecision(None, None, 0.0)
+    if _NEED_PATTERN.search(folded) and len(tokens) >= _NEED_MIN_TOKENS:
+        return NeedDecision(True, need_description(original, folded), 0.9)
+    return NeedDecision(None, None, 0.0)
+
+
+def need_description(original: str, folded: str) -> str:
+    """Descrição da necessidade sem o "preciso/quero/gostaria de" inicial"""
+    lead = _NEED_LEAD.match(folded)
+    description = original[lead.end():] if lead else original
+    description = description.strip().rstrip(' .!;')
+    return description[:1].upper() + description[1:]
+
+
+def is_confident(confidence: float, min_confidence: Optional[float] = None) -> bool:
+    return confidence >= (MIN_CONFIDENCE if min_confidence is None else min_confidence)
@@ -0,0 +1,274 @@
+"""
+Cache semântico de sugestões de requisitos.
+
+Órgãos contratam as mesmas coisas com nomes diferentes ("aquisição de
+notebooks", "compra de computadores portáteis"). Cada conjunto de requisitos
+aceito pelo usuário é gravado em accepted_requirement_set com o embedding da
+necessidade normalizada. Antes de chamar o modelo (/suggest-requirements e a
+trava da necessidade em /conversation), a necessidade é buscada num índice
+FAISS desses embeddings: acima de REQUIREMENTS_CACHE_THRESHOLD (similaridade
+de cosseno) o conjunto aceito é devolvido, com a procedência, sem RAG nem LLM.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import update
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    from prometheus_client import Counter, Histogram
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.interfaces.dataprovider.LlmGateway import get_llm_gateway
+from domain.dto.EtpDto import AcceptedRequirementSet
+
+logger = logging.getLogger(__name__)
+
+REQUIREMENTS_CACHE_THRESHOLD = float(os.getenv('REQUIREMENTS_CACHE_THRESHOLD', '0.9'))
+# Intervalo para incorporar ao índice conjuntos aceitos em outros processos
+REQUIREMENTS_CACHE_REFRESH_SECONDS = float(os.getenv('REQUIREMENTS_CACHE_REFRESH_SECONDS', '30'))
+
+# Verbos de compra no início da necessidade não mudam o objeto
+_PURCHASE_PREFIX = re.compile(r'^(?:aquisicao|compra|fornecimento)\s+(?:de|do|da|dos|das)\s+')
+
+if PROMETHEUS_AVAILABLE:
+    REQUIREMENTS_CACHE_LOOKUPS = Counter(
+        "requirements_cache_lookups_total",
+        "Consultas ao cache semântico de requisitos por resultado",
+        ["call_site", "result"]
+    )
+    REQUIREMENTS_CACHE_SIMILARITY = Histogram(
+        "requirements_cache_similarity",
+        "Maior similaridade encontrada no cache semântico de requisitos",
+        buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.93, 0.96, 0.98, 1.0)
+    )
+    LLM_CALLS_AVOIDED = Counter(
+        "llm_calls_avoided_total",
+        "Chamadas ao modelo evitadas por reaproveitamento",
+        ["call_site", "reason"]
+    )
+else:
+    REQUIREMENTS_CACHE_LOOKUPS = None
+    REQUIREMENTS_CACHE_SIMILARITY = None
+    LLM_CALLS_AVOIDED = None
+
+
+def normalize_necessity(necessity: str) -> str:
+    """Minúsculas, sem acentos, pontuação e verbo de compra inicial"""
+    text = unicodedata.normalize('NFKD', necessity or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return _PURCHASE_PREFIX.sub('', text)[:500]
+
+
+def _clean_requirements(requirements) -> List[Dict]:
+    """Requisitos com texto, renumerados R1..Rn"""
+    cleaned = []
+    for req in requirements or []:
+        if isinstance(req, str):
+            req = {'text': req}
+        if not isinstance(req, dict):
+            continue
+        text = (req.get('text') or req.get('description') or '').strip()
+        if not text:
+            continue
+        cleaned.append({
+            'id': f"R{len(cleaned) + 1}",
+            'text': text,
+            'justification': req.get('justification', '')
+        })
+    return cleaned
+
+
+class RequirementSemanticCache:
+    """Índice FAISS (produto interno de vetores normalizados) dos conjuntos de requisitos aceitos"""
+
+    def __init__(self, llm=None, threshold: Optional[float] = None, enabled: Optional[bool] = None,
+                 embedding_model: Optional[str] = None, refresh_seconds: Optional[float] = None):
+        if enabled is None:
+            enabled = os.getenv('REQUIREMENTS_CACHE_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled and faiss is not None
+        self._llm = llm
+        self.threshold = threshold if threshold is not None else REQUIREMENTS_CACHE_THRESHOLD
+        self.embedding_model = embedding_model or os.getenv('EMBEDDINGS_MODEL', 'text-embedding-3-small')
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else REQUIREMENTS_CACHE_REFRESH_SECONDS
+        self._index = None
+        self._ids: List[int] = []
+        self._max_id = 0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = get_llm_gateway()
+        return self._llm
+
+    def _embed(self, text: str) -> np.ndarray:
+        response = self.llm.embed('requirements_cache', model=self.embedding_model, input=[text])
+        vector = np.array([response.data[0].embedding], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _refresh(self, force: bool = False):
+        """Acrescenta ao índice os conjuntos gravados desde a última leitura"""
+        if not force and time.monotonic() - self._last_refresh < self.refresh_seconds:
+            return
+        rows = (
+            db.session.query(AcceptedRequirementSet.id, AcceptedRequirementSet.embedding)
+            .filter(AcceptedRequirementSet.id > self._max_id,
+                    AcceptedRequirementSet.embedding_model == self.embedding_model)
+            .order_by(AcceptedRequirementSet.id)
+            .all()
+        )
+        with self._lock:
+            self._last_refresh = time.monotonic()
+            for row_id, embedding in rows:
+                if row_id <= self._max_id:
+                    continue
+                self._max_id = row_id
+                try:
+                    vector = np.array([json.loads(embedding)], dtype=np.float32)
+                except (TypeError, ValueError):
+                    continue
+                if self._index is None:
+                    self._index = faiss.IndexFlatIP(vector.shape[1])
+                if vector.shape[1] != self._index.d:
+                    continue
+                faiss.normalize_L2(vector)
+                self._index.add(vector)
+                self._ids.append(row_id)
+
+    def _search(self, vector: np.ndarray):
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0 or vector.shape[1] != self._index.d:
+                return None, 0.0
+            scores, positions = self._index.search(vector, 1)
+            if positions[0][0] < 0:
+                return None, 0.0
+            return self._ids[positions[0][0]], float(scores[0][0])
+
+    def _count(self, call_site: str, result: str):
+        if PROMETHEUS_AVAILABLE:
+            REQUIREMENTS_CACHE_LOOKUPS.labels(call_site, result).inc()
+            if result.startswith('hit'):
+                LLM_CALLS_AVOIDED.labels(call_site, 'requirements_cache').inc()
+
+    def lookup(self, necessity: str, call_site: str) -> Optional[Dict]:
+        """
+        Conjunto aceito para uma necessidade equivalente, ou None. Atualiza o
+        contador de uso do conjunto (sem commit).
+
+        Returns:
+            {'requirements': [...], 'provenance': {...}}
+        """
+        if not self.enabled or not necessity:
+            return None
+        normalized = normalize_necessity(necessity)
+        try:
+            row = (
+                AcceptedRequirementSet.query.filter_by(normalized_necessity=normalized)
+                .order_by(AcceptedRequirementSet.updated_at.desc())
+                .first()
+            )
+            similarity, result = 1.0, 'hit_exact'
+            if row is None:
+                result = 'hit'
+                self._refresh()
+                row_id, similarity = self._search(self._embed(normalized))
+                if PROMETHEUS_AVAILABLE and row_id is not None:
+                    REQUIREMENTS_CACHE_SIMILARITY.observe(similarity)
+                if row_id is None or similarity < self.threshold:
+                    self._count(call_site, 'miss')
+                    return None
+                row = db.session.get(AcceptedRequirementSet, row_id)
+                if row is None:
+                    self._count(call_site, 'miss')
+                    return None
+        except Exception as e:
+            logger.warning(f"Cache semântico de requisitos indisponível ({call_site}): {e}")
+            self._count(call_site, 'error')
+            return None
+
+        self._count(call_site, result)
+        db.session.execute(
+            update(AcceptedRequirementSet)
+            .where(AcceptedRequirementSet.id == row.id)
+            .values(hits=AcceptedRequirementSet.hits + 1, last_hit_at=datetime.utcnow())
+        )
+        logger.info(
+            f"Cache semântico de requisitos ({call_site}): '{necessity[:60]}' ≈ "
+            f"'{row.necessity[:60]}' (similaridade {similarity:.3f})"
+        )
+        return {
+            'requirements': _clean_requirements(row.get_requirements()),
+            'provenance': {
+                'source': 'semantic_cache',
+                'requirement_set_id': row.id,
+                'similarity': round(similarity, 4),
+                'matched_necessity': row.necessity,
+                'accepted_at': (row.updated_at or row.created_at).isoformat() if (row.updated_at or row.created_at) else None
+            }
+        }
+
+    def remember(self, etp_session, necessity: str, requirements) -> Optional[AcceptedRequirementSet]:
+        """
+        Grava o conjunto aceito para a necessidade (o mais recente substitui o
+        anterior com a mesma necessidade normalizada). Não faz commit.
+        """
+        requirements = _clean_requirements(requirements)
+        if not self.enabled or not necessity or not requirements:
+            return None
+        normalized = normalize_necessity(necessity)
+        row = AcceptedRequirementSet.query.filter_by(
+            normalized_necessity=normalized, embedding_model=self.embedding_model
+        ).first()
+        if row is None:
+            try:
+                vector = self._embed(normalized)
+            except Exception as e:
+                logger.warning(f"Não foi possível gravar requisitos aceitos no cache semântico: {e}")
+                return None
+            row = AcceptedRequirementSet(
+                necessity=necessity,
+                normalized_necessity=normalized,
+                embedding_model=self.embedding_model,
+                hits=0
+            )
+            row.set_embedding(vector[0])
+            db.session.add(row)
+            # O novo conjunto entra no índice na próxima consulta
+            self._last_refresh = 0.0
+        row.etp_session_id = getattr(etp_session, 'id', None)
+        row.necessity = necessity
+        row.set_requirements(requirements)
+        row.updated_at = datetime.utcnow()
+        return row
+
+
+_requirements_cache: Optional[RequirementSemanticCache] = None
+
+
+def get_requirements_cache() -> RequirementSemanticCache:
+    """Instância compartilhada do cache semântico de requisitos"""
+    global _requirements_cache
+    if _requirements_cache is None:
+        _requirements_cache = RequirementSemanticCache()
+    return _requirements_cache
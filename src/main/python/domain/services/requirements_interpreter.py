@@ -1,12 +1,16 @@
 """
 Interpretador de comandos de revisão de requisitos em português.
-Implementa a lógica determinística para interpretar comandos do usuário sobre requisitos.
+A interpretação dos comandos fica no roteador de intenções (intent_router).
 """
 
-import re
 from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
 
+from domain.services.intent_router import (
+    DECISION_CLARIFY, DECISION_LOCAL, INTENT_ADD, INTENT_CHANGE_NEED, INTENT_CONFIRM, INTENT_EDIT, INTENT_UNCLEAR,
+    ROUTE_COMMAND, is_confident, record_decision, route_command
+)
+
 
 @dataclass
 class Requirement:
@@ -27,78 +31,25 @@ def parse_update_command(user_text: str, requirements: List[Dict]) -> Dict[str,
     Returns:
         Dict com intent e parâmetros da ação a executar
     """
-    text = user_text.strip().lower()
-    total_reqs = len(requirements)
-    
-    # 1) Detecta troca de necessidade (gatilhos explícitos)
-    if re.search(r"nova\s*necessidade|trocar\s*a\s*necessidade|na\s*verdade\s*a\s*necessidade\s*é", text):
-        return {"intent": "change_need"}
-    
-    # 2) Identificar índices mencionados
-    targets = []
-    
-    # Verificar se menciona "último"
-    if re.search(r"últim[oa]", text):
-        if total_reqs > 0:
-            targets.append(total_reqs)  # 1-based indexing
-    
-    # Extrair números mencionados
-    number_matches = re.findall(r"\b(\d+)\b", text)
-    for match in number_matches:
-        idx = int(match)
-        if 1 <= idx <= total_reqs:
-            targets.append(idx)
-    
-    # Remover duplicatas e ordenar
-    targets = sorted(set(targets))
-    
-    # 3) Determinar ação baseada em palavras-chave
-    
-    # Comando de remoção
-    if re.search(r"remov|apag|exclu", text) and targets:
-        return {"intent": "remove", "indices": targets}
-    
-    # Comando de manter apenas alguns
-    if re.search(r"manter\s*(só|somente)", text) and targets:
-        return {"intent": "keep_only", "indices": targets}
-    
-    # Comando de ajuste/edição
-    if re.search(r"ajust|troc|substitu", text) and targets:
-        # Tentar extrair novo texto após ':'
-        parts = re.split(r":", user_text, maxsplit=1)
-        new_text = parts[1].strip() if len(parts) == 2 and len(parts[1].strip()) > 0 else None
-        return {
-            "intent": "edit", 
-            "indices": targets, 
-            "new_text": new_text
-        }
-    
-    # Comando de adição (identificar palavras-chave de adição)
-    if re.search(r"adicion|inclui|acrescent|mais\s*um", text):
-        # Tentar extrair novo texto após ':'
-        parts = re.split(r":", user_text, maxsplit=1)
-        new_text = parts[1].strip() if len(parts) == 2 and len(parts[1].strip()) > 0 else None
-        return {
-            "intent": "add",
-            "new_text": new_text or user_text  # Usar texto completo se não houver ':'
-        }
-    
-    # Comando de confirmação/aprovação
-    if re.search(r"confirmo|aprovo|perfeito|está\s*bom|ok|concordo|mantenha|assim\s*mesmo", text):
-        return {"intent": "confirm"}
-    
-    # Se tem targets mas não identificou ação específica, assumir edição
-    if targets:
-        parts = re.split(r":", user_text, maxsplit=1)
-        new_text = parts[1].strip() if len(parts) == 2 and len(parts[1].strip()) > 0 else None
-        return {
-            "intent": "edit", 
-            "indices": targets, 
-            "new_text": new_text
-        }
-    
-    # Nenhuma ação clara identificada
-    return {"intent": "unclear", "original_text": user_text}
+    decision = route_command(user_text, len(requirements))
+    confident = decision.intent != INTENT_UNCLEAR and is_confident(decision.confidence)
+    record_decision(ROUTE_COMMAND, DECISION_LOCAL if confident else DECISION_CLARIFY)
+
+    if decision.intent == INTENT_UNCLEAR:
+        return {"intent": "unclear", "original_text": user_text}
+    if not confident:
+        # Ambíguo ("e o 5?", verbo negado, comandos misturados): não aplica, pede esclarecimento
+        return {"intent": "unclear", "original_text": user_text, "ambiguous": True}
+    if decision.intent in (INTENT_CHANGE_NEED, INTENT_CONFIRM):
+        return {"intent": decision.intent}
+    if decision.intent == INTENT_ADD:
+        # Usar texto completo se não houver conteúdo após o comando
+        return {"intent": "add", "new_text": decision.new_text or user_text}
+
+    command = {"intent": decision.intent, "indices": decision.indices}
+    if decision.intent == INTENT_EDIT:
+        command["new_text"] = decision.new_text
+    return command
 
 
 def apply_update_command(command: Dict[str, Any], requirements: List[Dict], necessity: str = "") -> tuple[List[Dict], str]:
@@ -188,6 +139,8 @@ def apply_update_command(command: Dict[str, Any], requirements: List[Dict], nece
             return requirements, "Por favor, especifique o requisito que deseja adicionar. Exemplo: 'adicionar: certificação ISO 9001'"
     
     # Intent unclear
+    if command.get("ambiguous"):
+        return requirements, "Não tenho certeza do que fazer. Pode confirmar? Por exemplo: 'remover o 2', 'ajustar o último'"
     return requirements, "Não compreendi o comando. Você pode ser mais específico? Exemplos: 'remover 3', 'ajustar o último', 'manter só 1 e 2'"
 
 
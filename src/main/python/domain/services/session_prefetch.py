@@ -0,0 +1,204 @@
+"""
+Pré-busca especulativa por sessão.
+
+Quando /conversation trava a necessidade, o que as etapas seguintes vão pedir
+já está definido: requisitos recuperados (RAG), opções de caminho de
+contratação e normas federais sugeridas, verificadas no LexML e resumidas para
+o usuário. A trava agenda essas buscas num pool em segundo plano e os
+resultados ficam num cache em memória por sessão, com TTL.
+
+Cada resultado é guardado com a chave de que depende (necessidade ou
+objective_slug). As etapas consultam o cache antes de calcular: pronto, é
+usado direto; em andamento, aguardam até o timeout pedido; ausente (outro
+processo, necessidade trocada, TTL vencido), calculam na hora como antes.
+
+Métricas: session_prefetch_total{kind, result}
+- scheduled: busca agendada
+- hit / wait: resultado pronto / aguardado
+- pending: ainda em andamento no timeout
+- miss / error: sem resultado para a chave / busca falhou
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from prometheus_client import Counter, Histogram
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.usecase.etp.options_advisor import OptionsAdvisor
+from domain.usecase.etp.verify_federal import build_legal_cards
+from domain.usecase.utils.legal_norms import suggest_federal
+from rag.retrieval import search_requirements
+
+logger = logging.getLogger(__name__)
+
+KIND_REQUIREMENTS = 'requirements'
+KIND_OPTIONS = 'options'
+KIND_LEGAL_NORMS = 'legal_norms'
+
+# Maior k usado pelas etapas; as demais usam o início da lista (ordenada por score)
+PREFETCH_REQUIREMENTS_K = 15
+PREFETCH_LEGAL_NORMS_K = 6
+# Espera máxima (s) por uma busca em andamento quando a etapa precisa do resultado
+PREFETCH_WAIT_SECONDS = float(os.getenv('SESSION_PREFETCH_WAIT_SECONDS', '10'))
+
+if PROMETHEUS_AVAILABLE:
+    SESSION_PREFETCH = Counter(
+        "session_prefetch_total",
+        "Pré-buscas por sessão e consultas ao cache por resultado",
+        ["kind", "result"]
+    )
+    SESSION_PREFETCH_SECONDS = Histogram(
+        "session_prefetch_seconds",
+        "Duração das pré-buscas em segundo plano",
+        ["kind"],
+        buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60)
+    )
+else:
+    SESSION_PREFETCH = None
+    SESSION_PREFETCH_SECONDS = None
+
+
+class _Entry:
+    """Busca de uma sessão: chave de que depende, future e validade"""
+
+    __slots__ = ('key', 'future', 'expires_at')
+
+    def __init__(self, key: str, future: Future, expires_at: float):
+        self.key = key
+        self.future = future
+        self.expires_at = expires_at
+
+    def reusable(self, key: str, now: float) -> bool:
+        if self.key != key or self.expires_at <= now:
+            return False
+        return not (self.future.done() and self.future.exception() is not None)
+
+
+class SessionPrefetch:
+    """Cache em memória, por sessão e tipo, de buscas feitas em segundo plano"""
+
+    def __init__(self, enabled: Optional[bool] = None, ttl_seconds: Optional[float] = None,
+                 workers: Optional[int] = None, max_sessions: Optional[int] = None):
+        if enabled is None:
+            enabled = os.getenv('SESSION_PREFETCH_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('SESSION_PREFETCH_TTL_SECONDS', '1800'))
+        self.workers = workers if workers is not None else int(os.getenv('SESSION_PREFETCH_WORKERS', '2'))
+        self.max_sessions = max_sessions if max_sessions is not None else int(os.getenv('SESSION_PREFETCH_MAX_SESSIONS', '512'))
+        # session_id -> {kind: _Entry}, da sessão menos para a mais recente
+        self._sessions: "OrderedDict[str, Dict[str, _Entry]]" = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers),
+                                                thread_name_prefix='session-prefetch')
+        return self._executor
+
+    def submit(self, session_id: Optional[str], kind: str, key: str, fn: Callable, *args) -> bool:
+        """
+        Agenda fn(*args) como resultado de (sessão, kind) para a chave. Retorna
+        False se desligado ou se já há busca válida para a mesma chave.
+        """
+        if not (self.enabled and session_id):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            entries = self._sessions.setdefault(session_id, {})
+            self._sessions.move_to_end(session_id)
+            entry = entries.get(kind)
+            if entry is not None and entry.reusable(key, now):
+                return False
+            future = self._pool().submit(self._run, kind, fn, *args)
+            entries[kind] = _Entry(key, future, now + self.ttl_seconds)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._record(kind, 'scheduled')
+        return True
+
+    def _run(self, kind: str, fn: Callable, *args) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        except Exception as e:
+            logger.warning(f"Pré-busca '{kind}' falhou: {e}")
+            raise
+        finally:
+            db.session.remove()
+            if PROMETHEUS_AVAILABLE:
+                SESSION_PREFETCH_SECONDS.labels(kind).observe(time.perf_counter() - started)
+
+    def result(self, session_id: Optional[str], kind: str, key: str, timeout: float = 0.0) -> Any:
+        """
+        Resultado pré-buscado para a chave, aguardando até timeout (s) se ainda
+        em andamento. None quando não há resultado: a etapa calcula na hora.
+        """
+        if not (self.enabled and session_id):
+            return None
+        with self._lock:
+            entry = self._sessions.get(session_id, {}).get(kind)
+        if entry is None or entry.key != key or entry.expires_at <= time.monotonic():
+            self._record(kind, 'miss')
+            return None
+
+        outcome = 'hit' if entry.future.done() else 'wait'
+        try:
+            value = entry.future.result(timeout=timeout)
+        except FutureTimeout:
+            self._record(kind, 'pending')
+            return None
+        except Exception:
+            self._record(kind, 'error')
+            return None
+        self._record(kind, outcome)
+        return value
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _record(self, kind: str, result: str):
+        if PROMETHEUS_AVAILABLE:
+            SESSION_PREFETCH.labels(kind, result).inc()
+
+
+def path_options(necessity: str) -> Dict:
+    """Opções de caminho de contratação já formatadas para /options-if-ambiguous"""
+    advisor = OptionsAdvisor()
+    return advisor.format_options_for_response(advisor.suggest_options(necessity, []))
+
+
+def legal_norm_cards(objective_slug: str, llm=None):
+    """Normas federais sugeridas para o objetivo, verificadas no LexML e resumidas"""
+    return build_legal_cards(suggest_federal(objective_slug, k=PREFETCH_LEGAL_NORMS_K), llm)
+
+
+def prefetch_necessity(session_id: str, necessity: str, objective_slug: str, llm=None):
+    """Agenda as buscas das etapas seguintes à trava da necessidade"""
+    prefetch = get_session_prefetch()
+    prefetch.submit(session_id, KIND_REQUIREMENTS, necessity,
+                    search_requirements, "generic", necessity, PREFETCH_REQUIREMENTS_K)
+    prefetch.submit(session_id, KIND_OPTIONS, necessity, path_options, necessity)
+    prefetch.submit(session_id, KIND_LEGAL_NORMS, objective_slug, legal_norm_cards, objective_slug, llm)
+
+
+_session_prefetch: Optional[SessionPrefetch] = None
+
+
+def get_session_prefetch() -> SessionPrefetch:
+    """Instância compartilhada da pré-busca por sessão"""
+    global _session_prefetch
+    if _session_prefetch is None:
+        _session_prefetch = SessionPrefetch()
+    return _session_prefetch
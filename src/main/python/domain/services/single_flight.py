@@ -0,0 +1,268 @@
+"""
+Coalescência de requisições duplicadas concorrentes (single-flight).
+
+Duplo clique e retentativas do frontend disparam o mesmo /generate, /preview,
+/suggest-requirements ou regeneração de seção várias vezes ao mesmo tempo.
+A chave de coalescência é (session_id, operação, fingerprint da entrada):
+- no mesmo processo, a primeira requisição executa e as demais aguardam o
+  mesmo resultado;
+- entre workers, a primeira grava uma linha em request_lease (chave única);
+  as outras aguardam a linha ficar 'done' e devolvem o resultado gravado.
+
+Lease 'running' vencido (dono morreu) ou resultado antigo é assumido por um
+UPDATE condicional, como a reserva de jobs em etp_jobs. O resultado fica
+disponível por SINGLE_FLIGHT_RESULT_SECONDS para retentativas que chegam logo
+após a conclusão. Falha no banco de leases não impede a operação: ela segue
+só com a coalescência local.
+
+Métricas: single_flight_total{operation,role} - leader, local_follower,
+remote_follower, wait_timeout.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+try:
+    from prometheus_client import Counter
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.dto.EtpDto import RequestLease
+
+logger = logging.getLogger(__name__)
+
+OPERATION_GENERATE = 'generate'
+OPERATION_PREVIEW = 'preview'
+OPERATION_SUGGEST_REQUIREMENTS = 'suggest_requirements'
+OPERATION_REGENERATE_SECTION = 'regenerate_section'
+
+LEASE_RUNNING = 'running'
+LEASE_DONE = 'done'
+LEASE_FAILED = 'failed'
+
+# Linhas de lease encerradas há mais que isso são apagadas (no máximo uma vez por intervalo)
+LEASE_PRUNE_SECONDS = 3600
+
+if PROMETHEUS_AVAILABLE:
+    SINGLE_FLIGHT = Counter(
+        "single_flight_total",
+        "Requisições por papel na coalescência de operações duplicadas",
+        ["operation", "role"]
+    )
+else:
+    SINGLE_FLIGHT = None
+
+
+def input_fingerprint(*parts) -> str:
+    """sha256 das entradas da operação"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def flight_key(session_id: Optional[str], operation: str, fingerprint: str) -> str:
+    """Chave de coalescência (cabe em request_lease.lease_key)"""
+    return hashlib.sha256(f"{session_id or ''}|{operation}|{fingerprint}".encode('utf-8')).hexdigest()
+
+
+def _record(operation: str, role: str):
+    if PROMETHEUS_AVAILABLE:
+        SINGLE_FLIGHT.labels(operation, role).inc()
+
+
+class _Call:
+    """Execução local em andamento para uma chave"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Executa uma vez cada operação duplicada concorrente e compartilha o resultado"""
+
+    def __init__(self, enabled: Optional[bool] = None, lease_seconds: Optional[float] = None,
+                 wait_seconds: Optional[float] = None, poll_seconds: Optional[float] = None,
+                 result_seconds: Optional[float] = None):
+        self.enabled = enabled if enabled is not None else \
+            os.getenv('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+        # Lease 'running' sem conclusão após esse tempo é considerado abandonado
+        self.lease_seconds = lease_seconds if lease_seconds is not None else \
+            float(os.getenv('SINGLE_FLIGHT_LEASE_SECONDS', '300'))
+        # Espera máxima de uma duplicata; depois disso ela executa por conta própria
+        self.wait_seconds = wait_seconds if wait_seconds is not None else \
+            float(os.getenv('SINGLE_FLIGHT_WAIT_SECONDS', '300'))
+        self.poll_seconds = poll_seconds if poll_seconds is not None else \
+            float(os.getenv('SINGLE_FLIGHT_POLL_SECONDS', '0.5'))
+        self.result_seconds = result_seconds if result_seconds is not None else \
+            float(os.getenv('SINGLE_FLIGHT_RESULT_SECONDS', '10'))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._last_prune = 0.0
+
+    def do(self, session_id: Optional[str], operation: str, fingerprint: str,
+           fn: Callable[[], Any], keep: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, bool]:
+        """
+        Executa fn() (resultado serializável em JSON) ou aguarda a execução
+        idêntica em andamento. Resultado rejeitado por keep (ex.: erro 500) vai
+        para as duplicatas locais já em espera, mas não é gravado para os demais
+        workers nem para retentativas.
+
+        Returns:
+            (resultado, compartilhado)
+        """
+        if not self.enabled:
+            return fn(), False
+
+        key = flight_key(session_id, operation, fingerprint)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            _record(operation, 'local_follower')
+            if not call.done.wait(self.wait_seconds):
+                _record(operation, 'wait_timeout')
+                return fn(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result, shared = self._do_leased(key, session_id, operation, fn, keep)
+            return call.result, shared
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _do_leased(self, key: str, session_id: Optional[str], operation: str,
+                   fn: Callable[[], Any], keep: Optional[Callable[[Any], bool]]) -> Tuple[Any, bool]:
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            try:
+                acquired, result = self._try_acquire(key, session_id, operation)
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                logger.warning(f"Lease de {operation} indisponível, seguindo sem coalescência entre workers: {e}")
+                _record(operation, 'leader')
+                return fn(), False
+
+            if acquired:
+                break
+            if result is not None:
+                _record(operation, 'remote_follower')
+                return result[0], True
+            if time.monotonic() >= deadline:
+                _record(operation, 'wait_timeout')
+                return fn(), False
+            time.sleep(self.poll_seconds)
+
+        _record(operation, 'leader')
+        try:
+            result = fn()
+        except BaseException:
+            db.session.rollback()
+            self._finish(key, LEASE_FAILED, None)
+            raise
+        if keep is None or keep(result):
+            self._finish(key, LEASE_DONE, result)
+        else:
+            self._finish(key, LEASE_FAILED, None)
+        return result, False
+
+    def _try_acquire(self, key: str, session_id: Optional[str], operation: str) -> Tuple[bool, Optional[Tuple]]:
+        """
+        (True, None) quando esta requisição passa a executar; (False, (resultado,))
+        quando há resultado recente; (False, None) quando outro worker executa.
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        try:
+            db.session.add(RequestLease(
+                lease_key=key, operation=operation, session_id=session_id, owner=self.owner,
+                status=LEASE_RUNNING, created_at=now, expires_at=expires_at
+            ))
+            db.session.commit()
+            return True, None
+        except IntegrityError:
+            db.session.rollback()
+
+        row = db.session.query(
+            RequestLease.status, RequestLease.result_json, RequestLease.finished_at, RequestLease.expires_at
+        ).filter(RequestLease.lease_key == key).first()
+        db.session.rollback()
+        if row is None:
+            return False, None
+        status, result_json, finished_at, lease_expires = row
+
+        fresh_after = now - timedelta(seconds=self.result_seconds)
+        if status == LEASE_DONE and finished_at and finished_at >= fresh_after:
+            return False, (json.loads(result_json) if result_json else None,)
+        if status == LEASE_RUNNING and lease_expires >= now:
+            return False, None
+
+        # Lease abandonado, falho ou resultado antigo: assume com UPDATE condicional
+        taken = db.session.execute(
+            update(RequestLease)
+            .where(RequestLease.lease_key == key, RequestLease.status == status,
+                   RequestLease.expires_at == lease_expires)
+            .values(owner=self.owner, status=LEASE_RUNNING, result_json=None, finished_at=None,
+                    operation=operation, session_id=session_id, expires_at=expires_at)
+        )
+        db.session.commit()
+        return taken.rowcount == 1, None
+
+    def _finish(self, key: str, status: str, result: Any):
+        """Grava o resultado no lease (falha aqui não afeta a resposta do dono)"""
+        now = datetime.utcnow()
+        try:
+            db.session.execute(
+                update(RequestLease)
+                .where(RequestLease.lease_key == key, RequestLease.owner == self.owner)
+                .values(status=status, finished_at=now, expires_at=now,
+                        result_json=json.dumps(result, ensure_ascii=False) if status == LEASE_DONE else None)
+            )
+            db.session.commit()
+            self._prune(now)
+        except (SQLAlchemyError, TypeError, ValueError) as e:
+            db.session.rollback()
+            logger.warning(f"Falha ao gravar o resultado do lease {key[:12]}: {e}")
+
+    def _prune(self, now: datetime):
+        if time.monotonic() - self._last_prune < LEASE_PRUNE_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+        cutoff = now - timedelta(seconds=LEASE_PRUNE_SECONDS)
+        db.session.execute(delete(RequestLease).where(RequestLease.expires_at < cutoff))
+        db.session.commit()
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Instância compartilhada do processo"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
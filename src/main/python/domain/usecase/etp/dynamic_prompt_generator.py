@@ -3,9 +3,11 @@ import json
 import re
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-import openai
 import logging
 
+from domain.interfaces.dataprovider.LlmGateway import get_llm_gateway
+from domain.usecase.etp.prompt_budget import PromptBuilder
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -13,7 +15,9 @@ class DynamicPromptGenerator:
     """Gerador dinâmico de prompts para ETPs com integração RAG"""
     
     def __init__(self, openai_api_key: str):
-        self.client = openai.OpenAI(api_key=openai_api_key)
+        self.llm = get_llm_gateway(openai_api_key)
+        # Cliente do pool compartilhado, usado pelo RAG para embeddings
+        self.client = self.llm.client
         self.rag_retrieval = None
         
     def set_rag_retrieval(self, rag_retrieval):
@@ -50,8 +54,13 @@ class DynamicPromptGenerator:
             
         return cleaned
     
-    def generate_dynamic_prompt(self, session_data: Dict, section_info: Dict) -> str:
-        """Gera prompt dinâmico para o modelo fine-tunado"""
+    def generate_dynamic_prompt(self, session_data: Dict, section_info: Dict,
+                                builder: Optional[PromptBuilder] = None) -> str:
+        """
+        Gera prompt dinâmico para o modelo fine-tunado. Com builder, as
+        instruções são contabilizadas e as respostas do usuário são cortadas
+        no orçamento da parte 'answers'.
+        """
         try:
             # Extrair informações da sessão
             answers = session_data.get('answers', {})
@@ -73,12 +82,8 @@ class DynamicPromptGenerator:
             prompt_parts.append("- Detalhe processos, metodologias e critérios técnicos específicos")
             prompt_parts.append("- Inclua considerações sobre aspectos administrativos, operacionais e estratégicos")
             
-            # Adicionar informações das respostas
-            if answers:
-                prompt_parts.append("\nInformações fornecidas pelo usuário:")
-                for question_id, answer in answers.items():
-                    if answer:
-                        prompt_parts.append(f"- {answer}")
+            # Informações das respostas entram depois de contabilizadas as instruções
+            answers_position = len(prompt_parts)
             
             # Adicionar requisitos específicos da seção
             if section_info.get('min_paragraphs'):
@@ -100,6 +105,17 @@ class DynamicPromptGenerator:
             prompt_parts.append("- Fundamentação legal específica e referências normativas")
             prompt_parts.append("- Estrutura lógica com progressão argumentativa coerente")
             
+            # Adicionar informações das respostas
+            answer_texts = [str(answer) for answer in answers.values() if answer]
+            answers_header = "\nInformações fornecidas pelo usuário:"
+            if builder is not None:
+                builder.instructions("\n".join(prompt_parts), answers_header, "\n- " * len(answer_texts))
+                answer_texts = builder.fit_answers('answers', answer_texts)
+            if answer_texts:
+                prompt_parts[answers_position:answers_position] = (
+                    [answers_header] + [f"- {answer}" for answer in answer_texts]
+                )
+            
             return "\n".join(prompt_parts)
             
         except Exception as e:
@@ -210,7 +226,8 @@ class DynamicPromptGenerator:
             - Retorne apenas o requisito reformulado, sem explicações adicionais
             """
             
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
+                'rag_rewrite',
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": rewrite_prompt}],
                 max_tokens=200,
@@ -247,7 +264,8 @@ class DynamicPromptGenerator:
             - "consultative_message": mensagem explicativa sobre as recomendações
             """
             
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
+                'contextual_suggestions',
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": consultive_prompt}],
                 max_tokens=800,
@@ -1,22 +1,122 @@
 import os
 import json
+import time
+import hashlib
+import queue
 import logging
-from typing import Dict, List, Optional
-import openai
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 from .dynamic_prompt_generator import DynamicPromptGenerator
 from rag.retrieval import search_requirements
 from domain.usecase.utils.legal_norms import suggest_federal
-from domain.usecase.etp.verify_federal import resolve_lexml, summarize_for_user
+from domain.usecase.etp.verify_federal import build_legal_cards
+from domain.services.session_prefetch import get_session_prefetch, KIND_LEGAL_NORMS
+from domain.usecase.etp.prompt_budget import PromptBuilder, SECTION_PROMPT_TOKENS
+from domain.usecase.etp.section_routing import RouteSelection, SectionRoute, SectionRouter
+from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.interfaces.dataprovider.LlmGateway import get_llm_gateway
+
+def _total_tokens(usage) -> int:
+    """total_tokens do uso informado pela API (0 quando ausente)"""
+    tokens = getattr(usage, 'total_tokens', 0)
+    return tokens if isinstance(tokens, int) else 0
+
+
+def _close_stream(stream):
+    """Fecha a resposta em streaming (a conexão HTTP), se o objeto permitir"""
+    close = getattr(stream, 'close', None)
+    if close:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+class _ActiveStreams:
+    """Respostas em streaming abertas, para fechá-las ao cancelar a geração"""
+    
+    def __init__(self):
+        self._streams = set()
+        self._lock = threading.Lock()
+    
+    def add(self, stream):
+        with self._lock:
+            self._streams.add(stream)
+    
+    def discard(self, stream):
+        with self._lock:
+            self._streams.discard(stream)
+    
+    def close_all(self):
+        with self._lock:
+            streams, self._streams = list(self._streams), set()
+        for stream in streams:
+            _close_stream(stream)
+
 
 class DynamicEtpGenerator:
     """Gerador de ETP com prompts dinâmicos baseados em documentos existentes"""
     
-    def __init__(self, openai_api_key: str):
-        self.client = openai.OpenAI(api_key=openai_api_key)
+    # Parâmetros da rota padrão; as demais rotas estão em section_routing
+    SECTION_MODEL = "ft:gpt-4.1-mini-2025-04-14:az-tecnologia-ltda:etp-treino:CBXrnlhG"
+    SECTION_MAX_TOKENS = 4000
+    SECTION_TEMPERATURE = 0.2
+    # Alterar quando a montagem do prompt mudar, para invalidar seções já geradas
+    SECTION_FINGERPRINT_VERSION = 2
+    # Divisão do orçamento de tokens (após as instruções) entre as partes do prompt da seção
+    SECTION_PROMPT_SHARES = {
+        'answers': {'answers': 1.0},
+        'context': {'answers': 0.55, 'context': 0.45},
+        'legal': {'answers': 0.7, 'legal': 0.3},
+    }
+    
+    # Perguntas (pela seção a que pertencem) consumidas por cada seção do ETP; None = todas
+    SECTION_INPUTS = {
+        1: None,
+        2: ("OBJETO",),
+        3: ("OBJETO", "REQUISITOS"),
+        4: ("OBJETO", "QUANTIDADES"),
+        5: ("OBJETO", "REQUISITOS", "QUANTIDADES"),
+        6: ("QUANTIDADES",),
+        7: ("OBJETO", "REQUISITOS"),
+        8: ("PARCELAMENTO", "QUANTIDADES"),
+        9: ("OBJETO",),
+        10: ("OBJETO",),
+        11: ("OBJETO",),
+        12: ("OBJETO", "REQUISITOS"),
+        13: ("OBJETO", "REQUISITOS", "QUANTIDADES"),
+        14: None
+    }
+    SECTION_SYSTEM_PROMPT = """Você é um especialista em elaboração de Estudos Técnicos Preliminares conforme a Lei 14.133/21. 
+                        Gere conteúdo técnico, detalhado, formal e em total conformidade com a legislação de licitações e contratos públicos.
+                        
+                        DIRETRIZES PARA CONTEÚDO EXTENSO E ESTILIZADO:
+                        - Produza texto substancial com parágrafos bem desenvolvidos de 4-7 linhas cada
+                        - Inclua análises técnicas aprofundadas com fundamentação jurídica específica
+                        - Desenvolva argumentações completas com contextualização adequada
+                        - Use linguagem técnica formal própria de documentos administrativos oficiais
+                        - Apresente detalhamentos metodológicos e critérios técnicos específicos
+                        - Incorpore aspectos legais, administrativos, técnicos e operacionais relevantes
+                        - Estruture o conteúdo com progressão lógica e coerência argumentativa
+                        
+                        Use os exemplos fornecidos como referência, mas adapte ao contexto específico da contratação atual.
+                        Mantenha sempre linguagem administrativa apropriada e estrutura técnica detalhada."""
+    
+    def __init__(self, openai_api_key: str, max_workers: Optional[int] = None):
+        self.llm = get_llm_gateway(openai_api_key)
         self.prompt_generator = DynamicPromptGenerator(openai_api_key)
         self.etp_template = self._load_etp_template()
         self.logger = logging.getLogger(__name__)
+        # Número máximo de seções geradas em paralelo
+        if max_workers is None:
+            max_workers = int(os.getenv('ETP_SECTION_CONCURRENCY', '4'))
+        self.max_workers = max(1, max_workers)
+        # Modelo, max_tokens e temperature por seção, com fallback por SLO de latência
+        self.router = SectionRouter.from_env(self.SECTION_MODEL, self.SECTION_MAX_TOKENS, self.SECTION_TEMPERATURE)
+        # Tokens (prompt + resposta) da última chamada ao modelo de cada thread de seção
+        self._call_usage = threading.local()
         
         # Estrutura obrigatória conforme Lei 14.133/21
         self.etp_structure = [
@@ -144,168 +244,465 @@ class DynamicEtpGenerator:
             # Retorna estrutura básica em caso de erro
             return {str(i): {"titulo": f"Seção {i}", "conteudo": ""} for i in range(1, 15)}
     
-    def generate_complete_etp(self, session_data: Dict, context_data: Dict = None, is_preview: bool = False) -> str:
+    def generate_complete_etp(self, session_data: Dict, context_data: Dict = None, is_preview: bool = False,
+                              reusable_sections: Optional[Dict[int, Dict]] = None) -> str:
         """Gera ETP completo usando o template fixo e prompts dinâmicos"""
         try:
-            # Criar uma cópia do template para preenchimento
-            etp_document = {}
-            for section_id, section_data in self.etp_template.items():
-                etp_document[section_id] = {
-                    "titulo": section_data["titulo"],
-                    "conteudo": ""  # Será preenchido dinamicamente
-                }
-            
-            # Gerar conteúdo para cada seção usando prompts dinâmicos
-            for section_id in range(1, 15):
-                section_key = str(section_id)
-                if section_key in etp_document:
-                    # Encontrar a seção correspondente na estrutura antiga para compatibilidade
-                    section_info = next(
-                        (s for s in self.etp_structure if s["section"].startswith(f"{section_id}.")), 
-                        None
-                    )
-                    
-                    if section_info:
-                        section_content = self._generate_section_dynamic(
-                            section_info, 
-                            session_data, 
-                            context_data,
-                            is_preview
-                        )
-                        # Extrair apenas o conteúdo, removendo o título se presente
-                        if section_content.startswith(section_info["section"]):
-                            section_content = section_content[len(section_info["section"]):].strip()
-                        
-                        etp_document[section_key]["conteudo"] = section_content
-            
-            # Formatar documento final
-            formatted_sections = []
-            for section_id in range(1, 15):
-                section_key = str(section_id)
-                if section_key in etp_document:
-                    section = etp_document[section_key]
-                    formatted_sections.append(f"{section_id}. {section['titulo']}\n\n{section['conteudo']}")
-            
-            full_etp = "\n\n".join(formatted_sections)
-            
-            # Adicionar cabeçalho se não for preview
-            if not is_preview:
-                header = self._generate_document_header()
-                full_etp = header + "\n\n" + full_etp
-            
-            return full_etp
+            sections = self.generate_sections(session_data, context_data, is_preview, reusable_sections)
+            return self.assemble_etp(sections, is_preview)
             
         except Exception as e:
             raise Exception(f"Erro na geração do ETP: {str(e)}")
     
-    def _generate_section_dynamic(self, section_info: Dict, session_data: Dict, 
-                                context_data: Dict = None, is_preview: bool = False) -> str:
-        """Gera uma seção específica usando prompt dinâmico"""
+    def generate_sections(self, session_data: Dict, context_data: Dict = None, is_preview: bool = False,
+                          reusable_sections: Optional[Dict[int, Dict]] = None) -> List[Dict]:
+        """
+        Gera as seções num pool de até self.max_workers threads.
+        
+        reusable_sections: {número: {'fingerprint': ..., 'content': ...}} de uma geração
+        anterior; a seção cujo fingerprint não mudou é reaproveitada sem chamar o modelo.
+        
+        Returns:
+            Resultados por seção (ver _section_result), na ordem do template; a falha
+            de uma seção vira o texto de fallback apenas daquela seção.
+        """
+        sections = self._sections_to_generate(self._new_etp_document())
+        if not sections:
+            return []
+        reusable_sections = reusable_sections or {}
+        
+        def generate(section_key: str, section_info: Dict) -> Dict:
+            try:
+                try:
+                    messages = self._build_section_messages(section_info, session_data)
+                    fingerprint = self._section_fingerprint(messages, self._section_route(section_info))
+                    previous = reusable_sections.get(int(section_key))
+                    if previous and previous.get('fingerprint') == fingerprint:
+                        return self._section_result(section_key, previous['content'], fingerprint, reused=True)
+                    selection = self.router.select(int(section_key))
+                    self._call_usage.tokens = 0
+                    called = time.perf_counter()
+                    content = self._complete_section(section_info, messages, selection)
+                    return self._section_result(section_key, content, fingerprint, selection=selection,
+                                                tokens=self._call_usage.tokens,
+                                                latency_ms=int((time.perf_counter() - called) * 1000))
+                except Exception as e:
+                    self.logger.error(f"Falha ao gerar seção {section_info['section']}: {str(e)}")
+                    return self._section_result(section_key, self._section_error_content(section_info, e), error=True)
+            finally:
+                # Sessão do banco é por thread (scoped_session); liberar ao terminar
+                db.session.remove()
+        
+        started = time.perf_counter()
+        workers = min(self.max_workers, len(sections))
+        results: List[Optional[Dict]] = [None] * len(sections)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='etp-section') as executor:
+            futures = {
+                executor.submit(generate, section_key, section_info): position
+                for position, (section_key, section_info) in enumerate(sections)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        
+        reused = sum(1 for result in results if result['reused'])
+        self.logger.info(
+            f"{len(sections)} seções em {time.perf_counter() - started:.1f}s "
+            f"(paralelismo {workers}, {reused} reaproveitadas)"
+        )
+        return results
+    
+    def stream_complete_etp(self, session_data: Dict, context_data: Dict = None, is_preview: bool = False,
+                            reusable_sections: Optional[Dict[int, Dict]] = None,
+                            heartbeat_interval: float = 15.0) -> Iterator[Dict]:
+        """
+        Versão em streaming de generate_complete_etp. Gera eventos à medida que
+        as seções (em paralelo, até self.max_workers) avançam:
+            {'event': 'section_start', 'section': n, 'title': ...}
+            {'event': 'token', 'section': n, 'delta': ...}
+            {'event': 'section_complete', **resultado da seção}
+            {'event': 'heartbeat'}   (sem eventos há heartbeat_interval segundos)
+            {'event': 'done', 'etp_content': ..., 'sections': [...]}
+        Seções reaproveitadas (fingerprint inalterado) não emitem tokens.
+        Interromper o iterador (cliente desconectado) cancela as seções em andamento.
+        """
+        sections = self._sections_to_generate(self._new_etp_document())
+        reusable_sections = reusable_sections or {}
+        events: queue.Queue = queue.Queue()
+        cancelled = threading.Event()
+        active_streams = _ActiveStreams()
+        
+        def generate(section_key: str, section_info: Dict):
+            try:
+                events.put({'event': 'section_start', 'section': int(section_key),
+                            'title': self.etp_template[section_key]['titulo']})
+                result = self._stream_section(section_key, section_info, session_data,
+                                              reusable_sections, events, cancelled, active_streams)
+                events.put(dict(result, event='section_complete'))
+            finally:
+                # Sessão do banco é por thread (scoped_session); liberar ao terminar
+                db.session.remove()
+        
+        started = time.perf_counter()
+        workers = min(self.max_workers, max(len(sections), 1))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='etp-section-stream')
         try:
-            # Gerar prompt dinâmico baseado na base de conhecimento
-            dynamic_prompt = self.prompt_generator.generate_dynamic_prompt(
-                session_data, 
-                section_info
+            for section_key, section_info in sections:
+                executor.submit(generate, section_key, section_info)
+            
+            results: Dict[int, Dict] = {}
+            while len(results) < len(sections):
+                try:
+                    event = events.get(timeout=heartbeat_interval)
+                except queue.Empty:
+                    yield {'event': 'heartbeat'}
+                    continue
+                if event['event'] == 'section_complete':
+                    results[event['section']] = {k: v for k, v in event.items() if k != 'event'}
+                yield event
+            
+            self.logger.info(
+                f"{len(sections)} seções transmitidas em {time.perf_counter() - started:.1f}s "
+                f"(paralelismo {workers})"
             )
+            ordered = [results[int(section_key)] for section_key, _ in sections]
+            yield {'event': 'done', 'etp_content': self.assemble_etp(ordered, is_preview), 'sections': ordered}
+        finally:
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            # Fechar as respostas em andamento interrompe as chamadas ao modelo
+            active_streams.close_all()
+    
+    def _stream_section(self, section_key: str, section_info: Dict, session_data: Dict,
+                        reusable_sections: Dict[int, Dict], events: "queue.Queue",
+                        cancelled: threading.Event, active_streams: "_ActiveStreams") -> Dict:
+        """Gera uma seção com stream=True publicando cada trecho recebido; retorna o resultado da seção"""
+        try:
+            messages = self._build_section_messages(section_info, session_data)
+            fingerprint = self._section_fingerprint(messages, self._section_route(section_info))
+            previous = reusable_sections.get(int(section_key))
+            if previous and previous.get('fingerprint') == fingerprint:
+                return self._section_result(section_key, previous['content'], fingerprint, reused=True)
+            if cancelled.is_set():
+                return self._section_result(section_key, "", error=True)
             
-            # Integração do fluxo de consulta interna para seções específicas
-            section_title = section_info.get('section', '').upper()
+            selection = self.router.select(int(section_key))
+            started = time.perf_counter()
+            stream = self.llm.chat(
+                'section_generation_stream',
+                model=selection.model,
+                messages=messages,
+                max_tokens=selection.route.max_tokens,
+                temperature=selection.route.temperature,
+                stream=True
+            )
+            active_streams.add(stream)
+            parts = []
+            try:
+                for chunk in stream:
+                    if cancelled.is_set():
+                        return self._section_result(section_key, "".join(parts), error=True)
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        events.put({'event': 'token', 'section': int(section_key), 'delta': delta})
+            finally:
+                active_streams.discard(stream)
+                _close_stream(stream)
             
-            # Para seção "REQUISITO" - buscar contexto interno
-            if "REQUISITO" in section_title:
-                objective_slug = self._extract_objective_slug(session_data)
-                if objective_slug:
-                    # Extrair pergunta do usuário das respostas da sessão
-                    user_query = self._extract_user_query_for_requirements(session_data)
-                    if user_query:
-                        try:
-                            # Buscar contexto recuperado
-                            ctx = search_requirements(objective_slug, user_query, k=5)
-                            if ctx:
-                                self.logger.info("consulta interna encontrada")
-                                # Montar contexto recuperado (máximo 1200 palavras)
-                                context_text = self._build_context_text(ctx, max_words=1200)
-                                dynamic_prompt += f"\n\nCONTEXTO RECUPERADO:\n{context_text}"
-                        except Exception as e:
-                            self.logger.warning(f"Erro na busca de requisitos: {str(e)}")
+            elapsed = time.perf_counter() - started
+            self.router.observe(selection, elapsed)
+            content = self._post_process_section_content("".join(parts), section_info)
+            return self._section_result(section_key, content, fingerprint, selection=selection,
+                                        tokens=_total_tokens(getattr(stream, 'usage', None)),
+                                        latency_ms=int(elapsed * 1000))
             
-            # Para seção "NORMA LEGAL" - sugerir normas federais
-            elif "NORMA" in section_title and "LEGAL" in section_title:
-                objective_slug = self._extract_objective_slug(session_data)
-                if objective_slug:
+        except Exception as e:
+            self.logger.error(f"Falha ao transmitir seção {section_info['section']}: {str(e)}")
+            return self._section_result(section_key, self._section_error_content(section_info, e), error=True)
+    
+    def _section_result(self, section_key: str, content: str, fingerprint: Optional[str] = None,
+                        reused: bool = False, error: bool = False,
+                        selection: Optional[RouteSelection] = None, tokens: int = 0,
+                        latency_ms: Optional[int] = None) -> Dict:
+        """Resultado de uma seção: conteúdo sem o título, fingerprint das entradas, rota, modelo usado, tokens e latência da chamada"""
+        section_info = next(s for s in self.etp_structure if s["section"].startswith(f"{section_key}."))
+        route = selection.route if selection else self.router.route_for(int(section_key))
+        # Conteúdo reaproveitado já foi gravado sem o título
+        if not reused and content.startswith(section_info["section"]):
+            content = content[len(section_info["section"]):].strip()
+        return {
+            'section': int(section_key),
+            'title': self.etp_template[section_key]['titulo'],
+            'content': content,
+            'fingerprint': fingerprint,
+            'model': selection.model if selection else route.model,
+            'route': route.name,
+            'reused': reused,
+            'error': error,
+            'tokens': tokens,
+            'latency_ms': latency_ms
+        }
+    
+    def _section_route(self, section_info: Dict) -> SectionRoute:
+        """Rota configurada para a seção (sem considerar o fallback por SLO)"""
+        return self.router.route_for(int(section_info['section'].split('.')[0]))
+    
+    def _section_fingerprint(self, messages: List[Dict], route: SectionRoute) -> str:
+        """
+        sha256 das entradas da seção: mensagens (prompt com as respostas consumidas e o
+        contexto recuperado), modelo e parâmetros de geração da rota. O fallback por
+        SLO não muda o fingerprint: a seção não é refeita só porque o modelo principal voltou.
+        """
+        payload = {
+            'version': self.SECTION_FINGERPRINT_VERSION,
+            'model': route.model,
+            'max_tokens': route.max_tokens,
+            'temperature': route.temperature,
+            'messages': messages
+        }
+        return hashlib.sha256(
+            json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+    
+    def assemble_etp(self, section_results: List[Dict], is_preview: bool = False) -> str:
+        """Monta o documento final a partir dos resultados por seção"""
+        etp_document = self._new_etp_document()
+        for result in section_results:
+            section_key = str(result['section'])
+            if section_key in etp_document:
+                etp_document[section_key]["conteudo"] = result['content']
+        return self._format_etp_document(etp_document, is_preview)
+
+    def _section_span(self, document: str, section_number: int) -> Optional[Tuple[int, int]]:
+        """Início e fim do conteúdo da seção no documento formatado, ou None se o título não está lá"""
+        section_key = str(section_number)
+        if section_key not in self.etp_template:
+            return None
+        heading = f"{section_number}. {self.etp_template[section_key]['titulo']}\n\n"
+        position = 0 if document.startswith(heading) else document.find("\n\n" + heading)
+        if position < 0:
+            return None
+        start = document.index(heading, position) + len(heading)
+        end = len(document)
+        for next_number in range(section_number + 1, 15):
+            next_key = str(next_number)
+            if next_key in self.etp_template:
+                found = document.find(f"\n\n{next_number}. {self.etp_template[next_key]['titulo']}\n\n", start)
+                if found >= 0:
+                    end = found
+                    break
+        return start, end
+
+    def section_content(self, document: str, section_number: int) -> Optional[str]:
+        """Conteúdo da seção no documento formatado (sem o título)"""
+        span = self._section_span(document or '', section_number)
+        return document[span[0]:span[1]] if span else None
+
+    def replace_section(self, document: str, section_number: int, content: str) -> Optional[str]:
+        """Documento com o conteúdo da seção trocado, ou None se a seção não está no documento"""
+        span = self._section_span(document or '', section_number)
+        if span is None:
+            return None
+        return document[:span[0]] + content + document[span[1]:]
+
+    def _new_etp_document(self) -> Dict:
+        """Cria uma cópia do template para preenchimento"""
+        etp_document = {}
+        for section_id, section_data in self.etp_template.items():
+            etp_document[section_id] = {
+                "titulo": section_data["titulo"],
+                "conteudo": ""  # Será preenchido dinamicamente
+            }
+        return etp_document
+    
+    def _format_etp_document(self, etp_document: Dict, is_preview: bool = False) -> str:
+        """Formata o documento final (seções 1-14 e cabeçalho quando não é preview)"""
+        formatted_sections = []
+        for section_id in range(1, 15):
+            section_key = str(section_id)
+            if section_key in etp_document:
+                section = etp_document[section_key]
+                formatted_sections.append(f"{section_id}. {section['titulo']}\n\n{section['conteudo']}")
+        
+        full_etp = "\n\n".join(formatted_sections)
+        
+        # Adicionar cabeçalho se não for preview
+        if not is_preview:
+            header = self._generate_document_header()
+            full_etp = header + "\n\n" + full_etp
+        
+        return full_etp
+    
+    def section_titles(self) -> List[Tuple[int, str]]:
+        """(número, título) das seções geradas, na ordem do template"""
+        return [(int(key), self.etp_template[key]['titulo'])
+                for key, _ in self._sections_to_generate(self._new_etp_document())]
+    
+    def _sections_to_generate(self, etp_document: Dict) -> List[Tuple[str, Dict]]:
+        """Lista (chave, section_info) das seções 1-14 presentes no template, em ordem"""
+        sections = []
+        for section_id in range(1, 15):
+            section_key = str(section_id)
+            if section_key in etp_document:
+                # Encontrar a seção correspondente na estrutura antiga para compatibilidade
+                section_info = next(
+                    (s for s in self.etp_structure if s["section"].startswith(f"{section_id}.")), 
+                    None
+                )
+                if section_info:
+                    sections.append((section_key, section_info))
+        return sections
+    
+    def _section_session_data(self, section_info: Dict, session_data: Dict) -> Dict:
+        """
+        Restringe as respostas às que a seção consome (SECTION_INPUTS), usando o
+        mapa session_data['question_sections'] {id da pergunta: seção da pergunta}.
+        Sem o mapa, ou para respostas de perguntas desconhecidas, a seção recebe tudo.
+        """
+        section_number = int(section_info['section'].split('.')[0])
+        topics = self.SECTION_INPUTS.get(section_number)
+        question_sections = session_data.get('question_sections')
+        if topics is None or not question_sections:
+            return session_data
+        
+        answers = {}
+        for question_id, answer in session_data.get('answers', {}).items():
+            question_section = question_sections.get(str(question_id))
+            if question_section is None or any(topic in question_section.upper() for topic in topics):
+                answers[question_id] = answer
+        return dict(session_data, answers=answers)
+    
+    def _build_section_messages(self, section_info: Dict, session_data: Dict) -> List[Dict]:
+        """
+        Monta as mensagens (system + prompt dinâmico com contexto interno) de uma
+        seção, dentro do orçamento de tokens SECTION_PROMPT_TOKENS: instruções
+        inteiras, respostas e contexto recuperado (ou cards de normas) cortados.
+        """
+        section_title = section_info.get('section', '').upper()
+        is_requirements = "REQUISITO" in section_title
+        is_legal = "NORMA" in section_title and "LEGAL" in section_title
+        shares = self.SECTION_PROMPT_SHARES['context' if is_requirements else 'legal' if is_legal else 'answers']
+        builder = PromptBuilder('section_generation', self._section_route(section_info).model,
+                                SECTION_PROMPT_TOKENS, shares)
+        
+        # Informações específicas da seção, acrescentadas ao final do prompt
+        section_suffix = ""
+        if section_info.get('subsections'):
+            section_suffix += f"\n\nSUBSEÇÕES OBRIGATÓRIAS:\n"
+            for subsection in section_info['subsections']:
+                section_suffix += f"- {subsection}\n"
+        
+        if section_info.get('requires_table'):
+            section_suffix += "\n\nIMPORTANTE: Esta seção deve incluir uma tabela formatada quando apropriado."
+        context_header = ""
+        if is_requirements:
+            context_header = "\n\nCONTEXTO RECUPERADO:\n"
+        elif is_legal:
+            context_header = "\n\nNORMAS LEGAIS SUGERIDAS (fonte: LexML):\n"
+        builder.instructions(self.SECTION_SYSTEM_PROMPT, section_suffix, context_header)
+        
+        # Gerar prompt dinâmico baseado na base de conhecimento (apenas as respostas que a seção consome)
+        dynamic_prompt = self.prompt_generator.generate_dynamic_prompt(
+            self._section_session_data(section_info, session_data), 
+            section_info,
+            builder=builder
+        )
+        
+        # Integração do fluxo de consulta interna para seções específicas
+        # Para seção "REQUISITO" - buscar contexto interno
+        if is_requirements:
+            objective_slug = self._extract_objective_slug(session_data)
+            if objective_slug:
+                # Extrair pergunta do usuário das respostas da sessão
+                user_query = self._extract_user_query_for_requirements(session_data)
+                if user_query:
                     try:
-                        # Sugerir normas federais
-                        cands = suggest_federal(objective_slug, k=6)
-                        if cands:
+                        # Buscar contexto recuperado
+                        ctx = search_requirements(objective_slug, user_query, k=5)
+                        if ctx:
                             self.logger.info("consulta interna encontrada")
-                            # Verificar normas via LexML e preparar cards
-                            verified = [resolve_lexml(c) for c in cands]
-                            cards = [summarize_for_user(v) for v in verified if v]
-                            
-                            # Adicionar cards ao contexto para apresentação ao usuário
-                            if cards:
-                                cards_text = self._build_legal_cards_text(cards)
-                                dynamic_prompt += f"\n\nNORMAS LEGAIS SUGERIDAS (fonte: LexML):\n{cards_text}"
+                            # Montar contexto recuperado no saldo do orçamento
+                            context_text = self._build_context_text(ctx, builder)
+                            if context_text:
+                                dynamic_prompt += f"{context_header}{context_text}"
                     except Exception as e:
-                        self.logger.warning(f"Erro na busca de normas legais: {str(e)}")
-            
-            # Adicionar informações específicas da seção
-            if section_info.get('subsections'):
-                dynamic_prompt += f"\n\nSUBSEÇÕES OBRIGATÓRIAS:\n"
-                for subsection in section_info['subsections']:
-                    dynamic_prompt += f"- {subsection}\n"
-            
-            if section_info.get('requires_table'):
-                dynamic_prompt += "\n\nIMPORTANTE: Esta seção deve incluir uma tabela formatada quando apropriado."
-            
-            # Fazer chamada à API
-            response = self.client.chat.completions.create(
-                model="ft:gpt-4.1-mini-2025-04-14:az-tecnologia-ltda:etp-treino:CBXrnlhG",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Você é um especialista em elaboração de Estudos Técnicos Preliminares conforme a Lei 14.133/21. 
-                        Gere conteúdo técnico, detalhado, formal e em total conformidade com a legislação de licitações e contratos públicos.
-                        
-                        DIRETRIZES PARA CONTEÚDO EXTENSO E ESTILIZADO:
-                        - Produza texto substancial com parágrafos bem desenvolvidos de 4-7 linhas cada
-                        - Inclua análises técnicas aprofundadas com fundamentação jurídica específica
-                        - Desenvolva argumentações completas com contextualização adequada
-                        - Use linguagem técnica formal própria de documentos administrativos oficiais
-                        - Apresente detalhamentos metodológicos e critérios técnicos específicos
-                        - Incorpore aspectos legais, administrativos, técnicos e operacionais relevantes
-                        - Estruture o conteúdo com progressão lógica e coerência argumentativa
-                        
-                        Use os exemplos fornecidos como referência, mas adapte ao contexto específico da contratação atual.
-                        Mantenha sempre linguagem administrativa apropriada e estrutura técnica detalhada."""
-                    },
-                    {
-                        "role": "user",
-                        "content": dynamic_prompt
-                    }
-                ],
-                max_tokens=4000,
-                temperature=0.2
-            )
-            
-            section_content = response.choices[0].message.content
-            
-            # Pós-processamento
-            section_content = self._post_process_section_content(section_content, section_info)
-            
-            return section_content
+                        self.logger.warning(f"Erro na busca de requisitos: {str(e)}")
+        
+        # Para seção "NORMA LEGAL" - sugerir normas federais
+        elif is_legal:
+            objective_slug = self._extract_objective_slug(session_data)
+            if objective_slug:
+                try:
+                    # Cards pré-buscados na trava da necessidade ou, sem eles, normas
+                    # federais sugeridas verificadas via LexML agora
+                    cards = get_session_prefetch().result(
+                        session_data.get('session_id'), KIND_LEGAL_NORMS, objective_slug
+                    )
+                    if cards is None:
+                        cards = build_legal_cards(suggest_federal(objective_slug, k=6), self.llm)
+                    
+                    # Adicionar cards ao contexto para apresentação ao usuário
+                    if cards:
+                        self.logger.info("consulta interna encontrada")
+                        cards_text = self._build_legal_cards_text(cards, builder)
+                        if cards_text:
+                            dynamic_prompt += f"{context_header}{cards_text}"
+                except Exception as e:
+                    self.logger.warning(f"Erro na busca de normas legais: {str(e)}")
+        
+        dynamic_prompt += section_suffix
+        builder.finish()
+        
+        return [
+            {"role": "system", "content": self.SECTION_SYSTEM_PROMPT},
+            {"role": "user", "content": dynamic_prompt}
+        ]
+    
+    def _generate_section_dynamic(self, section_info: Dict, session_data: Dict, 
+                                context_data: Dict = None, is_preview: bool = False) -> str:
+        """Gera uma seção específica usando prompt dinâmico"""
+        try:
+            messages = self._build_section_messages(section_info, session_data)
+            return self._complete_section(section_info, messages)
             
         except Exception as e:
-            # Fallback em caso de erro com mensagem amigável
-            error_msg = "Erro ao gerar esta seção. Tente novamente ou verifique o modelo configurado."
-            if "rate limit" in str(e).lower():
-                error_msg = "Limite de requisições atingido. Aguarde alguns minutos e tente novamente."
-            elif "api key" in str(e).lower():
-                error_msg = "Problema com a chave da API. Verifique a configuração do modelo."
-            elif "model" in str(e).lower():
-                error_msg = "Modelo não encontrado. Verifique se o modelo fine-tuned está disponível."
-            
-            return f"{section_info['section']}\n\n[{error_msg}]\n\nEsta seção deve ser desenvolvida manualmente conforme a Lei 14.133/21."
+            return self._section_error_content(section_info, e)
+    
+    def _complete_section(self, section_info: Dict, messages: List[Dict],
+                          selection: Optional[RouteSelection] = None, cache: bool = True) -> str:
+        """Chama o modelo da rota da seção e pós-processa o conteúdo (cache=False ignora o cache de respostas)"""
+        if selection is None:
+            selection = self.router.select(int(section_info['section'].split('.')[0]))
+        
+        # Fazer chamada à API
+        started = time.perf_counter()
+        response = self.llm.chat(
+            'section_generation',
+            model=selection.model,
+            messages=messages,
+            max_tokens=selection.route.max_tokens,
+            temperature=selection.route.temperature,
+            cache=cache
+        )
+        self.router.observe(selection, time.perf_counter() - started)
+        self._call_usage.tokens = _total_tokens(getattr(response, 'usage', None))
+        
+        section_content = response.choices[0].message.content
+        
+        # Pós-processamento
+        return self._post_process_section_content(section_content, section_info)
+    
+    def _section_error_content(self, section_info: Dict, error: Exception) -> str:
+        """Texto de fallback com mensagem amigável para uma seção que falhou"""
+        error_msg = "Erro ao gerar esta seção. Tente novamente ou verifique o modelo configurado."
+        if "rate limit" in str(error).lower():
+            error_msg = "Limite de requisições atingido. Aguarde alguns minutos e tente novamente."
+        elif "api key" in str(error).lower():
+            error_msg = "Problema com a chave da API. Verifique a configuração do modelo."
+        elif "model" in str(error).lower():
+            error_msg = "Modelo não encontrado. Verifique se o modelo fine-tuned está disponível."
+        
+        return f"{section_info['section']}\n\n[{error_msg}]\n\nEsta seção deve ser desenvolvida manualmente conforme a Lei 14.133/21."
     
     def _post_process_section_content(self, content: str, section_info: Dict) -> str:
         """Pós-processa o conteúdo da seção"""
@@ -373,38 +770,12 @@ class DynamicEtpGenerator:
         
         return "requisitos da contratação"
     
-    def _build_context_text(self, context_results: List[Dict], max_words: int = 1200) -> str:
-        """Constrói texto de contexto limitado por número de palavras"""
-        context_parts = []
-        word_count = 0
-        
-        for result in context_results:
-            content = result.get('content', '')
-            section_title = result.get('section_title', '')
-            
-            # Adicionar título da seção se disponível
-            if section_title:
-                part = f"[{section_title}]: {content}"
-            else:
-                part = content
-            
-            # Contar palavras
-            part_words = len(part.split())
-            if word_count + part_words <= max_words:
-                context_parts.append(part)
-                word_count += part_words
-            else:
-                # Adicionar parte truncada para não exceder limite
-                remaining_words = max_words - word_count
-                if remaining_words > 10:  # Só adicionar se houver espaço suficiente
-                    truncated = ' '.join(part.split()[:remaining_words])
-                    context_parts.append(truncated + "...")
-                break
-        
-        return '\n\n'.join(context_parts)
+    def _build_context_text(self, context_results: List[Dict], builder: PromptBuilder) -> str:
+        """Constrói texto de contexto por relevância, limitado ao orçamento de tokens da parte 'context'"""
+        return builder.context('context', context_results)
     
-    def _build_legal_cards_text(self, cards: List[Dict]) -> str:
-        """Constrói texto formatado dos cards de normas legais"""
+    def _build_legal_cards_text(self, cards: List[Dict], builder: Optional[PromptBuilder] = None) -> str:
+        """Constrói texto formatado dos cards de normas legais (na ordem recebida, até o orçamento da parte 'legal')"""
         cards_parts = []
         
         for i, card in enumerate(cards, 1):
@@ -424,6 +795,8 @@ class DynamicEtpGenerator:
             
             cards_parts.append(card_text)
         
+        if builder is not None:
+            cards_parts = builder.fit_items('legal', cards_parts)
         return '\n\n'.join(cards_parts)
     
     def _generate_document_header(self) -> str:
@@ -445,67 +818,112 @@ O objetivo principal é identificar a necessidade e identificar a melhor soluç
     def generate_section_adjustment(self, section_content: str, feedback: str, section_info: Dict) -> str:
         """Ajusta uma seção específica com base no feedback usando contexto dinâmico"""
         try:
-            # Buscar exemplos relevantes para a seção
-            session_data = {'answers': {}}  # Dados básicos para busca de exemplos
-            relevant_examples = self.prompt_generator._find_relevant_examples(
-                section_info['section'], 
-                session_data
-            )
-            
-            # Construir contexto para ajuste
-            examples_context = ""
-            if relevant_examples:
-                examples_context = "EXEMPLOS DE REFERÊNCIA:\n"
-                for example in relevant_examples[:2]:
-                    examples_context += f"- {example['content'][:300]}...\n"
-            
-            prompt = f"""
-            Ajuste a seguinte seção de ETP com base no feedback fornecido:
+            return self._adjust_section(section_content, feedback, section_info)
+        except Exception as e:
+            return section_content  # Retornar original em caso de erro
+    
+    def regenerate_section(self, section_number: int, session_data: Dict, current_content: Optional[str] = None,
+                           feedback: Optional[str] = None, fingerprint: Optional[str] = None) -> Dict:
+        """
+        Regenera uma única seção com uma chamada ao modelo (ver _section_result),
+        sem passar pelo cache de respostas: as mensagens são as da geração original.
 
-            SEÇÃO ATUAL:
-            {section_content}
+        Com feedback, ajusta o conteúdo atual e mantém o fingerprint gravado (as entradas
+        da seção não mudaram); sem feedback, refaz a seção a partir das respostas, mesmo
+        com fingerprint inalterado. Levanta exceção em caso de falha: quem chama
+        preserva o conteúdo anterior.
+        """
+        section_key = str(section_number)
+        section_info = next(
+            (info for key, info in self._sections_to_generate(self._new_etp_document()) if key == section_key),
+            None
+        )
+        if section_info is None:
+            raise ValueError(f"Seção {section_number} não existe no template")
+        
+        self._call_usage.tokens = 0
+        started = time.perf_counter()
+        if feedback:
+            # Conteúdo gravado não tem o título; o ajuste recebe a seção completa
+            section_content = f"{section_info['section']}\n\n{current_content or ''}"
+            content = self._adjust_section(section_content, feedback, section_info, cache=False)
+            content = self._post_process_section_content(content, section_info)
+            result = self._section_result(section_key, content, fingerprint, tokens=self._call_usage.tokens,
+                                          latency_ms=int((time.perf_counter() - started) * 1000))
+            result['model'] = self.SECTION_MODEL
+            return result
+        
+        messages = self._build_section_messages(section_info, session_data)
+        fingerprint = self._section_fingerprint(messages, self._section_route(section_info))
+        selection = self.router.select(section_number)
+        content = self._complete_section(section_info, messages, selection, cache=False)
+        return self._section_result(section_key, content, fingerprint, selection=selection,
+                                    tokens=self._call_usage.tokens,
+                                    latency_ms=int((time.perf_counter() - started) * 1000))
+    
+    def _adjust_section(self, section_content: str, feedback: str, section_info: Dict, cache: bool = True) -> str:
+        """Chamada de ajuste da seção; levanta exceção em caso de falha"""
+        # Buscar exemplos relevantes para a seção
+        session_data = {'answers': {}}  # Dados básicos para busca de exemplos
+        relevant_examples = self.prompt_generator._find_relevant_examples(
+            section_info['section'], 
+            session_data
+        )
+        
+        # Construir contexto para ajuste
+        examples_context = ""
+        if relevant_examples:
+            examples_context = "EXEMPLOS DE REFERÊNCIA:\n"
+            for example in relevant_examples[:2]:
+                examples_context += f"- {example['content'][:300]}...\n"
+        
+        prompt = f"""
+        Ajuste a seguinte seção de ETP com base no feedback fornecido:
 
-            FEEDBACK DO USUÁRIO:
-            {feedback}
+        SEÇÃO ATUAL:
+        {section_content}
 
-            {examples_context}
+        FEEDBACK DO USUÁRIO:
+        {feedback}
 
-            INFORMAÇÕES DA SEÇÃO:
-            - Título: {section_info['section']}
-            - Descrição: {section_info['description']}
-            - Parágrafos mínimos: {section_info.get('min_paragraphs', 8)}
+        {examples_context}
 
-            INSTRUÇÕES:
-            1. Mantenha a estrutura e formatação original
-            2. Aplique os ajustes solicitados no feedback
-            3. Preserve a conformidade com a Lei 14.133/21
-            4. Mantenha linguagem técnica e formal
-            5. Use os exemplos como referência para estilo e conteúdo
-            6. Garanta coerência com o restante do documento
+        INFORMAÇÕES DA SEÇÃO:
+        - Título: {section_info['section']}
+        - Descrição: {section_info['description']}
+        - Parágrafos mínimos: {section_info.get('min_paragraphs', 8)}
 
-            Retorne a seção ajustada:
-            """
-            
-            response = self.client.chat.completions.create(
-                model="ft:gpt-4.1-mini-2025-04-14:az-tecnologia-ltda:etp-treino:CBXrnlhG",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Você é um especialista em revisão de documentos de ETP. Faça ajustes precisos mantendo qualidade técnica e conformidade legal."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=2000,
-                temperature=0.2
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            return section_content  # Retornar original em caso de erro
+        INSTRUÇÕES:
+        1. Mantenha a estrutura e formatação original
+        2. Aplique os ajustes solicitados no feedback
+        3. Preserve a conformidade com a Lei 14.133/21
+        4. Mantenha linguagem técnica e formal
+        5. Use os exemplos como referência para estilo e conteúdo
+        6. Garanta coerência com o restante do documento
+
+        Retorne a seção ajustada:
+        """
+        
+        response = self.llm.chat(
+            'section_adjustment',
+            model=self.SECTION_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Você é um especialista em revisão de documentos de ETP. Faça ajustes precisos mantendo qualidade técnica e conformidade legal."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            max_tokens=2000,
+            temperature=0.2,
+            cache=cache
+        )
+        self._call_usage.tokens = _total_tokens(getattr(response, 'usage', None))
+        
+        return response.choices[0].message.content
     
     def get_knowledge_base_info(self) -> Dict:
         """Retorna informações sobre a base de conhecimento carregada"""
@@ -515,8 +933,13 @@ O objetivo principal é identificar a necessidade e identificar a melhor soluç
         """Recarrega a base de conhecimento"""
         return self.prompt_generator.refresh_knowledge_base()
     
-    def validate_etp_completeness(self, etp_content: str) -> Dict:
-        """Valida se o ETP está completo conforme a estrutura obrigatória"""
+    def validate_etp_completeness(self, etp_content: str, sections: Optional[List[Dict]] = None) -> Dict:
+        """
+        Valida se o ETP está completo conforme a estrutura obrigatória. Com as seções
+        gravadas (section/content, ver etp_sections.load_sections) não depende do texto.
+        """
+        if sections is not None:
+            return self._validate_sections(sections)
         validation_result = {
             'is_complete': True,
             'missing_sections': [],
@@ -550,4 +973,32 @@ O objetivo principal é identificar a necessidade e identificar a melhor soluç
         ) * 100
         
         return validation_result
-
+    
+    def _validate_sections(self, sections: List[Dict]) -> Dict:
+        """Completude a partir das seções gravadas: seção presente e com conteúdo"""
+        contents = {int(section['section']): section.get('content') or '' for section in sections}
+        validation_result = {
+            'is_complete': True,
+            'missing_sections': [],
+            'section_analysis': {},
+            'total_sections': len(self.etp_structure),
+            'found_sections': 0
+        }
+        for section_info in self.etp_structure:
+            section_title = section_info['section']
+            content = contents.get(int(section_title.split('.')[0]), '').strip()
+            if content:
+                validation_result['found_sections'] += 1
+            else:
+                validation_result['is_complete'] = False
+                validation_result['missing_sections'].append(section_title)
+            validation_result['section_analysis'][section_title] = {
+                'found': bool(content),
+                'estimated_length': len(content)
+            }
+        
+        validation_result['completeness_percentage'] = (
+            validation_result['found_sections'] / validation_result['total_sections']
+        ) * 100
+        
+        return validation_result
@@ -0,0 +1,245 @@
+"""
+Montagem de prompts com orçamento de tokens.
+
+O PromptBuilder conta os tokens do modelo de destino (tiktoken, ou estimativa
+por caracteres quando indisponível) e distribui um total entre as partes do
+prompt: instruções (nunca cortadas), respostas do usuário, contexto recuperado
+(RAG) e cards de normas legais. Cada parte recebe a fração `shares` do saldo
+restante, de modo que a sobra de uma parte passa para as seguintes. O contexto
+é compactado (sem ids e scores, sem duplicatas) e entra por ordem de
+relevância até o orçamento.
+
+Ao final, finish() registra uma linha de log estruturada com os tokens
+economizados em relação à montagem anterior (JSON bruto / texto integral).
+"""
+
+import os
+import re
+import json
+import math
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    from prometheus_client import Counter
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Orçamentos de entrada (tokens) por tipo de chamada
+SECTION_PROMPT_TOKENS = int(os.getenv('PROMPT_BUDGET_SECTION_TOKENS', '6000'))
+# Contexto recuperado nas chamadas de conversa (requisitos, alternativas)
+CONVERSATION_CONTEXT_TOKENS = int(os.getenv('PROMPT_BUDGET_CONVERSATION_TOKENS', '1200'))
+
+# Sem tiktoken: texto em português fica perto de 3,5 caracteres por token
+# (estimativa conservadora, superestima levemente)
+CHARS_PER_TOKEN = 3.5
+# Trecho que não cabe inteiro só entra truncado se sobrar pelo menos isso
+MIN_PART_TOKENS = 40
+ELLIPSIS = '...'
+
+if PROMETHEUS_AVAILABLE:
+    PROMPT_TOKENS_SAVED = Counter(
+        "llm_prompt_tokens_saved_total",
+        "Tokens de prompt economizados pelo orçamento de montagem",
+        ["call_site", "part"]
+    )
+else:
+    PROMPT_TOKENS_SAVED = None
+
+
+@lru_cache(maxsize=32)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    # Modelos fine-tuned: ft:<modelo base>:<org>:...
+    base = model.split(':')[1] if model.startswith('ft:') else model
+    try:
+        return tiktoken.encoding_for_model(base)
+    except KeyError:
+        name = 'o200k_base' if base.startswith(('gpt-4o', 'gpt-4.1', 'o1', 'o3', 'o4')) else 'cl100k_base'
+        return tiktoken.get_encoding(name)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Tokens do texto no modelo (estimativa quando tiktoken não está instalado)"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Corta o texto em até max_tokens (incluindo as reticências), no limite de palavra"""
+    if max_tokens <= 0:
+        return ''
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _encoding(model)
+    if encoding is None:
+        cut = text[:int((max_tokens - 1) * CHARS_PER_TOKEN)]
+    else:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens - 1])
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip() + ELLIPSIS
+
+
+def compact_results(results: Iterable[Dict]) -> List[str]:
+    """
+    Trechos recuperados em texto enxuto ("[título]: conteúdo"), em ordem de
+    relevância, sem ids/scores, espaços repetidos nem conteúdo duplicado.
+    """
+    scored = []
+    for position, result in enumerate(results or []):
+        if isinstance(result, str):
+            result = {'content': result}
+        content = re.sub(r'\s+', ' ', str(result.get('content') or result.get('text') or '')).strip()
+        if not content:
+            continue
+        score = result.get('hybrid_score', result.get('score'))
+        scored.append((-(score or 0.0), position, result.get('section_title') or '', content))
+    # Sem score, mantém a ordem recebida (já vem ordenada pela busca)
+    scored.sort()
+
+    parts, seen = [], set()
+    for _, _, title, content in scored:
+        key = content.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        parts.append(f"[{title}]: {content}" if title else content)
+    return parts
+
+
+class PromptBuilder:
+    """Distribui um orçamento de tokens entre as partes de um prompt"""
+
+    def __init__(self, call_site: str, model: str, total_tokens: int,
+                 shares: Optional[Dict[str, float]] = None):
+        self.call_site = call_site
+        self.model = model
+        self.total_tokens = total_tokens
+        self.shares = dict(shares or {'context': 1.0})
+        self.used = 0
+        # parte -> {'raw': tokens da montagem integral, 'used': tokens enviados}
+        self.parts: Dict[str, Dict[str, int]] = {}
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def _record(self, part: str, raw: int, used: int):
+        stats = self.parts.setdefault(part, {'raw': 0, 'used': 0})
+        stats['raw'] += raw
+        stats['used'] += used
+        self.used += used
+
+    def instructions(self, *texts: str) -> int:
+        """Contabiliza texto fixo (instruções, formato de saída); nunca é cortado"""
+        tokens = sum(self.count(text) for text in texts if text)
+        self._record('instructions', tokens, tokens)
+        return tokens
+
+    def budget(self, part: str) -> int:
+        """Fração do saldo destinada à parte, entre as partes ainda não montadas"""
+        available = max(0, self.total_tokens - self.used)
+        pending = sum(share for name, share in self.shares.items() if name not in self.parts or name == part)
+        share = self.shares.get(part, 0.0)
+        if share <= 0 or pending <= 0:
+            return 0
+        return int(available * share / pending)
+
+    def fit_items(self, part: str, items: List[str], raw_tokens: Optional[int] = None,
+                  separator: str = '\n\n') -> List[str]:
+        """
+        Itens (já em ordem de prioridade) que cabem no orçamento da parte; o
+        primeiro que não cabe entra truncado se sobrar espaço útil, e a
+        montagem para aí.
+        """
+        budget = self.budget(part)
+        separator_tokens = self.count(separator) if separator.strip() else 0
+        tokens = [self.count(item) for item in items]
+        kept, used = [], 0
+        for item, item_tokens in zip(items, tokens):
+            if used + item_tokens <= budget:
+                kept.append(item)
+                used += item_tokens + separator_tokens
+                continue
+            remaining = budget - used
+            if remaining >= MIN_PART_TOKENS:
+                item = truncate_tokens(item, remaining, self.model)
+                kept.append(item)
+                used += self.count(item)
+            break
+        if raw_tokens is None:
+            raw_tokens = sum(tokens) + separator_tokens * len(tokens)
+        self._record(part, raw_tokens, used)
+        return kept
+
+    def fit_answers(self, part: str, answers: List[str]) -> List[str]:
+        """
+        Respostas do usuário no orçamento da parte: as curtas entram inteiras e
+        o saldo é dividido igualmente entre as longas, que são truncadas.
+        """
+        budget = self.budget(part)
+        tokens = [self.count(answer) for answer in answers]
+        limits = [0] * len(answers)
+        remaining, pending = budget, sorted(range(len(answers)), key=lambda i: tokens[i])
+        while pending:
+            fair_share = remaining // len(pending)
+            index = pending.pop(0)
+            limits[index] = min(tokens[index], fair_share)
+            remaining -= limits[index]
+        fitted = [
+            answer if limit >= tokens[i] else truncate_tokens(answer, limit, self.model)
+            for i, (answer, limit) in enumerate(zip(answers, limits))
+        ]
+        self._record(part, sum(tokens), sum(self.count(answer) for answer in fitted))
+        return [answer for answer in fitted if answer]
+
+    def context(self, part: str, results: List[Dict]) -> str:
+        """
+        Trechos do RAG compactados e cortados por relevância. A economia é
+        medida contra o JSON bruto dos resultados, como era enviado antes.
+        """
+        raw = self.count(json.dumps(results, indent=2, ensure_ascii=False, default=str)) if results else 0
+        return '\n\n'.join(self.fit_items(part, compact_results(results), raw_tokens=raw))
+
+    def finish(self) -> Dict:
+        """Registra tokens enviados e economizados por parte; retorna os campos do log"""
+        raw = sum(stats['raw'] for stats in self.parts.values())
+        fields = {
+            'event': 'prompt_budget',
+            'call_site': self.call_site,
+            'model': self.model,
+            'budget_tokens': self.total_tokens,
+            'prompt_tokens': self.used,
+            'tokens_saved': max(0, raw - self.used),
+            'parts': {part: dict(stats) for part, stats in self.parts.items()},
+        }
+        if PROMETHEUS_AVAILABLE:
+            for part, stats in self.parts.items():
+                saved = stats['raw'] - stats['used']
+                if saved > 0:
+                    PROMPT_TOKENS_SAVED.labels(self.call_site, part).inc(saved)
+        logger.info(json.dumps(fields, ensure_ascii=False))
+        return fields
+
+
+def budget_context(call_site: str, model: str, results: List[Dict],
+                   max_tokens: Optional[int] = None) -> str:
+    """Trechos do RAG para prompts de conversa, limitados a max_tokens"""
+    builder = PromptBuilder(call_site, model, max_tokens or CONVERSATION_CONTEXT_TOKENS)
+    context = builder.context('context', results)
+    builder.finish()
+    return context or '(nenhum exemplo encontrado)'
@@ -3,8 +3,20 @@ PASSO 3 - Interpretador de comandos para revisão de requisitos
 Suporte robusto para variações em português brasileiro
 """
 
-import re
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any
+
+from domain.services.intent_router import (
+    DECISION_CLARIFY, DECISION_LOCAL, INTENT_ADD, INTENT_CHANGE_NEED, INTENT_CONFIRM, INTENT_EDIT, INTENT_KEEP_ONLY,
+    INTENT_REMOVE, INTENT_UNCLEAR, ROUTE_COMMAND, is_confident, record_decision, route_command
+)
+
+_AMBIGUOUS_MESSAGE = 'Não tenho certeza do que fazer. Pode confirmar? Por exemplo: "remover o 2", "ajustar o último"'
+
+_UNCLEAR_MESSAGES = {
+    INTENT_REMOVE: 'Não foi possível identificar quais requisitos remover',
+    INTENT_KEEP_ONLY: 'Não foi possível identificar quais requisitos manter',
+    INTENT_EDIT: 'Não foi possível identificar quais requisitos alterar',
+}
 
 
 def parse_update_command(user_message: str, current_requirements: List[Dict]) -> Dict[str, Any]:
@@ -14,218 +26,60 @@ def parse_update_command(user_message: str, current_requirements: List[Dict]) ->
     - intent: 'remove', 'edit', 'keep_only', 'add', 'confirm', 'restart_necessity', 'unclear'
     - items: list of requirement IDs or content
     - message: explanation of what was done
+    - confidence: router confidence (0-1)
     """
     if not user_message or not isinstance(user_message, str):
-        return {'intent': 'unclear', 'items': [], 'message': 'Mensagem vazia ou inválida'}
-    
-    message_lower = user_message.lower().strip()
-    
-    # PASSO 4: Check for explicit necessity restart keywords
-    restart_keywords = [
-        r'nova\s*necessidade',
-        r'trocar\s*a\s*necessidade', 
-        r'na\s*verdade\s*a\s*necessidade\s*é',
-        r'mudou\s*a\s*necessidade',
-        r'preciso\s*trocar\s*a\s*necessidade'
-    ]
-    
-    for keyword in restart_keywords:
-        if re.search(keyword, message_lower):
-            return {
-                'intent': 'restart_necessity',
-                'items': [],
-                'message': 'Detectada solicitação para reiniciar necessidade'
-            }
-    
-    # Extract requirement numbers/indices
-    req_indices = extract_requirement_indices(user_message, current_requirements)
-    
-    # Determine action type based on verbs and patterns
-    intent = determine_intent(message_lower, req_indices)
-    
-    if intent == 'remove':
-        if req_indices:
-            return {
-                'intent': 'remove',
-                'items': req_indices,
-                'message': f'Removidos requisitos: {", ".join(req_indices)}'
-            }
-        else:
-            return {'intent': 'unclear', 'items': [], 'message': 'Não foi possível identificar quais requisitos remover'}
-    
-    elif intent == 'keep_only':
-        if req_indices:
-            return {
-                'intent': 'keep_only',
-                'items': req_indices,
-                'message': f'Mantidos apenas requisitos: {", ".join(req_indices)}'
-            }
-        else:
-            return {'intent': 'unclear', 'items': [], 'message': 'Não foi possível identificar quais requisitos manter'}
-    
-    elif intent == 'edit':
-        if req_indices:
-            # Check for explicit new text after ":"
-            new_text = extract_new_text_after_colon(user_message)
-            return {
-                'intent': 'edit',
-                'items': req_indices,
-                'new_text': new_text,
-                'message': f'Requisitos para edição: {", ".join(req_indices)}'
-            }
-        else:
-            return {'intent': 'unclear', 'items': [], 'message': 'Não foi possível identificar quais requisitos alterar'}
-    
-    elif intent == 'add':
-        # Extract the content after the add command
-        add_content = extract_add_content(user_message, message_lower)
-        return {
-            'intent': 'add',
-            'items': [add_content],
-            'message': f'Novo requisito adicionado: {add_content}'
-        }
-    
-    elif intent == 'confirm':
-        return {
-            'intent': 'confirm',
-            'items': [],
-            'message': 'Requisitos confirmados'
-        }
-    
-    # If nothing clear was detected
+        return {'intent': 'unclear', 'items': [], 'message': 'Mensagem vazia ou inválida', 'confidence': 0.0}
+
+    decision = route_command(user_message, len(current_requirements))
+    confident = decision.intent != INTENT_UNCLEAR and is_confident(decision.confidence)
+    record_decision(ROUTE_COMMAND, DECISION_LOCAL if confident else DECISION_CLARIFY)
+    ids = requirement_ids(decision.indices, current_requirements)
+
+    if decision.intent != INTENT_UNCLEAR and not confident:
+        # Ambíguo ("e o 5?", verbo negado, comandos misturados): não aplica, pede esclarecimento
+        return {'intent': 'unclear', 'items': [], 'confidence': decision.confidence,
+                'message': _AMBIGUOUS_MESSAGE}
+
+    if decision.intent == INTENT_CHANGE_NEED:
+        return {'intent': 'restart_necessity', 'items': [], 'confidence': decision.confidence,
+                'message': 'Detectada solicitação para reiniciar necessidade'}
+
+    if decision.intent == INTENT_REMOVE:
+        return {'intent': 'remove', 'items': ids, 'confidence': decision.confidence,
+                'message': f'Removidos requisitos: {", ".join(ids)}'}
+
+    if decision.intent == INTENT_KEEP_ONLY:
+        return {'intent': 'keep_only', 'items': ids, 'confidence': decision.confidence,
+                'message': f'Mantidos apenas requisitos: {", ".join(ids)}'}
+
+    if decision.intent == INTENT_EDIT:
+        return {'intent': 'edit', 'items': ids, 'new_text': decision.new_text or '',
+                'confidence': decision.confidence, 'message': f'Requisitos para edição: {", ".join(ids)}'}
+
+    if decision.intent == INTENT_ADD:
+        add_content = decision.new_text or user_message.strip()
+        return {'intent': 'add', 'items': [add_content], 'confidence': decision.confidence,
+                'message': f'Novo requisito adicionado: {add_content}'}
+
+    if decision.intent == INTENT_CONFIRM:
+        return {'intent': 'confirm', 'items': [], 'confidence': decision.confidence,
+                'message': 'Requisitos confirmados'}
+
+    # Verbo reconhecido sem requisito válido, ou nada reconhecido
     return {
         'intent': 'unclear',
         'items': [],
-        'message': 'Comando não reconhecido. Use: "ajustar 5", "remover 2 e 4", "trocar 3: <novo texto>"'
+        'confidence': decision.confidence,
+        'message': _UNCLEAR_MESSAGES.get(
+            decision.unresolved, 'Comando não reconhecido. Use: "ajustar 5", "remover 2 e 4", "trocar 3: <novo texto>"'
+        )
     }
 
 
-def extract_requirement_indices(user_message: str, current_requirements: List[Dict]) -> List[str]:
-    """Extract requirement indices from user message"""
-    req_numbers = []
-    message_lower = user_message.lower()
-    
-    # Look for patterns like "R1", "R2", etc.
-    r_patterns = re.findall(r'[rR](\d+)', user_message)
-    req_numbers.extend([str(n) for n in r_patterns])
-    
-    # Look for standalone numbers that might refer to requirements
-    number_patterns = re.findall(r'\b(\d+)\b', user_message)
-    for n in number_patterns:
-        if int(n) <= len(current_requirements):
-            req_id = str(n)
-            if req_id not in req_numbers:
-                req_numbers.append(req_id)
-    
-    # Handle ranges like "2-4", "2 a 4", "do 2 ao 4", "de 2 até 4"
-    range_patterns = re.findall(r'(\d+)\s*(?:[-a]|ao|até|ate)\s*(\d+)', user_message.lower())
-    for start, end in range_patterns:
-        start_num, end_num = int(start), int(end)
-        if start_num <= end_num <= len(current_requirements):
-            for i in range(start_num, end_num + 1):
-                req_id = f"R{i}"
-                if req_id not in req_numbers:
-                    req_numbers.append(req_id)
-    
-    # Handle lists like "1, 3 e 5" or "1,3,5"
-    list_patterns = re.findall(r'(\d+)\s*[,e]\s*', user_message.lower())
-    for n in list_patterns:
-        if int(n) <= len(current_requirements):
-            req_id = f"R{n}"
-            if req_id not in req_numbers:
-                req_numbers.append(req_id)
-    
-    # Handle positional references
-    if any(word in message_lower for word in ['último', 'ultima', 'ultimo']):
-        if current_requirements:
-            last_req = current_requirements[-1]
-            req_id = last_req.get('id', str(len(current_requirements)))
-            if req_id not in req_numbers:
-                req_numbers.append(req_id)
-    
-    if any(word in message_lower for word in ['primeiro', 'primeira']):
-        if current_requirements:
-            first_req = current_requirements[0]
-            req_id = first_req.get('id', '1')
-            if req_id not in req_numbers:
-                req_numbers.append(req_id)
-    
-    if any(word in message_lower for word in ['penúltimo', 'penultima', 'penultimo']):
-        if len(current_requirements) > 1:
-            penult_req = current_requirements[-2]
-            req_id = penult_req.get('id', str(len(current_requirements)-1))
-            if req_id not in req_numbers:
-                req_numbers.append(req_id)
-    
-    return req_numbers
-
-
-def determine_intent(message_lower: str, req_indices: List[str]) -> str:
-    """Determine the user's intent based on the message"""
-    
-    # Remove patterns (ampliado com sinônimos)
-    remove_patterns = [
-        'remover', 'tirar', 'excluir', 'deletar', 'retirar', 'apagar',
-        'apaga', 'exclui', 'descarta', 'descartar', 'eliminar', 'elimina'
-    ]
-    if any(word in message_lower for word in remove_patterns):
-        return 'remove'
-    
-    # Keep only patterns (ampliado)
-    keep_only_patterns = [
-        'manter apenas', 'só manter', 'manter só', 'manter somente', 'apenas',
-        'somente', 'mantém', 'manter', 'ficar apenas', 'ficar só', 'deixar apenas',
-        'deixar só', 'quero apenas', 'quero só', 'quero somente'
-    ]
-    if any(pattern in message_lower for pattern in keep_only_patterns):
-        # Verificar se há números específicos (se não, não é keep_only)
-        if req_indices:
-            return 'keep_only'
-    
-    # Edit patterns (ampliado)
-    edit_patterns = [
-        'alterar', 'modificar', 'trocar', 'mudar', 'editar', 'ajustar', 'ajuste',
-        'refaz', 'refazer', 'substitui', 'substituir', 'troca', 'muda', 'altera'
-    ]
-    if any(word in message_lower for word in edit_patterns):
-        return 'edit'
-    
-    # Add patterns
-    add_patterns = ['adicionar', 'incluir', 'acrescentar', 'novo requisito', 'mais um']
-    if any(pattern in message_lower for pattern in add_patterns):
-        return 'add'
-    
-    # Confirmation patterns
-    confirm_patterns = [
-        'confirmar', 'confirmo', 'manter', 'ok', 'está bom', 'perfeito',
-        'concordo', 'aceito', 'pode ser', 'sim', 'correto', 'certo',
-        'pode manter', 'mantenha', 'assim está bom'
-    ]
-    if any(pattern in message_lower for pattern in confirm_patterns):
-        return 'confirm'
-    
-    return 'unclear'
-
-
-def extract_new_text_after_colon(user_message: str) -> str:
-    """Extract new text after colon for edit commands"""
-    colon_match = re.search(r':\s*(.+)$', user_message)
-    if colon_match:
-        return colon_match.group(1).strip()
-    return ""
-
-
-def extract_add_content(user_message: str, message_lower: str) -> str:
-    """Extract content to add for add commands"""
-    add_patterns = ['adicionar', 'incluir', 'acrescentar', 'novo requisito']
-    
-    for pattern in add_patterns:
-        if pattern in message_lower:
-            parts = user_message.lower().split(pattern, 1)
-            if len(parts) > 1:
-                return parts[1].strip()
-    
-    return user_message.strip()
+def requirement_ids(indices: List[int], current_requirements: List[Dict]) -> List[str]:
+    """IDs dos requisitos nas posições (1-based) indicadas"""
+    return [current_requirements[i - 1].get('id', f'R{i}') for i in indices]
 
 
 def aplicar_comando(cmd: Dict[str, Any], session, necessity: str = None) -> None:
@@ -0,0 +1,181 @@
+"""
+Roteamento das seções do ETP entre modelos.
+
+Cada seção do etp_structure usa uma rota (modelo, max_tokens, temperature).
+Seções analíticas (requisitos, riscos, mercado) vão para a rota padrão; seções
+formulaicas (providências adotadas, contratações correlatas, conclusão) usam
+uma rota com menos tokens de saída.
+
+Cada rota pode ter um SLO de latência: se o p95 recente do modelo principal
+(janela deslizante de ETP_ROUTE_WINDOW_SECONDS) passa de slo_p95_seconds, as
+seções da rota vão para o fallback_model até a janela expirar.
+
+A tabela pode ser alterada por ETP_SECTION_ROUTES (JSON), por exemplo:
+    {"routes": {"formulaica": {"model": "gpt-4o-mini", "max_tokens": 1500}},
+     "sections": {"9": "formulaica"}}
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Deque, Dict, Optional, Tuple
+
+try:
+    from prometheus_client import Counter, Histogram
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTE = 'analitica'
+FALLBACK_MODEL = os.getenv('ETP_ROUTE_FALLBACK_MODEL', 'gpt-4o-mini')
+ROUTE_WINDOW_SECONDS = float(os.getenv('ETP_ROUTE_WINDOW_SECONDS', '900'))
+ROUTE_MIN_SAMPLES = int(os.getenv('ETP_ROUTE_MIN_SAMPLES', '5'))
+
+# Seções formulaicas: texto padronizado, não precisam de 4000 tokens de saída
+DEFAULT_SECTION_ROUTES = {10: 'formulaica', 11: 'formulaica', 14: 'formulaica'}
+
+if PROMETHEUS_AVAILABLE:
+    ETP_SECTION_ROUTES = Counter(
+        "etp_section_routes_total",
+        "Seções do ETP geradas por rota e modelo (fallback = SLO do modelo principal violado)",
+        ["section", "route", "model", "fallback"]
+    )
+    ETP_SECTION_LATENCY = Histogram(
+        "etp_section_latency_seconds",
+        "Latência de geração de uma seção do ETP por rota e modelo",
+        ["route", "model"],
+        buckets=(2, 5, 10, 20, 30, 45, 60, 90, 120, 180, 240)
+    )
+else:
+    ETP_SECTION_ROUTES = None
+    ETP_SECTION_LATENCY = None
+
+
+@dataclass(frozen=True)
+class SectionRoute:
+    """Parâmetros de geração de uma rota"""
+    name: str
+    model: str
+    max_tokens: int
+    temperature: float
+    fallback_model: Optional[str] = None
+    # p95 (s) do modelo principal acima do qual a rota usa o fallback_model
+    slo_p95_seconds: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class RouteSelection:
+    """Rota escolhida para uma seção e o modelo efetivamente usado"""
+    section: int
+    route: SectionRoute
+    model: str
+    fallback: bool = False
+
+
+def default_routes(model: str, max_tokens: int, temperature: float) -> Dict[str, SectionRoute]:
+    """Rotas padrão a partir do modelo e dos parâmetros das seções do gerador"""
+    return {
+        DEFAULT_ROUTE: SectionRoute(DEFAULT_ROUTE, model, max_tokens, temperature,
+                                    fallback_model=FALLBACK_MODEL, slo_p95_seconds=120.0),
+        'formulaica': SectionRoute('formulaica', model, min(max_tokens, 2000), temperature,
+                                   fallback_model=FALLBACK_MODEL, slo_p95_seconds=60.0),
+    }
+
+
+def parse_routes_config(raw: Optional[str], routes: Dict[str, SectionRoute],
+                        sections: Dict[int, str]) -> Tuple[Dict[str, SectionRoute], Dict[int, str]]:
+    """Aplica ETP_SECTION_ROUTES (JSON) sobre as rotas e o mapa seção -> rota"""
+    if not raw:
+        return routes, sections
+    try:
+        config = json.loads(raw)
+    except ValueError as e:
+        logger.warning(f"ETP_SECTION_ROUTES inválido, usando rotas padrão: {e}")
+        return routes, sections
+
+    routes, sections = dict(routes), dict(sections)
+    fields = set(SectionRoute.__dataclass_fields__) - {'name'}
+    for name, values in (config.get('routes') or {}).items():
+        values = {k: v for k, v in (values or {}).items() if k in fields}
+        if name in routes:
+            routes[name] = replace(routes[name], **values)
+        elif 'model' in values and 'max_tokens' in values:
+            routes[name] = SectionRoute(name=name, temperature=values.pop('temperature', 0.2), **values)
+        else:
+            logger.warning(f"ETP_SECTION_ROUTES: rota '{name}' sem model/max_tokens ignorada")
+    for section, name in (config.get('sections') or {}).items():
+        if name in routes:
+            sections[int(section)] = name
+        else:
+            logger.warning(f"ETP_SECTION_ROUTES: seção {section} aponta para rota inexistente '{name}'")
+    return routes, sections
+
+
+class SectionRouter:
+    """Escolhe a rota de cada seção e troca para o fallback quando o SLO é violado"""
+
+    def __init__(self, routes: Dict[str, SectionRoute], sections: Optional[Dict[int, str]] = None,
+                 window_seconds: float = ROUTE_WINDOW_SECONDS, min_samples: int = ROUTE_MIN_SAMPLES):
+        self.routes = routes
+        self.sections = dict(sections or {})
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        # modelo -> (instante, latência) das seções concluídas
+        self._latencies: Dict[str, Deque[Tuple[float, float]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, model: str, max_tokens: int, temperature: float) -> "SectionRouter":
+        routes, sections = parse_routes_config(
+            os.getenv('ETP_SECTION_ROUTES'), default_routes(model, max_tokens, temperature), DEFAULT_SECTION_ROUTES
+        )
+        return cls(routes, sections)
+
+    def route_for(self, section: int) -> SectionRoute:
+        return self.routes[self.sections.get(section, DEFAULT_ROUTE)]
+
+    def p95(self, model: str) -> Optional[float]:
+        """p95 da latência recente do modelo, ou None com amostras insuficientes"""
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            samples = self._latencies.get(model)
+            if not samples:
+                return None
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            latencies = sorted(latency for _, latency in samples)
+        if len(latencies) < max(1, self.min_samples):
+            return None
+        return latencies[max(0, math.ceil(0.95 * len(latencies)) - 1)]
+
+    def select(self, section: int) -> RouteSelection:
+        route = self.route_for(section)
+        if route.fallback_model and route.slo_p95_seconds:
+            p95 = self.p95(route.model)
+            if p95 is not None and p95 > route.slo_p95_seconds:
+                logger.warning(
+                    f"Seção {section}: p95 de {route.model} em {p95:.0f}s acima do SLO da rota "
+                    f"'{route.name}' ({route.slo_p95_seconds:.0f}s), usando {route.fallback_model}"
+                )
+                return RouteSelection(section, route, route.fallback_model, fallback=True)
+        return RouteSelection(section, route, route.model)
+
+    def observe(self, selection: RouteSelection, latency: float):
+        """Registra a seção concluída (latência do modelo usado e a rota que a atendeu)"""
+        with self._lock:
+            samples = self._latencies.get(selection.model)
+            if samples is None:
+                samples = self._latencies[selection.model] = deque(maxlen=200)
+            samples.append((time.monotonic(), latency))
+        if PROMETHEUS_AVAILABLE:
+            ETP_SECTION_ROUTES.labels(
+                str(selection.section), selection.route.name, selection.model, str(selection.fallback).lower()
+            ).inc()
+            ETP_SECTION_LATENCY.labels(selection.route.name, selection.model).observe(latency)
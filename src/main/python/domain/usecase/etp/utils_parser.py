@@ -7,6 +7,10 @@ import json
 import re
 import logging
 
+from domain.services.intent_router import (
+    DECISION_LLM, DECISION_LOCAL, ROUTE_NEED, is_confident, record_decision, route_need
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,9 +56,38 @@ def parse_json_relaxed(s: str):
         return None
 
 
-def analyze_need_safely(user_msg: str, openai_client):
+def json_schema_format(name: str, schema: dict) -> dict:
+    """
+    response_format for a structured completion with a strict JSON schema
+    (every property required, no extra properties)
+    """
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+
+
+def chat_json(llm, call_site: str, model: str, messages: list, schema_name: str, schema: dict, **params):
+    """
+    One structured round-trip: classification and user-facing reply come back
+    in the same JSON object. The content is still parsed with parse_json_relaxed,
+    so a model that ignores the schema degrades to the relaxed parser.
+    
+    Returns:
+        Parsed dict, or None if parsing fails (callers keep their fallbacks)
+    """
+    response = llm.chat(
+        call_site,
+        model=model,
+        messages=messages,
+        response_format=json_schema_format(schema_name, schema),
+        **params
+    )
+    parsed = parse_json_relaxed(response.choices[0].message.content)
+    return parsed if isinstance(parsed, dict) else None
+
+
+def analyze_need_safely(user_msg: str, llm):
     """
     Safely analyze if user message contains a necessity description
+    Obvious messages are routed locally (intent_router); only ambiguous ones call the LLM
     NEVER promotes user_msg to necessity when contains_need=False or parse fails
     
     Returns:
@@ -63,6 +96,14 @@ def analyze_need_safely(user_msg: str, openai_client):
     if not user_msg or not isinstance(user_msg, str):
         logger.warning("analyze_need_safely: Empty or invalid user message")
         return False, None
+
+    # Pedido óbvio de contratação ou mensagem sem conteúdo: decidido localmente, sem chamada ao modelo
+    decision = route_need(user_msg)
+    if decision.contains_need is not None and is_confident(decision.confidence):
+        record_decision(ROUTE_NEED, DECISION_LOCAL)
+        logger.info(f"analyze_need_safely: Local route contains_need={decision.contains_need}")
+        return decision.contains_need, decision.description
+    record_decision(ROUTE_NEED, DECISION_LLM)
     
     try:
         # Call OpenAI need analyzer
@@ -78,7 +119,8 @@ def analyze_need_safely(user_msg: str, openai_client):
         - "need_description": texto extraído se contains_need for true
         """
 
-        response = openai_client.chat.completions.create(
+        response = llm.chat(
+            'analyze_need',
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": need_analysis_prompt}],
             max_tokens=200,
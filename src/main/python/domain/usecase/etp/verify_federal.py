@@ -2,7 +2,7 @@ import requests
 import json
 from datetime import datetime, timedelta
 from lxml import etree
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 import logging
 import os
 
@@ -189,19 +189,19 @@ def resolve_lexml(tipo: str, numero: str, ano: int) -> Dict[str, Any]:
         return result
 
 
-def summarize_for_user(entry: Dict[str, Any], openai_client=None) -> str:
+def summarize_for_user(entry: Dict[str, Any], llm=None) -> str:
     """
     Gera um resumo curto do status da norma legal usando OpenAI.
     
     Args:
         entry: Resultado da consulta resolve_lexml
-        openai_client: Cliente OpenAI configurado
+        llm: LlmGateway configurado
         
     Returns:
         String com resumo do status explicitando "fonte: LexML"
     """
     
-    if not openai_client:
+    if not llm:
         # Fallback sem IA
         if entry['verified']:
             return f"Norma {entry['label']} encontrada no LexML com status '{entry['status']}'. Fonte: LexML"
@@ -242,7 +242,8 @@ def summarize_for_user(entry: Dict[str, Any], openai_client=None) -> str:
         """
         
         # Chamar OpenAI
-        response = openai_client.chat.completions.create(
+        response = llm.chat(
+            'legal_norm_summary',
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "Você é um assistente especializado em explicar informações legais de forma simples e clara."},
@@ -281,6 +282,42 @@ def summarize_for_user(entry: Dict[str, Any], openai_client=None) -> str:
             return f"Norma {entry['label']} não pôde ser verificada. {entry['status']}. Fonte: LexML"
 
 
+def build_legal_cards(candidates: List[Dict[str, Any]], llm=None) -> List[Dict[str, Any]]:
+    """
+    Verifica no LexML as normas sugeridas por suggest_federal e monta os cards
+    apresentados ao usuário.
+    
+    Args:
+        candidates: Normas candidatas ({tipo, numero, ano, descricao, ...})
+        llm: LlmGateway para o resumo (opcional)
+        
+    Returns:
+        Lista de cards: dados da candidata + label, status, verified, resumo
+        e, quando disponíveis, ementa e url_lexml
+    """
+    cards = []
+    for candidate in candidates:
+        entry = resolve_lexml(candidate['tipo'], candidate['numero'], int(candidate['ano']))
+        entry = dict(entry, tipo=candidate['tipo'], numero=candidate['numero'], ano=candidate['ano'])
+        
+        card = dict(candidate)
+        card.update({
+            'label': entry['label'],
+            'status': entry['status'],
+            'verified': entry['verified'],
+            'urn': entry['urn'],
+            'resumo': summarize_for_user(entry, llm)
+        })
+        metadados = entry.get('metadados') or {}
+        if metadados.get('ementa'):
+            card['ementa'] = metadados['ementa']
+        if entry['urn']:
+            card['url_lexml'] = f"https://www.lexml.gov.br/urn/{entry['urn']}"
+        cards.append(card)
+    
+    return cards
+
+
 def parse_legal_norm_string(norm_string: str) -> Optional[Dict[str, Any]]:
     """
     Parseia uma string de norma legal para extrair tipo, número e ano.
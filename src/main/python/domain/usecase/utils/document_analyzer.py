@@ -4,19 +4,21 @@ import json
 from typing import Dict, List, Tuple, Optional, Any
 import openai
 
+from domain.interfaces.dataprovider.LlmGateway import get_llm_gateway
+
 class AdvancedDocumentAnalyzer:
     """Analisador avançado de documentos para extração de informações de ETP"""
     
     def __init__(self, openai_api_key: str):
         # Configurar cliente OpenAI de forma robusta
         try:
-            # Tentar inicialização moderna
-            self.client = openai.OpenAI(api_key=openai_api_key)
+            # Tentar inicialização moderna (gateway compartilhado)
+            self.llm = get_llm_gateway(openai_api_key)
         except Exception as e:
             try:
                 # Fallback para configuração legacy
                 openai.api_key = openai_api_key
-                self.client = None  # Usar API legacy
+                self.llm = None  # Usar API legacy
             except Exception as e2:
                 raise Exception(f"Erro ao configurar OpenAI: {e}. Fallback: {e2}")
         
@@ -279,9 +281,10 @@ class AdvancedDocumentAnalyzer:
             
             # Fazer chamada à API de forma compatível
             try:
-                if self.client:
+                if self.llm:
                     # Usar cliente moderno
-                    response = self.client.chat.completions.create(
+                    response = self.llm.chat(
+                        'document_answers',
                         model="gpt-4-turbo",  # Modelo mais poderoso para análise de documentos
                         messages=[
                             {
@@ -487,8 +490,9 @@ class AdvancedDocumentAnalyzer:
             
             # Fazer chamada à API
             try:
-                if self.client:
-                    response = self.client.chat.completions.create(
+                if self.llm:
+                    response = self.llm.chat(
+                        'document_extraction',
                         model="gpt-4-turbo",
                         messages=[
                             {
@@ -0,0 +1,54 @@
+"""
+Extração de texto de PDF página a página com memória limitada.
+
+pdfplumber mantém em cache os objetos de layout (chars, linhas, retângulos) de
+cada página enquanto o objeto Page existir, e PDF.pages guarda todas as páginas
+numa lista. Aqui cada página é criada, extraída e descartada antes da próxima,
+de forma que o pico de memória depende do tamanho da página e não do documento.
+"""
+
+import logging
+from typing import IO, Iterator, Tuple, Union
+
+import pdfplumber
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pdfminer.pdfpage import PDFPage
+    from pdfplumber.page import Page
+    _PAGE_STREAMING = True
+except ImportError:  # API interna indisponível: recorre a pdf.pages
+    _PAGE_STREAMING = False
+
+
+def iter_pdf_pages(source: Union[str, IO[bytes]]) -> Iterator[Tuple[int, str]]:
+    """
+    Gera (número_da_página, texto) para cada página do PDF.
+
+    Args:
+        source: Caminho do arquivo ou stream binário com seek
+    """
+    with pdfplumber.open(source) as pdf:
+        if not _PAGE_STREAMING:
+            for page in pdf.pages:
+                try:
+                    yield page.page_number, page.extract_text() or ""
+                finally:
+                    page.flush_cache()
+            return
+
+        doctop = 0
+        for index, page_obj in enumerate(PDFPage.create_pages(pdf.doc)):
+            page = Page(pdf, page_obj, page_number=index + 1, initial_doctop=doctop)
+            doctop += page.height
+            try:
+                text = page.extract_text() or ""
+            except Exception as e:
+                logger.warning(f"Erro extraindo texto da página {index + 1}: {e}")
+                text = ""
+            try:
+                yield index + 1, text
+            finally:
+                page.flush_cache()
+                del page
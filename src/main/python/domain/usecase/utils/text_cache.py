@@ -0,0 +1,272 @@
+"""
+Cache de texto extraído endereçado por conteúdo (sha256 do arquivo).
+
+Guarda o texto normalizado de cada arquivo, uma página por linha (string
+JSON) após uma linha de cabeçalho, comprimido (gzip) em disco local. Reenvios
+do mesmo arquivo (/api/kb/upload, ETPIngestor) evitam nova extração de PDF; as
+páginas são gravadas e lidas uma a uma, sem o documento inteiro em memória.
+"""
+
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+import tempfile
+from itertools import islice
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato/normalização; alterar invalida entradas antigas
+CACHE_VERSION = 2
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass
+class ExtractedText:
+    """Texto normalizado de um arquivo e offsets (em caracteres) do início de cada página."""
+    sha256: str
+    extractor: str
+    text: str
+    page_offsets: List[int] = field(default_factory=list)
+
+    @property
+    def pages(self) -> List[str]:
+        """Retorna o texto de cada página a partir dos offsets."""
+        if not self.page_offsets:
+            return [self.text] if self.text else []
+        bounds = self.page_offsets + [len(self.text) + 1]
+        return [self.text[bounds[i]:bounds[i + 1] - 1] for i in range(len(self.page_offsets))]
+
+
+def sha256_bytes(content: bytes) -> str:
+    """Hash sha256 de um conteúdo em memória."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def sha256_stream(stream: IO[bytes]) -> str:
+    """Hash sha256 de um stream binário lido em blocos; volta o stream à posição inicial."""
+    start = stream.tell()
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(_HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    stream.seek(start)
+    return digest.hexdigest()
+
+
+def sha256_file(path: Union[str, Path]) -> str:
+    """Hash sha256 de um arquivo lido em blocos (sem carregá-lo inteiro)."""
+    with open(path, 'rb') as f:
+        return sha256_stream(f)
+
+
+def normalize_page_text(text: Optional[str]) -> str:
+    """Normaliza o texto de uma página: quebras de linha, NULs e espaços à direita."""
+    if not text:
+        return ""
+    text = text.replace('\r\n', '\n').replace('\r', '\n').replace('\x00', '')
+    text = re.sub(r'[ \t]+\n', '\n', text)
+    return text.strip()
+
+
+def build_extracted_text(sha256: str, extractor: str, pages: Iterable[str]) -> ExtractedText:
+    """Junta as páginas normalizadas (separadas por '\\n') registrando os offsets."""
+    offsets, parts, position = [], [], 0
+    for page in pages:
+        page = normalize_page_text(page)
+        offsets.append(position)
+        parts.append(page)
+        position += len(page) + 1
+    return ExtractedText(sha256=sha256, extractor=extractor, text="\n".join(parts), page_offsets=offsets)
+
+
+class _StreamingEntryWriter:
+    """Grava uma entrada página a página no gzip, sem manter o texto completo em memória."""
+
+    def __init__(self, path: Path, sha256: str, extractor: str):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        self._raw = os.fdopen(fd, 'wb')
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        self._has_text = False
+        self._write_line({'version': CACHE_VERSION, 'sha256': sha256, 'extractor': extractor})
+
+    def _write_line(self, value):
+        self._gz.write((json.dumps(value, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    def add_page(self, page: str):
+        self._write_line(page)
+        self._has_text = self._has_text or bool(page)
+
+    def finish(self) -> bool:
+        """Fecha o arquivo e publica a entrada; descarta se não houver texto."""
+        self._gz.close()
+        self._raw.close()
+        if not self._has_text:
+            os.remove(self.tmp_path)
+            return False
+        os.replace(self.tmp_path, self.path)
+        return True
+
+    def abort(self):
+        try:
+            self._gz.close()
+            self._raw.close()
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+class ExtractedTextCache:
+    """
+    Armazena ExtractedText em <cache_dir>/<sha[:2]>/<sha>.<extractor>.json.gz.
+    O extrator faz parte da chave porque pdfplumber e PyPDF2 produzem textos diferentes.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, enabled: Optional[bool] = None):
+        self.cache_dir = Path(cache_dir or os.getenv('TEXT_CACHE_DIR', './cache/extracted_text'))
+        if enabled is None:
+            enabled = os.getenv('TEXT_CACHE_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, sha256: str, extractor: str) -> Path:
+        return self.cache_dir / sha256[:2] / f"{sha256}.{extractor}.json.gz"
+
+    def _open(self, sha256: str, extractor: str) -> Optional[IO[str]]:
+        """Abre a entrada já posicionada na primeira página, ou None (ausente, corrompida ou de outra versão)."""
+        if not self.enabled:
+            return None
+        path = self._path(sha256, extractor)
+        if not path.exists():
+            return None
+        f = None
+        try:
+            f = gzip.open(path, 'rt', encoding='utf-8')
+            header = json.loads(f.readline())
+            if header.get('version') == CACHE_VERSION:
+                return f
+        except Exception as e:
+            logger.warning(f"Entrada de cache de texto inválida {path.name}: {e}")
+        if f is not None:
+            f.close()
+        return None
+
+    def get(self, sha256: str, extractor: str) -> Optional[ExtractedText]:
+        """Retorna a entrada em cache ou None (ausente, corrompida ou de outra versão)."""
+        f = self._open(sha256, extractor)
+        if f is None:
+            return None
+        try:
+            with f:
+                # Páginas já normalizadas na gravação; normalizar de novo não as altera
+                return build_extracted_text(sha256, extractor, (json.loads(line) for line in f))
+        except Exception as e:
+            logger.warning(f"Entrada de cache de texto inválida {sha256[:12]}.{extractor}: {e}")
+            return None
+
+    def put(self, entry: ExtractedText) -> None:
+        """Grava a entrada de forma atômica (arquivo temporário + rename)."""
+        if not self.enabled:
+            return
+        try:
+            writer = _StreamingEntryWriter(self._path(entry.sha256, entry.extractor), entry.sha256, entry.extractor)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache de texto {entry.sha256[:12]}: {e}")
+            return
+        try:
+            for page in entry.pages:
+                writer.add_page(page)
+            writer.finish()
+        except Exception as e:
+            writer.abort()
+            logger.warning(f"Falha ao gravar cache de texto {entry.sha256[:12]}: {e}")
+
+    def get_or_extract(self, sha256: str, extractor: str,
+                       extract_pages: Callable[[], Iterable[str]]) -> ExtractedText:
+        """
+        Consulta o cache pelo hash; em caso de ausência executa extract_pages()
+        (iterável de textos por página), normaliza e grava o resultado.
+        """
+        cached = self.get(sha256, extractor)
+        if cached is not None:
+            self.hits += 1
+            logger.info(f"Cache de texto: hit {sha256[:12]} ({extractor})")
+            return cached
+
+        self.misses += 1
+        entry = build_extracted_text(sha256, extractor, extract_pages())
+        if entry.text:
+            self.put(entry)
+        return entry
+
+    def iter_pages(self, sha256: str, extractor: str,
+                   extract_pages: Callable[[], Iterable[str]]) -> Iterator[str]:
+        """
+        Versão em streaming de get_or_extract: gera o texto normalizado de cada
+        página. Em caso de acerto, lê as páginas da entrada uma a uma; em caso de
+        ausência, grava a entrada à medida que as páginas são extraídas e só a
+        publica se a extração chegar ao fim.
+        """
+        cached = self._open(sha256, extractor)
+        if cached is not None:
+            self.hits += 1
+            logger.info(f"Cache de texto: hit {sha256[:12]} ({extractor})")
+            served = 0
+            try:
+                with cached:
+                    for line in cached:
+                        page = json.loads(line)
+                        served += 1
+                        yield page
+                return
+            except (OSError, EOFError, ValueError) as e:
+                # Entrada corrompida no meio: descarta e extrai o restante do arquivo
+                logger.warning(f"Entrada de cache de texto inválida {sha256[:12]}.{extractor}: {e}")
+                self._path(sha256, extractor).unlink(missing_ok=True)
+                yield from (normalize_page_text(page) for page in islice(extract_pages(), served, None))
+                return
+
+        self.misses += 1
+        writer = None
+        if self.enabled:
+            try:
+                writer = _StreamingEntryWriter(self._path(sha256, extractor), sha256, extractor)
+            except Exception as e:
+                logger.warning(f"Falha ao abrir cache de texto {sha256[:12]}: {e}")
+
+        completed = False
+        try:
+            for page in extract_pages():
+                page = normalize_page_text(page)
+                if writer is not None:
+                    writer.add_page(page)
+                yield page
+            completed = True
+        finally:
+            if writer is not None:
+                try:
+                    if completed:
+                        writer.finish()
+                    else:
+                        writer.abort()
+                except Exception as e:
+                    logger.warning(f"Falha ao gravar cache de texto {sha256[:12]}: {e}")
+
+
+_text_cache = None
+
+
+def get_text_cache() -> ExtractedTextCache:
+    """Retorna a instância compartilhada do cache de texto extraído."""
+    global _text_cache
+    if _text_cache is None:
+        _text_cache = ExtractedTextCache()
+    return _text_cache
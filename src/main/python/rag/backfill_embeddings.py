@@ -0,0 +1,337 @@
+"""
+Backfill retomável de embeddings da base de conhecimento.
+
+Percorre kb_chunk em lotes paginados por chave (id > último id processado)
+selecionando apenas chunks sem embedding, gera os vetores em chamadas
+concorrentes com múltiplos textos por requisição, faz commit a cada lote e
+acrescenta os novos vetores ao índice FAISS existente (sem reconstruí-lo).
+
+Uso:
+    cd src/main/python
+    python -m rag.backfill_embeddings --batch-size 256 --concurrency 4
+
+Interromper e executar novamente continua de onde parou: chunks já
+vetorizados têm kb_chunk.embedding preenchido e não são selecionados.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from collections import defaultdict
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+import faiss
+
+# Adicionar src/main/python ao path para imports
+current_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(current_dir))
+
+from domain.dto.KbDto import KbChunk
+from domain.interfaces.dataprovider.DatabaseConfig import db
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.getenv('FAISS_INDEX_DIR', '/app/data/indices')
+DEFAULT_MODEL = os.getenv('EMBEDDINGS_MODEL', 'text-embedding-3-small')
+
+
+class _RequestThrottle:
+    """Limita o número de requisições por minuto compartilhado entre threads."""
+
+    def __init__(self, requests_per_minute: int = 0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FaissIndexAppender:
+    """
+    Mantém faiss.index + faiss_mapping.json (lista de ids de chunk) e acrescenta
+    vetores incrementalmente. A escrita é atômica (arquivo temporário + rename).
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.index_dir / "faiss.index"
+        self.mapping_path = self.index_dir / "faiss_mapping.json"
+        self.index = None
+        self.mapping: List[int] = []
+
+        if self.index_path.exists() and self.mapping_path.exists():
+            self.index = faiss.read_index(str(self.index_path))
+            with open(self.mapping_path, 'r') as f:
+                self.mapping = json.load(f)
+            if self.index.ntotal != len(self.mapping):
+                logger.warning(
+                    f"Índice FAISS ({self.index.ntotal}) e mapeamento ({len(self.mapping)}) divergentes; "
+                    "o índice será reconstruído a partir do banco"
+                )
+                self.index = None
+                self.mapping = []
+        self._known_ids = set(self.mapping)
+
+    def contains(self, chunk_id: int) -> bool:
+        return chunk_id in self._known_ids
+
+    def add(self, chunk_ids: List[int], vectors: List[List[float]]) -> int:
+        """Acrescenta vetores ainda não indexados. Retorna quantos foram adicionados."""
+        pairs = [(cid, vec) for cid, vec in zip(chunk_ids, vectors) if cid not in self._known_ids]
+        if not pairs:
+            return 0
+
+        matrix = np.array([vec for _, vec in pairs], dtype=np.float32)
+        faiss.normalize_L2(matrix)
+
+        if self.index is None:
+            self.index = faiss.IndexFlatIP(matrix.shape[1])
+        elif self.index.d != matrix.shape[1]:
+            raise ValueError(f"Dimensão do embedding ({matrix.shape[1]}) difere do índice ({self.index.d})")
+
+        self.index.add(matrix)
+        for cid, _ in pairs:
+            self.mapping.append(cid)
+            self._known_ids.add(cid)
+        return len(pairs)
+
+    def save(self):
+        if self.index is None:
+            return
+        tmp_index = self.index_path.with_suffix('.index.tmp')
+        tmp_mapping = self.mapping_path.with_suffix('.json.tmp')
+        faiss.write_index(self.index, str(tmp_index))
+        with open(tmp_mapping, 'w') as f:
+            json.dump(self.mapping, f)
+        os.replace(tmp_index, self.index_path)
+        os.replace(tmp_mapping, self.mapping_path)
+
+
+class EmbeddingBackfill:
+    """Gera embeddings faltantes de kb_chunk em lotes retomáveis."""
+
+    def __init__(self, openai_client, index_dir: str = DEFAULT_INDEX_DIR, model: str = DEFAULT_MODEL,
+                 batch_size: int = 256, request_size: int = 64, concurrency: int = 4,
+                 requests_per_minute: int = 0, max_retries: int = 6, session=None):
+        self.openai_client = openai_client
+        self.model = model
+        self.batch_size = batch_size
+        self.request_size = request_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.session = session or db.session
+        self.throttle = _RequestThrottle(requests_per_minute)
+        self.appender = FaissIndexAppender(index_dir)
+        # Tempo acumulado (s) por etapa: embed, persist, index
+        self.timings = defaultdict(float)
+
+    def count_pending(self) -> int:
+        return self.session.query(KbChunk).filter(KbChunk.embedding.is_(None)).count()
+
+    def _next_batch(self, last_id: int) -> List[KbChunk]:
+        return (
+            self.session.query(KbChunk)
+            .filter(KbChunk.embedding.is_(None), KbChunk.id > last_id)
+            .order_by(KbChunk.id)
+            .limit(self.batch_size)
+            .all()
+        )
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Uma requisição de embeddings com retry exponencial (com jitter) em 429/5xx."""
+        import openai
+
+        for attempt in range(self.max_retries + 1):
+            self.throttle.wait()
+            try:
+                response = self.openai_client.embeddings.create(model=self.model, input=texts)
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+            except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+                headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+                if headers.get('retry-after'):
+                    try:
+                        retry_after = float(headers['retry-after'])
+                    except ValueError:
+                        retry_after = None
+                delay = retry_after if retry_after is not None else min(60.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"Limite/erro transitório da API ({type(e).__name__}); nova tentativa em {delay:.1f}s")
+                time.sleep(delay)
+
+    def _embed_batch(self, chunks: List[KbChunk]) -> Tuple[List[int], List[List[float]], List[int]]:
+        """Divide o lote em requisições e executa em paralelo. Retorna (ids, vetores, ids_com_falha)."""
+        valid = [c for c in chunks if c.content_text and c.content_text.strip()]
+        groups = [valid[i:i + self.request_size] for i in range(0, len(valid), self.request_size)]
+
+        def run(group):
+            return self._embed_texts([c.content_text.replace("\n", " ") for c in group])
+
+        ids, vectors, failed = [], [], [c.id for c in chunks if c not in valid]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [(group, executor.submit(run, group)) for group in groups]
+            for group, future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Falha ao gerar embeddings para chunks {group[0].id}-{group[-1].id}: {e}")
+                    failed.extend(c.id for c in group)
+                    continue
+                for chunk, vector in zip(group, result):
+                    ids.append(chunk.id)
+                    vectors.append(vector)
+        return ids, vectors, failed
+
+    def _reconcile_index(self) -> int:
+        """Indexa chunks que já têm embedding no banco mas faltam no FAISS (ex.: queda após commit)."""
+        added, last_id = 0, 0
+        while True:
+            rows = (
+                self.session.query(KbChunk.id, KbChunk.embedding)
+                .filter(KbChunk.embedding.isnot(None), KbChunk.id > last_id)
+                .order_by(KbChunk.id)
+                .limit(self.batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            missing = [(cid, json.loads(emb)) for cid, emb in rows if not self.appender.contains(cid)]
+            if missing:
+                added += self.appender.add([cid for cid, _ in missing], [vec for _, vec in missing])
+        if added:
+            self.appender.save()
+            logger.info(f"🔁 {added} vetores já persistidos no banco foram adicionados ao FAISS")
+        return added
+
+    def run(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """Executa o backfill. Retorna estatísticas do processamento."""
+        self._reconcile_index()
+
+        pending = self.count_pending()
+        total = min(pending, limit) if limit else pending
+        logger.info(f"📦 {pending} chunks sem embedding (processando até {total})")
+
+        stats = {'processed': 0, 'embedded': 0, 'failed': 0, 'batches': 0}
+        last_id = 0
+        started = time.monotonic()
+
+        while stats['processed'] < total:
+            chunks = self._next_batch(last_id)
+            if not chunks:
+                break
+            if limit:
+                chunks = chunks[:total - stats['processed']]
+            last_id = chunks[-1].id
+
+            stage_start = time.perf_counter()
+            ids, vectors, failed = self._embed_batch(chunks)
+            self.timings['embed'] += time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            by_id = {c.id: c for c in chunks}
+            for cid, vector in zip(ids, vectors):
+                by_id[cid].embedding = json.dumps(vector)
+
+            try:
+                self.session.commit()
+            except Exception:
+                self.session.rollback()
+                raise
+            self.timings['persist'] += time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            self.appender.add(ids, vectors)
+            self.appender.save()
+            self.timings['index'] += time.perf_counter() - stage_start
+
+            stats['batches'] += 1
+            stats['processed'] += len(chunks)
+            stats['embedded'] += len(ids)
+            stats['failed'] += len(failed)
+
+            elapsed = time.monotonic() - started
+            rate = stats['processed'] / elapsed if elapsed > 0 else 0.0
+            remaining = total - stats['processed']
+            eta = remaining / rate if rate > 0 else 0.0
+            logger.info(
+                f"Lote {stats['batches']}: {stats['processed']}/{total} chunks "
+                f"({stats['embedded']} ok, {stats['failed']} falhas) - "
+                f"{rate:.1f} chunks/s - ETA {eta:.0f}s (último id {last_id})"
+            )
+
+        return stats
+
+
+def main():
+    """Função principal do CLI"""
+    parser = argparse.ArgumentParser(description="Backfill retomável de embeddings da base de conhecimento")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv('EMBED_BACKFILL_BATCH_SIZE', '256')),
+                        help="Chunks por lote (commit por lote)")
+    parser.add_argument("--request-size", type=int, default=64, help="Textos por requisição de embeddings")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv('EMBED_BACKFILL_CONCURRENCY', '4')),
+                        help="Requisições de embeddings simultâneas")
+    parser.add_argument("--rpm", type=int, default=int(os.getenv('EMBED_BACKFILL_RPM', '0')),
+                        help="Limite de requisições por minuto (0 = sem limite)")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de chunks a processar nesta execução")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR, help="Diretório do faiss.index/faiss_mapping.json")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Modelo de embeddings")
+
+    args = parser.parse_args()
+
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key or api_key == 'test_key':
+        logger.error("OPENAI_API_KEY não configurada")
+        sys.exit(1)
+
+    try:
+        import openai
+        openai_client = openai.OpenAI(api_key=api_key, base_url=os.getenv('OPENAI_API_BASE') or None)
+
+        backfill = EmbeddingBackfill(
+            openai_client,
+            index_dir=args.index_dir,
+            model=args.model,
+            batch_size=args.batch_size,
+            request_size=args.request_size,
+            concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+        )
+        stats = backfill.run(limit=args.limit)
+        logger.info(f"✅ Backfill concluído: {stats}")
+        sys.exit(0 if stats['failed'] == 0 else 2)
+
+    except KeyboardInterrupt:
+        logger.info("Backfill interrompido; execute novamente para continuar")
+        sys.exit(1)
+    except Exception as e:
+        logger.error(f"Erro no backfill: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
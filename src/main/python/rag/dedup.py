@@ -0,0 +1,276 @@
+"""
+Detecção de chunks quase duplicados na ingestão (MinHash + LSH).
+
+ETPs históricos repetem blocos inteiros (fundamentação legal, trechos padrão
+da Lei 14.133/2021). Em vez de gravar cada cópia, o chunk quase idêntico é
+colapsado no chunk canônico já existente, que recebe uma referência de volta
+(metadata 'duplicates') ao documento/seção de origem. Menos linhas em kb_chunk
+significa menos chamadas de embedding e índices BM25/FAISS menores.
+"""
+
+import os
+import re
+import zlib
+import logging
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from sqlalchemy import inspect
+
+from domain.dto.KbDto import KbChunk
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Limite de back-references guardadas por chunk canônico
+MAX_BACK_REFERENCES = 200
+
+
+def _normalize_words(text: str) -> List[str]:
+    """Minúsculas, sem acentos, apenas palavras."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return _WORD_RE.findall(text)
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Conjunto de shingles de palavras (n-gramas) do texto normalizado."""
+    words = _normalize_words(text)
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Assinaturas MinHash com permutações universais (a*x + b) mod p."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, 1 << 29, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 29, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        tokens = shingles(text)
+        if not tokens:
+            return None
+        hashes = np.fromiter((zlib.crc32(t.encode('utf-8')) for t in tokens), dtype=np.uint64, count=len(tokens))
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """
+    Índice LSH em bandas sobre assinaturas MinHash. Candidatos de uma mesma banda
+    são confirmados pela similaridade de Jaccard estimada (fração de posições iguais).
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, bands: int = 16, seed: int = 1,
+                 hasher: Optional[MinHasher] = None):
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = hasher or MinHasher(num_perm=num_perm, seed=seed)
+        self._buckets: List[Dict[bytes, list]] = [{} for _ in range(bands)]
+        self._signatures: Dict[object, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def query(self, signature: np.ndarray):
+        """Retorna (chave, similaridade) do melhor candidato acima do limiar, ou (None, 0.0)."""
+        best_key, best_score = None, 0.0
+        seen = set()
+        for band, key in self._band_keys(signature):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                score = float(np.mean(self._signatures[candidate] == signature))
+                if score >= self.threshold and score > best_score:
+                    best_key, best_score = candidate, score
+        return best_key, best_score
+
+    def add(self, key, signature: np.ndarray):
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def remove(self, key):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket and key in bucket:
+                bucket.remove(key)
+
+
+class ChunkDeduplicator:
+    """
+    Colapsa chunks quase duplicados antes de gravá-los.
+
+    A comparação é feita apenas dentro do mesmo (section_type, objective_slug),
+    pois a busca híbrida filtra por esses campos: colapsar entre objetivos
+    diferentes tiraria o trecho dos resultados do outro objetivo.
+
+    Uso:
+        dedup = ChunkDeduplicator(db.session)
+        dedup.refresh()                  # indexa chunks já existentes no banco
+        if dedup.add_chunk(kb_chunk):    # False = colapsado no canônico
+            ...
+        logger.info(dedup.summary())
+    """
+
+    def __init__(self, session, threshold: Optional[float] = None, enabled: Optional[bool] = None,
+                 load_batch_size: int = 1000):
+        self.session = session
+        if threshold is None:
+            threshold = float(os.getenv('KB_DEDUP_THRESHOLD', '0.8'))
+        if enabled is None:
+            enabled = os.getenv('KB_DEDUP_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.threshold = threshold
+        self.hasher = MinHasher()
+        # Um índice por partição; chaves: id (int) para chunks persistidos, o objeto KbChunk para pendentes
+        self.indexes: Dict[tuple, NearDuplicateIndex] = {}
+        self.load_batch_size = load_batch_size
+        self._last_loaded_id = 0
+        self.stats = {'seen': 0, 'unique': 0, 'collapsed': 0}
+        self._lock = threading.Lock()
+
+    def _index_for(self, section_type: str, objective_slug: str) -> NearDuplicateIndex:
+        partition = (section_type, objective_slug)
+        if partition not in self.indexes:
+            self.indexes[partition] = NearDuplicateIndex(threshold=self.threshold, hasher=self.hasher)
+        return self.indexes[partition]
+
+    def __len__(self):
+        return sum(len(index) for index in self.indexes.values())
+
+    def refresh(self) -> int:
+        """Indexa chunks persistidos com id maior que o último carregado (carga incremental)."""
+        if not self.enabled:
+            return 0
+        loaded = 0
+        with self._lock:
+            while True:
+                rows = (
+                    self.session.query(KbChunk.id, KbChunk.section_type, KbChunk.objective_slug, KbChunk.content_text)
+                    .filter(KbChunk.id > self._last_loaded_id)
+                    .order_by(KbChunk.id)
+                    .limit(self.load_batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                for chunk_id, section_type, objective_slug, content in rows:
+                    index = self._index_for(section_type, objective_slug)
+                    if chunk_id in index._signatures:
+                        continue
+                    signature = self.hasher.signature(content)
+                    if signature is not None:
+                        index.add(chunk_id, signature)
+                        loaded += 1
+                self._last_loaded_id = rows[-1][0]
+        if loaded:
+            logger.info(f"Dedup: {loaded} chunks existentes indexados (total {len(self)})")
+        return loaded
+
+    def _resolve(self, key) -> Optional[KbChunk]:
+        if isinstance(key, KbChunk):
+            # Pendente de outra sessão/thread ou descartado por rollback: não é canônico válido
+            state = inspect(key)
+            current = self.session() if callable(self.session) else self.session
+            return key if state.session is current and not state.transient else None
+        return self.session.get(KbChunk, key)
+
+    def add_chunk(self, chunk: KbChunk, source: Optional[str] = None) -> bool:
+        """
+        Adiciona o chunk à sessão, ou o colapsa num quase duplicado já conhecido.
+
+        Returns:
+            bool: True se o chunk foi adicionado; False se foi colapsado
+        """
+        with self._lock:
+            self.stats['seen'] += 1
+            signature = self.hasher.signature(chunk.content_text) if self.enabled else None
+            index = self._index_for(chunk.section_type, chunk.objective_slug) if signature is not None else None
+
+            if signature is not None:
+                key, score = index.query(signature)
+                canonical = self._resolve(key) if key is not None else None
+                if key is not None and canonical is None and not isinstance(key, KbChunk):
+                    index.remove(key)  # chunk removido (ex.: documento reingerido)
+                if canonical is not None:
+                    self._add_back_reference(canonical, chunk, score, source)
+                    self.stats['collapsed'] += 1
+                    return False
+
+            self.session.add(chunk)
+            if signature is not None:
+                index.add(chunk, signature)
+            self.stats['unique'] += 1
+            return True
+
+    def _add_back_reference(self, canonical: KbChunk, duplicate: KbChunk, score: float, source: Optional[str]):
+        metadata = canonical.get_metadata()
+        references = metadata.get('duplicates', [])
+        if len(references) < MAX_BACK_REFERENCES:
+            references.append({
+                'kb_document_id': duplicate.kb_document_id,
+                'source': source,
+                'similarity': round(score, 3),
+            })
+        metadata['duplicates'] = references
+        metadata['duplicate_count'] = metadata.get('duplicate_count', 0) + 1
+        canonical.set_metadata(metadata)
+
+    def sync_pending(self):
+        """
+        Chamar após commit/rollback: chunks pendentes que ganharam id passam a ser
+        indexados pelo id; os descartados por rollback saem do índice.
+        """
+        with self._lock:
+            for index in self.indexes.values():
+                pending = [key for key in list(index._signatures) if isinstance(key, KbChunk)]
+                for chunk in pending:
+                    signature = index._signatures[chunk]
+                    state = inspect(chunk)
+                    if chunk.id and not state.transient:
+                        index.remove(chunk)
+                        index.add(chunk.id, signature)
+                    elif state.transient or state.detached:
+                        index.remove(chunk)
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.stats['collapsed'] / self.stats['seen'] if self.stats['seen'] else 0.0
+
+    def summary(self) -> Dict[str, Union[int, float]]:
+        return dict(self.stats, dedup_ratio=round(self.dedup_ratio, 4))
+
+
+_chunk_deduplicator = None
+_chunk_deduplicator_lock = threading.Lock()
+
+
+def get_chunk_deduplicator(session) -> ChunkDeduplicator:
+    """Instância por processo (usada pelo /api/kb/upload), atualizada incrementalmente a cada uso."""
+    global _chunk_deduplicator
+    with _chunk_deduplicator_lock:
+        if _chunk_deduplicator is None:
+            _chunk_deduplicator = ChunkDeduplicator(session)
+    _chunk_deduplicator.refresh()
+    return _chunk_deduplicator
@@ -23,6 +23,8 @@ sys.path.insert(0, str(current_dir))
 
 from domain.dto.KnowledgeBaseDto import KbDocument, KbChunk, KnowledgeBaseDocument
 from domain.interfaces.dataprovider.DatabaseConfig import db
+from domain.usecase.utils.text_cache import get_text_cache, sha256_file
+from rag.dedup import ChunkDeduplicator
 
 # Configurar logging
 logging.basicConfig(
@@ -54,6 +56,7 @@ class ETPIngestor:
         
         self.openai_client = openai_client
         self.embeddings_provider = os.getenv('EMBEDDINGS_PROVIDER', 'openai')
+        self.deduplicator = None
         
         # NÃO criar engine próprio - usar sempre o shared session do db
         
@@ -88,6 +91,7 @@ class ETPIngestor:
                 db.session.query(KbDocument).delete()
                 db.session.commit()
             
+            self._start_dedup()
             total_chunks = 0
             
             # Processar PDFs primeiro
@@ -100,6 +104,7 @@ class ETPIngestor:
             
             db.session.commit()
             logger.info(f"Ingestão concluída: {total_chunks} chunks processados")
+            self._log_dedup_summary()
             
             # Gerar embeddings e criar índice FAISS
             if self.embeddings_provider == 'openai' and self.openai_client:
@@ -173,20 +178,15 @@ class ETPIngestor:
             str: Texto extraído do PDF
         """
         try:
-            text_content = ""
+            extracted = get_text_cache().get_or_extract(
+                sha256_file(pdf_path), 'pypdf2', lambda: self._read_pdf_pages(pdf_path)
+            )
             
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text.strip():
-                            text_content += f"\n--- Página {page_num + 1} ---\n"
-                            text_content += page_text + "\n"
-                    except Exception as e:
-                        logger.warning(f"Erro extraindo texto da página {page_num + 1} do PDF {pdf_path.name}: {e}")
-                        continue
+            text_content = ""
+            for page_num, page_text in enumerate(extracted.pages):
+                if page_text.strip():
+                    text_content += f"\n--- Página {page_num + 1} ---\n"
+                    text_content += page_text + "\n"
             
             return text_content.strip()
             
@@ -194,6 +194,43 @@ class ETPIngestor:
             logger.error(f"Erro extraindo texto do PDF {pdf_path}: {e}")
             return ""
 
+    def _read_pdf_pages(self, pdf_path: Path) -> List[str]:
+        """Lê o texto bruto de cada página do PDF (PyPDF2); páginas com erro ficam vazias"""
+        pages = []
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            
+            for page_num, page in enumerate(pdf_reader.pages):
+                try:
+                    pages.append(page.extract_text() or "")
+                except Exception as e:
+                    logger.warning(f"Erro extraindo texto da página {page_num + 1} do PDF {pdf_path.name}: {e}")
+                    pages.append("")
+        return pages
+
+    def _start_dedup(self) -> None:
+        """Inicializa o detector de quase duplicados com os chunks já existentes"""
+        self.deduplicator = ChunkDeduplicator(db.session)
+        self.deduplicator.refresh()
+
+    def _add_chunk(self, kb_chunk: KbChunk, filename: str) -> bool:
+        """Adiciona o chunk à sessão ou o colapsa num quase duplicado. Retorna True se adicionado"""
+        if self.deduplicator is None:
+            db.session.add(kb_chunk)
+            return True
+        return self.deduplicator.add_chunk(kb_chunk, source=filename)
+
+    def _log_dedup_summary(self) -> None:
+        """Registra a taxa de deduplicação da ingestão"""
+        if self.deduplicator is None:
+            return
+        self.deduplicator.sync_pending()
+        summary = self.deduplicator.summary()
+        logger.info(
+            f"♻️ Dedup: {summary['collapsed']} de {summary['seen']} chunks colapsados "
+            f"({summary['dedup_ratio'] * 100:.1f}%) - {summary['unique']} chunks gravados"
+        )
+
     def _process_knowledge_base_document(self, kb_doc: KnowledgeBaseDocument, filename: str) -> int:
         """
         Processa um KnowledgeBaseDocument e cria chunks na base de dados usando db.session
@@ -237,8 +274,8 @@ class ETPIngestor:
                     content_text=chunk_content.strip(),
                     objective_slug=kb_doc.section
                 )
-                db.session.add(kb_chunk)
-                chunks_processed += 1
+                if self._add_chunk(kb_chunk, filename):
+                    chunks_processed += 1
             
             logger.info(f"Documento {filename}: {chunks_processed} chunks criados")
             return chunks_processed
@@ -332,6 +369,7 @@ class ETPIngestor:
                 db.session.query(KbDocument).delete()
                 db.session.commit()
                 
+                self._start_dedup()
                 total_chunks = 0
                 total_documents = 0
                 
@@ -366,6 +404,7 @@ class ETPIngestor:
                 
             db.session.commit()
             logger.info(f"Ingestão concluída: {total_documents} documentos, {total_chunks} chunks processados com sucesso")
+            self._log_dedup_summary()
             
             # Gerar embeddings e criar índice FAISS
             if self.embeddings_provider == 'openai' and self.openai_client:
@@ -435,9 +474,8 @@ class ETPIngestor:
                             content_text=chunk_content.strip(),
                             objective_slug=objective_slug
                         )
-                        db.session.add(kb_chunk)
-                        
-                    chunks_processed += len(chunks)
+                        if self._add_chunk(kb_chunk, filename):
+                            chunks_processed += 1
             
             # Caso 2: Estrutura simples descrita na issue (need, requirements, etc.)
             else:
@@ -464,9 +502,8 @@ class ETPIngestor:
                                     content_text=chunk_content.strip(),
                                     objective_slug=objective_slug
                                 )
-                                db.session.add(kb_chunk)
-                                
-                            chunks_processed += len(chunks)
+                                if self._add_chunk(kb_chunk, filename):
+                                    chunks_processed += 1
             
             logger.info(f"Documento {filename}: {chunks_processed} chunks criados")
             return chunks_processed
@@ -690,7 +727,7 @@ class ETPIngestor:
             if os.getenv('OPENAI_API_KEY') and os.getenv('OPENAI_API_KEY') != 'test_key':
                 try:
                     import openai
-                    openai_client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+                    openai_client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'), base_url=os.getenv('OPENAI_API_BASE') or None)
                     logger.info("Cliente OpenAI configurado para ingestão inicial")
                 except ImportError:
                     logger.warning("Biblioteca openai não encontrada para ingestão inicial")
@@ -721,7 +758,7 @@ def main():
         if os.getenv('OPENAI_API_KEY') and os.getenv('OPENAI_API_KEY') != 'test_key':
             try:
                 import openai
-                openai_client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+                openai_client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'), base_url=os.getenv('OPENAI_API_BASE') or None)
                 logger.info("Cliente OpenAI configurado")
             except ImportError:
                 logger.warning("Biblioteca openai não encontrada")
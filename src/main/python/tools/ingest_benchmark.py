@@ -0,0 +1,383 @@
+"""
+Benchmark de throughput da ingestão com perfil por etapa.
+
+Executa o pipeline completo (extract → chunk → persist → embed → index) sobre um
+corpus sintético (PDFs gerados) ou de amostra (knowledge/etps/raw), contra
+SQLite/PostgreSQL e um servidor de embeddings local (tools.openai_standin), e
+emite um relatório JSON com tempo de parede, throughput, memória e número de
+round-trips ao banco por etapa.
+
+A memória de cada etapa é medida só durante a etapa: pico e variação do RSS
+amostrado por uma thread e, com --trace-memory, o pico de alocações Python
+(tracemalloc, que deixa as etapas mais lentas). ru_maxrss é o pico do processo
+desde o início e aparece apenas no total do relatório (process_peak_rss_mb).
+
+Uso:
+    cd src/main/python
+    python -m tools.ingest_benchmark --corpus synthetic --docs 20 --pages 30 --output /tmp/ingest.json
+    python -m tools.ingest_benchmark --corpus sample --database-url postgresql://... \\
+        --embeddings-base-url http://127.0.0.1:8089/v1
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Adicionar src/main/python ao path para imports
+current_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(current_dir))
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = current_dir.parent.parent.parent
+SAMPLE_CORPUS_DIR = PROJECT_ROOT / "knowledge" / "etps" / "raw"
+
+_VOCABULARY = (
+    "contratacao servico manutencao preventiva corretiva equipamentos fornecimento prazo "
+    "garantia licitante proposta valor estimado pesquisa precos mercado requisito tecnico "
+    "administracao publica orgao contratante fiscalizacao execucao contrato pagamento "
+    "medicao entrega recebimento provisorio definitivo sustentabilidade risco matriz"
+).split()
+
+_BOILERPLATE = (
+    "A presente contratacao fundamenta-se na Lei 14.133, de 1 de abril de 2021, que estabelece "
+    "normas gerais de licitacao e contratacao para as Administracoes Publicas diretas, autarquicas "
+    "e fundacionais da Uniao, dos Estados, do Distrito Federal e dos Municipios."
+)
+
+
+_MB = 1024 * 1024
+
+# Intervalo de amostragem do RSS durante uma etapa
+RSS_SAMPLE_INTERVAL_S = 0.01
+
+
+def _ru_maxrss_mb() -> float:
+    """Pico de RSS do processo desde o início, em MB (ru_maxrss é KB no Linux e bytes no macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (_MB if platform.system() == 'Darwin' else 1024), 1)
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """RSS atual do processo (Linux, /proc/self/statm); None se indisponível."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _StageMemory:
+    """
+    Memória de uma etapa: pico e variação do RSS amostrado enquanto a etapa roda
+    e, opcionalmente, pico de alocações Python acima do início da etapa.
+    """
+
+    def __init__(self, trace_allocations: bool = False, interval: float = RSS_SAMPLE_INTERVAL_S):
+        self.trace_allocations = trace_allocations
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_tracing = False
+        self._traced_start = 0
+        self._rss_start = self._rss_peak = self._rss_end = None
+        self._alloc_peak = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = _current_rss_bytes()
+            if rss is not None:
+                self._rss_peak = max(self._rss_peak, rss)
+
+    def __enter__(self):
+        if self.trace_allocations:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self._started_tracing = True
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+        self._rss_start = self._rss_peak = _current_rss_bytes()
+        if self._rss_start is not None:
+            self._thread = threading.Thread(target=self._sample, name='ingest-benchmark-rss', daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._rss_end = _current_rss_bytes()
+        if self._rss_end is not None and self._rss_peak is not None:
+            self._rss_peak = max(self._rss_peak, self._rss_end)
+        if self.trace_allocations:
+            self._alloc_peak = tracemalloc.get_traced_memory()[1] - self._traced_start
+            if self._started_tracing:
+                tracemalloc.stop()
+        return False
+
+    def result(self) -> Dict:
+        def mb(value):
+            return round(value / _MB, 1) if value is not None else None
+
+        measured = self._rss_start is not None and self._rss_end is not None
+        return {
+            'peak_rss_mb': mb(self._rss_peak),
+            'rss_delta_mb': mb(self._rss_end - self._rss_start) if measured else None,
+            'peak_alloc_mb': mb(self._alloc_peak),
+        }
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_synthetic_pdf(path: Path, pages: int, lines_per_page: int, rng: random.Random,
+                        boilerplate_ratio: float = 0.2) -> None:
+    """Gera um PDF mínimo (Helvetica, texto ASCII) com páginas de texto pseudoaleatório."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, preenchido após conhecer os filhos
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(lines_per_page):
+            if rng.random() < boilerplate_ratio:
+                lines.append(_BOILERPLATE[:90])
+            else:
+                lines.append(' '.join(rng.choice(_VOCABULARY) for _ in range(12)))
+        stream = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(f"({_pdf_escape(l)}) '" for l in lines) + " ET"
+        stream_bytes = stream.encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream_bytes) + stream_bytes + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    path.write_bytes(bytes(out))
+
+
+class _RoundTripCounter:
+    """Conta statements executados no engine (round-trips ao banco)."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+class IngestBenchmark:
+    """Executa o pipeline de ingestão medindo cada etapa."""
+
+    def __init__(self, corpus: List[Path], work_dir: Path, embeddings_base_url: str,
+                 chunk_size: int = 1000, overlap: int = 200, dedup: bool = True,
+                 batch_size: int = 256, concurrency: int = 4, trace_allocations: bool = False):
+        self.corpus = corpus
+        self.work_dir = work_dir
+        self.embeddings_base_url = embeddings_base_url
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.dedup = dedup
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.trace_allocations = trace_allocations
+        self.stages: Dict[str, Dict] = {}
+
+    def _memory(self) -> _StageMemory:
+        return _StageMemory(self.trace_allocations)
+
+    def _record(self, stage: str, seconds: float, items: int, unit: str, round_trips: int = 0,
+                memory: Optional[_StageMemory] = None, **extra):
+        self.stages[stage] = dict({
+            'wall_time_s': round(seconds, 4),
+            'items': items,
+            'unit': unit,
+            'throughput_per_s': round(items / seconds, 2) if seconds > 0 else None,
+            'db_round_trips': round_trips,
+            **(memory.result() if memory is not None else {}),
+        }, **extra)
+
+    def run(self) -> Dict:
+        import openai
+        from domain.interfaces.dataprovider.DatabaseConfig import db, get_engine
+        from domain.dto.UserDto import User  # noqa: F401 - tabelas referenciadas por FK
+        from domain.dto.EtpDto import EtpSession  # noqa: F401
+        from domain.dto.KbDto import KbDocument, KbChunk
+        from domain.usecase.utils.pdf_pages import iter_pdf_pages
+        from adapter.entrypoint.kb.KbController import iter_chunks
+        from rag.dedup import ChunkDeduplicator
+        from rag.backfill_embeddings import EmbeddingBackfill
+
+        engine = get_engine()
+        db.metadata.create_all(bind=engine, tables=[KbDocument.__table__, KbChunk.__table__], checkfirst=True)
+        counter = _RoundTripCounter(engine)
+        session = db.session
+
+        # 1) extract: texto por página (sem cache de texto, para medir o parsing)
+        started = time.perf_counter()
+        documents, total_pages, total_bytes = [], 0, 0
+        with self._memory() as memory:
+            for pdf_path in self.corpus:
+                pages = [text for _, text in iter_pdf_pages(str(pdf_path))]
+                total_pages += len(pages)
+                total_bytes += pdf_path.stat().st_size
+                documents.append((pdf_path.name, pages))
+        self._record('extract', time.perf_counter() - started, total_pages, 'pages', memory=memory,
+                     documents=len(documents), megabytes=round(total_bytes / 1e6, 2))
+
+        # 2) chunk
+        started = time.perf_counter()
+        with self._memory() as memory:
+            chunked = [(name, list(iter_chunks(pages, self.chunk_size, self.overlap))) for name, pages in documents]
+        total_chunks = sum(len(chunks) for _, chunks in chunked)
+        self._record('chunk', time.perf_counter() - started, total_chunks, 'chunks', memory=memory)
+        del documents
+
+        # 3) persist (com deduplicação opcional)
+        before = counter.count
+        started = time.perf_counter()
+        with self._memory() as memory:
+            deduplicator = ChunkDeduplicator(session, enabled=self.dedup)
+            deduplicator.refresh()
+            for name, chunks in chunked:
+                kb_doc = KbDocument(filename=name, objective_slug='benchmark')
+                session.add(kb_doc)
+                session.flush()
+                for text in chunks:
+                    deduplicator.add_chunk(KbChunk(
+                        kb_document_id=kb_doc.id, section_type='content',
+                        content_text=text, objective_slug='benchmark'
+                    ), source=name)
+            session.commit()
+            deduplicator.sync_pending()
+        summary = deduplicator.summary()
+        self._record('persist', time.perf_counter() - started, summary['unique'], 'chunks',
+                     counter.count - before, memory=memory, dedup=summary)
+        del chunked
+
+        # 4/5) embed + index (backfill incremental contra o stand-in)
+        before = counter.count
+        client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY') or 'benchmark', base_url=self.embeddings_base_url)
+        backfill = EmbeddingBackfill(client, index_dir=str(self.work_dir / 'indices'), batch_size=self.batch_size,
+                                     concurrency=self.concurrency, session=session)
+        # embed e index se alternam a cada lote: a memória é medida uma vez para as duas etapas
+        with self._memory() as memory:
+            stats = backfill.run()
+        round_trips = counter.count - before
+        self._record('embed', backfill.timings['embed'], stats['embedded'], 'chunks', round_trips, memory=memory,
+                     failed=stats['failed'], batches=stats['batches'],
+                     persist_embeddings_s=round(backfill.timings['persist'], 4))
+        self._record('index', backfill.timings['index'], backfill.appender.index.ntotal if backfill.appender.index else 0,
+                     'vectors', memory=memory, memory_measured_with='embed')
+
+        total = sum(stage['wall_time_s'] for stage in self.stages.values())
+        return {
+            'generated_at': datetime.utcnow().isoformat() + 'Z',
+            'database': engine.url.get_backend_name(),
+            'embeddings_base_url': self.embeddings_base_url,
+            'corpus': {'documents': len(self.corpus), 'pages': total_pages, 'chunks': total_chunks},
+            'stages': self.stages,
+            'total_wall_time_s': round(total, 4),
+            'bottleneck': max(self.stages, key=lambda s: self.stages[s]['wall_time_s']),
+            'db_round_trips': counter.count,
+            'process_peak_rss_mb': _ru_maxrss_mb(),
+        }
+
+
+def main():
+    """Função principal do CLI"""
+    parser = argparse.ArgumentParser(description="Benchmark de ingestão (extract → chunk → persist → embed → index)")
+    parser.add_argument("--corpus", choices=["synthetic", "sample"], default="synthetic")
+    parser.add_argument("--docs", type=int, default=10, help="Documentos sintéticos")
+    parser.add_argument("--pages", type=int, default=20, help="Páginas por documento sintético")
+    parser.add_argument("--lines-per-page", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Banco alvo (padrão: SQLite temporário)")
+    parser.add_argument("--embeddings-base-url", help="Servidor de embeddings (padrão: stand-in local embutido)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latência do stand-in embutido")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--no-dedup", action="store_true", help="Desativa a deduplicação de chunks")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Mede o pico de alocações Python por etapa com tracemalloc (deixa as etapas mais lentas)")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    work_dir = Path(tempfile.mkdtemp(prefix='ingest-benchmark-'))
+
+    # DATABASE_URL precisa estar definido antes de importar a configuração do banco
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{work_dir / 'benchmark.db'}"
+
+    if args.corpus == 'synthetic':
+        rng = random.Random(args.seed)
+        corpus_dir = work_dir / 'corpus'
+        corpus_dir.mkdir()
+        corpus = []
+        for i in range(args.docs):
+            path = corpus_dir / f"etp_sintetico_{i:04d}.pdf"
+            write_synthetic_pdf(path, args.pages, args.lines_per_page, rng)
+            corpus.append(path)
+    else:
+        corpus = sorted(SAMPLE_CORPUS_DIR.glob("*.pdf"))
+        if not corpus:
+            logger.error(f"Nenhum PDF encontrado em {SAMPLE_CORPUS_DIR}")
+            sys.exit(1)
+
+    server = None
+    base_url = args.embeddings_base_url
+    if not base_url:
+        from tools.openai_standin import StandinConfig, start_standin_server
+        server, base_url = start_standin_server(config=StandinConfig(latency_ms=args.latency_ms))
+
+    try:
+        report = IngestBenchmark(
+            corpus, work_dir, base_url,
+            dedup=not args.no_dedup, batch_size=args.batch_size, concurrency=args.concurrency,
+            trace_allocations=args.trace_memory,
+        ).run()
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding='utf-8')
+        print(f"Relatório salvo em {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark do roteador local de intenções sobre o conjunto rotulado.
+
+Avalia domain.services.intent_router contra tools/intent_router_labels.jsonl
+(uma mensagem por linha, com rota 'command' ou 'need' e a resposta esperada)
+e emite um relatório JSON por rota com:
+- acurácia das decisões (comando: intenção e índices; necessidade: contém ou não);
+- decisões locais confiantes x encaminhadas ao modelo (chamadas evitadas);
+- acurácia só das decisões locais confiantes (erros que o modelo não corrige);
+- custo médio por mensagem em microssegundos.
+
+Na rota 'need', mensagens encaminhadas contam como acerto da chamada ao modelo
+(analyze_need_safely) e aparecem em llm_calls.
+
+Uso:
+    cd src/main/python
+    python -m tools.intent_router_benchmark
+    python -m tools.intent_router_benchmark --labels /tmp/labels.jsonl --min-confidence 0.7 --output /tmp/router.json
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Adicionar src/main/python ao path para imports
+current_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(current_dir))
+
+from domain.services.intent_router import (  # noqa: E402
+    MIN_CONFIDENCE, ROUTE_COMMAND, ROUTE_NEED, is_confident, route_command, route_need
+)
+
+DEFAULT_LABELS = Path(__file__).parent / "intent_router_labels.jsonl"
+
+
+def load_labels(path: Path) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _command_correct(label: Dict, decision) -> bool:
+    if decision.intent != label['intent'] or decision.indices != label.get('indices', []):
+        return False
+    return 'new_text' not in label or decision.new_text == label['new_text']
+
+
+def evaluate(labels: List[Dict], min_confidence: Optional[float] = None, repeat: int = 200) -> Dict:
+    """Relatório por rota; misses traz as mensagens classificadas errado"""
+    min_confidence = MIN_CONFIDENCE if min_confidence is None else min_confidence
+    report = {'min_confidence': min_confidence}
+
+    for route in (ROUTE_COMMAND, ROUTE_NEED):
+        items = [label for label in labels if label['route'] == route]
+        correct = local = local_correct = 0
+        misses = []
+        for label in items:
+            if route == ROUTE_COMMAND:
+                decision = route_command(label['text'], label['total'])
+                confident = is_confident(decision.confidence, min_confidence)
+                ok = _command_correct(label, decision)
+                got = {'intent': decision.intent, 'indices': decision.indices, 'confidence': decision.confidence}
+            else:
+                decision = route_need(label['text'])
+                confident = decision.contains_need is not None and is_confident(decision.confidence, min_confidence)
+                # Encaminhada: a decisão é do modelo
+                ok = decision.contains_need == label['need'] if confident else True
+                got = {'contains_need': decision.contains_need, 'confidence': decision.confidence}
+            correct += ok
+            local += confident
+            local_correct += confident and ok
+            if not ok:
+                misses.append({'text': label['text'], 'got': got})
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for label in items:
+                if route == ROUTE_COMMAND:
+                    route_command(label['text'], label['total'])
+                else:
+                    route_need(label['text'])
+        elapsed = time.perf_counter() - started
+
+        report[route] = {
+            'messages': len(items),
+            'accuracy': round(correct / len(items), 3) if items else None,
+            'local_decisions': local,
+            'local_accuracy': round(local_correct / local, 3) if local else None,
+            'llm_calls': len(items) - local if route == ROUTE_NEED else 0,
+            'avoided_llm_calls': local if route == ROUTE_NEED else 0,
+            'us_per_message': round(elapsed / max(1, repeat * len(items)) * 1e6, 2),
+            'misses': misses,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do roteador local de intenções")
+    parser.add_argument("--labels", default=str(DEFAULT_LABELS), help="Conjunto rotulado (JSONL)")
+    parser.add_argument("--min-confidence", type=float, help="Limiar de confiança (padrão: INTENT_ROUTER_MIN_CONFIDENCE)")
+    parser.add_argument("--repeat", type=int, default=200, help="Repetições para medir o custo por mensagem")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    report = evaluate(load_labels(Path(args.labels)), args.min_confidence, args.repeat)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding='utf-8')
+        print(f"Relatório salvo em {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""
+Teste de carga ponta a ponta do fluxo conversacional do ETP.
+
+Cada usuário virtual percorre a jornada real do frontend, com tempo de
+reflexão entre os passos:
+login → conversa (necessidade) → conversa (confirma requisitos) →
+options-if-ambiguous → pick-option → respostas → generate → download.
+
+Com a geração em fila (ETP_ASYNC_GENERATION=true), /generate devolve 202 com o
+job: o usuário consulta o status_url (a cada --job-poll s) até o job terminar,
+como o frontend. Cada consulta entra como 'GET /api/etp-dynamic/jobs/<id>' e o
+tempo do enfileiramento até a conclusão como 'JOB generate' (latência real da
+geração). Job com falha, cancelado ou além de --job-timeout falha a jornada.
+
+Usuários entram conforme o perfil de rampa e repetem a jornada até o fim do
+teste. O relatório JSON traz, por endpoint, throughput, p50/p95/p99 e taxa de
+erro; por nível de concorrência (usuários ativos), throughput e p95; e o ponto
+de saturação: o primeiro nível em que o throughput deixa de crescer enquanto a
+latência ou os erros sobem. Com isso dá para dimensionar workers/threads do
+gunicorn com dados.
+
+O modelo deve ser o stand-in local (tools.openai_standin), para medir a
+aplicação e não a API externa; --standin-port sobe um embutido. O download
+exige que o usuário do login seja o dono da sessão (user_id 1 nas sessões
+criadas pela conversa).
+Com a fila ligada, o applicationWorker precisa estar em execução.
+
+Perfis de rampa:
+    constant              todos os usuários no início
+    linear:60             entrada uniforme ao longo de 60 s
+    step:5,30             5 usuários a mais a cada 30 s
+
+Uso:
+    cd src/main/python
+    python -m tools.openai_standin --latency lognormal:400,0.5 --tokens-per-second 80 &
+    OPENAI_API_BASE=http://127.0.0.1:8089/v1 gunicorn -c ../../../gunicorn.conf.py applicationApi:app
+    # só com ETP_ASYNC_GENERATION=true:
+    OPENAI_API_BASE=http://127.0.0.1:8089/v1 python applicationWorker.py &
+    python -m tools.load_test --base-url http://127.0.0.1:5000 --users 40 --ramp step:5,30 \\
+        --duration 300 --think-time uniform:1000,3000 --username admin --password ... --output /tmp/load.json
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+# Adicionar src/main/python ao path para imports
+current_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(current_dir))
+
+from tools.openai_standin import (  # noqa: E402
+    LatencyDistribution, add_standin_arguments, config_from_args, start_standin_server
+)
+
+logger = logging.getLogger(__name__)
+
+API = '/api/etp-dynamic'
+
+# Status finais de um job de geração (domain.services.etp_jobs)
+JOB_DONE = 'completed'
+JOB_FAILED = ('failed', 'cancelled')
+
+NEEDS = [
+    "Preciso contratar manutenção preventiva e corretiva dos elevadores do edifício sede.",
+    "Precisamos adquirir 200 notebooks para os servidores da secretaria.",
+    "Necessidade de contratação de serviço de limpeza e conservação predial.",
+    "Preciso contratar a locação de veículos para a fiscalização ambiental.",
+    "Precisamos contratar licenças de software de gestão documental.",
+]
+
+ANSWERS = {
+    '3': 'Sim, a contratação está prevista no PCA deste exercício.',
+    '4': 'Lei 14.133/2021 e Decreto 10.947/2022.',
+    '5': 'Quantidade estimada conforme levantamento, valor de R$ 250.000,00.',
+    '6': 'Não haverá parcelamento.',
+}
+
+# Nível de concorrência saturado: ganho de throughput abaixo disso...
+SATURATION_MIN_GAIN = 0.05
+# ...com p95 acima deste múltiplo do primeiro nível ou erros acima desta taxa
+SATURATION_LATENCY_FACTOR = 1.5
+SATURATION_ERROR_RATE = 0.01
+
+
+def start_offsets(profile: str, users: int) -> List[float]:
+    """Instante de entrada (s) de cada usuário virtual conforme o perfil de rampa"""
+    kind, _, args = profile.partition(':')
+    params = [float(p) for p in args.split(',') if p.strip()]
+    if kind == 'constant':
+        return [0.0] * users
+    if kind == 'linear':
+        ramp = params[0] if params else 0.0
+        return [ramp * i / users for i in range(users)]
+    if kind == 'step':
+        per_step, interval = int(params[0]), params[1]
+        return [interval * (i // max(1, per_step)) for i in range(users)]
+    raise ValueError(f"Perfil de rampa desconhecido: {profile}")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil por posição mais próxima (sem interpolação)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 1) if value is not None else None
+
+
+class Recorder:
+    """Amostras de requisição (endpoint, início, latência, status, ok) e contagem de usuários ativos"""
+
+    def __init__(self):
+        self.samples: List[Dict] = []
+        self.journeys: List[Dict] = []
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def user_started(self):
+        with self._lock:
+            self.active += 1
+
+    def user_stopped(self):
+        with self._lock:
+            self.active -= 1
+
+    def add(self, endpoint: str, started: float, latency: float, status: int, ok: bool):
+        with self._lock:
+            self.samples.append({'endpoint': endpoint, 'started': started, 'latency': latency,
+                                 'status': status, 'ok': ok, 'users': self.active})
+
+    def add_journey(self, started: float, duration: float, ok: bool, failed_step: Optional[str]):
+        with self._lock:
+            self.journeys.append({'started': started, 'duration': duration, 'ok': ok, 'failed_step': failed_step})
+
+
+class StepFailed(Exception):
+    """Passo da jornada falhou; os seguintes dependem dele"""
+
+
+class VirtualUser:
+    """Um usuário do frontend: sessão HTTP própria (cookie de login) e jornada completa em laço"""
+
+    def __init__(self, index: int, args, recorder: Recorder, clock_start: float, rng: random.Random):
+        self.index = index
+        self.args = args
+        self.recorder = recorder
+        self.clock_start = clock_start
+        self.rng = rng
+        self.think = LatencyDistribution.parse(args.think_time)
+        self.http = requests.Session()
+
+    def _call(self, method: str, endpoint: str, path: str, **kwargs) -> Dict:
+        started = time.perf_counter()
+        status, body = 0, {}
+        try:
+            response = self.http.request(method, self.args.base_url + path, timeout=self.args.timeout, **kwargs)
+            status = response.status_code
+            if response.headers.get('Content-Type', '').startswith('application/json'):
+                body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.debug(f"{endpoint}: {e}")
+        latency = time.perf_counter() - started
+        ok = 200 <= status < 400 and body.get('success', True) is not False
+        self.recorder.add(endpoint, started - self.clock_start, latency, status, ok)
+        if not ok:
+            raise StepFailed(endpoint)
+        return body
+
+    def _think(self):
+        time.sleep(self.think.sample(self.rng) / 1000.0)
+
+    def login(self) -> bool:
+        if not self.args.username:
+            return True
+        try:
+            self._call('POST', 'POST /api/auth/login', '/api/auth/login',
+                       json={'username': self.args.username, 'password': self.args.password})
+            return True
+        except StepFailed:
+            return False
+
+    def journey(self):
+        started = time.perf_counter()
+        failed_step = None
+        try:
+            need = self.rng.choice(NEEDS)
+            body = self._call('POST', f'POST {API}/conversation', f'{API}/conversation',
+                              json={'message': need, 'conversation_history': []})
+            session_id = body.get('session_id')
+            if not session_id:
+                raise StepFailed(f'POST {API}/conversation')
+            self._think()
+
+            self._call('POST', f'POST {API}/conversation', f'{API}/conversation',
+                       json={'message': 'pode manter', 'session_id': session_id})
+            self._think()
+
+            options = self._call('POST', f'POST {API}/options-if-ambiguous', f'{API}/options-if-ambiguous',
+                                 json={'session_id': session_id})
+            option_ids = [o.get('id') for o in options.get('options', []) if str(o.get('id', '')).startswith('opt_')]
+            self._think()
+
+            self._call('POST', f'POST {API}/pick-option', f'{API}/pick-option',
+                       json={'session_id': session_id, 'option_id': option_ids[0] if option_ids else 'opt_compra'})
+            self._think()
+
+            for question_id, answer in ANSWERS.items():
+                self._call('POST', f'POST {API}/session/<id>/answer', f'{API}/session/{session_id}/answer',
+                           json={'question_id': question_id, 'answer': answer})
+            self._think()
+
+            generated = self._call('POST', f'POST {API}/session/<id>/generate',
+                                   f'{API}/session/{session_id}/generate', json={})
+            if generated.get('job_id'):
+                self._wait_job(generated)
+            self._think()
+
+            self._call('GET', 'GET /api/etp/download/<id>', f'/api/etp/download/{session_id}')
+        except StepFailed as e:
+            failed_step = str(e)
+        self.recorder.add_journey(started - self.clock_start, time.perf_counter() - started,
+                                  failed_step is None, failed_step)
+
+    def _wait_job(self, generated: Dict):
+        """Consulta o job de geração enfileirado até terminar; registra o tempo até a conclusão"""
+        started = time.perf_counter()
+        status_url = generated.get('status_url') or f"{API}/jobs/{generated['job_id']}"
+        status = generated.get('status')
+        while status != JOB_DONE:
+            if status in JOB_FAILED or time.perf_counter() - started > self.args.job_timeout:
+                self.recorder.add('JOB generate', started - self.clock_start, time.perf_counter() - started, 0, False)
+                raise StepFailed('JOB generate')
+            time.sleep(self.args.job_poll)
+            body = self._call('GET', f'GET {API}/jobs/<id>', status_url)
+            status = (body.get('job') or {}).get('status')
+        self.recorder.add('JOB generate', started - self.clock_start, time.perf_counter() - started, 200, True)
+
+    def run(self, start_at: float, deadline: float):
+        time.sleep(max(0.0, start_at - time.perf_counter()))
+        if time.perf_counter() >= deadline:
+            return
+        self.recorder.user_started()
+        try:
+            if not self.login():
+                return
+            while time.perf_counter() < deadline:
+                self.journey()
+        finally:
+            self.recorder.user_stopped()
+            self.http.close()
+
+
+def _stats(samples: List[Dict], window: float) -> Dict:
+    latencies = [s['latency'] for s in samples]
+    errors = sum(not s['ok'] for s in samples)
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        statuses[str(sample['status'])] = statuses.get(str(sample['status']), 0) + 1
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / window, 3) if window > 0 else None,
+        'p50_ms': _ms(percentile(latencies, 50)),
+        'p95_ms': _ms(percentile(latencies, 95)),
+        'p99_ms': _ms(percentile(latencies, 99)),
+        'error_rate': round(errors / len(samples), 4) if samples else None,
+        'statuses': statuses,
+    }
+
+
+def concurrency_levels(samples: List[Dict]) -> List[Dict]:
+    """
+    Throughput e latência por número de usuários ativos no início da
+    requisição; a janela de cada nível vai da primeira à última requisição
+    iniciada nele.
+    """
+    by_users: Dict[int, List[Dict]] = {}
+    for sample in samples:
+        by_users.setdefault(sample['users'], []).append(sample)
+    levels = []
+    for users in sorted(by_users):
+        group = by_users[users]
+        window = max(s['started'] + s['latency'] for s in group) - min(s['started'] for s in group)
+        stats = _stats(group, window)
+        levels.append({'users': users, 'window_s': round(window, 2),
+                       **{k: stats[k] for k in ('requests', 'throughput_rps', 'p95_ms', 'error_rate')}})
+    return levels
+
+
+def saturation_point(levels: List[Dict], min_requests: int = 20) -> Optional[Dict]:
+    """Primeiro nível em que o throughput para de crescer e a latência ou os erros sobem"""
+    usable = [level for level in levels if level['requests'] >= min_requests and level['throughput_rps']]
+    if len(usable) < 2:
+        return None
+    baseline_p95 = usable[0]['p95_ms'] or 0.0
+    best = usable[0]
+    for level in usable[1:]:
+        gained = level['throughput_rps'] >= best['throughput_rps'] * (1 + SATURATION_MIN_GAIN)
+        degraded = ((level['p95_ms'] or 0.0) > baseline_p95 * SATURATION_LATENCY_FACTOR
+                    or (level['error_rate'] or 0.0) > SATURATION_ERROR_RATE)
+        if not gained and degraded:
+            return {'users': level['users'], 'throughput_rps': level['throughput_rps'],
+                    'p95_ms': level['p95_ms'], 'error_rate': level['error_rate'],
+                    'max_throughput_rps': best['throughput_rps'], 'max_throughput_users': best['users']}
+        if level['throughput_rps'] > best['throughput_rps']:
+            best = level
+    return None
+
+
+def build_report(recorder: Recorder, duration: float, args) -> Dict:
+    endpoints: Dict[str, List[Dict]] = {}
+    for sample in recorder.samples:
+        endpoints.setdefault(sample['endpoint'], []).append(sample)
+    journeys = recorder.journeys
+    failed_steps: Dict[str, int] = {}
+    for journey in journeys:
+        if journey['failed_step']:
+            failed_steps[journey['failed_step']] = failed_steps.get(journey['failed_step'], 0) + 1
+    levels = concurrency_levels(recorder.samples)
+    return {
+        'base_url': args.base_url,
+        'users': args.users,
+        'ramp': args.ramp,
+        'think_time_ms': args.think_time,
+        'duration_s': round(duration, 2),
+        'total': _stats(recorder.samples, duration),
+        'journeys': {
+            'completed': sum(j['ok'] for j in journeys),
+            'failed': sum(not j['ok'] for j in journeys),
+            'per_minute': round(sum(j['ok'] for j in journeys) / duration * 60, 2) if duration else None,
+            'p50_s': round(percentile([j['duration'] for j in journeys if j['ok']], 50) or 0.0, 2),
+            'p95_s': round(percentile([j['duration'] for j in journeys if j['ok']], 95) or 0.0, 2),
+            'failed_steps': failed_steps,
+        },
+        'endpoints': {name: _stats(group, duration) for name, group in sorted(endpoints.items())},
+        'levels': levels,
+        'saturation': saturation_point(levels),
+    }
+
+
+def run_load(args) -> Dict:
+    """Executa o teste com os parâmetros do CLI e devolve o relatório"""
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    clock_start = time.perf_counter()
+    deadline = clock_start + args.duration
+    offsets = start_offsets(args.ramp, args.users)
+
+    threads = []
+    for i, offset in enumerate(offsets):
+        user = VirtualUser(i, args, recorder, clock_start, random.Random(rng.random()))
+        thread = threading.Thread(target=user.run, args=(clock_start + offset, deadline),
+                                  name=f'vu-{i}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return build_report(recorder, time.perf_counter() - clock_start, args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Teste de carga do fluxo conversacional do ETP")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000", help="URL da aplicação")
+    parser.add_argument("--users", type=int, default=10, help="Usuários virtuais")
+    parser.add_argument("--ramp", default="constant", help="Perfil de rampa: constant, linear:S, step:N,S")
+    parser.add_argument("--duration", type=float, default=120.0, help="Duração do teste (s)")
+    parser.add_argument("--think-time", default="uniform:500,2000",
+                        help="Tempo de reflexão entre passos (ms), mesma sintaxe de --latency")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout por requisição (s)")
+    parser.add_argument("--job-poll", type=float, default=1.0, help="Intervalo de consulta do job de geração (s)")
+    parser.add_argument("--job-timeout", type=float, default=600.0, help="Espera máxima pelo job de geração (s)")
+    parser.add_argument("--username", help="Usuário do login (sem ele a jornada começa sem login)")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--standin-port", type=int,
+                        help="Sobe o stand-in da OpenAI nesta porta (a aplicação deve usar OPENAI_API_BASE)")
+    standin = parser.add_argument_group("stand-in embutido")
+    add_standin_arguments(standin)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    server = None
+    if args.standin_port:
+        server, standin_url = start_standin_server(port=args.standin_port, config=config_from_args(args))
+        logger.info(f"Stand-in OpenAI em {standin_url}")
+
+    logger.info(f"Carga: {args.users} usuários, rampa {args.ramp}, {args.duration:.0f}s em {args.base_url}")
+    try:
+        report = run_load(args)
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    saturation = report['saturation']
+    logger.info(f"{report['total']['requests']} requisições, {report['journeys']['completed']} jornadas; "
+                f"saturação: {saturation['users'] if saturation else 'não atingida'}")
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding='utf-8')
+        print(f"Relatório salvo em {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
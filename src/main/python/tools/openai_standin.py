@@ -0,0 +1,454 @@
+"""
+Servidor local compatível com a API da OpenAI para benchmarks e testes de carga.
+
+Implementa o subconjunto usado pela aplicação, sem custo nem limite de taxa
+externos:
+- /v1/embeddings: vetores determinísticos (derivados do hash do texto);
+- /v1/chat/completions: respostas determinísticas, com ou sem streaming (SSE,
+  com uso de tokens no último chunk quando stream_options.include_usage).
+
+O conteúdo do chat é escolhido nesta ordem: respostas fixas do arquivo
+--responses (regex sobre as mensagens), instância do JSON schema de
+response_format, análise de necessidade (contains_need), exemplo JSON do
+próprio prompt ("Retorne APENAS um JSON no formato: {...}") e, por fim, texto
+em Markdown com o título pedido. Tudo passa por utils_parser.
+
+Latência por requisição segue uma distribuição (fixed, uniform, normal,
+lognormal), a geração respeita --tokens-per-second e erros 500/429 (com
+Retry-After) podem ser injetados por taxa. Com --seed a sequência de latências
+e erros é reproduzível. Selecionado via OPENAI_API_BASE.
+
+Uso:
+    cd src/main/python
+    python -m tools.openai_standin --port 8089 --latency lognormal:400,0.5 --tokens-per-second 80
+    python -m tools.openai_standin --error-rate 0.02 --rate-limit-rate 0.05 --responses respostas.json
+    OPENAI_API_BASE=http://127.0.0.1:8089/v1 python applicationApi.py
+
+Arquivo de respostas fixas (lista JSON; content pode ser texto ou objeto, e
+texto aceita {model} e {digest}):
+    [{"match": "contains_need", "content": {"contains_need": true, "need_description": "teste"}}]
+"""
+
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_DIM = 1536
+# Tamanho do texto livre quando a requisição não limita max_tokens
+DEFAULT_COMPLETION_TOKENS = 120
+
+_VOCABULARY = (
+    "a contratação atende à necessidade da administração com economicidade eficiência e conformidade "
+    "legal o objeto será executado conforme especificações técnicas prazos garantias e critérios de "
+    "medição definidos no termo de referência considerando a pesquisa de preços de mercado e os riscos "
+    "identificados na fase de planejamento nos termos da lei 14.133 de 2021"
+).split()
+
+
+def deterministic_embedding(text: str, dim: int = DEFAULT_EMBEDDING_DIM) -> list:
+    """Vetor unitário pseudoaleatório estável para o mesmo texto."""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:4], 'little')
+    vector = np.random.RandomState(seed).standard_normal(dim).astype(np.float32)
+    vector /= np.linalg.norm(vector) or 1.0
+    return [round(float(v), 6) for v in vector]
+
+
+class LatencyDistribution:
+    """
+    Latência por requisição em ms. Especificação: 'fixed:20', 'uniform:10,50',
+    'normal:100,20' (média, desvio) ou 'lognormal:400,0.5' (mediana, sigma).
+    """
+
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal')
+
+    def __init__(self, kind: str = 'fixed', params: Tuple[float, ...] = (0.0,)):
+        if kind not in self.KINDS:
+            raise ValueError(f"Distribuição de latência desconhecida: {kind}")
+        self.kind = kind
+        self.params = tuple(float(p) for p in params)
+
+    @classmethod
+    def parse(cls, spec: str) -> 'LatencyDistribution':
+        kind, _, args = spec.partition(':')
+        params = tuple(float(p) for p in args.split(',') if p.strip()) or (0.0,)
+        return cls(kind.strip() or 'fixed', params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == 'fixed':
+            value = self.params[0]
+        elif self.kind == 'uniform':
+            value = rng.uniform(self.params[0], self.params[-1])
+        elif self.kind == 'normal':
+            value = rng.gauss(self.params[0], self.params[1] if len(self.params) > 1 else 0.0)
+        else:
+            median = self.params[0]
+            value = median * math.exp(rng.gauss(0.0, self.params[1] if len(self.params) > 1 else 0.0))
+        return max(0.0, value)
+
+    def __repr__(self):
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+class StandinConfig:
+    """Parâmetros de simulação compartilhados pelos handlers."""
+
+    def __init__(self, latency_ms: float = 0.0, embedding_dim: int = DEFAULT_EMBEDDING_DIM,
+                 latency: Optional[Any] = None, tokens_per_second: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0,
+                 responses: Optional[List[Dict]] = None, seed: Optional[int] = None,
+                 completion_tokens: int = DEFAULT_COMPLETION_TOKENS):
+        if isinstance(latency, str):
+            latency = LatencyDistribution.parse(latency)
+        self.latency = latency or LatencyDistribution('fixed', (latency_ms,))
+        self.latency_ms = latency_ms
+        self.embedding_dim = embedding_dim
+        # 0 = conteúdo inteiro de uma vez, sem tempo de geração
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.completion_tokens = completion_tokens
+        self.responses = [(re.compile(item['match'], re.IGNORECASE | re.DOTALL), item['content'])
+                          for item in (responses or [])]
+        self.requests = 0
+        self.stats: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+
+    def sample_latency_ms(self) -> float:
+        with self._lock:
+            return self.latency.sample(self._rng)
+
+    def sample_fault(self) -> Optional[int]:
+        """Status de erro injetado nesta requisição (429, 500) ou None"""
+        with self._lock:
+            draw = self._rng.random()
+        if draw < self.rate_limit_rate:
+            return 429
+        if draw < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+
+def _message_text(messages: List[Dict]) -> str:
+    parts = []
+    for message in messages or []:
+        content = message.get('content')
+        if isinstance(content, list):
+            content = ' '.join(str(part.get('text', '')) for part in content if isinstance(part, dict))
+        parts.append(str(content or ''))
+    return '\n'.join(parts)
+
+
+def _filler(digest: str, words: int) -> str:
+    rng = random.Random(digest)
+    return ' '.join(rng.choice(_VOCABULARY) for _ in range(max(1, words)))
+
+
+def schema_instance(schema: Dict, digest: str, name: str = 'valor', index: int = 0) -> Any:
+    """Instância determinística de um JSON schema (subconjunto do modo strict)"""
+    if 'anyOf' in schema:
+        return schema_instance(schema['anyOf'][0], digest, name, index)
+    if 'enum' in schema:
+        return schema['enum'][0]
+    kind = schema.get('type', 'string')
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != 'null'), 'null')
+    if kind == 'object':
+        properties = schema.get('properties', {})
+        return {key: schema_instance(sub, digest, key, index) for key, sub in properties.items()}
+    if kind == 'array':
+        return [schema_instance(schema.get('items', {}), digest, name, i) for i in range(2)]
+    if kind == 'boolean':
+        return False
+    if kind in ('integer', 'number'):
+        return index + 1
+    if kind == 'null':
+        return None
+    if name == 'id':
+        return f"R{index + 1}"
+    return f"{name} {index + 1}: {_filler(f'{digest}:{name}:{index}', 8)}"
+
+
+def _json_example(text: str) -> Optional[Any]:
+    """Maior objeto JSON válido que aparece no prompt (exemplo do formato de resposta)"""
+    decoder = json.JSONDecoder()
+    best, best_size = None, 0
+    for match in re.finditer(r'\{', text):
+        try:
+            value, end = decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict) and end - match.start() > best_size:
+            best, best_size = value, end - match.start()
+    return best
+
+
+def render_chat_content(payload: Dict, config: StandinConfig) -> str:
+    """Conteúdo determinístico da resposta de chat para a requisição"""
+    messages = payload.get('messages') or []
+    text = _message_text(messages)
+    model = payload.get('model', 'gpt-4o-mini')
+    digest = hashlib.sha256(f"{model}\n{text}".encode('utf-8')).hexdigest()[:16]
+
+    for pattern, content in config.responses:
+        if pattern.search(text):
+            if isinstance(content, str):
+                return content.replace('{model}', model).replace('{digest}', digest)
+            return json.dumps(content, ensure_ascii=False)
+
+    response_format = payload.get('response_format') or {}
+    if response_format.get('type') == 'json_schema':
+        schema = (response_format.get('json_schema') or {}).get('schema') or {}
+        return json.dumps(schema_instance(schema, digest), ensure_ascii=False)
+
+    if '"contains_need"' in text:
+        quoted = re.search(r'Mensagem:\s*"(.*?)"\s*$', text, re.MULTILINE | re.DOTALL)
+        return json.dumps({'contains_need': True,
+                           'need_description': quoted.group(1).strip() if quoted else _filler(digest, 6)},
+                          ensure_ascii=False)
+
+    if 'json' in text.lower() or response_format.get('type') == 'json_object':
+        example = _json_example(text)
+        if example is not None:
+            return json.dumps(example, ensure_ascii=False)
+        if response_format.get('type') == 'json_object':
+            return '{}'
+
+    limit = payload.get('max_completion_tokens') or payload.get('max_tokens') or config.completion_tokens
+    words = max(1, min(int(limit), config.completion_tokens) - 4)
+    title = re.search(r'T[íi]tulo:\s*(.+)', text)
+    heading = title.group(1).strip() if title else 'Resposta'
+    paragraphs = [_filler(f"{digest}:{i}", max(1, words // 3)) for i in range(3)]
+    return f"{heading}\n\n" + '\n\n'.join(p[0].upper() + p[1:] + '.' for p in paragraphs)
+
+
+def _tokens(content: str) -> List[str]:
+    """Pedaços do conteúdo emitidos como tokens (palavra com o espaço seguinte)"""
+    return re.findall(r'\S+\s*|\s+', content) or ['']
+
+
+def _count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Handler HTTP das rotas /v1/*."""
+
+    server_version = "OpenAIStandin/1.0"
+    config = StandinConfig()
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('/health', '/v1/models'):
+            return self._send_json(200, {'object': 'list', 'data': []})
+        self._send_json(404, {'error': {'message': f'Rota não encontrada: {self.path}'}})
+
+    def do_POST(self):
+        self.config.count_request()
+        try:
+            payload = self._read_json()
+        except json.JSONDecodeError:
+            return self._send_json(400, {'error': {'message': 'JSON inválido'}})
+
+        path = self.path.rstrip('/')
+        if path not in ('/v1/embeddings', '/v1/chat/completions'):
+            return self._send_json(404, {'error': {'message': f'Rota não encontrada: {self.path}'}})
+
+        fault = self.config.sample_fault()
+        if fault == 429:
+            # Limite de taxa responde na hora, como a API
+            self.config.count('rate_limited')
+            return self._send_json(429, {'error': {
+                'message': 'Rate limit reached (stand-in)', 'type': 'requests', 'code': 'rate_limit_exceeded'
+            }}, headers={'Retry-After': f"{self.config.retry_after:g}"})
+
+        latency_ms = self.config.sample_latency_ms()
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+
+        if fault == 500:
+            self.config.count('server_error')
+            return self._send_json(500, {'error': {'message': 'Erro simulado (stand-in)', 'type': 'server_error'}})
+
+        if path == '/v1/embeddings':
+            self.config.count('embeddings')
+            return self._handle_embeddings(payload)
+        self.config.count('chat_stream' if payload.get('stream') else 'chat')
+        return self._handle_chat(payload)
+
+    def _handle_embeddings(self, payload: dict):
+        inputs = payload.get('input', [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dim = int(payload.get('dimensions') or self.config.embedding_dim)
+        data = [
+            {'object': 'embedding', 'index': i, 'embedding': deterministic_embedding(text, dim)}
+            for i, text in enumerate(inputs)
+        ]
+        tokens = sum(len(str(text).split()) for text in inputs)
+        self._send_json(200, {
+            'object': 'list',
+            'data': data,
+            'model': payload.get('model', 'text-embedding-3-small'),
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+        })
+
+    def _handle_chat(self, payload: dict):
+        if not payload.get('messages'):
+            return self._send_json(400, {'error': {'message': "'messages' é obrigatório"}})
+
+        content = render_chat_content(payload, self.config)
+        pieces = _tokens(content)
+        prompt_tokens = _count_tokens(_message_text(payload['messages']))
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(pieces),
+                 'total_tokens': prompt_tokens + len(pieces)}
+        base = {
+            'id': f"chatcmpl-standin-{hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]}",
+            'created': int(time.time()),
+            'model': payload.get('model', 'gpt-4o-mini'),
+            'system_fingerprint': 'standin',
+        }
+        delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second else 0.0
+
+        if not payload.get('stream'):
+            if delay:
+                time.sleep(delay * len(pieces))
+            return self._send_json(200, dict(base, object='chat.completion', choices=[{
+                'index': 0, 'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop', 'logprobs': None
+            }], usage=usage))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        def chunk(delta: Dict, finish_reason: Optional[str] = None, **extra):
+            event = dict(base, object='chat.completion.chunk',
+                         choices=[{'index': 0, 'delta': delta, 'finish_reason': finish_reason, 'logprobs': None}],
+                         **extra)
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            chunk({'role': 'assistant', 'content': ''})
+            for piece in pieces:
+                if delay:
+                    time.sleep(delay)
+                chunk({'content': piece})
+            chunk({}, 'stop')
+            if (payload.get('stream_options') or {}).get('include_usage'):
+                event = dict(base, object='chat.completion.chunk', choices=[], usage=usage)
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente fechou o stream (cancelamento)
+            self.config.count('stream_aborted')
+        self.close_connection = True
+
+
+def start_standin_server(host: str = '127.0.0.1', port: int = 0, config: StandinConfig = None):
+    """
+    Inicia o servidor numa thread daemon.
+
+    Returns:
+        (server, base_url): base_url no formato http://host:port/v1
+    """
+    handler = type('ConfiguredStandinHandler', (StandinHandler,), {'config': config or StandinConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='openai-standin', daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_standin_arguments(parser: argparse.ArgumentParser):
+    """Opções de simulação (reaproveitadas pelas ferramentas que embutem o stand-in)"""
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latência fixa por requisição")
+    parser.add_argument("--latency", help="Distribuição de latência (ms): fixed:20, uniform:10,50, "
+                                          "normal:100,20, lognormal:400,0.5")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Velocidade de geração (0 = instantânea)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fração de respostas 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After (s) das respostas 429")
+    parser.add_argument("--responses", help="Arquivo JSON com respostas fixas de chat")
+    parser.add_argument("--seed", type=int, help="Semente de latências e erros (reprodutível)")
+    parser.add_argument("--embedding-dim", type=int, default=DEFAULT_EMBEDDING_DIM)
+
+
+def config_from_args(args) -> StandinConfig:
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding='utf-8') as f:
+            responses = json.load(f)
+    return StandinConfig(
+        latency_ms=args.latency_ms, latency=args.latency, embedding_dim=args.embedding_dim,
+        tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, responses=responses, seed=args.seed
+    )
+
+
+def main():
+    """Função principal do CLI"""
+    parser = argparse.ArgumentParser(description="Servidor local compatível com a API da OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = config_from_args(args)
+    handler = type('ConfiguredStandinHandler', (StandinHandler,), {'config': config})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    logger.info(f"Stand-in OpenAI em http://{args.host}:{args.port}/v1 (latência {config.latency}, "
+                f"{config.tokens_per_second or '∞'} tokens/s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Encerrando stand-in")
+    finally:
+        server.server_close()
+        logger.info(f"Requisições: {config.requests} {config.stats}")
+
+
+if __name__ == "__main__":
+    main()
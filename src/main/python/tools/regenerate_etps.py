@@ -0,0 +1,123 @@
+"""
+Regeneração em lote do ETP de sessões existentes (após mudança de prompt ou modelo).
+
+Seleciona as sessões por filtro, regenera as seções alteradas num pool limitado
+sob um orçamento de tokens por minuto e grava cada documento numa transação
+(domain.services.etp_regeneration). O progresso fica em
+etp_regeneration_checkpoint: repetir o comando com o mesmo --run-id retoma a
+execução interrompida sem refazer as sessões concluídas.
+
+Uso:
+    cd src/main/python
+    python -m tools.regenerate_etps --run-id prompt-v3 --status completed --updated-since 2025-01-01 \\
+        --concurrency 4 --tpm 400000
+    python -m tools.regenerate_etps --run-id prompt-v3 --retry-failed     # retoma e refaz as falhas
+    python -m tools.regenerate_etps --run-id teste --session-id abc --session-id def --force --dry-run
+
+Sai com código 2 se alguma sessão falhar (o relatório lista as falhas).
+"""
+
+import os
+import sys
+import json
+import signal
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Adicionar src/main/python ao path para imports
+current_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(current_dir))
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+from domain.interfaces.dataprovider.DatabaseConfig import db  # noqa: E402
+from domain.dto import UserDto  # noqa: E402,F401  (tabela users referenciada por etp_sessions)
+from domain.services.etp_regeneration import (  # noqa: E402
+    REGEN_ESTIMATE_TOKENS, EtpRegenerator, TokenBudget, prepare_run, run_summary, select_sessions
+)
+
+
+def _date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main():
+    """Função principal do CLI"""
+    parser = argparse.ArgumentParser(description="Regeneração em lote do ETP de sessões existentes")
+    parser.add_argument("--run-id", default=f"regen-{datetime.utcnow():%Y%m%d-%H%M%S}",
+                        help="Identificador da execução (repita para retomar)")
+    parser.add_argument("--status", action="append", help="Status das sessões (padrão: completed)")
+    parser.add_argument("--session-id", action="append", help="Sessões específicas (session_id)")
+    parser.add_argument("--user-id", type=int, help="Apenas sessões deste usuário")
+    parser.add_argument("--updated-since", type=_date, help="Sessões atualizadas a partir desta data (ISO)")
+    parser.add_argument("--updated-until", type=_date, help="Sessões atualizadas antes desta data (ISO)")
+    parser.add_argument("--limit", type=int, help="Máximo de sessões processadas nesta invocação")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv('ETP_REGEN_CONCURRENCY', '2')),
+                        help="Sessões regeneradas simultaneamente")
+    parser.add_argument("--tpm", type=int, default=int(os.getenv('ETP_REGEN_TPM', '0')),
+                        help="Orçamento de tokens por minuto (0 = sem limite)")
+    parser.add_argument("--estimate-tokens", type=int, default=REGEN_ESTIMATE_TOKENS,
+                        help="Tokens reservados por sessão até haver uso real observado")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenera todas as seções, mesmo com fingerprint inalterado")
+    parser.add_argument("--retry-failed", action="store_true", help="Recoloca na fila as sessões que falharam")
+    parser.add_argument("--dry-run", action="store_true", help="Só mostra as sessões selecionadas")
+    parser.add_argument("--output", help="Arquivo JSON do relatório (padrão: stdout)")
+    args = parser.parse_args()
+
+    db.create_all()
+    selected = select_sessions(args.status or ['completed'], args.session_id, args.user_id,
+                               args.updated_since, args.updated_until)
+    if args.dry_run:
+        print(json.dumps({'run_id': args.run_id, 'selected': len(selected), 'etp_session_ids': selected}, indent=2))
+        return
+
+    added = prepare_run(args.run_id, selected, retry_failed=args.retry_failed)
+    logger.info(f"Execução {args.run_id}: {added} sessões novas de {len(selected)} selecionadas "
+                f"({run_summary(args.run_id)})")
+
+    from domain.services.etp_dynamic import init_etp_dynamic
+    from domain.services.etp_sections import question_sections
+    from adapter.entrypoint.etp.EtpDynamicController import ETP_QUESTIONS
+
+    etp_generator = init_etp_dynamic()[0]
+    if etp_generator is None:
+        logger.error("OPENAI_API_KEY não configurada; não é possível regenerar")
+        sys.exit(1)
+
+    regenerator = EtpRegenerator(
+        etp_generator, question_sections(ETP_QUESTIONS), concurrency=args.concurrency,
+        budget=TokenBudget(args.tpm), estimate_tokens=args.estimate_tokens, force=args.force
+    )
+    # Interrupção: termina as sessões em andamento; o restante fica para a retomada
+    signal.signal(signal.SIGTERM, regenerator.stop)
+    signal.signal(signal.SIGINT, regenerator.stop)
+
+    report = regenerator.run(args.run_id, limit=args.limit)
+    report['selected'] = len(selected)
+    report['added'] = added
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding='utf-8')
+        logger.info(f"Relatório salvo em {args.output}")
+    else:
+        print(output)
+    logger.info(f"✅ {report['processed']} sessões em {report['elapsed_s']}s "
+                f"({report['sessions_per_minute']} sessões/min, {report['tokens_per_minute']} tokens/min), "
+                f"{report['failed']} falhas")
+    sys.exit(2 if report['failed'] else 0)
+
+
+if __name__ == "__main__":
+    main()
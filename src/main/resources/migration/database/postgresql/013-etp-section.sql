@@ -0,0 +1,57 @@
+-- ================================================
+-- Changeset 013: ETP Section Table Creation
+-- Description: Stores generated ETP sections (preview/final) with the fingerprint of their inputs
+-- Tables: etp_section
+-- ================================================
+
+-- create tables section -------------------------------------------------
+
+-- table etp_section
+CREATE TABLE etp_section
+(
+    id serial NOT NULL,
+    etp_session_id integer NOT NULL,
+    variant varchar(20) NOT NULL DEFAULT 'final',
+    section_number integer NOT NULL,
+    title varchar(255),
+    content text,
+    fingerprint varchar(64) NOT NULL,
+    model varchar(255),
+    created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP
+);
+
+-- create primary keys section -------------------------------------------------
+
+ALTER TABLE etp_section
+    ADD CONSTRAINT pk_etp_section PRIMARY KEY (id);
+
+-- create unique constraints section -------------------------------------------------
+
+ALTER TABLE etp_section
+    ADD CONSTRAINT uk_etp_section_session_variant_number UNIQUE (etp_session_id, variant, section_number);
+
+-- create foreign keys (relationships) section -------------------------------------------------
+
+ALTER TABLE etp_section
+    ADD CONSTRAINT fk_etp_section_etp_session
+        FOREIGN KEY (etp_session_id) REFERENCES etp_sessions (id)
+        ON DELETE CASCADE;
+
+-- create indexes section -------------------------------------------------
+
+CREATE INDEX idx_etp_section_etp_session_id ON etp_section (etp_session_id);
+
+-- create comments section -------------------------------------------------
+
+COMMENT ON TABLE etp_section IS 'Generated ETP sections, reused when the fingerprint of their inputs is unchanged';
+COMMENT ON COLUMN etp_section.id IS 'Primary key identifier';
+COMMENT ON COLUMN etp_section.etp_session_id IS 'Reference to the ETP session';
+COMMENT ON COLUMN etp_section.variant IS 'Generation variant (preview, final)';
+COMMENT ON COLUMN etp_section.section_number IS 'Section number in the ETP template (1-14)';
+COMMENT ON COLUMN etp_section.title IS 'Section title';
+COMMENT ON COLUMN etp_section.content IS 'Generated section content';
+COMMENT ON COLUMN etp_section.fingerprint IS 'sha256 of prompt (consumed answers and retrieved context), model and parameters';
+COMMENT ON COLUMN etp_section.model IS 'Model used to generate the section';
+COMMENT ON COLUMN etp_section.created_at IS 'Timestamp when the section was created';
+COMMENT ON COLUMN etp_section.updated_at IS 'Timestamp when the section was last regenerated';
@@ -0,0 +1,68 @@
+-- ================================================
+-- Changeset 014: ETP Generation Job Table Creation
+-- Description: DB-backed queue of ETP generation jobs processed by the worker process
+-- Tables: etp_generation_job
+-- ================================================
+
+-- create tables section -------------------------------------------------
+
+-- table etp_generation_job
+CREATE TABLE etp_generation_job
+(
+    id serial NOT NULL,
+    job_id varchar(36) NOT NULL,
+    etp_session_id integer NOT NULL,
+    variant varchar(20) NOT NULL DEFAULT 'final',
+    status varchar(20) NOT NULL DEFAULT 'queued',
+    cancel_requested boolean NOT NULL DEFAULT false,
+    params_json text,
+    sections_json text,
+    error text,
+    worker_id varchar(100),
+    attempts integer NOT NULL DEFAULT 0,
+    created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    started_at timestamp with time zone,
+    heartbeat_at timestamp with time zone,
+    finished_at timestamp with time zone
+);
+
+-- create primary keys section -------------------------------------------------
+
+ALTER TABLE etp_generation_job
+    ADD CONSTRAINT pk_etp_generation_job PRIMARY KEY (id);
+
+-- create unique constraints section -------------------------------------------------
+
+ALTER TABLE etp_generation_job
+    ADD CONSTRAINT uk_etp_generation_job_job_id UNIQUE (job_id);
+
+-- create foreign keys (relationships) section -------------------------------------------------
+
+ALTER TABLE etp_generation_job
+    ADD CONSTRAINT fk_etp_generation_job_etp_session
+        FOREIGN KEY (etp_session_id) REFERENCES etp_sessions (id)
+        ON DELETE CASCADE;
+
+-- create indexes section -------------------------------------------------
+
+CREATE INDEX idx_etp_generation_job_etp_session_id ON etp_generation_job (etp_session_id);
+CREATE INDEX idx_etp_generation_job_status_created ON etp_generation_job (status, created_at);
+
+-- create comments section -------------------------------------------------
+
+COMMENT ON TABLE etp_generation_job IS 'Queue of ETP generation jobs';
+COMMENT ON COLUMN etp_generation_job.id IS 'Primary key identifier';
+COMMENT ON COLUMN etp_generation_job.job_id IS 'Public job identifier (uuid)';
+COMMENT ON COLUMN etp_generation_job.etp_session_id IS 'Reference to the ETP session';
+COMMENT ON COLUMN etp_generation_job.variant IS 'Generation variant (preview, final)';
+COMMENT ON COLUMN etp_generation_job.status IS 'Job status (queued, running, completed, failed, cancelled)';
+COMMENT ON COLUMN etp_generation_job.cancel_requested IS 'Set by DELETE /jobs/<id>; the worker aborts outstanding model calls';
+COMMENT ON COLUMN etp_generation_job.params_json IS 'JSON with generation parameters (e.g. question to section map)';
+COMMENT ON COLUMN etp_generation_job.sections_json IS 'JSON with per-section progress';
+COMMENT ON COLUMN etp_generation_job.error IS 'Error message when the job failed';
+COMMENT ON COLUMN etp_generation_job.worker_id IS 'Worker that claimed the job';
+COMMENT ON COLUMN etp_generation_job.attempts IS 'Number of times the job was claimed';
+COMMENT ON COLUMN etp_generation_job.created_at IS 'Timestamp when the job was enqueued';
+COMMENT ON COLUMN etp_generation_job.started_at IS 'Timestamp when a worker claimed the job';
+COMMENT ON COLUMN etp_generation_job.heartbeat_at IS 'Last progress/heartbeat written by the worker';
+COMMENT ON COLUMN etp_generation_job.finished_at IS 'Timestamp when the job finished';
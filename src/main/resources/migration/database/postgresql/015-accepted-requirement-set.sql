@@ -0,0 +1,55 @@
+-- ================================================
+-- Changeset 015: Accepted Requirement Set Table Creation
+-- Description: Stores requirement sets accepted by users, indexed by the embedding of the necessity (semantic cache for requirement suggestions)
+-- Tables: accepted_requirement_set
+-- ================================================
+
+-- create tables section -------------------------------------------------
+
+-- table accepted_requirement_set
+CREATE TABLE accepted_requirement_set
+(
+    id serial NOT NULL,
+    etp_session_id integer,
+    necessity text NOT NULL,
+    normalized_necessity varchar(500) NOT NULL,
+    embedding text NOT NULL,
+    embedding_model varchar(100) NOT NULL,
+    requirements_json text NOT NULL,
+    hits integer NOT NULL DEFAULT 0,
+    created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at timestamp with time zone
+);
+
+-- create primary keys section -------------------------------------------------
+
+ALTER TABLE accepted_requirement_set
+    ADD CONSTRAINT pk_accepted_requirement_set PRIMARY KEY (id);
+
+-- create foreign keys (relationships) section -------------------------------------------------
+
+ALTER TABLE accepted_requirement_set
+    ADD CONSTRAINT fk_accepted_requirement_set_etp_session
+        FOREIGN KEY (etp_session_id) REFERENCES etp_sessions (id)
+        ON DELETE SET NULL;
+
+-- create indexes section -------------------------------------------------
+
+CREATE INDEX idx_accepted_requirement_set_etp_session_id ON accepted_requirement_set (etp_session_id);
+CREATE INDEX idx_accepted_requirement_set_normalized_necessity ON accepted_requirement_set (normalized_necessity);
+
+-- create comments section -------------------------------------------------
+
+COMMENT ON TABLE accepted_requirement_set IS 'Requirement sets accepted by users, served again for semantically equivalent necessities';
+COMMENT ON COLUMN accepted_requirement_set.id IS 'Primary key identifier';
+COMMENT ON COLUMN accepted_requirement_set.etp_session_id IS 'ETP session where the set was accepted';
+COMMENT ON COLUMN accepted_requirement_set.necessity IS 'Necessity as described by the user';
+COMMENT ON COLUMN accepted_requirement_set.normalized_necessity IS 'Normalized necessity used for the embedding';
+COMMENT ON COLUMN accepted_requirement_set.embedding IS 'Embedding of the normalized necessity (JSON array)';
+COMMENT ON COLUMN accepted_requirement_set.embedding_model IS 'Model used to generate the embedding';
+COMMENT ON COLUMN accepted_requirement_set.requirements_json IS 'Accepted requirements (JSON array of id, text, justification)';
+COMMENT ON COLUMN accepted_requirement_set.hits IS 'Number of times the set was served from the cache';
+COMMENT ON COLUMN accepted_requirement_set.created_at IS 'Timestamp when the set was first accepted';
+COMMENT ON COLUMN accepted_requirement_set.updated_at IS 'Timestamp when the set was last accepted again';
+COMMENT ON COLUMN accepted_requirement_set.last_hit_at IS 'Timestamp of the last cache hit';
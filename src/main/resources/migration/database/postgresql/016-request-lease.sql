@@ -0,0 +1,50 @@
+-- ================================================
+-- Changeset 016: Request Lease Table Creation
+-- Description: Lease rows coalescing duplicate concurrent operations (single-flight) across workers
+-- Tables: request_lease
+-- ================================================
+
+-- create tables section -------------------------------------------------
+
+-- table request_lease
+CREATE TABLE request_lease
+(
+    id serial NOT NULL,
+    lease_key varchar(64) NOT NULL,
+    operation varchar(40) NOT NULL,
+    session_id varchar(100),
+    owner varchar(100) NOT NULL,
+    status varchar(20) NOT NULL DEFAULT 'running',
+    result_json text,
+    created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    expires_at timestamp with time zone NOT NULL,
+    finished_at timestamp with time zone
+);
+
+-- create primary keys section -------------------------------------------------
+
+ALTER TABLE request_lease
+    ADD CONSTRAINT pk_request_lease PRIMARY KEY (id);
+
+-- create unique constraints section -------------------------------------------------
+
+ALTER TABLE request_lease
+    ADD CONSTRAINT uk_request_lease_lease_key UNIQUE (lease_key);
+
+-- create indexes section -------------------------------------------------
+
+CREATE INDEX idx_request_lease_expires_at ON request_lease (expires_at);
+
+-- create comments section -------------------------------------------------
+
+COMMENT ON TABLE request_lease IS 'In-flight operations shared by duplicate concurrent requests';
+COMMENT ON COLUMN request_lease.id IS 'Primary key identifier';
+COMMENT ON COLUMN request_lease.lease_key IS 'sha256 of session id, operation and input fingerprint';
+COMMENT ON COLUMN request_lease.operation IS 'Coalesced operation (generate, preview, suggest_requirements)';
+COMMENT ON COLUMN request_lease.session_id IS 'Public ETP session identifier, when the operation has one';
+COMMENT ON COLUMN request_lease.owner IS 'Worker/process currently computing the operation';
+COMMENT ON COLUMN request_lease.status IS 'Lease status (running, done, failed)';
+COMMENT ON COLUMN request_lease.result_json IS 'JSON result handed to duplicates that waited on the lease';
+COMMENT ON COLUMN request_lease.created_at IS 'Timestamp when the lease row was first created';
+COMMENT ON COLUMN request_lease.expires_at IS 'Lease deadline; an expired running lease can be taken over';
+COMMENT ON COLUMN request_lease.finished_at IS 'Timestamp when the owner stored the result';
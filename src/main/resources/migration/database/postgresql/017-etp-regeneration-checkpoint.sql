@@ -0,0 +1,63 @@
+-- ================================================
+-- Changeset 017: ETP Regeneration Checkpoint Table Creation
+-- Description: Per-session progress of bulk ETP regeneration runs, so interrupted runs resume
+-- Tables: etp_regeneration_checkpoint
+-- ================================================
+
+-- create tables section -------------------------------------------------
+
+-- table etp_regeneration_checkpoint
+CREATE TABLE etp_regeneration_checkpoint
+(
+    id serial NOT NULL,
+    run_id varchar(64) NOT NULL,
+    etp_session_id integer NOT NULL,
+    status varchar(20) NOT NULL DEFAULT 'pending',
+    attempts integer NOT NULL DEFAULT 0,
+    worker_id varchar(100),
+    error text,
+    tokens integer NOT NULL DEFAULT 0,
+    sections_generated integer NOT NULL DEFAULT 0,
+    duration_ms integer,
+    created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    started_at timestamp with time zone,
+    finished_at timestamp with time zone
+);
+
+-- create primary keys section -------------------------------------------------
+
+ALTER TABLE etp_regeneration_checkpoint
+    ADD CONSTRAINT pk_etp_regeneration_checkpoint PRIMARY KEY (id);
+
+-- create unique constraints section -------------------------------------------------
+
+ALTER TABLE etp_regeneration_checkpoint
+    ADD CONSTRAINT uk_etp_regeneration_checkpoint_run_session UNIQUE (run_id, etp_session_id);
+
+-- create foreign keys (relationships) section -------------------------------------------------
+
+ALTER TABLE etp_regeneration_checkpoint
+    ADD CONSTRAINT fk_etp_regeneration_checkpoint_etp_session
+        FOREIGN KEY (etp_session_id) REFERENCES etp_sessions (id)
+        ON DELETE CASCADE;
+
+-- create indexes section -------------------------------------------------
+
+CREATE INDEX idx_etp_regeneration_checkpoint_run_id ON etp_regeneration_checkpoint (run_id);
+
+-- create comments section -------------------------------------------------
+
+COMMENT ON TABLE etp_regeneration_checkpoint IS 'Progress of each ETP session in a bulk regeneration run';
+COMMENT ON COLUMN etp_regeneration_checkpoint.id IS 'Primary key identifier';
+COMMENT ON COLUMN etp_regeneration_checkpoint.run_id IS 'Regeneration run identifier (reused to resume the run)';
+COMMENT ON COLUMN etp_regeneration_checkpoint.etp_session_id IS 'Reference to the ETP session';
+COMMENT ON COLUMN etp_regeneration_checkpoint.status IS 'Session status in the run (pending, running, done, unchanged, failed)';
+COMMENT ON COLUMN etp_regeneration_checkpoint.attempts IS 'Number of times the session was claimed in the run';
+COMMENT ON COLUMN etp_regeneration_checkpoint.worker_id IS 'Process that claimed the session';
+COMMENT ON COLUMN etp_regeneration_checkpoint.error IS 'Error message of the last failed attempt';
+COMMENT ON COLUMN etp_regeneration_checkpoint.tokens IS 'Model tokens (prompt and completion) spent on the session';
+COMMENT ON COLUMN etp_regeneration_checkpoint.sections_generated IS 'Sections regenerated by the model (not reused)';
+COMMENT ON COLUMN etp_regeneration_checkpoint.duration_ms IS 'Regeneration wall time in milliseconds';
+COMMENT ON COLUMN etp_regeneration_checkpoint.created_at IS 'Timestamp when the session was selected for the run';
+COMMENT ON COLUMN etp_regeneration_checkpoint.started_at IS 'Timestamp of the last claim';
+COMMENT ON COLUMN etp_regeneration_checkpoint.finished_at IS 'Timestamp when the session finished in the run';
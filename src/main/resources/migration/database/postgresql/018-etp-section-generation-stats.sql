@@ -0,0 +1,17 @@
+-- ================================================
+-- Changeset 018: Add Generation Stats Columns to etp_section
+-- Description: Per-section model cost (tokens, latency) and single-section regeneration timestamp
+-- Table: etp_section
+-- ================================================
+
+-- alter table section -------------------------------------------------
+
+ALTER TABLE etp_section ADD COLUMN IF NOT EXISTS tokens integer NOT NULL DEFAULT 0;
+ALTER TABLE etp_section ADD COLUMN IF NOT EXISTS latency_ms integer;
+ALTER TABLE etp_section ADD COLUMN IF NOT EXISTS regenerated_at timestamp with time zone;
+
+-- create comments section -------------------------------------------------
+
+COMMENT ON COLUMN etp_section.tokens IS 'Model tokens (prompt and completion) spent generating the section';
+COMMENT ON COLUMN etp_section.latency_ms IS 'Model call latency in milliseconds';
+COMMENT ON COLUMN etp_section.regenerated_at IS 'Set by a single-section regeneration and cleared when the whole document is written again; while set, the document is assembled from sections';
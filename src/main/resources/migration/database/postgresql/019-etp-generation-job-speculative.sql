@@ -0,0 +1,19 @@
+-- ================================================
+-- Changeset 019: Add Speculative Flag to etp_generation_job
+-- Description: Speculative drafts are flagged in their own column so promotion and completion are conditional updates
+-- Table: etp_generation_job
+-- ================================================
+
+-- alter table section -------------------------------------------------
+
+ALTER TABLE etp_generation_job ADD COLUMN IF NOT EXISTS speculative boolean NOT NULL DEFAULT false;
+
+-- migrate data section -------------------------------------------------
+
+UPDATE etp_generation_job
+SET speculative = true
+WHERE params_json LIKE '%"speculative": true%';
+
+-- create comments section -------------------------------------------------
+
+COMMENT ON COLUMN etp_generation_job.speculative IS 'Speculative draft job; cleared by a conditional update when the generate click adopts it';
@@ -0,0 +1,9 @@
+-- ================================================
+-- Changeset 020: Drop Single-Section Regeneration Marker from etp_section
+-- Description: A single-section regeneration now rewrites the section inside the stored document, so the document is never assembled from the rows
+-- Table: etp_section
+-- ================================================
+
+-- alter table section -------------------------------------------------
+
+ALTER TABLE etp_section DROP COLUMN IF EXISTS regenerated_at;
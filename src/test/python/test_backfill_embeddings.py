@@ -0,0 +1,174 @@
+import unittest
+import sys
+import os
+import json
+import random
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider.DatabaseConfig import db, metadata, get_engine
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.dto.EtpDto import EtpSession  # noqa: F401  (tabela etp_sessions referenciada por kb_document)
+from domain.dto.KbDto import KbDocument, KbChunk
+from rag.backfill_embeddings import EmbeddingBackfill, FaissIndexAppender
+
+DIM = 8
+
+
+def _vector(text):
+    """Vetor determinístico por texto"""
+    rng = random.Random(text)
+    return [rng.uniform(-1, 1) for _ in range(DIM)]
+
+
+class _FakeEmbeddings:
+    """embeddings.create simulado; falha nas requisições que contêm um texto marcado"""
+
+    def __init__(self, failing_text=None):
+        self.failing_text = failing_text
+        self.texts = []
+
+    def create(self, model, input):
+        if self.failing_text and self.failing_text in input:
+            raise RuntimeError('requisição rejeitada')
+        self.texts.extend(input)
+        data = [SimpleNamespace(index=i, embedding=_vector(text)) for i, text in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+class _FakeClient:
+    def __init__(self, failing_text=None):
+        self.embeddings = _FakeEmbeddings(failing_text)
+
+
+class TestEmbeddingBackfill(unittest.TestCase):
+    """Testes do backfill retomável de embeddings"""
+
+    CHUNKS = 10
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_dir = os.path.join(self.tmp.name, 'indices')
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'kb.db')}")
+        metadata.create_all(bind=self.engine)
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+
+        document = KbDocument(filename='doc.pdf', objective_slug='geral')
+        db.session.add(document)
+        db.session.flush()
+        for i in range(self.CHUNKS):
+            db.session.add(KbChunk(kb_document_id=document.id, section_type='content',
+                                   content_text=f'chunk {i}', objective_slug='geral'))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _backfill(self, client):
+        return EmbeddingBackfill(client, index_dir=self.index_dir, batch_size=3, request_size=2, concurrency=2)
+
+    def _pending(self):
+        return [row[0] for row in db.session.query(KbChunk.id).filter(KbChunk.embedding.is_(None)).order_by(KbChunk.id)]
+
+    def _assert_index_aligned(self):
+        """Cada vetor do índice está na mesma posição do id do seu chunk no mapeamento"""
+        appender = FaissIndexAppender(self.index_dir)
+        chunks = {c.id: c.content_text for c in KbChunk.query.all()}
+        self.assertEqual(appender.index.ntotal, len(appender.mapping))
+        self.assertEqual(len(set(appender.mapping)), len(appender.mapping))
+        for position, chunk_id in enumerate(appender.mapping):
+            stored = appender.index.reconstruct(position)
+            expected = np.array(_vector(chunks[chunk_id]), dtype=np.float32)
+            np.testing.assert_allclose(stored, expected / np.linalg.norm(expected), rtol=1e-5)
+        return appender
+
+    def test_interrupted_run_resumes_from_the_cursor(self):
+        client = _FakeClient()
+        first = self._backfill(client).run(limit=4)
+        self.assertEqual((first['processed'], first['embedded'], first['batches']), (4, 4, 2))
+        self.assertEqual(len(self._pending()), self.CHUNKS - 4)
+
+        second = self._backfill(client).run()
+        self.assertEqual((second['processed'], second['embedded']), (self.CHUNKS - 4, self.CHUNKS - 4))
+        self.assertEqual(self._pending(), [])
+        # Nenhum texto enviado duas vezes
+        self.assertEqual(sorted(client.embeddings.texts), sorted(f'chunk {i}' for i in range(self.CHUNKS)))
+
+        appender = self._assert_index_aligned()
+        self.assertEqual(appender.mapping, sorted(appender.mapping))
+        self.assertEqual(len(appender.mapping), self.CHUNKS)
+
+    def test_failed_request_is_retried_on_next_run(self):
+        report = self._backfill(_FakeClient(failing_text='chunk 5')).run()
+
+        # Lotes de 3 em requisições de 2: 'chunk 5' vai sozinho numa requisição
+        self.assertEqual((report['embedded'], report['failed']), (self.CHUNKS - 1, 1))
+        pending = self._pending()
+        self.assertEqual([db.session.get(KbChunk, cid).content_text for cid in pending], ['chunk 5'])
+        self.assertEqual(len(FaissIndexAppender(self.index_dir).mapping), self.CHUNKS - 1)
+
+        retried = self._backfill(_FakeClient()).run()
+        self.assertEqual((retried['processed'], retried['embedded'], retried['failed']), (1, 1, 0))
+        self.assertEqual(len(self._assert_index_aligned().mapping), self.CHUNKS)
+
+    def test_failed_commit_rolls_back_and_leaves_the_index_untouched(self):
+        backfill = self._backfill(_FakeClient())
+        with patch.object(backfill.session, 'commit', side_effect=RuntimeError('conexão perdida')):
+            with self.assertRaises(RuntimeError):
+                backfill.run()
+
+        db.session.remove()
+        self.assertEqual(len(self._pending()), self.CHUNKS)
+        self.assertFalse(os.path.exists(os.path.join(self.index_dir, 'faiss.index')))
+
+        report = self._backfill(_FakeClient()).run()
+        self.assertEqual(report['embedded'], self.CHUNKS)
+        self._assert_index_aligned()
+
+    def test_index_missing_committed_vectors_is_reconciled(self):
+        self._backfill(_FakeClient()).run()
+        # Mapeamento divergente do índice (queda entre as duas escritas): reconstrói a partir do banco
+        mapping_path = os.path.join(self.index_dir, 'faiss_mapping.json')
+        with open(mapping_path) as f:
+            mapping = json.load(f)
+        with open(mapping_path, 'w') as f:
+            json.dump(mapping[:-3], f)
+
+        client = _FakeClient()
+        report = self._backfill(client).run()
+
+        self.assertEqual((report['processed'], client.embeddings.texts), (0, []))
+        appender = self._assert_index_aligned()
+        self.assertEqual(sorted(appender.mapping), sorted(mapping))
+
+    def test_appender_skips_known_ids_and_checks_dimension(self):
+        appender = FaissIndexAppender(self.index_dir)
+        self.assertEqual(appender.add([1, 2], [_vector('a'), _vector('b')]), 2)
+        self.assertEqual(appender.add([2, 3], [_vector('x'), _vector('c')]), 1)
+        self.assertEqual(appender.mapping, [1, 2, 3])
+        self.assertEqual(appender.index.ntotal, 3)
+        with self.assertRaises(ValueError):
+            appender.add([4], [[1.0, 0.0]])
+        appender.save()
+
+        reloaded = FaissIndexAppender(self.index_dir)
+        self.assertEqual(reloaded.mapping, [1, 2, 3])
+        query = np.array([_vector('b')], dtype=np.float32)
+        query /= np.linalg.norm(query)
+        _, positions = reloaded.index.search(query, 1)
+        self.assertEqual(reloaded.mapping[positions[0][0]], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider.DatabaseConfig import db, metadata, get_engine
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.dto.EtpDto import EtpSession  # noqa: F401  (tabela etp_sessions referenciada por kb_document)
+from domain.dto.KbDto import KbDocument, KbChunk
+from rag.dedup import ChunkDeduplicator, NearDuplicateIndex, shingles
+
+
+BOILERPLATE = (
+    "A presente contratação fundamenta-se na Lei nº 14.133, de 1º de abril de 2021, "
+    "que estabelece normas gerais de licitação e contratação para as Administrações "
+    "Públicas diretas, autárquicas e fundacionais da União, dos Estados, do Distrito "
+    "Federal e dos Municípios, observados os princípios da legalidade, impessoalidade, "
+    "moralidade, publicidade e eficiência."
+)
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    """Testes para a detecção de chunks quase duplicados (MinHash/LSH)"""
+    
+    def setUp(self):
+        self.index = NearDuplicateIndex(threshold=0.8)
+        self.index.add(1, self.index.hasher.signature(BOILERPLATE))
+    
+    def test_shingles_ignore_case_and_accents(self):
+        """Shingles não dependem de caixa nem de acentuação"""
+        self.assertEqual(shingles("Contratação PÚBLICA de serviços"), shingles("contratacao publica de servicos"))
+    
+    def test_near_duplicate_is_found(self):
+        """Variação pequena do mesmo parágrafo é detectada como quase duplicata"""
+        variant = BOILERPLATE.replace("1º de abril de 2021", "01/04/2021") + " "
+        key, score = self.index.query(self.index.hasher.signature(variant))
+        self.assertEqual(key, 1)
+        self.assertGreaterEqual(score, 0.8)
+    
+    def test_distinct_text_is_not_collapsed(self):
+        """Texto diferente não é considerado duplicata"""
+        other = "Aquisição de notebooks com processador de 8 núcleos, 16 GB de memória e garantia de 36 meses on-site."
+        key, _ = self.index.query(self.index.hasher.signature(other))
+        self.assertIsNone(key)
+    
+    def test_remove(self):
+        """Chave removida deixa de ser candidata"""
+        self.index.remove(1)
+        key, _ = self.index.query(self.index.hasher.signature(BOILERPLATE))
+        self.assertIsNone(key)
+
+
+class TestChunkDeduplicator(unittest.TestCase):
+    """Testes do colapso de chunks quase duplicados na ingestão"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'kb.db')}")
+        metadata.create_all(bind=self.engine)
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+
+        self.documents = []
+        for i in range(4):
+            document = KbDocument(filename=f'etp_{i}.pdf', objective_slug='geral')
+            db.session.add(document)
+            self.documents.append(document)
+        db.session.commit()
+        self.dedup = ChunkDeduplicator(db.session, threshold=0.8, enabled=True)
+
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _chunk(self, document, text=BOILERPLATE, section_type='fundamentacao', objective_slug='geral'):
+        return KbChunk(kb_document_id=document.id, section_type=section_type,
+                       content_text=text, objective_slug=objective_slug)
+
+    def _canonical(self):
+        canonical = self._chunk(self.documents[0])
+        self.assertTrue(self.dedup.add_chunk(canonical, source='etp_0.pdf'))
+        db.session.commit()
+        self.dedup.sync_pending()
+        return canonical
+
+    def test_duplicate_is_collapsed_into_a_back_reference(self):
+        canonical = self._canonical()
+        variant = BOILERPLATE.replace("1º de abril de 2021", "01/04/2021")
+
+        self.assertFalse(self.dedup.add_chunk(self._chunk(self.documents[1], variant), source='etp_1.pdf'))
+        db.session.commit()
+
+        self.assertEqual(KbChunk.query.count(), 1)
+        references = canonical.get_metadata()['duplicates']
+        self.assertEqual(len(references), 1)
+        self.assertEqual(references[0]['kb_document_id'], self.documents[1].id)
+        self.assertEqual(references[0]['source'], 'etp_1.pdf')
+        self.assertGreaterEqual(references[0]['similarity'], 0.8)
+        self.assertEqual(canonical.get_metadata()['duplicate_count'], 1)
+        self.assertEqual(self.dedup.summary(), {'seen': 2, 'unique': 1, 'collapsed': 1, 'dedup_ratio': 0.5})
+
+    def test_back_references_are_capped(self):
+        canonical = self._canonical()
+        with mock.patch('rag.dedup.MAX_BACK_REFERENCES', 2):
+            for document in self.documents[1:]:
+                self.assertFalse(self.dedup.add_chunk(self._chunk(document), source=document.filename))
+        db.session.commit()
+
+        stored = canonical.get_metadata()
+        self.assertEqual([ref['source'] for ref in stored['duplicates']], ['etp_1.pdf', 'etp_2.pdf'])
+        # Todas as ocorrências são contadas, mesmo além do limite de referências
+        self.assertEqual(stored['duplicate_count'], 3)
+
+    def test_partitions_by_section_type_and_objective(self):
+        self._canonical()
+
+        self.assertTrue(self.dedup.add_chunk(self._chunk(self.documents[1], section_type='justificativa')))
+        self.assertTrue(self.dedup.add_chunk(self._chunk(self.documents[2], objective_slug='ti')))
+        self.assertFalse(self.dedup.add_chunk(self._chunk(self.documents[3])))
+        db.session.commit()
+
+        self.assertEqual(KbChunk.query.count(), 3)
+        self.assertEqual(len(self.dedup.indexes), 3)
+
+    def test_sync_pending_rekeys_committed_and_drops_rolled_back(self):
+        document_id = self.documents[3].id
+        committed = self._chunk(self.documents[0])
+        self.dedup.add_chunk(committed)
+        db.session.commit()
+        discarded = self._chunk(self.documents[1], "Serviço de limpeza predial com fornecimento de materiais.")
+        self.dedup.add_chunk(discarded)
+        db.session.rollback()
+
+        self.dedup.sync_pending()
+
+        keys = [key for index in self.dedup.indexes.values() for key in index._signatures]
+        self.assertEqual(keys, [committed.id])
+
+        # Em outra sessão o canônico é resolvido pelo id
+        db.session.remove()
+        self.assertFalse(self.dedup.add_chunk(KbChunk(
+            kb_document_id=document_id, section_type='fundamentacao', content_text=BOILERPLATE, objective_slug='geral'
+        )))
+        # O texto descartado no rollback pode ser gravado de novo
+        self.assertTrue(self.dedup.add_chunk(KbChunk(
+            kb_document_id=document_id, section_type='fundamentacao', content_text=discarded.content_text,
+            objective_slug='geral'
+        )))
+
+if __name__ == '__main__':
+    unittest.main()
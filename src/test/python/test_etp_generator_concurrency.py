@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import time
+import threading
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from domain.interfaces.dataprovider.LlmGateway import LlmGateway
+from domain.usecase.etp.etp_generator_dynamic import DynamicEtpGenerator
+
+
+class TestConcurrentSectionGeneration(unittest.TestCase):
+    """Testes da geração paralela de seções do ETP"""
+    
+    def _generator(self, max_workers, delay=0.05, failing_prefix=None):
+        generator = DynamicEtpGenerator('sk-test', max_workers=max_workers)
+        self.active = 0
+        self.peak = 0
+        lock = threading.Lock()
+        
+        def fake_section(section_info, messages, selection=None):
+            with lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            try:
+                time.sleep(delay)
+                if failing_prefix and section_info['section'].startswith(failing_prefix):
+                    raise RuntimeError("rate limit exceeded")
+                return f"{section_info['section']}\n\nconteudo {section_info['section'].split('.')[0]}"
+            finally:
+                with lock:
+                    self.active -= 1
+        
+        generator._complete_section = fake_section
+        generator._build_section_messages = lambda info, session_data: [{'role': 'user', 'content': info['section']}]
+        return generator
+    
+    def test_sections_keep_original_order(self):
+        """Seções aparecem na ordem do template independentemente da ordem de conclusão"""
+        generator = self._generator(max_workers=14)
+        document = generator.generate_complete_etp({'answers': {}}, is_preview=True)
+        positions = [document.index(f"conteudo {i}\n" if i < 14 else "conteudo 14") for i in range(1, 15)]
+        self.assertEqual(positions, sorted(positions))
+    
+    def test_parallelism_is_bounded(self):
+        """Nunca há mais chamadas simultâneas que o limite configurado"""
+        generator = self._generator(max_workers=3)
+        generator.generate_complete_etp({'answers': {}}, is_preview=True)
+        self.assertLessEqual(self.peak, 3)
+        self.assertGreater(self.peak, 1)
+    
+    def test_failure_only_affects_its_section(self):
+        """Erro numa seção vira fallback apenas dela"""
+        generator = self._generator(max_workers=4, failing_prefix="3.")
+        document = generator.generate_complete_etp({'answers': {}}, is_preview=True)
+        self.assertIn("Limite de requisições atingido", document)
+        self.assertIn("conteudo 2", document)
+        self.assertIn("conteudo 4", document)
+        self.assertNotIn("conteudo 3\n", document)
+
+
+class _FakeStreamingCompletions:
+    """Simula client.chat.completions.create(stream=True)"""
+    
+    def create(self, **kwargs):
+        title = kwargs['messages'][-1]['content']
+        for piece in (title, "\n\nTexto ", "gerado"):
+            delta = type('Delta', (), {'content': piece})()
+            yield type('Chunk', (), {'choices': [type('Choice', (), {'delta': delta})()]})()
+
+
+class TestStreamingSectionGeneration(unittest.TestCase):
+    """Testes do streaming de seções (SSE)"""
+    
+    def test_stream_events_and_final_document(self):
+        """Cada seção emite start, tokens e complete; 'done' traz o documento montado"""
+        generator = DynamicEtpGenerator('sk-test', max_workers=4)
+        generator.llm = LlmGateway(client=type('Client', (), {'chat': type('Chat', (), {'completions': _FakeStreamingCompletions()})()})())
+        generator._build_section_messages = lambda info, session_data: [{'role': 'user', 'content': info['section']}]
+        
+        events = list(generator.stream_complete_etp({'answers': {}}, is_preview=True))
+        
+        by_type = {}
+        for event in events:
+            by_type.setdefault(event['event'], []).append(event)
+        self.assertEqual(len(by_type['section_start']), 14)
+        self.assertEqual(len(by_type['section_complete']), 14)
+        self.assertEqual(events[-1]['event'], 'done')
+        for complete in by_type['section_complete']:
+            starts = [i for i, e in enumerate(events) if e['event'] == 'section_start' and e['section'] == complete['section']]
+            self.assertLess(starts[0], events.index(complete))
+            self.assertFalse(complete['error'])
+        self.assertEqual(events[-1]['etp_content'].count("Texto gerado"), 14)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider.DatabaseConfig import db, metadata, get_engine
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.dto.EtpDto import EtpSession, EtpSection
+from domain.services.etp_sections import generate_etp_incremental, question_sections
+from domain.usecase.etp.etp_generator_dynamic import DynamicEtpGenerator
+
+QUESTIONS = [
+    {"id": 1, "section": "OBJETO DO ESTUDO E ESPECIFICAÇÕES GERAIS"},
+    {"id": 2, "section": "DESCRIÇÃO DOS REQUISITOS DA CONTRATAÇÃO"},
+    {"id": 5, "section": "ESTIMATIVA DAS QUANTIDADES E VALORES"},
+    {"id": 6, "section": "JUSTIFICATIVA PARA O PARCELAMENTO"},
+]
+
+
+class _CountingGenerator(DynamicEtpGenerator):
+    """Gerador com prompt determinístico e chamada ao modelo simulada"""
+    
+    def __init__(self):
+        super().__init__('sk-test', max_workers=4)
+        self.calls = []
+    
+    def _build_section_messages(self, section_info, session_data):
+        answers = self._section_session_data(section_info, session_data)['answers']
+        prompt = section_info['section'] + '|' + '|'.join(f"{k}={answers[k]}" for k in sorted(answers))
+        return [{'role': 'user', 'content': prompt}]
+    
+    def _complete_section(self, section_info, messages, selection=None):
+        self.calls.append(int(section_info['section'].split('.')[0]))
+        return f"{section_info['section']}\n\n{messages[-1]['content']}"
+
+
+class TestIncrementalGeneration(unittest.TestCase):
+    """Testes da regeneração apenas das seções com entradas alteradas"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'etp.db')}")
+        metadata.create_all(bind=self.engine)
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+        
+        self.session = EtpSession(session_id='s1')
+        self.session.set_answers({'1': 'manutenção de computadores', '2': 'técnico certificado',
+                                  '5': '200 unidades', '6': 'não'})
+        db.session.add(self.session)
+        db.session.commit()
+        self.generator = _CountingGenerator()
+    
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+    
+    def _session_data(self):
+        return {'session_id': 's1', 'answers': self.session.get_answers(),
+                'question_sections': question_sections(QUESTIONS)}
+    
+    def _generate(self, is_preview=False):
+        self.generator.calls = []
+        content, summary = generate_etp_incremental(self.generator, self.session, self._session_data(), is_preview)
+        db.session.commit()
+        return content, summary
+    
+    def test_unchanged_inputs_reuse_all_sections(self):
+        """Sem mudanças, nenhuma seção é regenerada e o documento é o mesmo"""
+        first, _ = self._generate()
+        self.assertEqual(len(self.generator.calls), 14)
+        second, summary = self._generate()
+        self.assertEqual(self.generator.calls, [])
+        self.assertEqual(summary['sections_reused'], 14)
+        self.assertEqual(second.split('\n\n', 1)[1], first.split('\n\n', 1)[1])
+    
+    def test_changed_answer_regenerates_dependent_sections(self):
+        """Alterar a resposta de parcelamento refaz só as seções que a consomem"""
+        self._generate()
+        answers = self.session.get_answers()
+        answers['6'] = 'sim, em dois lotes'
+        self.session.set_answers(answers)
+        db.session.commit()
+        content, summary = self._generate()
+        self.assertEqual(sorted(self.generator.calls), [1, 8, 14])
+        self.assertEqual(summary['sections_generated'], 3)
+        self.assertIn('6=sim, em dois lotes', content)
+        rows = EtpSection.query.filter_by(etp_session_id=self.session.id, variant='final').count()
+        self.assertEqual(rows, 14)
+    
+    def test_approved_preview_is_promoted_to_final(self):
+        """Preview aprovado vira o documento final sem chamadas ao modelo"""
+        self._generate(is_preview=True)
+        self.session.preview_approved = True
+        db.session.commit()
+        _, summary = self._generate(is_preview=False)
+        self.assertEqual(self.generator.calls, [])
+        self.assertEqual(summary['sections_reused'], 14)
+    
+    def test_unapproved_preview_is_not_promoted(self):
+        """Sem aprovação, a geração final não reaproveita o preview"""
+        self._generate(is_preview=True)
+        self._generate(is_preview=False)
+        self.assertEqual(len(self.generator.calls), 14)
+
+
+if __name__ == '__main__':
+    unittest.main()
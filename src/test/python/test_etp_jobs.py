@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider.DatabaseConfig import db, metadata, get_engine
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.dto.EtpDto import EtpSession, EtpSection
+from domain.services.etp_jobs import (
+    EtpJobRunner, async_generation_enabled, claim_next_job, enqueue_generation_job, get_job, request_cancel
+)
+from domain.interfaces.dataprovider.LlmGateway import LlmGateway
+from domain.usecase.etp.etp_generator_dynamic import DynamicEtpGenerator
+
+
+class _FakeStreamingCompletions:
+    """Simula client.chat.completions.create(stream=True)"""
+    
+    def create(self, **kwargs):
+        title = kwargs['messages'][-1]['content']
+        delta = type('Delta', (), {'content': f"{title}\n\nConteúdo da seção"})()
+        yield type('Chunk', (), {'choices': [type('Choice', (), {'delta': delta})()]})()
+
+
+class TestGenerationJobs(unittest.TestCase):
+    """Testes da fila de jobs de geração de ETP"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'jobs.db')}")
+        metadata.create_all(bind=self.engine)
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+        
+        self.session = EtpSession(session_id='s1')
+        self.session.set_answers({'1': 'manutenção de computadores'})
+        db.session.add(self.session)
+        db.session.commit()
+    
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+    
+    def test_enqueue_reuses_active_job(self):
+        """Um segundo /generate para a mesma sessão devolve o job ativo"""
+        job, created = enqueue_generation_job(self.session)
+        db.session.commit()
+        again, created_again = enqueue_generation_job(self.session)
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(job.job_id, again.job_id)
+    
+    def test_async_generation_is_opt_in(self):
+        """Sem ETP_ASYNC_GENERATION, /generate continua síncrono (não depende do worker)"""
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop('ETP_ASYNC_GENERATION', None)
+            self.assertFalse(async_generation_enabled())
+        with patch.dict(os.environ, {'ETP_ASYNC_GENERATION': 'true'}):
+            self.assertTrue(async_generation_enabled())
+    
+    def test_job_is_claimed_once(self):
+        """Um job na fila é reservado por um único worker"""
+        job, _ = enqueue_generation_job(self.session)
+        db.session.commit()
+        claimed = claim_next_job('worker-a')
+        self.assertEqual(claimed.job_id, job.job_id)
+        self.assertEqual(claimed.status, 'running')
+        self.assertIsNone(claim_next_job('worker-b'))
+    
+    def test_cancel_queued_job(self):
+        """Cancelar um job na fila o finaliza sem passar pelo worker"""
+        job, _ = enqueue_generation_job(self.session)
+        request_cancel(job)
+        db.session.commit()
+        self.assertEqual(get_job(job.job_id).status, 'cancelled')
+        self.assertIsNone(claim_next_job('worker-a'))
+    
+    def test_runner_completes_job_with_section_progress(self):
+        """O worker gera o documento, grava as seções e o progresso do job"""
+        generator = DynamicEtpGenerator('sk-test', max_workers=4)
+        generator.llm = LlmGateway(client=type('Client', (), {'chat': type('Chat', (), {'completions': _FakeStreamingCompletions()})()})())
+        generator._build_section_messages = lambda info, session_data: [{'role': 'user', 'content': info['section']}]
+        
+        job, _ = enqueue_generation_job(self.session)
+        db.session.commit()
+        claim_next_job('worker-a')
+        
+        status = EtpJobRunner(generator, poll_interval=0.1).run(job.job_id)
+        
+        self.assertEqual(status, 'completed')
+        finished = get_job(job.job_id).to_dict()
+        self.assertEqual(finished['progress'], {'sections_done': 14, 'sections_total': 14})
+        self.assertEqual([s['section'] for s in finished['sections']], list(range(1, 15)))
+        self.assertIn("Conteúdo da seção", EtpSession.query.filter_by(session_id='s1').first().generated_etp)
+        self.assertEqual(EtpSection.query.filter_by(variant='final').count(), 14)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider.DatabaseConfig import db, metadata, get_engine
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.dto.EtpDto import EtpSession, EtpSection
+from domain.services.etp_jobs import EtpJobRunner, claim_next_job, get_job
+from domain.services.etp_pregeneration import adopt_speculative_job, maybe_pregenerate, pregenerated_draft
+from domain.interfaces.dataprovider.LlmGateway import LlmGateway
+from domain.usecase.etp.etp_generator_dynamic import DynamicEtpGenerator
+
+ENABLED = {'ETP_PREGENERATION_ENABLED': 'true', 'ETP_ASYNC_GENERATION': 'true'}
+
+
+class _FakeStreamingCompletions:
+    """Simula client.chat.completions.create(stream=True) contando as chamadas"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        title = kwargs['messages'][-1]['content']
+        delta = type('Delta', (), {'content': f"{title}\n\nConteúdo da seção"})()
+        yield type('Chunk', (), {'choices': [type('Choice', (), {'delta': delta})()]})()
+
+
+class TestEtpPregeneration(unittest.TestCase):
+    """Testes da pré-geração especulativa do ETP"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'pregen.db')}")
+        metadata.create_all(bind=self.engine)
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+
+        self.session = EtpSession(session_id='s1', conversation_stage='path_selected')
+        self.session.set_answers({'1': 'manutenção de computadores', '2': 'garantia', '3': 'anual'})
+        db.session.add(self.session)
+        db.session.commit()
+
+        self.completions = _FakeStreamingCompletions()
+        self.generator = DynamicEtpGenerator('sk-test', max_workers=4)
+        self.generator.llm = LlmGateway(client=type('Client', (), {
+            'chat': type('Chat', (), {'completions': self.completions})()
+        })())
+        self.generator._build_section_messages = lambda info, session_data: [
+            {'role': 'user', 'content': f"{info['section']} {session_data['answers'].get('2', '')}"}
+        ]
+
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _session_data(self):
+        return {'session_id': 's1', 'answers': self.session.get_answers(), 'question_sections': {}}
+
+    def _run_pending_job(self):
+        job = claim_next_job('worker-a')
+        status = EtpJobRunner(self.generator, poll_interval=0.1).run(job.job_id)
+        # O runner encerra a sessão do banco ao terminar
+        self.session = EtpSession.query.filter_by(session_id='s1').first()
+        return status
+
+    def test_draft_served_until_session_state_changes(self):
+        """Rascunho não altera a sessão e é entregue sem chamadas enquanto o estado não muda"""
+        self.assertIsNone(maybe_pregenerate(self.generator, self.session, self._session_data()))
+
+        with mock.patch.dict(os.environ, ENABLED):
+            job = maybe_pregenerate(self.generator, self.session, self._session_data())
+            db.session.commit()
+            self.assertTrue(job.speculative)
+            self.assertEqual(self._run_pending_job(), 'completed')
+            # Mesmo estado já rascunhado: nada a enfileirar
+            self.assertIsNone(maybe_pregenerate(self.generator, self.session, self._session_data()))
+
+        self.assertIsNone(self.session.generated_etp)
+        calls = self.completions.calls
+
+        content, summary = pregenerated_draft(self.generator, self.session, self._session_data())
+        self.assertIn('Conteúdo da seção', content)
+        self.assertEqual(summary['sections_reused'], summary['sections_total'])
+        self.assertEqual(self.completions.calls, calls)
+
+        self.session.set_answers(dict(self.session.get_answers(), **{'2': 'garantia de 36 meses'}))
+        db.session.commit()
+        self.assertIsNone(pregenerated_draft(self.generator, self.session, self._session_data()))
+
+    def test_draft_after_delivery_keeps_the_delivered_sections(self):
+        """Rascunho de uma sessão já gerada vai para a variante draft; as linhas final só mudam na adoção"""
+        with mock.patch.dict(os.environ, ENABLED):
+            maybe_pregenerate(self.generator, self.session, self._session_data())
+            db.session.commit()
+            self._run_pending_job()
+        content, _ = pregenerated_draft(self.generator, self.session, self._session_data())
+        self.session.generated_etp = content
+        db.session.commit()
+        # Seção ajustada depois da entrega (regeneração isolada)
+        row = EtpSection.query.filter_by(variant='final', section_number=3).one()
+        row.content = 'Seção 3 ajustada pelo usuário'
+        db.session.commit()
+        delivered = {r.section_number: r.content for r in EtpSection.query.filter_by(variant='final')}
+
+        with mock.patch.dict(os.environ, ENABLED):
+            # O usuário escolhe de novo uma opção: novo estado, novo rascunho
+            self.session.set_answers(dict(self.session.get_answers(), **{'3': 'bienal'}))
+            db.session.commit()
+            self.assertIsNotNone(maybe_pregenerate(self.generator, self.session, self._session_data()))
+            db.session.commit()
+            self.assertEqual(self._run_pending_job(), 'completed')
+
+        self.assertEqual(self.session.generated_etp, content)
+        self.assertEqual({r.section_number: r.content for r in EtpSection.query.filter_by(variant='final')}, delivered)
+        draft_rows = EtpSection.query.filter_by(variant='draft').all()
+        self.assertEqual(len(draft_rows), len(delivered))
+        # Seções com entradas inalteradas foram reaproveitadas da versão entregue, com o ajuste
+        self.assertIn('Seção 3 ajustada pelo usuário', [r.content for r in draft_rows])
+
+        # Adotado no clique em gerar: as seções do rascunho passam a ser as da variante final
+        adopted, _ = pregenerated_draft(self.generator, self.session, self._session_data())
+        db.session.commit()
+        self.assertIn('Seção 3 ajustada pelo usuário', adopted)
+        self.assertEqual({r.section_number: r.content for r in EtpSection.query.filter_by(variant='final')},
+                         {r.section_number: r.content for r in draft_rows})
+
+    def test_daily_cap_limits_speculative_spend(self):
+        with mock.patch.dict(os.environ, ENABLED), \
+                mock.patch('domain.services.etp_pregeneration.PREGENERATION_DAILY_SECTIONS', 14):
+            maybe_pregenerate(self.generator, self.session, self._session_data())
+            db.session.commit()
+            self._run_pending_job()
+
+            self.session.set_answers(dict(self.session.get_answers(), **{'2': 'outra garantia'}))
+            self.assertIsNone(maybe_pregenerate(self.generator, self.session, self._session_data()))
+
+    def test_click_adopts_or_cancels_running_draft(self):
+        """Job especulativo ativo: mesmo estado é promovido; estado diferente é cancelado"""
+        with mock.patch.dict(os.environ, ENABLED):
+            job = maybe_pregenerate(self.generator, self.session, self._session_data())
+            db.session.commit()
+
+            adopted = adopt_speculative_job(self.generator, self.session, self._session_data())
+            db.session.commit()
+            self.assertEqual(adopted.job_id, job.job_id)
+            self.assertFalse(get_job(job.job_id).speculative)
+            # Promovido, o job grava o documento da sessão
+            self._run_pending_job()
+            self.assertIsNotNone(self.session.generated_etp)
+
+            self.session.conversation_stage = 'done'
+            self.session.set_answers(dict(self.session.get_answers(), **{'3': 'bienal'}))
+            other = maybe_pregenerate(self.generator, self.session, self._session_data())
+            db.session.commit()
+            self.session.set_answers(dict(self.session.get_answers(), **{'3': 'trienal'}))
+            self.assertIsNone(adopt_speculative_job(self.generator, self.session, self._session_data()))
+            db.session.commit()
+            self.assertEqual(get_job(other.job_id).status, 'cancelled')
+
+    def test_promotion_during_generation_writes_the_document(self):
+        """Promovido depois que o worker leu o job: o rascunho não sobrescreve a promoção"""
+        with mock.patch.dict(os.environ, ENABLED):
+            job = maybe_pregenerate(self.generator, self.session, self._session_data())
+            db.session.commit()
+            claimed = claim_next_job('worker-a')
+            runner = EtpJobRunner(self.generator, poll_interval=0.1)
+            complete = runner._complete_speculative
+
+            def promote_then_complete(running_job, sections):
+                # O clique chega entre a leitura do job pelo worker e a conclusão
+                self.assertIsNotNone(adopt_speculative_job(self.generator, self.session, self._session_data()))
+                return complete(running_job, sections)
+
+            with mock.patch.object(runner, '_complete_speculative', side_effect=promote_then_complete):
+                self.assertEqual(runner.run(claimed.job_id), 'completed')
+
+            self.session = EtpSession.query.filter_by(session_id='s1').first()
+            self.assertIsNotNone(self.session.generated_etp)
+            self.assertFalse(get_job(job.job_id).speculative)
+            self.assertNotIn('sections', get_job(job.job_id).get_params())
+
+            # Concluído como rascunho, o job não é mais promovido
+            self.session.set_answers(dict(self.session.get_answers(), **{'3': 'bienal'}))
+            db.session.commit()
+            draft = maybe_pregenerate(self.generator, self.session, self._session_data())
+            db.session.commit()
+            self.assertEqual(self._run_pending_job(), 'completed')
+            self.assertIsNone(adopt_speculative_job(self.generator, self.session, self._session_data()))
+            self.assertTrue(get_job(draft.job_id).speculative)
+
+
+if __name__ == '__main__':
+    unittest.main()
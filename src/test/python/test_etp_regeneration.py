@@ -0,0 +1,135 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider.DatabaseConfig import db, metadata, get_engine
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.dto.EtpDto import EtpSession, EtpRegenerationCheckpoint
+from domain.services.etp_regeneration import (
+    EtpRegenerator, TokenBudget, prepare_run, run_summary, select_sessions
+)
+from domain.usecase.etp.etp_generator_dynamic import DynamicEtpGenerator
+
+
+class _PromptGenerator(DynamicEtpGenerator):
+    """Prompt determinístico, chamada simulada de 100 tokens e falha opcional numa sessão"""
+
+    def __init__(self, version=1, failing_answer=None):
+        super().__init__('sk-test', max_workers=4)
+        self.version = version
+        self.failing_answer = failing_answer
+        self.calls = 0
+
+    def _build_section_messages(self, section_info, session_data):
+        answer = session_data['answers'].get('1', '')
+        return [{'role': 'user', 'content': f"v{self.version}|{section_info['section']}|{answer}"}]
+
+    def _complete_section(self, section_info, messages, selection=None):
+        if self.failing_answer and messages[-1]['content'].endswith(self.failing_answer):
+            raise RuntimeError('modelo indisponível')
+        self.calls += 1
+        self._call_usage.tokens = 100
+        return f"{section_info['section']}\n\n{messages[-1]['content']}"
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestEtpRegeneration(unittest.TestCase):
+    """Testes da regeneração em lote retomável"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'regen.db')}")
+        metadata.create_all(bind=self.engine)
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+
+        for i, answer in enumerate(['elevadores', 'notebooks', 'limpeza']):
+            session = EtpSession(session_id=f's{i}', status='completed', generated_etp='ETP antigo')
+            session.set_answers({'1': answer})
+            db.session.add(session)
+        db.session.add(EtpSession(session_id='rascunho', status='active'))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _run(self, generator, run_id, limit=None, retry_failed=False):
+        prepare_run(run_id, select_sessions(), retry_failed=retry_failed)
+        return EtpRegenerator(generator, {}, concurrency=2).run(run_id, limit=limit)
+
+    def test_interrupted_run_resumes_and_unchanged_sessions_are_skipped(self):
+        generator = _PromptGenerator()
+        first = self._run(generator, 'r1', limit=1)
+        self.assertEqual((first['processed'], first['done'], first['tokens']), (1, 1, 1400))
+
+        resumed = self._run(generator, 'r1')
+        self.assertEqual(resumed['processed'], 2)
+        self.assertEqual(run_summary('r1'), {'sessions': 3, 'tokens': 4200, 'done': 3})
+        etp = EtpSession.query.filter_by(session_id='s1').one().generated_etp
+        self.assertIn('v1|1. INTRODUÇÃO|notebooks', etp)
+
+        # Nada mudou desde a última execução: nenhuma chamada nem escrita do documento
+        generator.calls = 0
+        again = self._run(generator, 'r2')
+        self.assertEqual((again['unchanged'], generator.calls), (3, 0))
+
+        # Mudança de prompt: todas as seções são refeitas
+        changed = self._run(_PromptGenerator(version=2), 'r3')
+        self.assertEqual((changed['done'], changed['sections_generated']), (3, 42))
+
+    def test_failed_session_keeps_previous_document(self):
+        report = self._run(_PromptGenerator(failing_answer='limpeza'), 'r1')
+
+        self.assertEqual((report['done'], report['failed']), (2, 1))
+        self.assertEqual(report['failures'][0]['session_id'], 's2')
+        self.assertEqual(EtpSession.query.filter_by(session_id='s2').one().generated_etp, 'ETP antigo')
+        checkpoint = EtpRegenerationCheckpoint.query.filter_by(status='failed').one()
+        self.assertIn('seções com erro', checkpoint.error)
+
+        retried = self._run(_PromptGenerator(), 'r1', retry_failed=True)
+        self.assertEqual((retried['processed'], retried['done']), (1, 1))
+
+    def test_deleted_session_marks_checkpoint_failed(self):
+        prepare_run('r1', select_sessions())
+        db.session.delete(EtpSession.query.filter_by(session_id='s1').one())
+        db.session.commit()
+
+        report = EtpRegenerator(_PromptGenerator(), {}, concurrency=2).run('r1')
+
+        self.assertEqual((report['processed'], report['done'], report['failed']), (3, 2, 1))
+        checkpoint = EtpRegenerationCheckpoint.query.filter_by(status='failed').one()
+        self.assertEqual(checkpoint.error, 'sessão não encontrada')
+        self.assertIsNotNone(checkpoint.finished_at)
+
+    def test_token_budget_waits_for_refill(self):
+        clock = _FakeClock()
+        budget = TokenBudget(6000, clock=clock, sleep=clock.sleep)
+
+        self.assertEqual(budget.acquire(5000), 5000)
+        budget.settle(5000, 6000)  # gastou mais que o reservado
+        budget.acquire(3000)
+        self.assertAlmostEqual(clock.now, 30.0)
+        self.assertEqual(TokenBudget(0).acquire(10 ** 6), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import sys
+import os
+import random
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider import DatabaseConfig
+from domain.interfaces.dataprovider.DatabaseConfig import db, get_engine
+from tools.ingest_benchmark import IngestBenchmark, _StageMemory, _current_rss_bytes, write_synthetic_pdf
+from tools.openai_standin import StandinConfig, start_standin_server
+
+_MB = 1024 * 1024
+
+
+class TestStageMemory(unittest.TestCase):
+    """A memória de cada etapa é medida só durante a etapa (ru_maxrss é cumulativo)"""
+
+    def test_allocation_peak_is_per_stage(self):
+        with _StageMemory(trace_allocations=True) as heavy:
+            block = bytearray(32 * _MB)
+            del block
+        with _StageMemory(trace_allocations=True) as light:
+            sum(range(1000))
+
+        self.assertGreaterEqual(heavy.result()['peak_alloc_mb'], 32)
+        self.assertLess(light.result()['peak_alloc_mb'], 1)
+
+    @unittest.skipIf(_current_rss_bytes() is None, "RSS atual indisponível nesta plataforma")
+    def test_rss_is_sampled_during_the_stage(self):
+        with _StageMemory() as memory:
+            block = bytearray(64 * _MB)
+            for i in range(0, len(block), 4096):
+                block[i] = 1
+            peak_inside = _current_rss_bytes()
+            del block
+
+        result = memory.result()
+        self.assertGreaterEqual(result['peak_rss_mb'], round(peak_inside / _MB, 1))
+        self.assertLess(result['rss_delta_mb'], result['peak_rss_mb'])
+        self.assertIsNone(result['peak_alloc_mb'])
+
+
+class TestIngestBenchmark(unittest.TestCase):
+    """Execução completa do benchmark sobre um corpus sintético pequeno"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.work_dir = Path(self.tmp.name)
+        self.engine = create_engine(f"sqlite:///{self.work_dir / 'benchmark.db'}")
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+
+        server, self.base_url = start_standin_server(config=StandinConfig(seed=7))
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        rng = random.Random(42)
+        self.corpus = []
+        for i in range(2):
+            path = self.work_dir / f"doc_{i}.pdf"
+            write_synthetic_pdf(path, pages=3, lines_per_page=20, rng=rng)
+            self.corpus.append(path)
+
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_report_has_memory_per_stage(self):
+        with patch.object(DatabaseConfig, 'get_engine', return_value=self.engine):
+            report = IngestBenchmark(self.corpus, self.work_dir, self.base_url, batch_size=8).run()
+
+        self.assertEqual(report['corpus']['pages'], 6)
+        self.assertEqual(list(report['stages']), ['extract', 'chunk', 'persist', 'embed', 'index'])
+        self.assertEqual(report['stages']['index']['items'], report['stages']['embed']['items'])
+        self.assertIn('process_peak_rss_mb', report)
+        for name, stage in report['stages'].items():
+            with self.subTest(stage=name):
+                self.assertIn('rss_delta_mb', stage)
+                self.assertIsNone(stage['peak_alloc_mb'])  # tracemalloc só com --trace-memory
+        self.assertEqual(report['stages']['index']['memory_measured_with'], 'embed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from domain.services.intent_router import fold, route_command, route_need
+from domain.usecase.etp.requirements_interpreter import parse_update_command
+from domain.usecase.etp.utils_parser import analyze_need_safely
+from tools.intent_router_benchmark import DEFAULT_LABELS, evaluate, load_labels
+
+
+class _FakeLlm:
+    """Responde ao analisador de necessidade e conta as chamadas"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, call_site, **kwargs):
+        self.calls += 1
+        message = type('Message', (), {'content': '{"contains_need": false}'})()
+        return type('Response', (), {'choices': [type('Choice', (), {'message': message})()]})()
+
+
+class TestIntentRouter(unittest.TestCase):
+    """Testes do roteador local de intenções"""
+
+    def test_labelled_set(self):
+        """Conjunto rotulado: sem erros nas decisões locais e chamadas ao modelo evitadas"""
+        report = evaluate(load_labels(DEFAULT_LABELS), repeat=1)
+
+        for route in ('command', 'need'):
+            self.assertEqual(report[route]['misses'], [], route)
+            self.assertEqual(report[route]['local_accuracy'], 1.0, route)
+        self.assertGreater(report['need']['avoided_llm_calls'], report['need']['llm_calls'])
+
+    def test_fold_keeps_positions(self):
+        text = 'Incluir: Certificação ÁGIL'
+        self.assertEqual(fold(text), 'incluir: certificacao agil')
+        self.assertEqual(len(fold(text)), len(text))
+
+    def test_conflicting_or_negated_commands_lose_confidence(self):
+        clear = route_command('remover 2', 5)
+        mixed = route_command('remover 2 e trocar o 3', 5)
+        self.assertEqual(mixed.intent, 'remove')
+        self.assertLess(mixed.confidence, clear.confidence)
+
+        self.assertEqual(route_command('não está bom', 5).intent, 'unclear')
+        self.assertIsNone(route_need('nossos computadores estão lentos').contains_need)
+
+    def test_usecase_interpreter_returns_requirement_ids(self):
+        requirements = [{'id': f'R{i}', 'text': f'Requisito {i}'} for i in range(1, 6)]
+
+        self.assertEqual(parse_update_command('remova 2 e o último', requirements)['items'], ['R2', 'R5'])
+        self.assertEqual(parse_update_command('nova necessidade', requirements)['intent'], 'restart_necessity')
+        self.assertEqual(parse_update_command('remover 10', requirements)['message'],
+                         'Não foi possível identificar quais requisitos remover')
+        # Números fora da lista de alvos fazem parte do texto
+        self.assertEqual(parse_update_command('remover o requisito 2 que exige garantia de 3 anos',
+                                              requirements)['items'], ['R2'])
+
+    def test_negated_or_low_confidence_commands_are_not_applied(self):
+        requirements = [{'id': f'R{i}', 'text': f'Requisito {i}'} for i in range(1, 6)]
+
+        for message in ('não remover o 2', 'nem pense em excluir o 3', 'e o 5?', 'remover 2 e trocar o 3',
+                        'não quero mudar o 3, pode remover o 4'):
+            command = parse_update_command(message, requirements)
+            self.assertEqual((command['intent'], command['items']), ('unclear', []), message)
+        self.assertLess(route_command('e o 5?', 5).confidence, 0.8)
+        self.assertEqual(parse_update_command('remover o 2', requirements)['items'], ['R2'])
+
+    def test_need_analyzer_calls_llm_only_for_ambiguous_messages(self):
+        llm = _FakeLlm()
+
+        contains_need, description = analyze_need_safely('Preciso contratar manutenção de elevadores.', llm)
+        self.assertTrue(contains_need)
+        self.assertEqual(description, 'Contratar manutenção de elevadores')
+        self.assertEqual(route_need('O órgão precisa de vigilância armada 24 horas').description,
+                         'Vigilância armada 24 horas')
+        self.assertEqual(analyze_need_safely('bom dia', llm), (False, None))
+        self.assertEqual(llm.calls, 0)
+
+        analyze_need_safely('o que é um ETP?', llm)
+        analyze_need_safely('gostaria de saber como contratar serviço de limpeza', llm)
+        self.assertEqual(llm.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,387 @@
+import unittest
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+from unittest import mock
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+import openai
+from openai.types.chat import ChatCompletion
+from prometheus_client import REGISTRY
+
+from domain.interfaces.dataprovider.LlmGateway import LlmGateway, LlmUnavailableError
+from domain.interfaces.dataprovider.LlmMetrics import record_llm_call
+from domain.interfaces.dataprovider.LlmResponseCache import LlmResponseCache
+from domain.interfaces.dataprovider.LlmHedging import HedgePolicy
+
+
+def _status_error(cls, status_code, retry_after=None):
+    headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+    response = type('Response', (), {'status_code': status_code, 'headers': headers, 'request': None})()
+    return cls(f"HTTP {status_code}", response=response, body=None)
+
+
+class _FakeCompletions:
+    """Simula client.chat.completions.create com falhas programadas"""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.failures:
+            raise self.failures.pop(0)
+        if kwargs.get('stream'):
+            return iter(['a', 'b'])
+        return 'ok'
+
+
+def _gateway(completions, **kwargs):
+    client = type('Client', (), {'chat': type('Chat', (), {'completions': completions})()})()
+    return LlmGateway(client=client, **kwargs)
+
+
+class TestLlmGateway(unittest.TestCase):
+    """Testes do gateway de chamadas ao modelo"""
+
+    @mock.patch('domain.interfaces.dataprovider.LlmGateway.time.sleep')
+    def test_retries_rate_limit_and_server_errors(self, sleep):
+        """429 e 5xx são refeitos com backoff; o Retry-After é respeitado"""
+        completions = _FakeCompletions([
+            _status_error(openai.RateLimitError, 429, retry_after=3),
+            _status_error(openai.InternalServerError, 503),
+        ])
+        gateway = _gateway(completions, max_retries=3)
+
+        self.assertEqual(gateway.chat('teste', model='gpt-4o-mini', messages=[]), 'ok')
+        self.assertEqual(len(completions.calls), 3)
+        self.assertGreaterEqual(sleep.call_args_list[0][0][0], 3)
+
+    @mock.patch('domain.interfaces.dataprovider.LlmGateway.time.sleep')
+    def test_client_errors_and_exhausted_retries_propagate(self, sleep):
+        """400 não é refeito; 429 persistente esgota as tentativas"""
+        completions = _FakeCompletions([_status_error(openai.BadRequestError, 400)])
+        with self.assertRaises(openai.BadRequestError):
+            _gateway(completions).chat('teste', model='gpt-4o-mini', messages=[])
+        self.assertEqual(len(completions.calls), 1)
+
+        completions = _FakeCompletions([_status_error(openai.RateLimitError, 429) for _ in range(5)])
+        with self.assertRaises(openai.RateLimitError):
+            _gateway(completions, max_retries=2).chat('teste', model='gpt-4o-mini', messages=[])
+        self.assertEqual(len(completions.calls), 3)
+
+    def test_timeout_per_model(self):
+        """O timeout vem do prefixo mais longo do modelo"""
+        completions = _FakeCompletions()
+        gateway = _gateway(completions, model_timeouts={'gpt-4o': 50.0}, default_timeout=10.0)
+
+        gateway.chat('teste', model='ft:gpt-4.1-mini:etp', messages=[])
+        gateway.chat('teste', model='gpt-4o-mini', messages=[])
+        gateway.chat('teste', model='outro', messages=[])
+        self.assertEqual([c['timeout'] for c in completions.calls], [180.0, 45.0, 10.0])
+        self.assertNotIn('stream', completions.calls[0])
+
+    def test_stream_holds_slot_until_consumed(self):
+        """Resposta em streaming ocupa a vaga até terminar; sem vaga, a chamada desiste"""
+        gateway = _gateway(_FakeCompletions(), max_concurrency=1, queue_timeout=0.05)
+
+        stream = gateway.chat('teste', model='gpt-4o-mini', messages=[], stream=True)
+        with self.assertRaises(LlmUnavailableError):
+            gateway.chat('teste', model='gpt-4o-mini', messages=[])
+
+        self.assertEqual(list(stream), ['a', 'b'])
+        stream.close()
+        self.assertEqual(gateway.chat('teste', model='gpt-4o-mini', messages=[]), 'ok')
+
+    def test_concurrency_is_bounded(self):
+        """Nunca há mais chamadas simultâneas que max_concurrency"""
+        active, peak = [0], [0]
+        lock = threading.Lock()
+        release = threading.Event()
+
+        class SlowCompletions:
+            def create(self, **kwargs):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                release.wait(1)
+                with lock:
+                    active[0] -= 1
+                return 'ok'
+
+        gateway = _gateway(SlowCompletions(), max_concurrency=2)
+        threads = [threading.Thread(target=gateway.chat, args=('teste',),
+                                    kwargs={'model': 'gpt-4o-mini', 'messages': []}) for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        self.assertEqual(active[0], 2)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertLessEqual(peak[0], 2)
+
+
+class TestLlmInstrumentation(unittest.TestCase):
+    """Testes das métricas e do log por chamada"""
+
+    def _usage(self, prompt, completion):
+        return type('Usage', (), {'prompt_tokens': prompt, 'completion_tokens': completion})()
+
+    def test_records_tokens_latency_and_outcome(self):
+        """Chamada comum registra tokens e resultado; falha registra o tipo de erro"""
+        usage = self._usage(120, 30)
+
+        class Completions:
+            def create(self, **kwargs):
+                return type('Response', (), {'usage': usage})()
+
+        before = REGISTRY.get_sample_value(
+            'llm_tokens_total', {'call_site': 'medido', 'model': 'gpt-4o-mini', 'kind': 'prompt'}) or 0
+        with mock.patch('domain.interfaces.dataprovider.LlmGateway.record_llm_call',
+                        wraps=record_llm_call) as record:
+            _gateway(Completions()).chat('medido', model='gpt-4o-mini', messages=[])
+            args, kwargs = record.call_args
+        self.assertEqual(args[:3], ('medido', 'gpt-4o-mini', 'ok'))
+        self.assertIs(kwargs['usage'], usage)
+        self.assertEqual(REGISTRY.get_sample_value(
+            'llm_tokens_total', {'call_site': 'medido', 'model': 'gpt-4o-mini', 'kind': 'prompt'}), before + 120)
+
+        with mock.patch('domain.interfaces.dataprovider.LlmGateway.record_llm_call') as record:
+            with self.assertRaises(openai.BadRequestError):
+                _gateway(_FakeCompletions([_status_error(openai.BadRequestError, 400)])).chat(
+                    'medido', model='gpt-4o-mini', messages=[])
+        self.assertEqual(record.call_args[0][2], 'client_error')
+
+    def test_stream_records_time_to_first_token(self):
+        """Streaming registra TTFT e o uso informado no último chunk"""
+        usage = self._usage(50, 2)
+
+        def chunk(content, usage=None):
+            delta = type('Delta', (), {'content': content})()
+            choices = [type('Choice', (), {'delta': delta})()] if content else []
+            return type('Chunk', (), {'choices': choices, 'usage': usage})()
+
+        class Completions:
+            def create(self, **kwargs):
+                self.kwargs = kwargs
+                return iter([chunk('a'), chunk('b'), chunk(None, usage)])
+
+        completions = Completions()
+        with mock.patch('domain.interfaces.dataprovider.LlmGateway.record_llm_call') as record:
+            stream = _gateway(completions).chat('medido', model='gpt-4o-mini', messages=[], stream=True)
+            record.assert_not_called()
+            list(stream)
+        args, kwargs = record.call_args
+        self.assertEqual(args[2], 'ok')
+        self.assertIsNotNone(kwargs['ttft'])
+        self.assertIs(kwargs['usage'], usage)
+        self.assertEqual(completions.kwargs['stream_options'], {'include_usage': True})
+
+    def test_log_line_is_structured(self):
+        """Cada chamada gera uma linha JSON com os campos da chamada"""
+        with self.assertLogs('domain.interfaces.dataprovider.LlmMetrics', level='INFO') as logs:
+            record_llm_call('medido', 'gpt-4o-mini', 'ok', 0.5, ttft=0.1, usage=self._usage(10, 5))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['call_site'], 'medido')
+        self.assertEqual(line['latency_ms'], 500.0)
+        self.assertEqual(line['ttft_ms'], 100.0)
+        self.assertEqual((line['prompt_tokens'], line['completion_tokens']), (10, 5))
+
+
+
+def _completion(content):
+    return ChatCompletion.model_validate({
+        'id': 'cmpl-1', 'object': 'chat.completion', 'created': 1, 'model': 'gpt-4o-mini',
+        'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}
+    })
+
+
+class TestLlmResponseCache(unittest.TestCase):
+    """Testes do cache exato de respostas"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'responses.sqlite3')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _gateway(self, cache):
+        class Completions:
+            calls = 0
+
+            def create(self, **kwargs):
+                Completions.calls += 1
+                return _completion(f"resposta {Completions.calls}")
+
+        self.completions = Completions
+        return _gateway(Completions(), cache=cache)
+
+    def test_identical_low_temperature_calls_hit_cache(self):
+        """Mesma chamada com temperatura baixa é servida do cache; mudar parâmetros gera nova chamada"""
+        cache = LlmResponseCache(path=self.path, enabled=True)
+        gateway = self._gateway(cache)
+        call = dict(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'oi'}], temperature=0.1, max_tokens=50)
+
+        first = gateway.chat('teste', **call)
+        second = gateway.chat('teste', **call)
+        self.assertEqual(second.choices[0].message.content, first.choices[0].message.content)
+        self.assertEqual(self.completions.calls, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        gateway.chat('teste', **dict(call, max_tokens=60))
+        gateway.chat('teste', **call, cache=False)
+        self.assertEqual(self.completions.calls, 3)
+
+    def test_high_temperature_and_disabled_cache_are_skipped(self):
+        """Temperatura alta (ou não informada) e cache desligado sempre chamam o modelo"""
+        gateway = self._gateway(LlmResponseCache(path=self.path, enabled=True, max_temperature=0.3))
+        for _ in range(2):
+            gateway.chat('teste', model='gpt-4o-mini', messages=[], temperature=0.7)
+            gateway.chat('teste', model='gpt-4o-mini', messages=[])
+        self.assertEqual(self.completions.calls, 4)
+
+        gateway = self._gateway(LlmResponseCache(path=self.path, enabled=False))
+        for _ in range(2):
+            gateway.chat('teste', model='gpt-4o-mini', messages=[], temperature=0)
+        self.assertEqual(self.completions.calls, 2)
+
+    def test_ttl_and_size_eviction(self):
+        """Entradas expiram pelo TTL e as menos usadas saem quando o limite de tamanho é excedido"""
+        cache = LlmResponseCache(path=self.path, enabled=True, ttl_seconds=-1)
+        cache.put('teste', 'm', 'k', _completion('x'))
+        self.assertIsNone(cache.get('teste', 'k'))
+
+        size = len(_completion('x').model_dump_json())
+        cache = LlmResponseCache(path=self.path, enabled=True, max_bytes=size * 2)
+        cache.put('teste', 'm', 'a', _completion('x'))
+        cache.put('teste', 'm', 'b', _completion('x'))
+        cache.get('teste', 'a')
+        cache.put('teste', 'm', 'c', _completion('x'))
+        self.assertIsNotNone(cache.get('teste', 'a'))
+        self.assertIsNone(cache.get('teste', 'b'))
+        self.assertIsNotNone(cache.get('teste', 'c'))
+
+
+def _chunk(content):
+    delta = type('Delta', (), {'content': content})()
+    return type('Chunk', (), {'choices': [type('Choice', (), {'delta': delta})()], 'usage': None})()
+
+
+class _SlowStream:
+    """Stream que só entrega o primeiro chunk após `delay`; close() o interrompe"""
+
+    def __init__(self, label, delay, usage=None):
+        self.label = label
+        self.delay = delay
+        self.usage = usage
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        if self.closed.wait(self.delay):
+            raise openai.APIConnectionError(request=None)
+        yield _chunk(self.label)
+        if self.usage is not None:
+            yield type('Chunk', (), {'choices': [], 'usage': self.usage})()
+
+    def close(self):
+        self.closed.set()
+
+
+class TestLlmHedging(unittest.TestCase):
+    """Testes das requisições duplicadas contra latência de cauda"""
+
+    def _policy(self, budget_ratio=1.0):
+        policy = HedgePolicy(enabled=True, call_sites={'secao'}, percentile=50, budget_ratio=budget_ratio,
+                             burst=1, min_delay=0.05, min_samples=3)
+        for _ in range(3):
+            policy.observe('secao', 0.05)
+        return policy
+
+    def _hedges(self, result):
+        return REGISTRY.get_sample_value('llm_hedges_total', {'call_site': 'secao', 'result': result}) or 0
+
+    def _wasted(self, kind):
+        return REGISTRY.get_sample_value('llm_hedge_wasted_tokens_total', {'call_site': 'secao', 'kind': kind}) or 0
+
+    def _wait_wasted(self, kind, expected, timeout=3):
+        deadline = time.monotonic() + timeout
+        while self._wasted(kind) < expected and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return self._wasted(kind)
+
+    def test_straggler_is_hedged_and_copy_wins(self):
+        """Sem resposta no percentil, a cópia é disparada e a primeira resposta vale"""
+        class Completions:
+            calls = 0
+
+            def create(self, **kwargs):
+                Completions.calls += 1
+                if Completions.calls == 1:
+                    time.sleep(1)
+                    return _completion('lenta')
+                return _completion('copia')
+
+        fired, won = self._hedges('fired'), self._hedges('won')
+        prompt, completion = self._wasted('prompt'), self._wasted('completion')
+        gateway = _gateway(Completions(), hedging=self._policy())
+        started = time.perf_counter()
+        response = gateway.chat('secao', model='gpt-4o-mini', messages=[])
+        self.assertEqual(response.choices[0].message.content, 'copia')
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual((self._hedges('fired'), self._hedges('won')), (fired + 1, won + 1))
+
+        # Sem streaming a original não é cancelada: termina, é paga e descartada
+        self.assertEqual(self._wait_wasted('completion', completion + 5), completion + 5)
+        self.assertEqual(self._wasted('prompt'), prompt + 10)
+
+    def test_budget_caps_hedges(self):
+        """Sem crédito no orçamento, a chamada lenta não é duplicada"""
+        completions = _FakeCompletions()
+        original = completions.create
+        completions.create = lambda **kwargs: (time.sleep(0.15), original(**kwargs))[1]
+
+        exhausted = self._hedges('budget_exhausted')
+        gateway = _gateway(completions, hedging=self._policy(budget_ratio=0.0))
+        self.assertEqual(gateway.chat('secao', model='gpt-4o-mini', messages=[]), 'ok')
+        self.assertEqual(len(completions.calls), 1)
+        self.assertEqual(self._hedges('budget_exhausted'), exhausted + 1)
+
+        # Call site fora da lista nunca é duplicado
+        self.assertIsNone(self._policy().delay('outro'))
+
+    def test_stream_loser_is_closed(self):
+        """Em streaming vale o primeiro token; o stream perdedor é fechado"""
+        usage = type('Usage', (), {'prompt_tokens': 12, 'completion_tokens': 1})()
+        streams = [_SlowStream('lenta', 2), _SlowStream('copia', 0, usage=usage)]
+        prompt, completion = self._wasted('prompt'), self._wasted('completion')
+
+        class Completions:
+            def create(self, **kwargs):
+                return streams.pop(0)
+
+        slow, fast = streams
+        gateway = _gateway(Completions(), hedging=self._policy(), max_concurrency=2)
+        stream = gateway.chat('secao', model='gpt-4o-mini', messages=[], stream=True)
+        self.assertEqual([c.choices[0].delta.content for c in stream if c.choices], ['copia'])
+        self.assertTrue(slow.closed.wait(1))
+        self.assertFalse(fast.closed.is_set())
+
+        # A perdedora fechada custou o prompt (o mesmo da vencedora), sem tokens gerados
+        self.assertEqual((self._wasted('prompt'), self._wasted('completion')), (prompt + 12, completion))
+
+        # As duas vagas foram devolvidas
+        for _ in range(2):
+            self.assertTrue(gateway._slots.acquire(timeout=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
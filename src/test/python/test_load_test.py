@@ -0,0 +1,108 @@
+import unittest
+import sys
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from tools.load_test import build_parser, percentile, run_load, saturation_point, start_offsets
+
+
+class _FakeAppHandler(BaseHTTPRequestHandler):
+    """Rotas da jornada com respostas mínimas; /generate enfileira um job e o primeiro download falha"""
+
+    counter = 0
+    downloads = 0
+    polls = {}
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload, content_type='application/json'):
+        body = json.dumps(payload).encode('utf-8') if content_type == 'application/json' else payload
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.path == '/api/etp-dynamic/conversation':
+            with self.lock:
+                type(self).counter += 1
+                return self._reply(200, {'success': True, 'session_id': f's{type(self).counter}'})
+        if self.path == '/api/etp-dynamic/options-if-ambiguous':
+            return self._reply(200, {'success': True, 'ambiguous': True, 'options': [{'id': 'opt_locacao'}]})
+        if self.path.endswith('/generate'):
+            job_id = 'job-' + self.path.split('/')[-2]
+            return self._reply(202, {'success': True, 'job_id': job_id, 'status': 'queued',
+                                     'status_url': f'/api/etp-dynamic/jobs/{job_id}'})
+        self._reply(200, {'success': True})
+
+    def do_GET(self):
+        if self.path.startswith('/api/etp-dynamic/jobs/'):
+            with self.lock:
+                polls = self.polls[self.path] = self.polls.get(self.path, 0) + 1
+            return self._reply(200, {'success': True, 'job': {'status': 'completed' if polls > 1 else 'running'}})
+        with self.lock:
+            type(self).downloads += 1
+            first = type(self).downloads == 1
+        if first:
+            return self._reply(403, {'success': False, 'error': 'Acesso não autorizado'})
+        self._reply(200, b'DOCX', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+
+
+class TestLoadTest(unittest.TestCase):
+    """Testes do gerador de carga do fluxo conversacional"""
+
+    def test_journeys_are_reported_per_endpoint(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeAppHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        args = build_parser().parse_args([
+            '--base-url', f'http://127.0.0.1:{server.server_address[1]}', '--users', '3',
+            '--ramp', 'linear:0.3', '--duration', '1', '--think-time', 'fixed:5', '--seed', '1',
+            '--job-poll', '0.01'
+        ])
+        report = run_load(args)
+
+        download = report['endpoints']['GET /api/etp/download/<id>']
+        self.assertGreater(download['requests'], 0)
+        self.assertIn('403', download['statuses'])
+        self.assertEqual(report['endpoints']['POST /api/etp-dynamic/session/<id>/answer']['error_rate'], 0.0)
+        # Geração em fila: cada job é consultado até concluir (2 consultas) antes do download
+        jobs = report['endpoints']['JOB generate']
+        self.assertEqual(jobs['error_rate'], 0.0)
+        self.assertEqual(report['endpoints']['GET /api/etp-dynamic/jobs/<id>']['requests'], 2 * jobs['requests'])
+        self.assertGreaterEqual(jobs['requests'], download['requests'])
+        self.assertEqual(report['journeys']['failed_steps'], {'GET /api/etp/download/<id>': report['journeys']['failed']})
+        self.assertGreater(report['journeys']['completed'], 0)
+        self.assertEqual([level['users'] for level in report['levels']][-1], 3)
+
+    def test_ramp_profiles_and_percentiles(self):
+        self.assertEqual(start_offsets('step:2,10', 5), [0, 0, 10, 10, 20])
+        self.assertEqual(start_offsets('linear:10', 2), [0, 5])
+        with self.assertRaises(ValueError):
+            start_offsets('spike', 2)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        self.assertEqual(percentile([0.2], 99), 0.2)
+
+    def test_saturation_point(self):
+        def level(users, rps, p95, errors=0.0):
+            return {'users': users, 'requests': 100, 'throughput_rps': rps, 'p95_ms': p95, 'error_rate': errors}
+
+        levels = [level(5, 10, 200), level(10, 19, 220), level(15, 19.5, 600), level(20, 19, 900)]
+        self.assertEqual(saturation_point(levels)['users'], 15)
+        self.assertEqual(saturation_point(levels)['max_throughput_users'], 10)
+        self.assertIsNone(saturation_point(levels[:2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from flask import Flask
+
+from adapter.entrypoint.health.HealthController import PROMETHEUS_AVAILABLE, metrics_bp
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """/metrics: um único endpoint (metrics_bp) usado por applicationApi e create_api"""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(metrics_bp)
+        self.client = app.test_client()
+
+    def test_token_is_required_when_configured(self):
+        with mock.patch.dict(os.environ, {'METRICS_TOKEN': 'segredo'}):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer outro'}).status_code, 401)
+            response = self.client.get('/metrics', headers={'Authorization': 'Bearer segredo'})
+
+        self.assertEqual(response.status_code, 200 if PROMETHEUS_AVAILABLE else 503)
+
+    @unittest.skipUnless(PROMETHEUS_AVAILABLE, "prometheus_client não instalado")
+    def test_exposition_format(self):
+        with mock.patch.dict(os.environ, {'METRICS_TOKEN': ''}):
+            response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+
+
+if __name__ == '__main__':
+    unittest.main()
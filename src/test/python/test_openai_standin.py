@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import random
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+import openai
+
+from domain.interfaces.dataprovider.LlmGateway import LlmGateway
+from domain.usecase.etp.utils_parser import analyze_need_safely, chat_json, parse_requirements_response_safely
+from tools.openai_standin import LatencyDistribution, StandinConfig, start_standin_server
+
+REQUIREMENTS_PROMPT = """
+Baseado na necessidade: "manutenção de elevadores"
+
+Retorne APENAS um JSON no formato:
+{
+    "suggested_requirements": [
+        {"id": "R1", "text": "Descrição do requisito", "justification": "Justificativa"},
+        {"id": "R2", "text": "Descrição do requisito", "justification": "Justificativa"}
+    ],
+    "consultative_message": "Requisitos sugeridos baseados na necessidade identificada"
+}
+"""
+
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": ["confirm", "edit"]},
+        "items": {"type": "array", "items": {"type": "object", "properties": {"id": {"type": "string"}}}},
+        "ai_response": {"type": "string"},
+    },
+    "required": ["intent", "items", "ai_response"],
+    "additionalProperties": False,
+}
+
+
+class TestOpenAIStandin(unittest.TestCase):
+    """Testes do stand-in local da API da OpenAI pelos clientes da aplicação"""
+
+    def _start(self, **kwargs):
+        server, base_url = start_standin_server(config=StandinConfig(seed=7, **kwargs))
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, LlmGateway(api_key='test', base_url=base_url, max_retries=0)
+
+    def test_chat_outputs_parse_through_utils_parser(self):
+        _, llm = self._start()
+        messages = [{"role": "user", "content": REQUIREMENTS_PROMPT}]
+
+        response = llm.chat('suggest_requirements', model='gpt-4o-mini', messages=messages, cache=False)
+        parsed = parse_requirements_response_safely(response.choices[0].message.content)
+        self.assertEqual([r['id'] for r in parsed['suggested_requirements']], ['R1', 'R2'])
+        self.assertGreater(response.usage.completion_tokens, 0)
+
+        structured = chat_json(llm, 'analyze_response', 'gpt-4o-mini', messages, 'analyze', RESPONSE_SCHEMA,
+                               cache=False)
+        self.assertEqual(structured['intent'], 'confirm')
+        self.assertEqual([item['id'] for item in structured['items']], ['R1', 'R2'])
+
+        # Determinístico: mesma requisição, mesmo conteúdo
+        again = llm.chat('suggest_requirements', model='gpt-4o-mini', messages=messages, cache=False)
+        self.assertEqual(again.choices[0].message.content, response.choices[0].message.content)
+
+    def test_streaming_and_canned_responses(self):
+        canned = [{"match": "contains_need", "content": {"contains_need": True, "need_description": "elevadores"}}]
+        server, llm = self._start(tokens_per_second=1000, responses=canned)
+
+        stream = llm.chat('generate_section', model='gpt-4o-mini', stream=True,
+                          messages=[{"role": "user", "content": "Redija a seção.\n- Título: 1. DESCRIÇÃO"}])
+        chunks = list(stream)
+        text = ''.join(c.choices[0].delta.content or '' for c in chunks if c.choices)
+        self.assertTrue(text.startswith('1. DESCRIÇÃO'))
+        self.assertEqual(chunks[-1].usage.completion_tokens, len(text.split()))
+
+        self.assertEqual(analyze_need_safely('o que é um ETP?', llm), (True, 'elevadores'))
+        self.assertEqual(server.RequestHandlerClass.config.stats, {'chat_stream': 1, 'chat': 1})
+
+    def test_rate_limit_injection(self):
+        server, _ = self._start(rate_limit_rate=1.0, retry_after=2)
+        client = openai.OpenAI(api_key='test', base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+                               max_retries=0)
+
+        with self.assertRaises(openai.RateLimitError) as ctx:
+            client.embeddings.create(model='text-embedding-3-small', input=['a'])
+        self.assertEqual(ctx.exception.response.headers['retry-after'], '2')
+        self.assertEqual(server.RequestHandlerClass.config.stats, {'rate_limited': 1})
+
+    def test_latency_distributions_are_seeded(self):
+        spec = LatencyDistribution.parse('lognormal:400,0.5')
+        first = [spec.sample(random.Random(3)) for _ in range(3)]
+        self.assertEqual(first, [spec.sample(random.Random(3)) for _ in range(3)])
+        self.assertEqual(LatencyDistribution.parse('fixed:20').sample(random.Random()), 20.0)
+        with self.assertRaises(ValueError):
+            LatencyDistribution.parse('pareto:1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import sys
+import os
+import io
+import random
+import tempfile
+from unittest.mock import patch
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+import pdfplumber
+from pdfplumber.page import Page
+
+from domain.usecase.utils.pdf_pages import iter_pdf_pages
+from adapter.entrypoint.kb.KbController import chunk_text, iter_chunks
+
+
+def _build_pdf(pages):
+    """PDF mínimo com uma linha de texto (Helvetica) por página; '' gera página sem texto"""
+    count = len(pages)
+    font_id = 3 + 2 * count
+    kids = ' '.join(f"{3 + 2 * i} 0 R" for i in range(count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {count} >>".encode(),
+    ]
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode() if text else b""
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _reference_chunk_text(text, chunk_size=1000, overlap=200):
+    """chunk_text anterior ao streaming (texto inteiro em memória)"""
+    chunks = []
+    text_length = len(text)
+
+    for i in range(0, text_length, chunk_size - overlap):
+        chunk = text[i:i + chunk_size]
+        if chunk.strip():
+            chunks.append(chunk.strip())
+
+        if i + chunk_size >= text_length:
+            break
+
+    return chunks
+
+
+class TestIterPdfPages(unittest.TestCase):
+    """Testes da extração de PDF página a página"""
+
+    PAGES = ['Primeira pagina', '', 'Terceira pagina', 'Quarta pagina']
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'doc.pdf')
+        with open(self.path, 'wb') as f:
+            f.write(_build_pdf(self.PAGES))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pages_match_pdfplumber_in_order(self):
+        with pdfplumber.open(self.path) as pdf:
+            expected = [(page.page_number, page.extract_text() or "") for page in pdf.pages]
+
+        self.assertEqual(list(iter_pdf_pages(self.path)), expected)
+        self.assertEqual([text for _, text in expected], self.PAGES)
+
+    def test_accepts_binary_stream(self):
+        with open(self.path, 'rb') as f:
+            stream = io.BytesIO(f.read())
+        self.assertEqual(list(iter_pdf_pages(stream)), list(enumerate(self.PAGES, start=1)))
+
+    def test_each_page_cache_is_flushed_before_the_next(self):
+        events = []
+        original_flush = Page.flush_cache
+
+        def flush_cache(page, *args, **kwargs):
+            events.append(('flush', page.page_number))
+            return original_flush(page, *args, **kwargs)
+
+        with patch.object(Page, 'flush_cache', flush_cache):
+            for number, _ in iter_pdf_pages(self.path):
+                events.append(('page', number))
+
+        expected = [event for n in range(1, len(self.PAGES) + 1) for event in (('page', n), ('flush', n))]
+        self.assertEqual(events, expected)
+
+
+class TestIterChunks(unittest.TestCase):
+    """iter_chunks sobre páginas produz os mesmos chunks do chunk_text anterior"""
+
+    def test_matches_previous_chunk_text(self):
+        rng = random.Random(28)
+        alphabet = 'abcde \n'
+        for _ in range(200):
+            pages = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 900)))
+                     for _ in range(rng.randint(0, 6))]
+            chunk_size = rng.randint(50, 400)
+            overlap = rng.randint(0, chunk_size - 1)
+            text = "\n".join(page for page in pages if page)
+            with self.subTest(pages=len(pages), chunk_size=chunk_size, overlap=overlap):
+                expected = _reference_chunk_text(text, chunk_size, overlap)
+                self.assertEqual(list(iter_chunks(pages, chunk_size, overlap)), expected)
+                self.assertEqual(chunk_text(text, chunk_size, overlap), expected)
+
+    def test_edges(self):
+        self.assertEqual(chunk_text(''), [])
+        self.assertEqual(list(iter_chunks(['', '', ''])), [])
+        self.assertEqual(list(iter_chunks(['a' * 1000])), ['a' * 1000])
+        self.assertEqual(list(iter_chunks(['a' * 1001])), _reference_chunk_text('a' * 1001))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from domain.usecase.etp.prompt_budget import PromptBuilder, compact_results, count_tokens, budget_context
+from domain.usecase.etp.etp_generator_dynamic import DynamicEtpGenerator
+
+MODEL = "gpt-4o-mini"
+
+
+def _chunk(chunk_id, content, score, title='Requisitos'):
+    return {'chunk_id': chunk_id, 'doc_id': 7, 'content': content, 'section_title': title,
+            'objective_slug': 'generic', 'bm25_score': score, 'faiss_score': 0.0, 'hybrid_score': score}
+
+
+class TestPromptBudget(unittest.TestCase):
+    """Testes da montagem de prompts com orçamento de tokens"""
+
+    def test_context_is_compacted_by_relevance_within_budget(self):
+        """Sem ids/scores nem duplicatas, mais relevantes primeiro e dentro do orçamento"""
+        results = [
+            _chunk(1, 'Garantia mínima de 12 meses. ' * 40, 0.2),
+            _chunk(2, 'Processador com 8 núcleos e 16 GB de RAM.', 0.9),
+            _chunk(3, 'Processador com  8 núcleos e 16 GB de RAM. ', 0.8),
+            _chunk(4, 'Assistência técnica on-site. ' * 40, 0.5),
+        ]
+        self.assertEqual(compact_results(results)[0], '[Requisitos]: Processador com 8 núcleos e 16 GB de RAM.')
+        self.assertEqual(len(compact_results(results)), 3)
+
+        builder = PromptBuilder('teste', MODEL, 200)
+        context = builder.context('context', results)
+        self.assertNotIn('chunk_id', context)
+        self.assertNotIn('Garantia', context)
+        self.assertTrue(context.endswith('...'))
+        self.assertLessEqual(count_tokens(context, MODEL), 200)
+
+        fields = builder.finish()
+        self.assertEqual(fields['prompt_tokens'], builder.parts['context']['used'])
+        self.assertGreater(fields['tokens_saved'], 0)
+
+    def test_unused_share_flows_to_later_parts(self):
+        """Instruções nunca são cortadas; a sobra das respostas fica para o contexto"""
+        builder = PromptBuilder('teste', MODEL, 1000, {'answers': 0.5, 'context': 0.5})
+        used = builder.instructions('x' * 350)
+        self.assertEqual(builder.budget('answers'), (1000 - used) // 2)
+
+        answers = builder.fit_answers('answers', ['Notebooks', 'curta'])
+        self.assertEqual(answers, ['Notebooks', 'curta'])
+        self.assertEqual(builder.budget('context'), 1000 - builder.used)
+
+    def test_long_answers_share_the_budget(self):
+        """Respostas curtas entram inteiras e as longas dividem o saldo"""
+        builder = PromptBuilder('teste', MODEL, 300, {'answers': 1.0})
+        long_answer = 'detalhamento extenso da necessidade ' * 100
+        answers = builder.fit_answers('answers', [long_answer, '50 unidades', long_answer])
+        self.assertEqual(answers[1], '50 unidades')
+        self.assertTrue(answers[0].endswith('...'))
+        self.assertLessEqual(sum(count_tokens(a, MODEL) for a in answers), 300)
+
+    def test_budget_context_without_results(self):
+        self.assertEqual(budget_context('teste', MODEL, []), '(nenhum exemplo encontrado)')
+
+    def test_section_prompt_respects_token_budget(self):
+        """Prompt da seção de requisitos fica no orçamento, mantendo instruções e subseções"""
+        generator = DynamicEtpGenerator('sk-test')
+        section_info = next(s for s in generator.etp_structure if 'REQUISITO' in s['section'].upper())
+        session_data = {'answers': {'1': 'Aquisição de notebooks para a secretaria. ' * 200, '2': 'Garantia'}}
+        chunks = [_chunk(i, f'Requisito recuperado número {i}. ' * 80, 1.0 - i / 10) for i in range(5)]
+
+        with patch('domain.usecase.etp.etp_generator_dynamic.search_requirements', return_value=chunks), \
+                patch('domain.usecase.etp.etp_generator_dynamic.SECTION_PROMPT_TOKENS', 2500):
+            messages = generator._build_section_messages(section_info, session_data)
+
+        prompt = messages[1]['content']
+        total = sum(count_tokens(m['content'], generator.SECTION_MODEL) for m in messages)
+        self.assertLessEqual(total, 2500)
+        self.assertIn('CONTEXTO RECUPERADO', prompt)
+        self.assertIn('Requisito recuperado número 0', prompt)
+        self.assertIn('- Garantia', prompt)
+        for subsection in section_info['subsections']:
+            self.assertIn(subsection, prompt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider.DatabaseConfig import db, metadata, get_engine
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.dto.EtpDto import EtpSession, AcceptedRequirementSet
+from domain.services.requirements_cache import RequirementSemanticCache, normalize_necessity
+
+# Embeddings fixos: sinônimos apontam para a mesma direção
+VECTORS = {
+    'notebooks': [1.0, 0.0, 0.0],
+    'computadores portateis': [0.98, 0.2, 0.0],
+    'servicos de limpeza predial': [0.0, 0.0, 1.0],
+}
+
+
+class _FakeLlm:
+    """Simula LlmGateway.embed com vetores fixos"""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, call_site, model, input):
+        self.calls.append(input[0])
+        embedding = VECTORS.get(input[0], [0.0, 1.0, 0.0])
+        item = type('Item', (), {'embedding': embedding})()
+        return type('Response', (), {'data': [item]})()
+
+
+class TestRequirementSemanticCache(unittest.TestCase):
+    """Testes do cache semântico de sugestões de requisitos"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'etp.db')}")
+        metadata.create_all(bind=self.engine)
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+
+        self.session = EtpSession(session_id='s1')
+        db.session.add(self.session)
+        db.session.commit()
+        self.llm = _FakeLlm()
+        self.cache = RequirementSemanticCache(llm=self.llm, threshold=0.9, enabled=True)
+
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_normalize_necessity(self):
+        """Acentos, pontuação e verbo de compra inicial não fazem parte da chave"""
+        self.assertEqual(normalize_necessity('Aquisição de Notebooks.'), 'notebooks')
+        self.assertEqual(normalize_necessity('Compra de computadores portáteis'), 'computadores portateis')
+        self.assertEqual(normalize_necessity('Locação de veículos'), 'locacao de veiculos')
+
+    def test_equivalent_necessity_returns_accepted_set_with_provenance(self):
+        """Necessidade semelhante acima do limiar devolve o conjunto aceito; diferente não"""
+        requirements = [{'id': 'R7', 'text': 'Processador de 8 núcleos', 'justification': 'desempenho'},
+                        {'id': 'R9', 'text': 'Garantia de 36 meses'}]
+        self.cache.remember(self.session, 'Aquisição de notebooks', requirements)
+        db.session.commit()
+
+        cached = self.cache.lookup('Compra de computadores portáteis', 'teste')
+        db.session.commit()
+        self.assertIsNotNone(cached)
+        self.assertEqual([r['id'] for r in cached['requirements']], ['R1', 'R2'])
+        self.assertEqual(cached['requirements'][0]['text'], 'Processador de 8 núcleos')
+        self.assertEqual(cached['provenance']['matched_necessity'], 'Aquisição de notebooks')
+        self.assertGreaterEqual(cached['provenance']['similarity'], 0.9)
+        self.assertEqual(AcceptedRequirementSet.query.one().hits, 1)
+
+        self.assertIsNone(self.cache.lookup('Serviços de limpeza predial', 'teste'))
+
+    def test_exact_match_skips_embedding_and_latest_acceptance_wins(self):
+        """Mesma necessidade normalizada dispensa embedding; nova aceitação substitui a anterior"""
+        self.cache.remember(self.session, 'Aquisição de notebooks', [{'text': 'Tela de 14 polegadas'}])
+        db.session.commit()
+        self.cache.remember(self.session, 'aquisição de NOTEBOOKS', [{'text': 'Tela de 15 polegadas'}])
+        db.session.commit()
+        self.assertEqual(AcceptedRequirementSet.query.count(), 1)
+
+        embeds_before = len(self.llm.calls)
+        cached = self.cache.lookup('Aquisição de notebooks!', 'teste')
+        self.assertEqual(len(self.llm.calls), embeds_before)
+        self.assertEqual(cached['provenance']['similarity'], 1.0)
+        self.assertEqual(cached['requirements'][0]['text'], 'Tela de 15 polegadas')
+
+    def test_disabled_or_empty_sets_are_ignored(self):
+        """Cache desligado não consulta nada; conjunto sem texto não é gravado"""
+        self.assertIsNone(self.cache.remember(self.session, 'Aquisição de notebooks', [{'id': 'R1'}]))
+        disabled = RequirementSemanticCache(llm=self.llm, enabled=False)
+        self.assertIsNone(disabled.lookup('Aquisição de notebooks', 'teste'))
+        self.assertEqual(self.llm.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
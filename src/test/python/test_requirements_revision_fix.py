@@ -289,6 +289,20 @@ class TestRequirementsRevisionFix(unittest.TestCase):
         # Deve ser ignorado no parsing
         self.assertEqual(command["intent"], "unclear")
 
+    def test_ambiguous_commands_are_not_applied(self):
+        """Comandos com confiança abaixo do limiar pedem esclarecimento em vez de alterar a lista"""
+        for user_input in ["remover 2 e trocar o 3", "o 2 está confuso", "e o 5?"]:
+            with self.subTest(user_input=user_input), \
+                    patch('domain.services.requirements_interpreter.record_decision') as record:
+                command = parse_update_command(user_input, self.sample_requirements)
+                new_reqs, message = apply_update_command(command, self.sample_requirements, self.necessity)
+
+                self.assertEqual(command["intent"], "unclear")
+                self.assertEqual(new_reqs, self.sample_requirements)
+                self.assertIn("Pode confirmar?", message)
+                # Pedido de esclarecimento, sem chamada ao modelo
+                record.assert_called_once_with('command', 'clarify')
+
 
 class TestChatControllerIntegration(unittest.TestCase):
     """Testes de integração com ChatController"""
@@ -0,0 +1,165 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from flask import Flask
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider.DatabaseConfig import db, metadata, get_engine
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.dto.EtpDto import EtpSession, EtpSection
+from domain.services import etp_dynamic
+from domain.services.etp_sections import (
+    generate_etp_incremental, load_sections, question_sections, regenerate_section
+)
+from domain.usecase.etp.etp_generator_dynamic import DynamicEtpGenerator
+from adapter.entrypoint.etp import EtpController, EtpDynamicController
+
+
+class _CountingGenerator(DynamicEtpGenerator):
+    """Prompt determinístico; geração e ajuste simulados, 100 tokens por chamada"""
+
+    def __init__(self):
+        super().__init__('sk-test', max_workers=4)
+        self.calls = []
+
+    def _build_section_messages(self, section_info, session_data):
+        answer = session_data['answers'].get('1', '')
+        return [{'role': 'user', 'content': f"{section_info['section']}|{answer}"}]
+
+    def _complete_section(self, section_info, messages, selection=None, cache=True):
+        self.calls.append(('generate' if cache else 'regenerate', int(section_info['section'].split('.')[0])))
+        self._call_usage.tokens = 100
+        return f"{section_info['section']}\n\n{messages[-1]['content']}"
+
+    def _adjust_section(self, section_content, feedback, section_info, cache=True):
+        self.calls.append(('adjust' if cache else 'adjust_uncached', int(section_info['section'].split('.')[0])))
+        self._call_usage.tokens = 100
+        return f"{section_content} [{feedback}]"
+
+
+class TestSectionRegeneration(unittest.TestCase):
+    """Testes da regeneração isolada de uma seção"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'sections.db')}")
+        metadata.create_all(bind=self.engine)
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+
+        self.session = EtpSession(session_id='s1', status='active')
+        self.session.set_answers({'1': 'elevadores'})
+        db.session.add(self.session)
+        db.session.commit()
+        self.generator = _CountingGenerator()
+
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _session_data(self):
+        return {'session_id': 's1', 'answers': self.session.get_answers(), 'question_sections': question_sections([])}
+
+    def _generate(self):
+        self.generator.calls = []
+        content, summary = generate_etp_incremental(self.generator, self.session, self._session_data())
+        self.session.generated_etp = content
+        db.session.commit()
+        return summary
+
+    def test_feedback_patches_only_the_section_row(self):
+        self.assertIsNone(regenerate_section(self.generator, self.session, 3, self._session_data(), 'curto'))
+        self._generate()
+        rows = load_sections(self.session, is_preview=False)
+        self.assertEqual({row.tokens for row in rows}, {100})
+        self.assertTrue(all(row.latency_ms is not None for row in rows))
+        before = {row.section_number: (row.content, row.updated_at) for row in rows}
+        document = self.session.generated_etp
+
+        self.generator.calls = []
+        result = regenerate_section(self.generator, self.session, 3, self._session_data(), feedback='mais prazos')
+        db.session.commit()
+
+        self.assertEqual(self.generator.calls, [('adjust_uncached', 3)])
+        self.assertEqual(result['tokens'], 100)
+        self.assertTrue(result['content'].endswith('|elevadores [mais prazos]'))
+        changed = {row.section_number for row in load_sections(self.session, is_preview=False)
+                   if (row.content, row.updated_at) != before[row.section_number]}
+        self.assertEqual(changed, {3})
+
+        # O documento gravado troca só o trecho da seção, na mesma transação da linha
+        db.session.expire_all()
+        patched = self.session.generated_etp
+        self.assertEqual(self.generator.section_content(patched, 3), result['content'])
+        for number in range(1, 15):
+            if number != 3:
+                self.assertEqual(self.generator.section_content(patched, number),
+                                 self.generator.section_content(document, number))
+
+        # Nova geração completa reaproveita a seção ajustada sem chamar o modelo
+        summary = self._generate()
+        self.assertEqual((self.generator.calls, summary['sections_reused']), ([], 14))
+        self.assertIn('[mais prazos]', self.session.generated_etp)
+
+        validation = self.generator.validate_etp_completeness(
+            '', sections=[{'section': row.section_number, 'content': row.content}
+                          for row in load_sections(self.session, is_preview=False)])
+        self.assertEqual(validation['completeness_percentage'], 100)
+
+    def test_endpoint_regenerates_and_coalesces_by_current_content(self):
+        self._generate()
+        app = Flask(__name__)
+        app.register_blueprint(EtpDynamicController.etp_dynamic_bp)
+        self.generator.calls = []
+
+        with patch.object(EtpDynamicController, '_get_etp_components', return_value=(self.generator, None, None)):
+            client = app.test_client()
+            response = client.post('/session/s1/sections/5/regenerate', json={})
+            missing = client.post('/session/s1/sections/99/regenerate', json={})
+            preview = client.post('/session/s1/sections/5/regenerate', json={'variant': 'preview', 'feedback': 'x'})
+
+        body = response.get_json()
+        self.assertEqual(response.status_code, 200, body)
+        self.assertEqual((body['generation_method'], body['section']['section']), ('section_regeneration', 5))
+        # Regeneração explícita não devolve a resposta em cache da geração original
+        self.assertEqual(self.generator.calls, [('regenerate', 5)])
+        self.assertEqual(missing.status_code, 400)
+        self.assertEqual(preview.status_code, 404)
+        row = EtpSection.query.filter_by(section_number=5, variant='final').one()
+        self.assertEqual(body['etp_content'], self.session.generated_etp)
+        self.assertEqual(self.generator.section_content(body['etp_content'], 5), row.content)
+
+    def test_legacy_generation_after_section_regeneration_is_served(self):
+        self._generate()
+        regenerate_section(self.generator, self.session, 3, self._session_data(), feedback='mais prazos')
+        db.session.commit()
+
+        app = Flask(__name__)
+        app.register_blueprint(EtpController.etp_bp)
+        legacy = _CountingGenerator()
+        legacy.generate_complete_etp = lambda session_data, context_data=None, is_preview=False: 'ETP legado'
+
+        with patch.object(etp_dynamic, 'etp_generator', legacy, create=True):
+            client = app.test_client()
+            generated = client.post('/generate-final-document', json={'session_id': 's1'})
+            preview = client.post('/get-preview', json={'session_id': 's1'})
+
+        self.assertEqual(generated.status_code, 200, generated.get_json())
+        self.assertEqual(preview.get_json()['preview'], 'ETP legado')
+
+        # A próxima seção regenerada não ressuscita o documento anterior montado das linhas
+        db.session.expire_all()
+        self.assertIsNone(regenerate_section(self.generator, self.session, 3, self._session_data(), feedback='x'))
+        self.assertEqual(self.session.generated_etp, 'ETP legado')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from domain.usecase.etp.section_routing import (
+    SectionRouter, default_routes, parse_routes_config, DEFAULT_SECTION_ROUTES
+)
+from domain.usecase.etp.etp_generator_dynamic import DynamicEtpGenerator
+
+PRIMARY = 'ft:gpt-4.1-mini:etp'
+
+
+class _FakeLlm:
+    """Registra os parâmetros de cada chamada de seção"""
+
+    def __init__(self):
+        self.calls = []
+
+    def chat(self, call_site, **kwargs):
+        self.calls.append(kwargs)
+        message = type('Message', (), {'content': 'texto da seção'})()
+        return type('Response', (), {'choices': [type('Choice', (), {'message': message})()]})()
+
+
+class TestSectionRouting(unittest.TestCase):
+    """Testes do roteamento de seções entre modelos"""
+
+    def _router(self, **kwargs):
+        return SectionRouter(default_routes(PRIMARY, 4000, 0.2), DEFAULT_SECTION_ROUTES, **kwargs)
+
+    def test_formulaic_sections_use_lighter_route(self):
+        router = self._router()
+        self.assertEqual(router.route_for(3).name, 'analitica')
+        self.assertEqual(router.route_for(3).max_tokens, 4000)
+        self.assertEqual(router.route_for(14).name, 'formulaica')
+        self.assertEqual(router.route_for(14).max_tokens, 2000)
+        self.assertEqual(router.select(10).model, PRIMARY)
+
+    def test_routes_config_from_json(self):
+        """ETP_SECTION_ROUTES altera rotas existentes, cria novas e remapeia seções"""
+        raw = ('{"routes": {"formulaica": {"max_tokens": 1500},'
+               ' "rapida": {"model": "gpt-4o-mini", "max_tokens": 800, "temperature": 0.1}},'
+               ' "sections": {"9": "rapida", "3": "inexistente"}}')
+        routes, sections = parse_routes_config(raw, default_routes(PRIMARY, 4000, 0.2), DEFAULT_SECTION_ROUTES)
+        router = SectionRouter(routes, sections)
+        self.assertEqual(router.route_for(10).max_tokens, 1500)
+        self.assertEqual((router.route_for(9).model, router.route_for(9).temperature), ('gpt-4o-mini', 0.1))
+        self.assertEqual(router.route_for(3).name, 'analitica')
+
+        self.assertEqual(parse_routes_config('{inválido', routes, sections), (routes, sections))
+
+    def test_slo_breach_falls_back_until_window_expires(self):
+        """p95 acima do SLO manda a rota para o modelo de fallback; amostras antigas expiram"""
+        router = self._router(window_seconds=60, min_samples=3)
+        for latency in (10, 150, 160):
+            router.observe(router.select(3), latency)
+
+        selection = router.select(3)
+        self.assertTrue(selection.fallback)
+        self.assertEqual(selection.model, router.route_for(3).fallback_model)
+        # Rota formulaica tem o mesmo modelo principal, logo o mesmo p95
+        self.assertTrue(router.select(14).fallback)
+
+        with mock.patch('domain.usecase.etp.section_routing.time.monotonic', return_value=10 ** 9):
+            self.assertFalse(router.select(3).fallback)
+
+    def test_generator_calls_model_of_the_route(self):
+        """A seção é gerada com os parâmetros da rota e o resultado informa o modelo usado"""
+        generator = DynamicEtpGenerator('sk-test')
+        generator.llm = _FakeLlm()
+        section_info = next(s for s in generator.etp_structure if s['section'].startswith('14.'))
+
+        selection = generator.router.select(14)
+        generator._complete_section(section_info, [{'role': 'user', 'content': 'x'}], selection)
+        self.assertEqual(generator.llm.calls[0]['max_tokens'], 2000)
+
+        result = generator._section_result('14', 'texto', 'fp', selection=selection)
+        self.assertEqual((result['route'], result['model']), ('formulaica', generator.SECTION_MODEL))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+import threading
+from unittest import mock
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from domain.services.session_prefetch import SessionPrefetch, KIND_LEGAL_NORMS, KIND_REQUIREMENTS
+from domain.usecase.etp.verify_federal import build_legal_cards
+
+
+class TestSessionPrefetch(unittest.TestCase):
+    """Testes da pré-busca especulativa por sessão"""
+
+    def setUp(self):
+        self.prefetch = SessionPrefetch(enabled=True, ttl_seconds=60, workers=2, max_sessions=2)
+
+    def test_result_waits_for_running_prefetch(self):
+        """Busca em andamento: sem timeout não bloqueia; com timeout, aguarda o resultado"""
+        release = threading.Event()
+
+        def slow_search():
+            release.wait(5)
+            return [{'content': 'R1'}]
+
+        self.assertTrue(self.prefetch.submit('s1', KIND_REQUIREMENTS, 'notebooks', slow_search))
+        self.assertFalse(self.prefetch.submit('s1', KIND_REQUIREMENTS, 'notebooks', slow_search))
+        self.assertIsNone(self.prefetch.result('s1', KIND_REQUIREMENTS, 'notebooks'))
+
+        release.set()
+        self.assertEqual(self.prefetch.result('s1', KIND_REQUIREMENTS, 'notebooks', timeout=5), [{'content': 'R1'}])
+
+    def test_key_ttl_and_failures_miss(self):
+        """Outra necessidade, TTL vencido ou busca com erro: a etapa calcula na hora"""
+        self.prefetch.submit('s1', KIND_REQUIREMENTS, 'notebooks', lambda: ['ok'])
+        self.assertEqual(self.prefetch.result('s1', KIND_REQUIREMENTS, 'notebooks', timeout=5), ['ok'])
+        self.assertIsNone(self.prefetch.result('s1', KIND_REQUIREMENTS, 'impressoras'))
+
+        with mock.patch('domain.services.session_prefetch.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(self.prefetch.result('s1', KIND_REQUIREMENTS, 'notebooks'))
+
+        def failing():
+            raise RuntimeError('LexML fora do ar')
+
+        self.prefetch.submit('s1', KIND_LEGAL_NORMS, 'software', failing)
+        self.assertIsNone(self.prefetch.result('s1', KIND_LEGAL_NORMS, 'software', timeout=5))
+        # Falha não é reaproveitada: nova trava agenda de novo
+        self.assertTrue(self.prefetch.submit('s1', KIND_LEGAL_NORMS, 'software', lambda: []))
+
+    def test_oldest_sessions_are_evicted(self):
+        for session_id in ('s1', 's2', 's3'):
+            self.prefetch.submit(session_id, KIND_REQUIREMENTS, 'x', lambda sid=session_id: [sid])
+        self.assertIsNone(self.prefetch.result('s1', KIND_REQUIREMENTS, 'x', timeout=5))
+        self.assertEqual(self.prefetch.result('s3', KIND_REQUIREMENTS, 'x', timeout=5), ['s3'])
+
+    def test_legal_cards_from_lexml_verification(self):
+        """Candidatas de suggest_federal viram cards com verificação e resumo"""
+        verified = {'urn': 'urn:lex:br:federal:lei:2021-04-01;14133', 'label': 'Lei 14133/2021',
+                    'status': 'vigente', 'metadados': {'ementa': 'Lei de Licitações'}, 'verified': True}
+        candidate = {'tipo': 'Lei', 'numero': '14133', 'ano': '2021', 'descricao': 'Nova Lei de Licitações'}
+
+        with mock.patch('domain.usecase.etp.verify_federal.resolve_lexml', return_value=verified) as resolve:
+            cards = build_legal_cards([candidate])
+
+        resolve.assert_called_once_with('Lei', '14133', 2021)
+        self.assertEqual(cards[0]['descricao'], 'Nova Lei de Licitações')
+        self.assertEqual(cards[0]['ementa'], 'Lei de Licitações')
+        self.assertTrue(cards[0]['url_lexml'].endswith('14133'))
+        self.assertIn('Fonte: LexML', cards[0]['resumo'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from sqlalchemy import create_engine
+
+from domain.interfaces.dataprovider.DatabaseConfig import db, metadata, get_engine
+from domain.dto import UserDto  # noqa: F401  (tabela users referenciada por etp_sessions)
+from domain.dto.EtpDto import RequestLease
+from domain.services.single_flight import SingleFlight, flight_key
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Testes da coalescência de requisições duplicadas concorrentes"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'lease.db')}")
+        metadata.create_all(bind=self.engine)
+        db.session.remove()
+        db.session.configure(bind=self.engine)
+        self.release = threading.Event()
+        self.calls = 0
+
+    def tearDown(self):
+        db.session.remove()
+        db.session.configure(bind=get_engine())
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _slow_generate(self):
+        self.calls += 1
+        self.release.wait(5)
+        return {'etp_content': 'ETP', 'call': self.calls}, 200
+
+    def _run_concurrently(self, flights):
+        """Primeira instância executa; as demais chegam com a execução em andamento"""
+        results = [None] * len(flights)
+
+        def run(i):
+            try:
+                results[i] = flights[i].do('s1', 'generate', 'fp', self._slow_generate)
+            finally:
+                db.session.remove()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(flights))]
+        threads[0].start()
+        while not self.calls:
+            threading.Event().wait(0.01)
+        for thread in threads[1:]:
+            thread.start()
+        threading.Event().wait(0.2)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_duplicates_in_same_worker_share_result(self):
+        flight = SingleFlight(enabled=True, poll_seconds=0.05)
+        results = self._run_concurrently([flight, flight, flight])
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([result for result, _ in results], [results[0][0]] * 3)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True])
+
+    def test_duplicates_across_workers_wait_on_lease(self):
+        worker_a = SingleFlight(enabled=True, poll_seconds=0.05)
+        worker_b = SingleFlight(enabled=True, poll_seconds=0.05)
+        results = self._run_concurrently([worker_a, worker_b])
+
+        self.assertEqual(self.calls, 1)
+        # Resultado do outro worker chega via JSON gravado no lease
+        self.assertEqual(results[1], ([{'etp_content': 'ETP', 'call': 1}, 200], True))
+        lease = RequestLease.query.filter_by(lease_key=flight_key('s1', 'generate', 'fp')).first()
+        self.assertEqual(lease.status, 'done')
+
+    def test_expired_lease_is_taken_over_and_errors_are_not_kept(self):
+        """Dono que morreu não trava a operação; resposta de erro não serve retentativas"""
+        now = datetime.utcnow()
+        db.session.add(RequestLease(lease_key=flight_key('s1', 'preview', 'fp'), operation='preview',
+                                    owner='morto', status='running', expires_at=now - timedelta(seconds=1)))
+        db.session.commit()
+
+        flight = SingleFlight(enabled=True, wait_seconds=1, poll_seconds=0.05)
+        failing = lambda: ({'success': False}, 500)
+        self.assertEqual(flight.do('s1', 'preview', 'fp', failing, keep=lambda r: r[1] < 500),
+                         (({'success': False}, 500), False))
+        self.assertEqual(RequestLease.query.one().status, 'failed')
+
+        self.release.set()
+        result, shared = flight.do('s1', 'preview', 'fp', self._slow_generate)
+        self.assertFalse(shared)
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import sys
+import os
+import json
+from unittest.mock import patch
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+from flask import Flask
+
+from domain.usecase.etp.utils_parser import chat_json
+from adapter.entrypoint.etp import EtpDynamicController
+
+
+class _FakeLlm:
+    """Devolve o conteúdo configurado e registra as chamadas"""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = []
+
+    def chat(self, call_site, **kwargs):
+        self.calls.append((call_site, kwargs))
+        message = type('Message', (), {'content': self.content})()
+        return type('Response', (), {'choices': [type('Choice', (), {'message': message})()]})()
+
+
+class TestStructuredChat(unittest.TestCase):
+    """Testes das respostas estruturadas (classificação e resposta numa só chamada)"""
+
+    def test_chat_json_sends_schema_and_parses_relaxed(self):
+        llm = _FakeLlm('```json\n{"made_choice": false, "reply": "Qual prazo?"}\n```')
+        result = chat_json(llm, 'teste', 'gpt-4o-mini', [{'role': 'user', 'content': 'x'}],
+                           'teste', {'type': 'object'}, max_tokens=10)
+
+        self.assertEqual(result, {'made_choice': False, 'reply': 'Qual prazo?'})
+        response_format = llm.calls[0][1]['response_format']
+        self.assertEqual(response_format['type'], 'json_schema')
+        self.assertTrue(response_format['json_schema']['strict'])
+
+        self.assertIsNone(chat_json(_FakeLlm('sem json'), 'teste', 'gpt-4o-mini', [], 'teste', {}))
+
+    def test_option_conversation_uses_one_call(self):
+        """Análise da escolha e resposta consultiva vêm da mesma chamada"""
+        llm = _FakeLlm(json.dumps({
+            'made_choice': True, 'chosen_option': 'Locação', 'needs_clarification': False,
+            'response_type': 'choice', 'reply': 'Ótimo, seguimos com a locação.'
+        }))
+        generator = type('Generator', (), {'llm': llm})()
+        app = Flask(__name__)
+        app.register_blueprint(EtpDynamicController.etp_dynamic_bp)
+
+        with patch.object(EtpDynamicController, '_get_etp_components', return_value=(generator, None, None)):
+            response = app.test_client().post('/option-conversation', json={
+                'message': 'Vamos de locação', 'options': [{'name': 'Compra'}, {'name': 'Locação'}]
+            })
+
+        body = response.get_json()
+        self.assertEqual(len(llm.calls), 1)
+        self.assertEqual(body['ai_response'], 'Ótimo, seguimos com a locação.')
+        self.assertEqual(body['choice_analysis']['chosen_option'], 'Locação')
+        self.assertNotIn('reply', body['choice_analysis'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import sys
+import os
+import gzip
+import tempfile
+from unittest import mock
+
+# Add src path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+from domain.usecase.utils import text_cache
+from domain.usecase.utils.text_cache import ExtractedTextCache, build_extracted_text, sha256_bytes
+
+
+class TestExtractedTextCache(unittest.TestCase):
+    """Testes para o cache de texto extraído endereçado por sha256"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ExtractedTextCache(cache_dir=self.tmp.name, enabled=True)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_page_offsets_roundtrip(self):
+        """Páginas normalizadas são recuperadas pelos offsets"""
+        entry = build_extracted_text("abc", "pdfplumber", ["Página 1  \r\nlinha", "", "Página 3\x00"])
+        self.assertEqual(entry.page_offsets, [0, 15, 16])
+        self.assertEqual(entry.pages, ["Página 1\nlinha", "", "Página 3"])
+    
+    def test_get_or_extract_hits_cache(self):
+        """Segunda extração do mesmo conteúdo não chama o extrator"""
+        sha = sha256_bytes(b"%PDF fake")
+        calls = []
+        
+        def extract():
+            calls.append(1)
+            return ["texto A", "texto B"]
+        
+        first = self.cache.get_or_extract(sha, "pypdf2", extract)
+        second = self.cache.get_or_extract(sha, "pypdf2", extract)
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(first.pages, second.pages)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+    
+    def test_extractor_is_part_of_key(self):
+        """Extratores diferentes não compartilham entradas"""
+        sha = sha256_bytes(b"conteudo")
+        self.cache.get_or_extract(sha, "pypdf2", lambda: ["a"])
+        self.assertIsNone(self.cache.get(sha, "pdfplumber"))
+
+    def test_iter_pages_hit_streams_from_the_entry(self):
+        """No acerto as páginas são lidas da entrada uma a uma, sem descomprimir o documento inteiro"""
+        sha = sha256_bytes(b"documento grande")
+        pages = [f"página {i} " + "x" * 20000 for i in range(50)]
+        self.assertEqual(list(self.cache.iter_pages(sha, "pdfplumber", lambda: iter(pages))), pages)
+
+        opened, gzip_open = [], gzip.open
+
+        def spy_open(*args, **kwargs):
+            opened.append(gzip_open(*args, **kwargs))
+            return opened[-1]
+
+        with mock.patch.object(text_cache.gzip, 'open', spy_open):
+            stream = self.cache.iter_pages(sha, "pdfplumber", lambda: self.fail("extrator chamado no acerto"))
+            self.assertEqual(next(stream), pages[0])
+            self.assertLess(opened[0].buffer.tell(), sum(len(page) for page in pages) // 10)
+            self.assertEqual(list(stream), pages[1:])
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.get(sha, "pdfplumber").pages, pages)
+
+    def test_iter_pages_recovers_from_a_truncated_entry(self):
+        """Entrada corrompida no meio: o restante vem do extrator e a entrada é descartada"""
+        sha = sha256_bytes(b"documento truncado")
+        pages = [f"página {i} " + "y" * 20000 for i in range(20)]
+        list(self.cache.iter_pages(sha, "pdfplumber", lambda: iter(pages)))
+        path = self.cache._path(sha, "pdfplumber")
+        path.write_bytes(path.read_bytes()[:-200])
+
+        self.assertEqual(list(self.cache.iter_pages(sha, "pdfplumber", lambda: iter(pages))), pages)
+        self.assertFalse(path.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -55,5 +55,10 @@ echo "📍 Acesse: http://localhost:5002"
 echo "🔄 Para parar: Ctrl+C"
 echo ""
 
+# Worker da fila de geração de ETP (encerrado junto com a aplicação)
+python src/main/python/applicationWorker.py &
+WORKER_PID=$!
+trap "kill $WORKER_PID 2>/dev/null" EXIT
+
 python src/main/python/applicationApi.py
 